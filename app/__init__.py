@@ -1,24 +1,88 @@
+import importlib
 import os
+import time
 
 from flask import Flask, redirect, request, session, url_for
 
-from app.routes.admin_tools import admin_tools_bp
-from app.routes.auth import auth_bp
-from app.routes.crypto import crypto_bp
-from app.routes.contact import contact_bp
-from app.routes.data_io import data_io_bp
-from app.routes.fiat import fiat_bp
-from app.routes.home import home_bp
-from app.routes.loans import loans_bp
-from app.routes.settings import settings_bp
-from app.routes.stock import stock_bp
-from app.routes.wallet import wallet_bp
-from app.routes.dev_auth import dev_auth_bp
+from app.services.assets import init_assets
 from app.services.authz import is_admin_user
+from app.services.compression import init_compression
+from app.services.http_replay import init_http_replay
+from app.services.mail_queue import init_mail_queue
+
+# Blueprints in registration order: (module, blueprint attribute).
+_BLUEPRINTS = (
+    ("app.routes.home", "home_bp"),
+    ("app.routes.wallet", "wallet_bp"),
+    ("app.routes.fiat", "fiat_bp"),
+    ("app.routes.crypto", "crypto_bp"),
+    ("app.routes.contact", "contact_bp"),
+    ("app.routes.stock", "stock_bp"),
+    ("app.routes.settings", "settings_bp"),
+    ("app.routes.loans", "loans_bp"),
+    ("app.routes.data_io", "data_io_bp"),
+    ("app.routes.history", "history_bp"),
+    ("app.routes.portfolio", "portfolio_bp"),
+    ("app.routes.auth", "auth_bp"),
+    ("app.routes.dev_auth", "dev_auth_bp"),
+    ("app.routes.admin_tools", "admin_tools_bp"),
+)
+
+# Rarely used blueprints that are only imported when one of their routes is first hit
+# (admin_tools pulls in boto3, contact the Turnstile/mail helpers). Keep in sync with the modules' routes.
+# module -> (blueprint name, url prefix, [(rule, view function, methods)])
+_LAZY_VIEWS = {
+    "app.routes.contact": ("contact", "", [("/contact", "contact_page", ["GET", "POST"])]),
+    "app.routes.admin_tools": (
+        "admin_tools",
+        "/admin",
+        [
+            ("/userid-migrate", "userid_migrate", ["GET", "POST"]),
+            ("/column-delete", "column_delete", ["GET", "POST"]),
+            ("/seed-settings", "seed_settings", ["GET", "POST"]),
+            ("/seed-settings/bulk", "bulk_seed_settings", ["POST"]),
+            ("/seed-settings/bulk/<job_id>", "bulk_seed_status", ["GET"]),
+            ("/failing-symbols", "failing_symbols", ["GET"]),
+        ],
+    ),
+}
+
+
+class _LazyView:
+    """View function that imports its module on the first request."""
+
+    def __init__(self, module: str, name: str):
+        self.module = module
+        self.name = name
+        self.__name__ = name
+        self._view = None
+
+    def __call__(self, *args, **kwargs):
+        view = self._view
+        if view is None:
+            view = self._view = getattr(importlib.import_module(self.module), self.name)
+        return view(*args, **kwargs)
+
+
+def _register_blueprints(app, lazy: bool, timings: list) -> None:
+    for module, attr in _BLUEPRINTS:
+        started = time.perf_counter()
+        if lazy and module in _LAZY_VIEWS:
+            bp_name, prefix, rules = _LAZY_VIEWS[module]
+            for rule, name, methods in rules:
+                app.add_url_rule(prefix + rule, f"{bp_name}.{name}", _LazyView(module, name), methods=methods)
+            timings.append((f"{module} (lazy)", time.perf_counter() - started))
+            continue
+        app.register_blueprint(getattr(importlib.import_module(module), attr))
+        timings.append((module, time.perf_counter() - started))
 
 
 def create_app():
+    started = time.perf_counter()
+    timings: list[tuple[str, float]] = []
     app = Flask(__name__)
+    # HTTP_REPLAY_MODE=record|replay: capture or serve all upstream HTTP traffic (offline profiling).
+    init_http_replay(app)
 
     def _strip_quotes(val: str) -> str:
         s = (val or "").strip()
@@ -92,7 +156,7 @@ def create_app():
         if not _is_codespaces() or not _dev_login_creds_present():
             return None
 
-        if request.endpoint == "static":
+        if request.endpoint in ("static", "assets"):
             return None
 
         # Avoid redirect loops.
@@ -116,16 +180,21 @@ def create_app():
             "is_admin": is_admin_user(),
         }
 
-    app.register_blueprint(home_bp)
-    app.register_blueprint(wallet_bp)
-    app.register_blueprint(fiat_bp)
-    app.register_blueprint(crypto_bp)
-    app.register_blueprint(contact_bp)
-    app.register_blueprint(stock_bp)
-    app.register_blueprint(settings_bp)
-    app.register_blueprint(loans_bp)
-    app.register_blueprint(data_io_bp)
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(dev_auth_bp)
-    app.register_blueprint(admin_tools_bp)
+    # LAZY_BLUEPRINTS=0 imports every blueprint up front (e.g. to surface import errors at boot).
+    lazy = (os.getenv("LAZY_BLUEPRINTS") or "1").strip().lower() not in {"0", "false", "no", "n", "off"}
+    _register_blueprints(app, lazy, timings)
+
+    step = time.perf_counter()
+    init_assets(app)
+    timings.append(("assets manifest", time.perf_counter() - step))
+    init_compression(app)
+    init_mail_queue(app)
+
+    # STARTUP_PROFILE=1 prints where worker boot time goes (per blueprint import, asset hashing).
+    # For a per-module breakdown run: python -X importtime run.py
+    if _truthy_env(os.getenv("STARTUP_PROFILE")):
+        total = time.perf_counter() - started
+        print(f"[startup] create_app took {total * 1000:.1f} ms")
+        for label, seconds in sorted(timings, key=lambda t: -t[1]):
+            print(f"[startup]   {seconds * 1000:8.1f} ms  {label}")
     return app
@@ -1,18 +1,26 @@
 import json
 import os
 import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal
 from typing import Any
 
-import requests as http_requests
-from flask import Blueprint, abort, flash, redirect, render_template, request, session, url_for
+from flask import Blueprint, abort, flash, jsonify, redirect, render_template, request, session, url_for
 
 from app.services.authz import is_admin_user
-from config import API_URL, aws_auth
-
-_SETTINGS_DEFAULTS_PATH = os.path.join(os.path.dirname(__file__), "..", "static", "settings_defaults.json")
-with open(_SETTINGS_DEFAULTS_PATH, "r") as _f:
-    _DEFAULT_SETTINGS_SEED = json.load(_f)
-
+from app.services.cmc import usage as cmc_usage
+from app.services.events import publish_change
+from app.services.negative_cache import failing_symbols as lookup_failing_symbols
+from app.services.providers import health_snapshot as provider_health
+from app.services.rate_limit import TokenBucket
+from app.services.settings_defaults import settings_defaults
+from app.services.user_settings import update_user_settings
+
+# Imported on first use by default: new routes must also be listed in app._LAZY_VIEWS.
 admin_tools_bp = Blueprint("admin_tools", __name__, url_prefix="/admin")
 
 
@@ -546,26 +554,60 @@ def column_delete():
     )
 
 
-def _scan_all_user_ids_from_table(client, table_name: str) -> list[str]:
-    user_ids: set[str] = set()
+def _scan_segments() -> int:
+    try:
+        return max(1, min(32, int((os.getenv("ADMIN_SCAN_SEGMENTS") or "4").strip())))
+    except Exception:
+        return 4
+
+
+def _scan_segment(client, scan_kwargs: dict[str, Any], segment: int, total_segments: int) -> list[dict[str, Any]]:
+    items: list[dict[str, Any]] = []
     start_key = None
     while True:
-        kwargs: dict[str, Any] = {
-            "TableName": table_name,
-            "ProjectionExpression": "#u",
-            "ExpressionAttributeNames": {"#u": "userId"},
-        }
+        kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
         if start_key:
             kwargs["ExclusiveStartKey"] = start_key
         resp = client.scan(**kwargs)
-        for item in resp.get("Items", []):
-            uid = (item.get("userId") or {}).get("S", "").strip()
-            if uid:
-                user_ids.add(uid)
+        items.extend(resp.get("Items", []))
         start_key = resp.get("LastEvaluatedKey")
         if not start_key:
-            break
-    return sorted(user_ids)
+            return items
+
+
+def _parallel_scan(client, scan_kwargs: dict[str, Any], segments: int | None = None) -> list[dict[str, Any]]:
+    """Full-table scan split into segments read concurrently (boto3 clients are thread-safe)."""
+    total = segments or _scan_segments()
+    if total == 1:
+        return _scan_segment(client, scan_kwargs, 0, 1)
+    items: list[dict[str, Any]] = []
+    with ThreadPoolExecutor(max_workers=total) as pool:
+        for part in pool.map(lambda seg: _scan_segment(client, scan_kwargs, seg, total), range(total)):
+            items.extend(part)
+    return items
+
+
+# table name -> {"ts": float, "ids": list[str]}; the seed page is reloaded after every action.
+_USER_IDS_CACHE: dict[str, dict[str, Any]] = {}
+_USER_IDS_TTL_SECONDS = 120
+
+
+def _scan_all_user_ids_from_table(client, table_name: str, *, force: bool = False) -> list[str]:
+    cached = _USER_IDS_CACHE.get(table_name)
+    if not force and cached and time.time() - cached["ts"] < _USER_IDS_TTL_SECONDS:
+        return cached["ids"]
+    items = _parallel_scan(
+        client,
+        {"TableName": table_name, "ProjectionExpression": "#u", "ExpressionAttributeNames": {"#u": "userId"}},
+    )
+    user_ids: set[str] = set()
+    for item in items:
+        uid = (item.get("userId") or {}).get("S", "").strip()
+        if uid:
+            user_ids.add(uid)
+    ids = sorted(user_ids)
+    _USER_IDS_CACHE[table_name] = {"ts": time.time(), "ids": ids}
+    return ids
 
 
 @admin_tools_bp.route("/seed-settings", methods=["GET", "POST"])
@@ -575,7 +617,7 @@ def seed_settings():
     client = _ddb_client()
     seed_user_ids: list[str] = []
     try:
-        seed_user_ids = _scan_all_user_ids_from_table(client, "Settings")
+        seed_user_ids = _scan_all_user_ids_from_table(client, "Settings", force=request.args.get("refresh") == "1")
     except Exception as e:
         flash(f"Error scanning Settings table: {e}", "danger")
 
@@ -589,19 +631,16 @@ def seed_settings():
             if not selected_fields:
                 flash("Select at least one field to update.", "warning")
             else:
-                try:
-                    with open(_SETTINGS_DEFAULTS_PATH, "r") as _fh:
-                        current_defaults = json.load(_fh)
-                except Exception as e:
-                    flash(f"Could not read defaults file: {e}", "danger")
-                    current_defaults = _DEFAULT_SETTINGS_SEED
+                # Re-read when the defaults file was edited since the last seed.
+                current_defaults = settings_defaults()
 
-                payload = {"userId": seed_selected_user}
+                payload = {}
                 for field in selected_fields:
                     if field in current_defaults:
                         payload[field] = current_defaults[field]
                 try:
-                    resp = http_requests.patch(f"{API_URL}/settings", json=payload, auth=aws_auth)
+                    # Publishes a settings change, so the user's cached settings refresh everywhere.
+                    resp = update_user_settings(seed_selected_user, payload)
                     if resp.status_code in (200, 201):
                         labels = ", ".join(selected_fields)
                         flash(f"Updated {labels} for {seed_selected_user}.", "success")
@@ -627,6 +666,8 @@ def seed_settings():
         # seed section
         seed_user_ids=seed_user_ids,
         seed_selected_user=seed_selected_user,
+        seed_fields=sorted(settings_defaults().keys()),
+        seed_job_id=(request.args.get("job") or "").strip(),
         # column delete section defaults
         drop_tables=[],
         drop_selected_table="",
@@ -640,3 +681,208 @@ def seed_settings():
         drop_matched=0,
         drop_changed=0,
     )
+
+
+# ── Bulk seeding ─────────────────────────────────────────────────────
+# Jobs run in a background thread of the worker that accepted the POST. Their progress is
+# kept in a JSON file so the status endpoint can be answered by any worker.
+_SEED_TABLE = "Settings"
+_SEED_JOB_ID_RE = re.compile(r"^[0-9a-f]{12}$")
+
+
+def _seed_job_path(job_id: str) -> str:
+    root = (os.getenv("ADMIN_JOBS_DIR") or "").strip() or os.path.join(tempfile.gettempdir(), "wallet-front-admin-jobs")
+    return os.path.join(root, f"seed-{job_id}.json")
+
+
+def _write_seed_job(job: dict[str, Any]) -> None:
+    path = _seed_job_path(job["id"])
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f"[admin] Could not write seed job progress: {e}")
+
+
+def _read_seed_job(job_id: str) -> dict[str, Any] | None:
+    try:
+        with open(_seed_job_path(job_id), "r") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _to_attrval(value: Any) -> dict[str, Any]:
+    from boto3.dynamodb.types import TypeSerializer
+
+    # DynamoDB numbers must be Decimal, not float.
+    return TypeSerializer().serialize(json.loads(json.dumps(value), parse_float=Decimal))
+
+
+def _scan_keys_missing_attribute(client, table_name: str, table_desc: dict[str, Any], field_name: str) -> list[tuple[dict, str]]:
+    """(key, userId) of every item without ``field_name``, found with a filtered parallel scan."""
+    key_fields = _key_fields(table_desc)
+    projection = list(key_fields) + ([] if "userId" in key_fields else ["userId"])
+    expr_names = {"#f": field_name}
+    for i, name in enumerate(projection):
+        expr_names[f"#p{i}"] = name
+    items = _parallel_scan(
+        client,
+        {
+            "TableName": table_name,
+            "FilterExpression": "attribute_not_exists(#f)",
+            "ExpressionAttributeNames": expr_names,
+            "ProjectionExpression": ", ".join(f"#p{i}" for i in range(len(projection))),
+        },
+    )
+    targets = []
+    for item in items:
+        key = {k: item[k] for k in key_fields if k in item}
+        if len(key) == len(key_fields):
+            targets.append((key, (item.get("userId") or {}).get("S", "").strip()))
+    return targets
+
+
+def _run_bulk_seed(job: dict[str, Any], value: Any, workers: int) -> None:
+    field = job["field"]
+    try:
+        client = _ddb_client()
+        job["state"] = "scanning"
+        _write_seed_job(job)
+        targets = _scan_keys_missing_attribute(client, _SEED_TABLE, _describe_table(client, _SEED_TABLE), field)
+        job["matched"] = len(targets)
+        if job["mode"] != "apply" or not targets:
+            job["state"] = "done"
+            return
+
+        job["state"] = "writing"
+        _write_seed_job(job)
+        bucket = TokenBucket(job["rate"])
+        attr = _to_attrval(value)
+
+        def write_one(key: dict, user_id: str) -> str:
+            bucket.acquire()
+            try:
+                # Conditional: never overwrite a value the user set after the scan.
+                client.update_item(
+                    TableName=_SEED_TABLE,
+                    Key=key,
+                    UpdateExpression="SET #f = :v",
+                    ConditionExpression="attribute_not_exists(#f)",
+                    ExpressionAttributeNames={"#f": field},
+                    ExpressionAttributeValues={":v": attr},
+                )
+            except Exception as e:
+                code = (getattr(e, "response", None) or {}).get("Error", {}).get("Code")
+                if code == "ConditionalCheckFailedException":
+                    return "skipped"
+                raise
+            if user_id:
+                publish_change("settings", user_id, action="update")
+            return "written"
+
+        last_report = time.time()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(write_one, key, uid) for key, uid in targets]
+            for fut in as_completed(futures):
+                try:
+                    outcome = fut.result()
+                except Exception as e:
+                    outcome = "failed"
+                    job["error"] = f"{type(e).__name__}: {e}"
+                job[outcome] += 1
+                if time.time() - last_report >= 1.0:
+                    last_report = time.time()
+                    _write_seed_job(job)
+        job["state"] = "done"
+    except Exception as e:
+        job["state"] = "failed"
+        job["error"] = f"{type(e).__name__}: {e}"
+        print(f"[admin] Bulk seed of {field} failed: {e}")
+    finally:
+        job["finished"] = time.time()
+        _write_seed_job(job)
+
+
+@admin_tools_bp.route("/seed-settings/bulk", methods=["POST"])
+def bulk_seed_settings():
+    """Apply a default to every Settings row that lacks the field (runs in the background).
+
+    Form: field, mode (preview|apply), rate (writes/second).
+    """
+    _require_allowed_admin_user()
+
+    field = (request.form.get("field") or "").strip()
+    current_defaults = settings_defaults()
+    if field not in current_defaults:
+        flash("Select a field that has a default value.", "danger")
+        return redirect(url_for("admin_tools.seed_settings"))
+    try:
+        rate = max(1.0, min(1000.0, float(request.form.get("rate") or 25)))
+    except Exception:
+        rate = 25.0
+
+    job = {
+        "id": uuid.uuid4().hex[:12],
+        "field": field,
+        "mode": "apply" if request.form.get("mode") == "apply" else "preview",
+        "rate": rate,
+        "state": "queued",
+        "matched": 0,
+        "written": 0,
+        "skipped": 0,
+        "failed": 0,
+        "error": "",
+        "started": time.time(),
+        "finished": None,
+    }
+    _write_seed_job(job)
+    workers = max(1, min(32, int(rate)))
+    threading.Thread(
+        target=_run_bulk_seed, args=(job, current_defaults[field], workers), name="admin-bulk-seed", daemon=True
+    ).start()
+    return redirect(url_for("admin_tools.seed_settings", job=job["id"]))
+
+
+@admin_tools_bp.route("/seed-settings/bulk/<job_id>", methods=["GET"])
+def bulk_seed_status(job_id: str):
+    """Progress of a bulk seed job.
+
+    Returns: {"id","field","mode","state","matched","written","skipped","failed","error",...}
+    """
+    _require_allowed_admin_user()
+    job = _read_seed_job(job_id) if _SEED_JOB_ID_RE.match(job_id or "") else None
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+
+@admin_tools_bp.route("/failing-symbols", methods=["GET"])
+def failing_symbols():
+    """Symbols whose market-data lookups keep failing (negative cache), price-provider health and CMC credit usage.
+
+    Query params:
+      - min: minimum consecutive failures to list (default 1)
+      - format: "json" for the raw rows
+    """
+    _require_allowed_admin_user()
+    try:
+        min_failures = max(1, int(request.args.get("min") or 1))
+    except ValueError:
+        min_failures = 1
+    rows = lookup_failing_symbols(min_failures)
+    usage = cmc_usage()
+    providers = provider_health()
+    if request.args.get("format") == "json":
+        return jsonify({"failing": rows, "providers": providers, "cmcUsage": usage})
+    now = time.time()
+    for row in rows:
+        row["retry_in"] = max(0, int(row["retry_at"] - now))
+        row["first_failed"] = time.strftime("%Y-%m-%d %H:%M", time.gmtime(row["first_ts"]))
+        row["last_failed"] = time.strftime("%Y-%m-%d %H:%M", time.gmtime(row["last_ts"]))
+    return render_template(
+        "admin_failing_symbols.html", rows=rows, min_failures=min_failures, providers=providers, cmc_usage=usage
+    )
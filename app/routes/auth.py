@@ -1,10 +1,11 @@
 import os
 import secrets
+import time
 import urllib.parse
 
-from authlib.integrations.flask_client import OAuth
-from flask import Blueprint, redirect, request, session, url_for
+from flask import Blueprint, current_app, redirect, request, session, url_for
 
+from app.services.oidc_cache import jwks, server_metadata
 from config import SERVER_METADATA_URL, URL
 
 auth_bp = Blueprint("auth", __name__)
@@ -18,14 +19,49 @@ auth_bp = Blueprint("auth", __name__)
 #     client_kwargs={'scope': 'email openid phone'}
 # )
 
-oauth = OAuth()
-oauth.register(
-    name="oidc",
-    client_id=os.getenv("CLIENT_ID"),
-    client_secret=os.getenv("CLIENT_SECRET"),
-    server_metadata_url=SERVER_METADATA_URL,
-    client_kwargs={"scope": "email openid phone"},
-)
+# Authlib (and the crypto stack behind it) is only imported when a login flow starts.
+_OAUTH = None
+
+
+def _oidc():
+    """The registered OIDC client, created on first use.
+
+    Discovery metadata and signing keys come from app.services.oidc_cache (shared on disk
+    by all workers) instead of being downloaded by Authlib in every fresh worker.
+    """
+    global _OAUTH
+    if _OAUTH is None:
+        from authlib.integrations.flask_client import OAuth
+
+        oauth = OAuth(current_app)
+        oauth.register(
+            name="oidc",
+            client_id=os.getenv("CLIENT_ID"),
+            client_secret=os.getenv("CLIENT_SECRET"),
+            server_metadata_url=SERVER_METADATA_URL,
+            client_kwargs={"scope": "email openid phone"},
+        )
+        # Authlib calls fetch_jwk_set(force=True) when an ID token names an unknown key (rotation).
+        oauth.oidc.fetch_jwk_set = lambda force=False: jwks(SERVER_METADATA_URL, force=force)
+        _OAUTH = oauth
+    client = _OAUTH.oidc
+    try:
+        # With "_loaded_at" set, Authlib treats the metadata as loaded and won't fetch it.
+        client.server_metadata.update({**server_metadata(SERVER_METADATA_URL), "_loaded_at": time.time()})
+    except Exception as e:
+        print(f"[auth] OIDC metadata cache unavailable, Authlib will fetch it: {e}")
+    return client
+
+
+# Claims copied from a validated ID token when OIDC_USERINFO_FROM_ID_TOKEN is set
+# (the same fields Cognito's /oauth2/userInfo returns).
+_USERINFO_CLAIMS = ("sub", "email", "email_verified", "phone_number", "phone_number_verified", "name")
+
+
+def _user_info_from_claims(claims: dict) -> dict:
+    info = {k: claims[k] for k in _USERINFO_CLAIMS if k in claims}
+    info["username"] = claims.get("cognito:username") or claims.get("username") or claims.get("sub")
+    return info
 
 
 def _strip_quotes(val: str) -> str:
@@ -72,12 +108,6 @@ def _dev_login_enabled() -> bool:
     return bool(u and p)
 
 
-@auth_bp.record_once
-def on_load(state):
-    """Initializes the OAuth app when the blueprint is loaded."""
-    oauth.init_app(state.app)
-
-
 @auth_bp.route("/login")
 def login():
     if _dev_login_enabled():
@@ -90,49 +120,55 @@ def login():
     # Authlib requires an explicit nonce for parse_id_token() in newer versions.
     nonce = secrets.token_urlsafe(24)
     session["oidc_nonce"] = nonce
-    return oauth.oidc.authorize_redirect(redirect_uri, nonce=nonce)
+    return _oidc().authorize_redirect(redirect_uri, nonce=nonce)
 
 
 @auth_bp.route("/callback")
 def auth_callback():
-    token = oauth.oidc.authorize_access_token()
+    client = _oidc()
+    token = client.authorize_access_token()
 
     try:
         print(f"[auth] token keys={list(token.keys())} has_id_token={'id_token' in token}")
     except Exception:
         pass
 
-    user_info = oauth.oidc.userinfo()
-    session["user"] = user_info
-
     # Persist ID token claims so Cognito group membership (cognito:groups) is available.
     # The UserInfo endpoint typically does NOT include groups.
+    claims = None
     try:
         nonce = session.get("oidc_nonce")
-        claims = oauth.oidc.parse_id_token(token, nonce=nonce)
-        session.pop("oidc_nonce", None)
-        if isinstance(claims, dict):
-            session["id_token_claims"] = claims
-            session["cognito_groups"] = claims.get("cognito:groups")
-            # Convenience: surface groups on session['user'] as well.
-            if isinstance(session.get("user"), dict) and "cognito:groups" in claims:
-                session["user"]["cognito:groups"] = claims.get("cognito:groups")
-
-            try:
-                grp = claims.get("cognito:groups")
-                sub = claims.get("sub")
-                print(f"[auth] sub={sub} cognito:groups={grp}")
-            except Exception:
-                pass
+        claims = client.parse_id_token(token, nonce=nonce)
     except Exception as e:
         # If parsing fails for any reason, keep login working; admin gating will simply be false.
         try:
             print(f"[auth] parse_id_token failed: {type(e).__name__}: {e}")
         except Exception:
             pass
+    session.pop("oidc_nonce", None)
+
+    # OIDC_USERINFO_FROM_ID_TOKEN=1 skips the /userInfo round-trip; the ID token was just validated.
+    if isinstance(claims, dict) and _truthy(os.getenv("OIDC_USERINFO_FROM_ID_TOKEN")):
+        session["user"] = _user_info_from_claims(claims)
+    else:
+        session["user"] = client.userinfo()
+
+    if isinstance(claims, dict):
+        session["id_token_claims"] = claims
+        session["cognito_groups"] = claims.get("cognito:groups")
+        # Convenience: surface groups on session['user'] as well.
+        if isinstance(session.get("user"), dict) and "cognito:groups" in claims:
+            session["user"]["cognito:groups"] = claims.get("cognito:groups")
+
+        try:
+            grp = claims.get("cognito:groups")
+            sub = claims.get("sub")
+            print(f"[auth] sub={sub} cognito:groups={grp}")
+        except Exception:
+            pass
+    else:
         session.pop("id_token_claims", None)
         session.pop("cognito_groups", None)
-        session.pop("oidc_nonce", None)
 
     return redirect(url_for("home.users"))
 
@@ -1,27 +1,25 @@
-import smtplib
 from email.message import EmailMessage
 from email.utils import formataddr, parseaddr
-import json
-import os
 import re
-from pathlib import Path
-from urllib import parse as urlparse
-from urllib import request as urlrequest
 
+import requests
 from flask import Blueprint, render_template, request, session
-from dotenv import dotenv_values
 
+from app.services.mail_queue import enqueue, env_setting, missing_smtp_settings, smtp_settings
 from config import (
     CONTACT_TO_EMAIL,
 )
 
+# Imported on first use by default: new routes must also be listed in app._LAZY_VIEWS.
 contact_bp = Blueprint("contact", __name__)
 
-_ENV_FILE = Path(__file__).resolve().parents[2] / ".env"
 _TURNSTILE_VERIFY_URL = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
 _TURNSTILE_TEST_SITE_KEY = "1x00000000000000000000AA"
 _TURNSTILE_TEST_SECRET_KEY = "1x0000000000000000000000000000000AA"
 
+# Keep-alive session: repeat captcha checks skip the TCP/TLS handshake with Cloudflare.
+_TURNSTILE_HTTP = requests.Session()
+
 
 def _session_user_email() -> str:
     user = session.get("user") or {}
@@ -48,14 +46,9 @@ def _verify_turnstile(token: str, secret_key: str, remote_ip: str | None = None)
     if remote_ip:
         payload["remoteip"] = str(remote_ip).strip()
 
-    body = urlparse.urlencode(payload).encode("utf-8")
-    req = urlrequest.Request(_TURNSTILE_VERIFY_URL, data=body, method="POST")
-    req.add_header("Content-Type", "application/x-www-form-urlencoded")
-
     try:
-        with urlrequest.urlopen(req, timeout=10) as resp:
-            raw = resp.read().decode("utf-8", errors="replace")
-            data = json.loads(raw)
+        resp = _TURNSTILE_HTTP.post(_TURNSTILE_VERIFY_URL, data=payload, timeout=10)
+        data = resp.json()
     except Exception:
         return False
 
@@ -81,56 +74,21 @@ def _is_truthy(value: str | None) -> bool:
 
 
 def _runtime_mail_settings() -> dict:
-    # Read .env at runtime so updates work without process restart.
-    file_values = {}
-    try:
-        file_values = dotenv_values(str(_ENV_FILE)) if _ENV_FILE.exists() else {}
-    except Exception:
-        file_values = {}
-
-    def _get(name: str, default: str = "") -> str:
-        val = os.getenv(name)
-        if val is None or str(val).strip() == "":
-            val = file_values.get(name)
-        return str(val if val is not None else default).strip()
-
-    smtp_host = _get("SMTP_HOST")
-    smtp_port_raw = _get("SMTP_PORT", "587")
-    try:
-        smtp_port = int(smtp_port_raw or "587")
-    except Exception:
-        smtp_port = 587
-
-    smtp_username = _get("SMTP_USERNAME")
-    smtp_password = _get("SMTP_PASSWORD")
-    mail_from_email = _get("MAIL_FROM_EMAIL") or smtp_username
-    contact_to_email = _get("CONTACT_TO_EMAIL", CONTACT_TO_EMAIL)
-    smtp_use_tls = _is_truthy(_get("SMTP_USE_TLS", "1"))
-    smtp_use_ssl = _is_truthy(_get("SMTP_USE_SSL", "0"))
-    turnstile_site_key = _get("TURNSTILE_SITE_KEY")
-    turnstile_secret_key = _get("TURNSTILE_SECRET_KEY")
+    # Environment first, then .env (re-parsed only when it changes) so updates work without restart.
+    contact_to_email = env_setting("CONTACT_TO_EMAIL", CONTACT_TO_EMAIL)
+    turnstile_site_key = env_setting("TURNSTILE_SITE_KEY")
+    turnstile_secret_key = env_setting("TURNSTILE_SECRET_KEY")
 
     # In local/dev environments, default to Cloudflare Turnstile test keys
     # so captcha can be exercised without provisioning real keys first.
-    is_dev_env = _is_truthy(_get("LOCAL_DEV")) or _is_truthy(_get("CODESPACES"))
+    is_dev_env = _is_truthy(env_setting("LOCAL_DEV")) or _is_truthy(env_setting("CODESPACES"))
     if is_dev_env and (not turnstile_site_key or not turnstile_secret_key):
         turnstile_site_key = _TURNSTILE_TEST_SITE_KEY
         turnstile_secret_key = _TURNSTILE_TEST_SECRET_KEY
 
-    # Gmail app passwords are often copied as 4-char groups with spaces.
-    # Normalize only for Gmail SMTP to avoid accidental auth failures.
-    if "gmail.com" in smtp_host.lower() and smtp_password:
-        smtp_password = smtp_password.replace(" ", "")
-
     return {
-        "smtp_host": smtp_host,
-        "smtp_port": smtp_port,
-        "smtp_username": smtp_username,
-        "smtp_password": smtp_password,
-        "mail_from_email": mail_from_email,
+        **smtp_settings(),
         "contact_to_email": contact_to_email,
-        "smtp_use_tls": smtp_use_tls,
-        "smtp_use_ssl": smtp_use_ssl,
         "turnstile_site_key": turnstile_site_key,
         "turnstile_secret_key": turnstile_secret_key,
     }
@@ -138,25 +96,11 @@ def _runtime_mail_settings() -> dict:
 
 def _send_contact_email(name: str, user_email: str, subject: str, topic: str, message: str) -> None:
     settings = _runtime_mail_settings()
-    smtp_host = settings["smtp_host"]
-    smtp_port = settings["smtp_port"]
     smtp_username = settings["smtp_username"]
-    smtp_password = settings["smtp_password"]
     mail_from_email = settings["mail_from_email"]
     contact_to_email = settings["contact_to_email"]
-    smtp_use_tls = settings["smtp_use_tls"]
-    smtp_use_ssl = settings["smtp_use_ssl"]
-
-    missing = []
-    if not smtp_host:
-        missing.append("SMTP_HOST")
-    if not smtp_username:
-        missing.append("SMTP_USERNAME")
-    if not smtp_password:
-        missing.append("SMTP_PASSWORD")
-    if not mail_from_email:
-        missing.append("MAIL_FROM_EMAIL")
 
+    missing = missing_smtp_settings(settings)
     if missing:
         raise RuntimeError(
             "SMTP is not configured. Missing: " + ", ".join(missing)
@@ -183,19 +127,8 @@ def _send_contact_email(name: str, user_email: str, subject: str, topic: str, me
 
     msg.set_content(body)
 
-    if smtp_use_ssl:
-        with smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=20) as server:
-            if smtp_username:
-                server.login(smtp_username, smtp_password)
-            server.send_message(msg)
-        return
-
-    with smtplib.SMTP(smtp_host, smtp_port, timeout=20) as server:
-        if smtp_use_tls:
-            server.starttls()
-        if smtp_username:
-            server.login(smtp_username, smtp_password)
-        server.send_message(msg)
+    # Delivered by the background sender (pooled SMTP connection, retried on outages).
+    enqueue(msg)
 
 
 @contact_bp.route("/contact", methods=["GET", "POST"])
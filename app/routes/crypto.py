@@ -8,7 +8,23 @@ from decimal import ROUND_HALF_UP, Decimal
 import requests
 from flask import Blueprint, jsonify, redirect, render_template, request, session, url_for
 
-from app.services.user_scope import filter_records_by_user
+from app.services.cmc import cmc_get
+from app.services.cmc import quotes_latest as cmc_quotes_latest
+from app.services.cmc import ttl_multiplier as cmc_ttl_multiplier
+from app.services.events import publish_change
+from app.services.ledger import AvgCostPosition
+from app.services.money import fmul, fmul3, from_decimal, muldiv, to_decimal, to_float
+from app.services.negative_cache import blocked as lookup_blocked
+from app.services.negative_cache import record_failure as record_lookup_failure
+from app.services.negative_cache import record_success as record_lookup_success
+from app.services.price_history import yahoo_symbol
+from app.services.providers import Provider, ProviderError, fetch_quotes
+from app.services.providers import register as register_provider
+from app.services.records import get_user_transactions
+from app.services.user_records import get_user_records
+from app.services.user_settings import get_user_settings
+from app.services.wallet_directory import get_wallet_directory
+from app.services.yahoo import spark_quotes as yh_spark_quotes
 from config import API_URL, aws_auth, CMC_API_KEY
 
 crypto_bp = Blueprint("crypto", __name__)
@@ -35,25 +51,14 @@ def _normalize_currency(code: str, default: str = "") -> str:
 
 def _get_user_base_currency(user_id: str) -> str:
     """Return the website/base currency (from Settings). Defaults to EUR."""
-    # Prefer session value (updated when visiting/updating settings)
-    base = _normalize_currency(session.get("currency"), "")
-    if base:
-        return base
-
-    # Fallback: fetch settings directly
-    try:
-        resp = requests.get(f"{API_URL}/settings", params={"userId": user_id}, auth=aws_auth, timeout=10)
-        if resp.status_code == 200:
-            settings = resp.json().get("settings", [])
-            if settings and isinstance(settings, list):
-                currency = _normalize_currency((settings[0] or {}).get("currency"), "EUR")
-                if currency:
-                    session["currency"] = currency
-                    return currency
-    except Exception:
-        pass
-
-    return "EUR"
+    # Server-side settings cache (invalidated on save), so a change made in another
+    # tab or device applies on the next request; the session copy is only a fallback.
+    currency = _normalize_currency(get_user_settings(user_id).get("currency"), "")
+    if currency:
+        if session.get("currency") != currency:
+            session["currency"] = currency
+        return currency
+    return _normalize_currency(session.get("currency"), "") or "EUR"
 
 
 def _get_fx_rate_yahoo(from_currency: str, to_currency: str) -> Decimal | None:
@@ -152,6 +157,19 @@ def _get_fx_rate(from_currency: str, to_currency: str) -> Decimal:
         raise
 
 
+def _fx_rates_to(base_currency: str):
+    """fx(currency) -> Decimal rate into base_currency, looked up once per currency (per request)."""
+    memo: dict[str, Decimal] = {}
+
+    def fx(currency: str) -> Decimal:
+        ccy = _normalize_currency(currency)
+        if ccy not in memo:
+            memo[ccy] = _get_fx_rate(ccy, base_currency)
+        return memo[ccy]
+
+    return fx
+
+
 def _format_number_trim(val, max_decimals: int) -> str:
     """Format a numeric value to <= max_decimals, trimming trailing zeros.
 
@@ -261,78 +279,35 @@ def _post_crypto_with_compat(url: str, payload: dict, method: str = "post"):
 
 # ===== CoinMarketCap API Functions =====
 
+def _cmc_quote_ttl_seconds() -> float:
+    # Stretched as the CMC credit quota runs low (inf once exhausted: keep serving cached prices).
+    return _CMC_QUOTE_TTL_SECONDS * cmc_ttl_multiplier()
+
+
 def _cmc_get_crypto_info(symbol: str) -> dict:
     """Fetch crypto info from CoinMarketCap by symbol.
     
     Returns dict with keys: id, name, symbol, price_usd
     Returns empty dict if not found or API unavailable.
     """
-    if not CMC_API_KEY:
-        print("Warning: CMC_API_KEY not configured")
-        return {}
-
     sym = (symbol or "").strip().upper()
     if not sym:
         return {}
-
-    # Check cache first
-    now = time.time()
-    cached = _CMC_QUOTE_CACHE.get(sym)
-    if cached and (now - cached.get("ts", 0.0) < _CMC_QUOTE_TTL_SECONDS):
-        return cached.get("data", {})
-
-    url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest"
-    headers = {
-        "X-CMC_PRO_API_KEY": CMC_API_KEY,
-        "Accept": "application/json",
-        "User-Agent": "Wallet-Front/1.0",
-    }
-
-    try:
-        r = requests.get(
-            url,
-            params={"symbol": sym, "convert": "USD"},
-            headers=headers,
-            timeout=10,
-        )
-        if r.status_code != 200:
-            return {}
-
-        data = r.json() or {}
-        if "data" not in data or not data["data"]:
-            return {}
-
-        # CMC returns data keyed by symbol
-        crypto_data = data["data"].get(sym) if isinstance(data["data"], dict) else None
-        if not crypto_data:
-            return {}
-
-        result = {
-            "id": crypto_data.get("id"),
-            "name": crypto_data.get("name", sym),
-            "symbol": crypto_data.get("symbol", sym),
-            "price_usd": float(
-                (crypto_data.get("quote", {}).get("USD", {}).get("price")) or 0
-            ),
-        }
-
-        # Cache the result
-        _CMC_QUOTE_CACHE[sym] = {"ts": now, "data": result}
-        return result
-
-    except Exception as e:
-        print(f"Error fetching CMC data for {sym}: {e}")
-        return {}
+    return _cmc_get_crypto_info_batch([sym]).get(sym, {})
 
 
-def _cmc_get_crypto_info_batch(symbols: list) -> dict:
-    """Fetch crypto info for multiple symbols in ONE API call using batching.
+def _cmc_get_crypto_info_batch(symbols: list, errors: dict | None = None) -> dict:
+    """Fetch crypto info for any number of symbols (chunked into concurrent CMC calls).
     
     Args:
         symbols: List of crypto symbols (e.g., ['BTC', 'ETH', 'ELON'])
+        errors: Optional dict that receives symbol -> reason for lookups that failed
     
     Returns:
-        Dict mapping symbol -> {id, name, symbol, price_usd}
+        Dict mapping symbol -> {id, name, symbol, price_usd}; {} for symbols CMC doesn't know.
+        Symbols whose CMC call failed get their last cached value, however old.
+        Unknown and failing symbols are negatively cached (app.services.negative_cache)
+        and not requested again until their back-off expires.
     """
     if not CMC_API_KEY:
         print("Warning: CMC_API_KEY not configured")
@@ -342,6 +317,7 @@ def _cmc_get_crypto_info_batch(symbols: list) -> dict:
         return {}
 
     now = time.time()
+    ttl = _cmc_quote_ttl_seconds()
     
     # Separate cached vs uncached symbols
     result = {}
@@ -353,65 +329,41 @@ def _cmc_get_crypto_info_batch(symbols: list) -> dict:
             continue
             
         cached = _CMC_QUOTE_CACHE.get(sym_upper)
-        if cached and (now - cached.get("ts", 0.0) < _CMC_QUOTE_TTL_SECONDS):
+        if cached and (now - cached.get("ts", 0.0) < ttl):
             result[sym_upper] = cached.get("data", {})
         else:
             uncached_syms.append(sym_upper)
     
+    # Symbols in negative-cache back-off are answered from whatever we have.
+    skipped = lookup_blocked("cmc", uncached_syms)
+    for sym_upper in skipped:
+        stale = _CMC_QUOTE_CACHE.get(sym_upper)
+        result[sym_upper] = stale.get("data", {}) if stale else {}
+    uncached_syms = [s for s in uncached_syms if s not in skipped]
+
     # If all cached, return early
     if not uncached_syms:
         return result
-    
-    # Batch fetch uncached symbols (CMC supports up to ~200 per request)
-    url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest"
-    headers = {
-        "X-CMC_PRO_API_KEY": CMC_API_KEY,
-        "Accept": "application/json",
-        "User-Agent": "Wallet-Front/1.0",
-    }
 
-    try:
-        symbols_param = ",".join(uncached_syms[:200])  # Limit to 200 per CMC docs
-        r = requests.get(
-            url,
-            params={"symbol": symbols_param, "convert": "USD"},
-            headers=headers,
-            timeout=15,
-        )
-        
-        if r.status_code != 200:
-            print(f"CMC batch request failed with status {r.status_code}")
-            return result
-
-        data = r.json() or {}
-        if "data" not in data or not data["data"]:
-            print("CMC batch response has no data")
-            return result
-
-        # CMC returns data keyed by symbol
-        for sym_upper in uncached_syms:
-            crypto_data = data["data"].get(sym_upper) if isinstance(data["data"], dict) else None
-            if crypto_data:
-                batch_result = {
-                    "id": crypto_data.get("id"),
-                    "name": crypto_data.get("name", sym_upper),
-                    "symbol": crypto_data.get("symbol", sym_upper),
-                    "price_usd": float(
-                        (crypto_data.get("quote", {}).get("USD", {}).get("price")) or 0
-                    ),
-                }
-                result[sym_upper] = batch_result
-                # Cache it
-                _CMC_QUOTE_CACHE[sym_upper] = {"ts": now, "data": batch_result}
+    quotes, cmc_errors = cmc_quotes_latest(uncached_syms)
+    for sym_upper in uncached_syms:
+        if sym_upper in quotes:
+            result[sym_upper] = quotes[sym_upper]
+            if quotes[sym_upper]:
+                _CMC_QUOTE_CACHE[sym_upper] = {"ts": now, "data": quotes[sym_upper]}
             else:
-                result[sym_upper] = {}
-
-        return result
-
-    except Exception as e:
-        print(f"Error fetching CMC batch data for {uncached_syms}: {e}")
-        return result
+                record_lookup_failure("cmc", sym_upper, "unknown symbol")
+        else:
+            stale = _CMC_QUOTE_CACHE.get(sym_upper)
+            result[sym_upper] = stale.get("data", {}) if stale else {}
+            record_lookup_failure("cmc", sym_upper, cmc_errors.get(sym_upper, ""), transient=True)
+    record_lookup_success("cmc", [s for s in uncached_syms if quotes.get(s)])
+    if cmc_errors:
+        print(f"CMC quotes failed for {len(cmc_errors)} of {len(uncached_syms)} symbols; using cached prices where available")
+        if errors is not None:
+            errors.update(cmc_errors)
 
+    return result
 
 
 def _cmc_search_symbols(query: str) -> list:
@@ -426,48 +378,17 @@ def _cmc_search_symbols(query: str) -> list:
     if not q or len(q) < 1:
         return []
 
-    url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/map"
-    headers = {
-        "X-CMC_PRO_API_KEY": CMC_API_KEY,
-        "Accept": "application/json",
-        "User-Agent": "Wallet-Front/1.0",
-    }
+    path = "/v1/cryptocurrency/map"
 
     try:
         # CMC map endpoint supports symbol and listing_status filters
         # First try exact symbol match
-        r = requests.get(
-            url,
-            params={
-                "symbol": q.upper(),
-                "listing_status": "active,inactive",
-            },
-            headers=headers,
-            timeout=10,
-        )
-
-        if r.status_code != 200:
-            return []
-
-        data = r.json() or {}
+        data = cmc_get(path, {"symbol": q.upper(), "listing_status": "active,inactive"}, timeout=10)
         cryptocurrencies = data.get("data", [])
 
         if not cryptocurrencies:
             # Try search by name if symbol didn't match
-            r = requests.get(
-                url,
-                params={
-                    "start": 1,
-                    "limit": 50,
-                    "listing_status": "active,inactive",
-                },
-                headers=headers,
-                timeout=10,
-            )
-            if r.status_code != 200:
-                return []
-
-            data = r.json() or {}
+            data = cmc_get(path, {"start": 1, "limit": 50, "listing_status": "active,inactive"}, timeout=10)
             cryptocurrencies = data.get("data", [])
             # Filter by name/symbol match
             q_upper = q.upper()
@@ -569,6 +490,77 @@ def _best_price_usd(query: str) -> Decimal:
     return Decimal(0)
 
 
+# ===== Quote provider chain (see app.services.providers) =====
+_YH_CRYPTO_QUOTE_CACHE = {}
+
+
+def _fresh_cached(cache: dict, symbols: list, ttl: float) -> dict:
+    now = time.time()
+    out = {}
+    for sym in symbols:
+        cached = cache.get(sym)
+        data = (cached or {}).get("data") or {}
+        if cached and now - cached.get("ts", 0.0) < ttl and data.get("price_usd"):
+            out[sym] = data
+    return out
+
+
+def _cmc_provider_quotes(symbols: list) -> dict:
+    errors = {}
+    batch = _cmc_get_crypto_info_batch(symbols, errors=errors)
+    priced = {sym: info for sym, info in batch.items() if info and info.get("price_usd")}
+    if errors and not priced:
+        raise ProviderError(next(iter(errors.values())))
+    return priced
+
+
+def _yh_crypto_provider_quotes(symbols: list) -> dict:
+    """{SYMBOL: {id, name, symbol, price_usd}} from Yahoo's SYMBOL-USD pairs (same shape as CMC)."""
+    skipped = lookup_blocked("yahoo-crypto", symbols)
+    wanted = {yahoo_symbol("crypto", sym): sym for sym in symbols if sym not in skipped}
+    if not wanted:
+        return {}
+    metas, errors = yh_spark_quotes(list(wanted))
+    if errors and not metas:
+        raise ProviderError(next(iter(errors.values())))
+    out = {}
+    for pair, sym in wanted.items():
+        meta = metas.get(pair) or {}
+        price = meta.get("regularMarketPrice")
+        if not isinstance(price, int | float) or price <= 0 or str(meta.get("currency") or "").upper() != "USD":
+            if pair not in errors:
+                record_lookup_failure("yahoo-crypto", sym, "no USD quote")
+            continue
+        name = str(meta.get("shortName") or meta.get("longName") or "").strip()
+        if name.upper().endswith(" USD"):
+            name = name[:-4].strip()
+        out[sym] = {"id": None, "name": name or sym, "symbol": sym, "price_usd": float(price)}
+        _YH_CRYPTO_QUOTE_CACHE[sym] = {"ts": time.time(), "data": out[sym]}
+    record_lookup_success("yahoo-crypto", list(out))
+    return out
+
+
+register_provider(
+    Provider(
+        "cmc",
+        "crypto",
+        {"quote", "batch", "search"},
+        _cmc_provider_quotes,
+        cached=lambda symbols: _fresh_cached(_CMC_QUOTE_CACHE, symbols, _cmc_quote_ttl_seconds()),
+        enabled=lambda: bool(CMC_API_KEY),
+    )
+)
+register_provider(
+    Provider(
+        "yahoo",
+        "crypto",
+        {"quote", "batch", "history"},
+        _yh_crypto_provider_quotes,
+        cached=lambda symbols: _fresh_cached(_YH_CRYPTO_QUOTE_CACHE, symbols, _CMC_QUOTE_TTL_SECONDS),
+    )
+)
+
+
 @crypto_bp.get("/crypto/search")
 def crypto_search():
     """Autocomplete helper: return a small list of token suggestions from CoinMarketCap.
@@ -712,9 +704,14 @@ def crypto_quotes_bulk():
     if not symbols:
         return jsonify({})
 
+    return jsonify(_crypto_quotes(symbols, base_currency, _fx_rates_to(base_currency)))
+
+
+def _crypto_quotes(symbols: list, base_currency: str, fx) -> dict:
+    """{symbol: {price, currency, name}} in base_currency; ``fx(currency)`` gives the rate into it."""
     # Fetch FX rate ONCE outside the loop
     try:
-        usd_to_base = _get_fx_rate("USD", base_currency)
+        usd_to_base = fx("USD")
     except Exception as e:
         print(f"Error fetching FX rate USD->{base_currency}: {e}")
         usd_to_base = Decimal(1)
@@ -730,8 +727,8 @@ def crypto_quotes_bulk():
         clean_symbols.append(clean_sym)
         symbol_map[clean_sym] = symbol
 
-    # BATCH fetch all crypto info in ONE CMC API call (not 25!)
-    crypto_batch = _cmc_get_crypto_info_batch(clean_symbols)
+    # Provider chain: batched CMC first, hedged/backed up by Yahoo's <SYMBOL>-USD pairs.
+    crypto_batch = fetch_quotes("crypto", [s.upper() for s in clean_symbols])
 
     # Now build response
     out = {}
@@ -742,7 +739,7 @@ def crypto_quotes_bulk():
             else:
                 clean_sym = symbol.strip()
 
-            crypto_info = crypto_batch.get(clean_sym, {})
+            crypto_info = crypto_batch.get(clean_sym.upper(), {})
             price_usd_raw = crypto_info.get("price_usd")
 
             # Handle stablecoins
@@ -777,7 +774,7 @@ def crypto_quotes_bulk():
             print(f"Error in crypto_quotes_bulk for '{symbol}': {e}")
             out[symbol] = {"price": None, "currency": base_currency, "name": ""}
 
-    return jsonify(out)
+    return out
 
 
 @crypto_bp.route("/api/crypto-data", methods=["GET"])
@@ -790,50 +787,19 @@ def crypto_data():
     base_currency = _get_user_base_currency(userId)
 
     # --- Fetch Cryptos + Wallets in parallel ---
-    cryptos = []
-    wallets = []
-
-    def _fetch_cryptos():
-        resp = requests.get(f"{API_URL}/cryptos", params={"userId": userId}, auth=aws_auth)
-        items = resp.json().get("cryptos", []) if resp.status_code == 200 else []
-        return filter_records_by_user(items, userId)
-
-    def _fetch_wallets():
-        resp = requests.get(f"{API_URL}/wallets", params={"userId": userId}, auth=aws_auth)
-        items = resp.json().get("wallets", []) if resp.status_code == 200 else []
-        return filter_records_by_user(items, userId)
-
-    try:
-        with ThreadPoolExecutor(max_workers=2) as ex:
-            fut_c = ex.submit(_fetch_cryptos)
-            fut_w = ex.submit(_fetch_wallets)
-            cryptos = fut_c.result()
-            wallets = fut_w.result()
-    except Exception as e:
-        print(f"Error fetching cryptos/wallets: {e}")
-
-    # Map wallet names to ids to handle APIs that store walletName in fromWallet/toWallet.
-    wallet_ids_set = set()
-    wallet_id_by_name = {}
-    try:
-        for w in wallets or []:
-            wid = (w.get("walletId") or "").strip()
-            wname = (w.get("walletName") or "").strip()
-            if wid:
-                wallet_ids_set.add(wid)
-            if wid and wname:
-                wallet_id_by_name[wname] = wid
-    except Exception:
-        wallet_ids_set = set()
-        wallet_id_by_name = {}
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        fut_c = ex.submit(get_user_records, userId, "cryptos")
+        fut_w = ex.submit(get_wallet_directory, userId)
+        try:
+            fut_c.result()
+        except Exception as e:
+            print(f"Error fetching cryptos: {e}")
+        wallet_dir = fut_w.result()
+    wallets = wallet_dir.wallets
 
-    def _resolve_wallet_ref(val):
-        s = (str(val) if val is not None else "").strip()
-        if not s:
-            return ""
-        if s in wallet_ids_set:
-            return s
-        return wallet_id_by_name.get(s, s)
+    # Parsed once per fetched list: wallet refs (ids or legacy names) are already resolved to walletId.
+    crypto_records = get_user_transactions(userId, "cryptos", wallet_dir=wallet_dir)
+    cryptos = crypto_records.items
 
     # --- Build coin list for autocomplete from the user's saved crypto names ---
     # This keeps the current UX (selection-only autocomplete) without relying on a provider-wide coin list.
@@ -915,30 +881,20 @@ def crypto_data():
         coins = []
 
     # --- Compute totals per crypto using weighted average price method ---
+    # Ledger math runs on fixed-point ints (app.services.money); results are converted
+    # back to Decimal below so the display code is unchanged.
     totals_map = {}
-    wallet_crypto_qty = defaultdict(lambda: defaultdict(lambda: Decimal(0)))
-    wallet_crypto_cost = defaultdict(lambda: defaultdict(lambda: Decimal(0)))
+    positions = {}
+    # walletId -> crypto key -> AvgCostPosition (wallet-level quantities + cost basis)
+    wallet_positions = defaultdict(lambda: defaultdict(AvgCostPosition))
     wallet_ids_seen = set()
     try:
         # Group transactions by crypto and sort by date to process chronologically
         crypto_transactions = {}
-        for c in cryptos:
-            name = c.get("cryptoName") or "Unknown"
-            if name not in crypto_transactions:
-                crypto_transactions[name] = []
-            crypto_transactions[name].append(c)
-
-        def to_decimal(val):
-            """Safely convert API value to Decimal; treat blanks/None as 0."""
-            try:
-                if val is None:
-                    return Decimal(0)
-                s = str(val).strip().replace(",", ".")
-                if s == "":
-                    return Decimal(0)
-                return Decimal(s)
-            except Exception:
-                return Decimal(0)
+        for c in crypto_records:
+            if c.name not in crypto_transactions:
+                crypto_transactions[c.name] = []
+            crypto_transactions[c.name].append(c)
 
         def norm_crypto_key(raw_name):
             """Normalize stored cryptoName to a stable key for wallet holdings.
@@ -954,30 +910,40 @@ def crypto_data():
             s = " ".join(s.split())
             return s.upper()
 
+        fx_cache = {}
+
+        def fx_fixed(currency, default=""):
+            """Fixed-point FX rate currency -> base, with the currency normalized like _normalize_currency()."""
+            key = (currency, default)
+            rate = fx_cache.get(key)
+            if rate is None:
+                ccy = _normalize_currency(currency, default)
+                rate = fx_cache[key] = (ccy, from_decimal(_get_fx_rate(ccy, base_currency)))
+            return rate
+
         # Sort each crypto's transactions by date
         for name in crypto_transactions:
-            crypto_transactions[name].sort(key=lambda x: x.get("tdate", ""))
+            crypto_transactions[name].sort(key=lambda x: x.tdate)
 
         # Process each crypto's transactions chronologically
         for name, transactions in crypto_transactions.items():
-            entry = {
-                "cryptoName": name,
-                "total_qty": Decimal(0),  # Current holding quantity
-                "total_cost": Decimal(0),  # Current total cost basis
-                "total_fee": Decimal(0),  # Total fees paid
-                "total_value_buy": Decimal(0),  # Total spent on purchases
-                "total_value_sell": Decimal(0),  # Total received from sales
-                "currency": base_currency,
-            }
+            pos = AvgCostPosition()
+            # Rows are grouped by cryptoName, so the wallet-holdings key is the same for the whole group.
+            ckey = norm_crypto_key(name)
 
             for tx in transactions:
                 try:
-                    qty = to_decimal(tx.get("quantity", 0))
-                    price = to_decimal(tx.get("price", 0))
-                    fee = to_decimal(tx.get("fee", 0))
-                    operation = str(tx.get("operation") or tx.get("side") or "buy").lower()
-                    fee_currency = _normalize_currency(tx.get("feeCurrency"), "")
-                    ckey = norm_crypto_key(tx.get("cryptoName") or name)
+                    qty = tx.qty
+                    price = tx.price
+                    fee = tx.fee
+                    operation = tx.operation
+                    fee_currency = tx.fee_currency
+                    from_wallet = tx.from_wallet
+                    to_wallet = tx.to_wallet
+                    if from_wallet:
+                        wallet_ids_seen.add(from_wallet)
+                    if to_wallet:
+                        wallet_ids_seen.add(to_wallet)
 
                     # TRANSFER: fee is a crypto quantity.
                     # Net received quantity = max(0, qty - fee).
@@ -985,167 +951,89 @@ def crypto_data():
                     # - To wallet receives (qty - fee) (net)
                     # Portfolio delta = (+net if toWallet else 0) - (qty if fromWallet else 0)
                     if operation == "transfer":
-                        from_wallet = _resolve_wallet_ref(tx.get("fromWallet"))
-                        to_wallet = _resolve_wallet_ref(tx.get("toWallet"))
-
                         # Transfer fee is treated as same-asset quantity only when feeCurrency is CRYPTO.
-                        fee_qty = fee if fee_currency == "CRYPTO" else Decimal(0)
+                        fee_qty = fee if fee_currency == "CRYPTO" else 0
                         qty_total = qty
-                        qty_net = qty_total - fee_qty
-                        if qty_net < 0:
-                            qty_net = Decimal(0)
-
-                        if from_wallet:
-                            wallet_ids_seen.add(from_wallet)
-                        if to_wallet:
-                            wallet_ids_seen.add(to_wallet)
+                        qty_net = max(0, qty_total - fee_qty)
 
-                        # Track per-wallet holdings (wallet-level quantities + cost basis)
-                        moved_cost = Decimal(0)
+                        # Track per-wallet holdings; cost basis moves with the quantity at average cost.
+                        moved_cost = 0
                         if from_wallet:
-                            w_qty = wallet_crypto_qty[from_wallet][ckey]
-                            w_cost = wallet_crypto_cost[from_wallet][ckey]
-                            if w_qty > 0:
-                                removable_qty = min(qty_total, w_qty)
-                                avg_cost_per_unit = (w_cost / w_qty) if w_qty else Decimal(0)
-                                moved_cost = removable_qty * avg_cost_per_unit
-                                wallet_crypto_qty[from_wallet][ckey] -= removable_qty
-                                wallet_crypto_cost[from_wallet][ckey] -= moved_cost
-                                excess_qty = qty_total - removable_qty
-                                if excess_qty > 0:
-                                    wallet_crypto_qty[from_wallet][ckey] -= excess_qty
-                            else:
-                                wallet_crypto_qty[from_wallet][ckey] -= qty_total
+                            moved_cost = wallet_positions[from_wallet][ckey].remove(qty_total)
 
                         if to_wallet:
-                            wallet_crypto_qty[to_wallet][ckey] += qty_net
+                            w_pos = wallet_positions[to_wallet][ckey]
+                            w_pos.add(qty_net)
                             if qty_total > 0 and moved_cost > 0 and qty_net > 0:
-                                moved_cost_net = moved_cost * (qty_net / qty_total)
-                                wallet_crypto_cost[to_wallet][ckey] += moved_cost_net
+                                w_pos.cost += muldiv(moved_cost, qty_net, qty_total)
 
-                        qty_in = qty_net if to_wallet else Decimal(0)
-                        qty_out = qty_total if from_wallet else Decimal(0)
+                        qty_in = qty_net if to_wallet else 0
+                        qty_out = qty_total if from_wallet else 0
                         delta_qty = qty_in - qty_out
 
                         if delta_qty > 0:
                             # Incoming transfer (no cost basis info here) -> add qty with zero cost basis.
-                            entry["total_qty"] += delta_qty
+                            pos.add(delta_qty)
                         elif delta_qty < 0:
                             # Outgoing amount reduces holdings at average cost (no revenue).
-                            qty_to_remove = -delta_qty
-                            if entry["total_qty"] and entry["total_qty"] > 0:
-                                avg_cost_per_unit = entry["total_cost"] / entry["total_qty"]
-                                can_remove = min(qty_to_remove, entry["total_qty"])
-                                entry["total_qty"] -= can_remove
-                                entry["total_cost"] -= can_remove * avg_cost_per_unit
-                                remaining = qty_to_remove - can_remove
-                                if remaining > 0:
-                                    # reflect as negative holdings (no additional cost basis change)
-                                    entry["total_qty"] -= remaining
-                            else:
-                                entry["total_qty"] -= qty_to_remove
+                            pos.remove(-delta_qty)
                         continue
 
-                    tx_currency = _normalize_currency(tx.get("currency"), base_currency)
-                    fx_rate = _get_fx_rate(tx_currency, base_currency)
+                    tx_currency, fx_rate = fx_fixed(tx.currency, base_currency)
 
                     # Fees can be fiat (feeCurrency set) or same-asset crypto (feeCurrency=CRYPTO).
                     if fee_currency == "CRYPTO":
-                        fee_base = (fee * price) * fx_rate
+                        fee_base = fmul3(fee, price, fx_rate)
                     else:
-                        fee_ccy = _normalize_currency(fee_currency, tx_currency)
-                        fee_fx = _get_fx_rate(fee_ccy, base_currency)
-                        fee_base = fee * fee_fx
+                        fee_base = fmul(fee, fx_fixed(fee_currency, tx_currency)[1])
 
-                    tx_value_base = ((qty * price) * fx_rate) + fee_base
-                    revenue_base = (qty * price) * fx_rate
+                    revenue_base = fmul3(qty, price, fx_rate)
+                    tx_value_base = revenue_base + fee_base
 
                     if operation == "buy":
                         # BUY: Add to holdings and cost basis
-                        entry["total_qty"] += qty
-                        entry["total_cost"] += tx_value_base
-                        entry["total_value_buy"] += tx_value_base
-                        entry["total_fee"] += fee_base
-
-                        # Wallet holdings: buys land in toWallet
-                        from_wallet = _resolve_wallet_ref(tx.get("fromWallet"))
-                        to_wallet = _resolve_wallet_ref(tx.get("toWallet"))
-                        hold_wallet = to_wallet or from_wallet
-                        if from_wallet:
-                            wallet_ids_seen.add(from_wallet)
-                        if to_wallet:
-                            wallet_ids_seen.add(to_wallet)
+                        pos.buy(qty, tx_value_base, fee_base)
+
+                        # Wallet holdings: buys land in toWallet.
                         # If user didn't provide toWallet, fall back to fromWallet so wallet contents still updates.
+                        hold_wallet = to_wallet or from_wallet
                         if hold_wallet:
-                            wallet_crypto_qty[hold_wallet][ckey] += qty
-                            wallet_crypto_cost[hold_wallet][ckey] += tx_value_base
+                            wallet_positions[hold_wallet][ckey].buy(qty, tx_value_base)
 
                     elif operation == "sell":
-                        # SELL: Use weighted average to calculate cost of sold portion
-                        if entry["total_qty"] > 0:
-                            # Calculate current weighted average cost per unit
-                            avg_cost_per_unit = entry["total_cost"] / entry["total_qty"]
-
-                            # Determine how much we can actually sell from current holdings
-                            qty_to_sell = min(qty, entry["total_qty"])
-
-                            # Cost basis of the sold quantity
-                            sold_cost = qty_to_sell * avg_cost_per_unit
-
-                            # Update holdings
-                            entry["total_qty"] -= qty_to_sell
-                            entry["total_cost"] -= sold_cost
-                            entry["total_value_sell"] += (revenue_base - fee_base)  # Net revenue from sale (after fee)
-                            entry["total_fee"] += fee_base
-
-                            # If selling more than we have, handle the excess as short position
-                            excess_qty = qty - qty_to_sell
-                            if excess_qty > 0:
-                                # Track the excess as negative position
-                                entry["total_qty"] -= excess_qty
-                                # No additional cost basis change for short position
-
-                        else:
-                            # Selling without holdings (short sell) - track as negative
-                            entry["total_qty"] -= qty
-                            entry["total_value_sell"] += (revenue_base - fee_base)
-                            entry["total_fee"] += fee_base
-
-                        # Wallet holdings: sells leave fromWallet
-                        from_wallet = _resolve_wallet_ref(tx.get("fromWallet"))
-                        to_wallet = _resolve_wallet_ref(tx.get("toWallet"))
-                        hold_wallet = from_wallet or to_wallet
-                        if from_wallet:
-                            wallet_ids_seen.add(from_wallet)
-                        if to_wallet:
-                            wallet_ids_seen.add(to_wallet)
+                        # SELL: weighted average cost of the sold portion leaves the cost basis;
+                        # selling more than held is tracked as a negative (short) position.
+                        pos.sell(qty, revenue_base - fee_base, fee_base)
+
+                        # Wallet holdings: sells leave fromWallet.
                         # If user didn't provide fromWallet, fall back to toWallet so wallet contents still updates.
+                        hold_wallet = from_wallet or to_wallet
                         if hold_wallet:
-                            w_qty = wallet_crypto_qty[hold_wallet][ckey]
-                            w_cost = wallet_crypto_cost[hold_wallet][ckey]
-                            if w_qty > 0:
-                                removable_qty = min(qty, w_qty)
-                                avg_cost_per_unit = (w_cost / w_qty) if w_qty else Decimal(0)
-                                removed_cost = removable_qty * avg_cost_per_unit
-                                wallet_crypto_qty[hold_wallet][ckey] -= removable_qty
-                                wallet_crypto_cost[hold_wallet][ckey] -= removed_cost
-                                excess_qty = qty - removable_qty
-                                if excess_qty > 0:
-                                    wallet_crypto_qty[hold_wallet][ckey] -= excess_qty
-                            else:
-                                wallet_crypto_qty[hold_wallet][ckey] -= qty
+                            wallet_positions[hold_wallet][ckey].remove(qty)
 
                 except Exception as e:
                     print(f"Error processing transaction for {name}: {e} | Raw tx: {tx}")
                     continue
 
-            # Set total_value as current cost basis for compatibility
-            entry["total_value"] = entry["total_cost"]
-            totals_map[name] = entry
+            positions[name] = pos
 
     except Exception as e:
         print(f"Error computing crypto totals: {e}")
 
+    for name, pos in positions.items():
+        total_cost = to_decimal(pos.cost)
+        totals_map[name] = {
+            "cryptoName": name,
+            "total_qty": to_decimal(pos.qty),  # Current holding quantity
+            "total_cost": total_cost,  # Current total cost basis
+            "total_fee": to_decimal(pos.fee),  # Total fees paid
+            "total_value_buy": to_decimal(pos.buy_total),  # Total spent on purchases
+            "total_value_sell": to_decimal(pos.sell_total),  # Total received from sales
+            # Set total_value as current cost basis for compatibility
+            "total_value": total_cost,
+            "currency": base_currency,
+        }
+
     # --- Set placeholder values for live price fields (prices fetched client-side) ---
     for name_key, v in totals_map.items():
         v["latest_price"] = None
@@ -1156,44 +1044,35 @@ def crypto_data():
         # compute weighted average buy price from current cost basis
         # Only calculate avg_buy_price if we have actual purchases (total_cost > 0)
         # If holdings came entirely from transfers (cost = 0), set to None to display as "—"
-        try:
-            if v["total_qty"] and v["total_qty"] > 0:
-                if v["total_cost"] and v["total_cost"] > 0:
-                    v["avg_buy_price"] = v["total_cost"] / v["total_qty"]
-                else:
-                    # Holdings without purchases (transferred in) - show as N/A
-                    v["avg_buy_price"] = None
+        pos = positions[name_key]
+        if pos.qty > 0:
+            if pos.cost > 0:
+                v["avg_buy_price"] = to_decimal(pos.avg_cost())
             else:
-                v["avg_buy_price"] = Decimal(0)
-        except Exception:
+                # Holdings without purchases (transferred in) - show as N/A
+                v["avg_buy_price"] = None
+        else:
             v["avg_buy_price"] = Decimal(0)
 
     # --- Compute holdings by wallet (quantities only; live values hydrated client-side) ---
     wallet_holdings = []
     try:
-        wallet_name_by_id = {}
-        for w in wallets or []:
-            wid = (w.get("walletId") or "").strip()
-            if wid:
-                wallet_name_by_id[wid] = w.get("walletName") or wid
-
-        ordered_wallet_ids = [w.get("walletId") for w in (wallets or []) if w.get("walletId")]
-        for wid in ordered_wallet_ids:
+        for wid in wallet_dir.ids():
             if wallet_ids_seen and wid not in wallet_ids_seen:
                 continue
-            per_crypto = wallet_crypto_qty.get(wid) or {}
+            per_crypto = wallet_positions.get(wid) or {}
             holdings_rows = []
-            for cname, qty in per_crypto.items():
+            for cname, w_pos in per_crypto.items():
                 try:
-                    q = qty or Decimal(0)
-                    if q == 0:
+                    if w_pos.qty == 0:
                         continue
+                    q = to_decimal(w_pos.qty)
                     holdings_rows.append(
                         {
                             "cryptoName": cname,
-                            "qty": float(q),
+                            "qty": to_float(w_pos.qty),
                             "qty_display": _format_number_trim(q, 8),
-                            "cost_basis": float(wallet_crypto_cost.get(wid, {}).get(cname, Decimal(0)) or Decimal(0)),
+                            "cost_basis": to_float(w_pos.cost),
                             "value_live": None,
                             "value_live_display": "\u2014",
                         }
@@ -1206,7 +1085,7 @@ def crypto_data():
             wallet_holdings.append(
                 {
                     "walletId": wid,
-                    "walletName": wallet_name_by_id.get(wid, wid),
+                    "walletName": wallet_dir.name(wid),
                     "total_value_live": None,
                     "total_value_live_display": "\u2014",
                     "holdings": holdings_rows,
@@ -1423,6 +1302,7 @@ def create_crypto():
         if response.status_code >= 400:
             return jsonify({"error": _response_message(response) or "Create crypto failed"}), response.status_code
 
+        publish_change("cryptos", user_id, crypto_id, data["tdate"], "create")
         return redirect(url_for("crypto.crypto_page"))
     except Exception as e:
         print(f"❌ [ERROR] Failed to create crypto: {str(e)}")
@@ -1461,6 +1341,7 @@ def update_crypto():
         if response.status_code >= 400:
             return jsonify({"error": _response_message(response) or "Update crypto failed"}), response.status_code
 
+        publish_change("cryptos", user_id, data["cryptoId"], data["tdate"], "update")
         return redirect(url_for("crypto.crypto_page"))
     except Exception as e:
         print(f"❌ [ERROR] Failed to update crypto: {str(e)}")
@@ -1486,6 +1367,8 @@ def delete_crypto(crypto_id, user_id):
         response = requests.delete(f"{API_URL}/crypto", json=data, auth=aws_auth)
         print(f"✅ [DEBUG] Delete Response: {response.status_code}, JSON: {response.json()}")
 
+        if response.status_code < 400:
+            publish_change("cryptos", session_user_id, crypto_id, action="delete")
         return redirect(url_for("crypto.crypto_page"))
     except Exception as e:
         print(f"❌ [ERROR] Failed to delete crypto: {str(e)}")
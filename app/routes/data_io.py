@@ -7,7 +7,9 @@ from pathlib import Path
 import requests
 from flask import Blueprint, Response, redirect, render_template, request, send_from_directory, session, url_for
 
+from app.services.events import publish_change
 from app.services.user_scope import filter_records_by_user
+from app.services.wallet_directory import get_wallet_directory
 from config import API_URL, aws_auth
 from .home import _ensure_user_settings_row
 
@@ -142,31 +144,6 @@ def _derive_position(counterparty, currency, tdate):
     return ""
 
 
-def _fetch_wallets(user_id):
-    """Return list of wallet dicts for the user."""
-    try:
-        resp = requests.get(
-            f"{API_URL}/wallets",
-            params={"userId": user_id},
-            auth=aws_auth,
-            timeout=15,
-        )
-        wallets = resp.json().get("wallets", []) if resp.status_code == 200 else []
-        return filter_records_by_user(wallets, user_id)
-    except Exception:
-        return []
-
-
-def _wallet_id_to_name(wallets):
-    """Build {walletId: walletName} mapping."""
-    return {w["walletId"]: w.get("walletName", w["walletId"]) for w in wallets if w.get("walletId")}
-
-
-def _wallet_name_to_id(wallets):
-    """Build {walletName (lower): walletId} mapping."""
-    return {w.get("walletName", "").strip().lower(): w["walletId"] for w in wallets if w.get("walletId") and w.get("walletName")}
-
-
 def _parse_date(s):
     """Parse a date string (YYYY-MM-DD or ISO) into a date object, or None."""
     s = (s or "").strip()
@@ -256,7 +233,7 @@ def export_csv(asset_type):
 
     # Resolve wallet IDs to names if this asset type has wallet columns
     has_wallet_cols = any(f in WALLET_FIELDS for f, _ in columns)
-    id_to_name = _wallet_id_to_name(_fetch_wallets(user_id)) if has_wallet_cols else {}
+    wallet_dir = get_wallet_directory(user_id, timeout=15) if has_wallet_cols else None
 
     buf = io.StringIO()
     writer = csv.DictWriter(buf, fieldnames=headers)
@@ -266,7 +243,7 @@ def export_csv(asset_type):
         for field, label in columns:
             val = rec.get(field, "")
             if field in WALLET_FIELDS and val:
-                val = id_to_name.get(val, val)
+                val = wallet_dir.name(val)
             row[label] = val
         writer.writerow(row)
 
@@ -357,7 +334,7 @@ def import_csv(asset_type):
 
         # Resolve wallet names to IDs if this asset type has wallet columns
         has_wallet_cols = any(f in WALLET_FIELDS for f, _ in columns)
-        name_to_id = _wallet_name_to_id(_fetch_wallets(user_id)) if has_wallet_cols else {}
+        wallet_dir = get_wallet_directory(user_id, timeout=15) if has_wallet_cols else None
 
         imported = 0
         errors = 0
@@ -372,7 +349,7 @@ def import_csv(asset_type):
                 if internal_field:
                     val = (value or "").strip()
                     if internal_field in WALLET_FIELDS and val:
-                        resolved = name_to_id.get(val.lower())
+                        resolved = wallet_dir.lookup(val)
                         if resolved is None:
                             skip = True
                             skipped_rows.append(f"Row {row_num}: wallet \"{val}\" not found")
@@ -412,6 +389,9 @@ def import_csv(asset_type):
                 errors += 1
                 print(f"Import error ({asset_type}): {e}")
 
+        if imported:
+            publish_change(cfg["api_path"].lstrip("/"), user_id, action="import")
+
         session["import_result"] = {
             "asset": cfg["label"],
             "imported": imported,
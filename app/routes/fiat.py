@@ -1,10 +1,12 @@
 import uuid
-from decimal import Decimal
 
 import requests
 from flask import Blueprint, jsonify, redirect, render_template, request, session, url_for
 
-from app.services.user_scope import filter_records_by_user
+from app.services.events import publish_change
+from app.services.money import to_decimal
+from app.services.records import get_user_transactions
+from app.services.wallet_directory import get_wallet_directory
 from config import API_URL, aws_auth
 
 from .home import _ensure_user_settings_row
@@ -13,24 +15,11 @@ from .home import _ensure_user_settings_row
 from .crypto import (
     _get_fx_rate,
     _get_user_base_currency,
-    _normalize_currency,
 )
 
 fiat_bp = Blueprint("fiat", __name__)
 
 
-def _to_decimal(val) -> Decimal:
-    try:
-        if val is None:
-            return Decimal(0)
-        s = str(val).strip().replace(",", ".")
-        if s == "":
-            return Decimal(0)
-        return Decimal(s)
-    except Exception:
-        return Decimal(0)
-
-
 @fiat_bp.route("/fiat", methods=["GET"])
 def fiat_page():
     user = session.get("user")
@@ -40,43 +29,34 @@ def fiat_page():
 
         base_currency = _get_user_base_currency(userId)
         fx_warning = False
+        wallet_dir = get_wallet_directory(userId)
         try:
-            response = requests.get(f"{API_URL}/transactions", params={"userId": userId}, auth=aws_auth)
-            transactions = response.json().get("transactions", []) if response.status_code == 200 else []
-            transactions = filter_records_by_user(transactions, userId)
+            tx_records = get_user_transactions(userId, "transactions", wallet_dir=wallet_dir)
+            tx_rows = zip(tx_records.items, tx_records.records)
         except Exception as e:
             print(f"Error fetching transactions: {e}")
-            transactions = []
+            tx_rows = ()
 
         # For overview charts/totals only: convert amounts/fees to the user's settings currency.
         # History remains original amount + original currency.
-        for tx in transactions or []:
+        # Rows are the shared cached API rows, so the converted fields go on copies.
+        transactions = []
+        for raw, rec in tx_rows:
+            tx = dict(raw)
+            amt_raw = to_decimal(rec.amount)
+            fee_raw = to_decimal(rec.fee)
             try:
-                tx_currency = _normalize_currency(tx.get("currency"), base_currency)
-                amt_raw = _to_decimal(tx.get("amount", 0))
-                fee_raw = _to_decimal(tx.get("fee", 0))
-
-                fx_rate = _get_fx_rate(tx_currency, base_currency)
+                fx_rate = _get_fx_rate(rec.currency or base_currency, base_currency)
                 tx["amountSetting"] = float(amt_raw * fx_rate)
                 tx["feeSetting"] = float(fee_raw * fx_rate)
-                tx["settingCurrency"] = base_currency
             except Exception:
                 fx_warning = True
-                try:
-                    tx["amountSetting"] = float(_to_decimal(tx.get("amount", 0)))
-                    tx["feeSetting"] = float(_to_decimal(tx.get("fee", 0)))
-                except Exception:
-                    tx["amountSetting"] = 0
-                    tx["feeSetting"] = 0
-                tx["settingCurrency"] = base_currency
+                tx["amountSetting"] = float(amt_raw)
+                tx["feeSetting"] = float(fee_raw)
+            tx["settingCurrency"] = base_currency
+            transactions.append(tx)
 
-        try:
-            w_resp = requests.get(f"{API_URL}/wallets", params={"userId": userId}, auth=aws_auth)
-            wallets = w_resp.json().get("wallets", []) if w_resp.status_code == 200 else []
-            wallets = filter_records_by_user(wallets, userId)
-        except Exception as e:
-            print(f"Error fetching wallets: {e}")
-            wallets = []
+        wallets = wallet_dir.wallets
 
         return render_template(
             "fiat.html",
@@ -116,6 +96,8 @@ def create_fiat_transaction():
         try:
             response = requests.post(f"{API_URL}/transaction", json=data, auth=aws_auth)
             print(f"✅ [DEBUG] Create Response: {response.status_code}, JSON: {response.json()}")
+            if response.status_code < 400:
+                publish_change("transactions", user_id, trans_id, data["tdate"], "create")
             return redirect(url_for("fiat.fiat_page"))
         except Exception as e:
             print(f"❌ [ERROR] Failed to create transaction: {str(e)}")
@@ -153,6 +135,8 @@ def update_fiat_transaction():
     try:
         response = requests.patch(f"{API_URL}/transaction", json=data, auth=aws_auth)
         print(f"✅ [DEBUG] Update Response: {response.status_code}, JSON: {response.json()}")
+        if response.status_code < 400:
+            publish_change("transactions", user_id, data["transId"], data["tdate"], "update")
         return redirect(url_for("fiat.fiat_page"))
     except Exception as e:
         print(f"❌ [ERROR] Failed to update transaction: {str(e)}")
@@ -176,6 +160,8 @@ def delete_fiat_transaction(trans_id, user_id):
     try:
         response = requests.delete(f"{API_URL}/transaction", json=data, auth=aws_auth)
         print(f"✅ [DEBUG] Delete Response: {response.status_code}, JSON: {response.json()}")
+        if response.status_code < 400:
+            publish_change("transactions", session_user_id, trans_id, action="delete")
         return redirect(url_for("fiat.fiat_page"))
     except Exception as e:
         print(f"❌ [ERROR] Failed to delete transaction: {str(e)}")
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request, session
+
+from app.services.tx_index import ASSET_SPECS, SORT_FIELDS, InvalidCursor, get_transaction_index
+
+history_bp = Blueprint("history", __name__)
+
+_PAGE_LIMIT_DEFAULT = 50
+_PAGE_LIMIT_MAX = 500
+
+
+def _parse_day(val: str | None) -> str | None:
+    """Validate a YYYY-MM-DD query param; returns "" when absent and None when malformed."""
+    s = (val or "").strip()
+    if not s:
+        return ""
+    try:
+        return datetime.strptime(s[:10], "%Y-%m-%d").date().isoformat()
+    except Exception:
+        return None
+
+
+@history_bp.route("/api/<asset_type>/transactions", methods=["GET"])
+def transactions_history(asset_type):
+    """Paginated transaction history for one asset type (fiat, crypto, stock, loans).
+
+    Query params:
+    - from / to: inclusive YYYY-MM-DD date range
+    - wallet: walletId matched against fromWallet or toWallet
+    - category: mainCat (fiat), operation (crypto/stock) or type (loans)
+    - symbol: currency (fiat), crypto symbol, stock symbol or counterparty (loans)
+    - sort: date (default) | amount; order: desc (default) | asc
+    - limit: page size (default 50, max 500); cursor: nextCursor of the previous page
+
+    Returns: {items: [...], nextCursor, total, asset}
+    """
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    if asset_type not in ASSET_SPECS:
+        return jsonify({"error": "Invalid asset type"}), 404
+
+    user_id = user.get("username")
+
+    date_from = _parse_day(request.args.get("from"))
+    date_to = _parse_day(request.args.get("to"))
+    if date_from is None or date_to is None:
+        return jsonify({"error": "Invalid date; expected YYYY-MM-DD"}), 400
+
+    sort = (request.args.get("sort") or "date").strip().lower()
+    if sort not in SORT_FIELDS:
+        return jsonify({"error": f"Invalid sort; expected one of {', '.join(SORT_FIELDS)}"}), 400
+    order = (request.args.get("order") or "desc").strip().lower()
+
+    try:
+        limit = int(request.args.get("limit") or _PAGE_LIMIT_DEFAULT)
+    except Exception:
+        limit = _PAGE_LIMIT_DEFAULT
+    limit = max(1, min(limit, _PAGE_LIMIT_MAX))
+
+    idx = get_transaction_index(user_id, asset_type)
+    try:
+        page = idx.query(
+            date_from=date_from,
+            date_to=date_to,
+            wallet=(request.args.get("wallet") or "").strip(),
+            category=(request.args.get("category") or "").strip(),
+            symbol=(request.args.get("symbol") or "").strip(),
+            sort=sort,
+            descending=(order != "asc"),
+            cursor=(request.args.get("cursor") or "").strip(),
+            limit=limit,
+        )
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    page["asset"] = asset_type
+    return jsonify(page)
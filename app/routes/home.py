@@ -1,15 +1,21 @@
 from collections import defaultdict
 from decimal import Decimal
-import json
 import os
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import requests
-from flask import Blueprint, jsonify, render_template, session
+from flask import Blueprint, current_app, jsonify, render_template, session
 
-from app.services.user_scope import filter_records_by_user
-from config import API_URL, aws_auth
+from app.services.events import ChangeEvent, subscribe, sync_remote_changes, user_data_stamp, user_data_version
+from app.services.ledger import AvgCostPosition
+from app.services.loan_positions import LoanBook, build_loan_book, get_loan_book
+from app.services.money import ONE, fmul, fmul3, from_decimal, muldiv, to_decimal, to_float
+from app.services.payload_cache import Payload, drop_payloads, get_payload, payload_response, put_payload
+from app.services.records import CryptoTx, FiatTx, LoanTx, StockTx, Wallet, get_user_transactions, get_user_wallets
+from app.services.settings_defaults import settings_defaults
+from app.services.user_records import get_user_records, invalidate_user_records
+from app.services.wallet_directory import WalletDirectory, get_wallet_directory
+from app.services.user_settings import get_user_settings, update_user_settings
 
 # Reuse the same currency/FX helpers used by the Crypto page
 from .crypto import (
@@ -21,18 +27,27 @@ from .crypto import (
 # Reuse stock scaling helpers for transaction totals
 from .stock import (
     _scale_minor_currency,
-    _to_decimal as _to_decimal_stock,
 )
 
 home_bp = Blueprint("home", __name__, url_prefix="/")
 
-_SETTINGS_DEFAULTS_PATH = os.path.join(os.path.dirname(__file__), "..", "static", "settings_defaults.json")
-with open(_SETTINGS_DEFAULTS_PATH, "r") as _f:
-    _SETTINGS_DEFAULTS = json.load(_f)
-
-# In-process cache for the Overview page to avoid recomputing heavy totals on every refresh.
-# NOTE: This is per-process (per gunicorn worker) and resets on restart.
-_OVERVIEW_CTX_CACHE: dict[tuple[str, str], dict] = {}
+# In-process caches for the Overview page to avoid recomputing heavy totals on every refresh.
+# NOTE: Sections are per-process (per gunicorn worker) and reset on restart. The assembled
+# payload is stored pre-serialised and compressed (app.services.payload_cache) under
+# (baseCurrency, change-stamp digest), so every worker can serve it and it survives restarts.
+# ChangeEvents from the CRUD routes (see app.services.events) drop the assembled payload plus
+# only the sections computed from the changed resource, so the TTL can be long.
+_DASHBOARD_PAYLOAD_NS = "dashboard"
+# userId -> baseCurrency -> section -> {"ts": float, "walletVersion": int, "data": dict}
+_OVERVIEW_SECTION_CACHE: dict[str, dict[str, dict[str, dict]]] = {}
+
+# Overview sections and the API resources each one is computed from.
+_DASHBOARD_SECTIONS = {
+    "crypto": ("cryptos", "wallets"),
+    "fiat": ("transactions", "wallets"),
+    "loans": ("loans", "wallets"),
+    "stock": ("stocks", "wallets"),
+}
 
 
 def _dashboard_cache_ttl_seconds() -> int:
@@ -46,9 +61,9 @@ def _dashboard_cache_ttl_seconds() -> int:
         pass
 
     try:
-        return max(0, int((os.getenv("OVERVIEW_CACHE_TTL_SECONDS") or "20").strip()))
+        return max(0, int((os.getenv("OVERVIEW_CACHE_TTL_SECONDS") or "600").strip()))
     except Exception:
-        return 20
+        return 600
 
 
 def _truthy_env(val: str | None) -> bool:
@@ -56,106 +71,110 @@ def _truthy_env(val: str | None) -> bool:
     return s in {"1", "true", "yes", "y", "on"}
 
 
-def _dashboard_cache_get(user_id: str, base_currency: str):
+def _dashboard_cache_key(user_id: str, base_currency: str) -> tuple[str, str]:
+    """(baseCurrency, data version) for the user's assembled payload; pending remote changes are applied first."""
+    uid = str(user_id or "").strip()
+    sync_remote_changes(uid)
+    resources = sorted({res for deps in _DASHBOARD_SECTIONS.values() for res in deps})
+    return (str(base_currency or "").strip().upper(), user_data_stamp(uid, resources))
+
+
+def _dashboard_cache_get(user_id: str, cache_key: tuple[str, str]) -> Payload | None:
     ttl = _dashboard_cache_ttl_seconds()
     if ttl <= 0:
         return None
-    key = (str(user_id or "").strip(), str(base_currency or "").strip().upper())
-    now = time.time()
-    cached = _OVERVIEW_CTX_CACHE.get(key)
-    if cached and (now - float(cached.get("ts") or 0.0) < ttl):
-        return cached.get("ctx")
-    return None
+    return get_payload(_DASHBOARD_PAYLOAD_NS, user_id, cache_key, ttl)
 
 
-def _dashboard_cache_set(user_id: str, base_currency: str, ctx: dict):
+def _dashboard_cache_set(user_id: str, cache_key: tuple[str, str], ctx: dict) -> Payload | None:
+    ttl = _dashboard_cache_ttl_seconds()
+    if ttl <= 0:
+        return None
+    return put_payload(_DASHBOARD_PAYLOAD_NS, user_id, cache_key, current_app.json.dumps(ctx).encode("utf-8"))
+
+
+def _dashboard_section_get(user_id: str, base_currency: str, section: str, wallet_version: int | None = None):
+    """Cached section data; with wallet_version, entries computed against another wallet list miss."""
+    ttl = _dashboard_cache_ttl_seconds()
+    if ttl <= 0:
+        return None
+    per_base = _OVERVIEW_SECTION_CACHE.get(str(user_id or "").strip(), {})
+    cached = per_base.get(str(base_currency or "").strip().upper(), {}).get(section)
+    if not cached or (time.time() - float(cached.get("ts") or 0.0) >= ttl):
+        return None
+    if wallet_version is not None and cached.get("walletVersion") != wallet_version:
+        return None
+    return cached.get("data")
+
+
+def _dashboard_section_set(user_id: str, base_currency: str, section: str, data: dict, wallet_version: int):
     ttl = _dashboard_cache_ttl_seconds()
     if ttl <= 0:
         return
-    key = (str(user_id or "").strip(), str(base_currency or "").strip().upper())
-    _OVERVIEW_CTX_CACHE[key] = {"ts": time.time(), "ctx": ctx}
+    per_base = _OVERVIEW_SECTION_CACHE.setdefault(str(user_id or "").strip(), {})
+    per_base.setdefault(str(base_currency or "").strip().upper(), {})[section] = {
+        "ts": time.time(),
+        "walletVersion": wallet_version,
+        "data": data,
+    }
 
 
-def _dashboard_cache_invalidate_user(user_id: str) -> None:
+def _dashboard_cache_invalidate_user(user_id: str, resource: str | None = None, *, remote: bool = False) -> None:
+    """Drop the user's cached Overview payloads.
+
+    With a resource, only sections computed from it are dropped; the others are reused
+    when the payload is reassembled. For changes replayed from another worker the stored
+    payload files are kept: that worker may already have written the new version.
+    """
     uid = str(user_id or "").strip()
     if not uid:
         return
-    keys = [k for k in list(_OVERVIEW_CTX_CACHE.keys()) if isinstance(k, tuple) and len(k) >= 1 and str(k[0]) == uid]
-    for k in keys:
-        _OVERVIEW_CTX_CACHE.pop(k, None)
+    drop_payloads(_DASHBOARD_PAYLOAD_NS, uid, disk=not remote)
+    if resource is None:
+        _OVERVIEW_SECTION_CACHE.pop(uid, None)
+        return
+    for sections in (_OVERVIEW_SECTION_CACHE.get(uid) or {}).values():
+        for section, deps in _DASHBOARD_SECTIONS.items():
+            if resource in deps:
+                sections.pop(section, None)
 
 
-def _api_list(path: str, *, user_id: str, list_key: str, timeout: int = 12) -> list:
-    try:
-        resp = requests.get(
-            f"{API_URL}/{path.lstrip('/')}",
-            params={"userId": user_id},
-            auth=aws_auth,
-            timeout=timeout,
-        )
-        items = resp.json().get(list_key, []) if resp.status_code == 200 else []
-        return filter_records_by_user(items, user_id)
-    except Exception as e:
-        try:
-            print(f"Error fetching {path}: {e}")
-        except Exception:
-            pass
-        return []
+def _on_dashboard_data_change(event: ChangeEvent) -> None:
+    if event.resource == "settings":
+        # Base currency is part of the cache key; other settings don't affect totals.
+        return
+    _dashboard_cache_invalidate_user(event.user_id, event.resource, remote=event.remote)
+
+
+subscribe("*", _on_dashboard_data_change)
 
 
-_SETTINGS_SYNC_TTL_SECONDS = 300  # 5 min — balances freshness vs per-request AWS round-trip
+# Settings fields mirrored into the session for templates and routes that read them from there.
+_SESSION_SETTINGS_FIELDS = ("theme", "currency", "dashboardColors", "incomeCategories", "expenseCategories")
 
 
 def _ensure_user_settings_row(user_id: str, *, force: bool = False) -> None:
-    """Sync the user's settings from the DB into the session, throttled.
+    """Sync the user's settings into the session, creating the default row if there is none.
 
-    Called from page route handlers; a fresh AWS round-trip on every page load
-    made navigation slow. We now cache for _SETTINGS_SYNC_TTL_SECONDS via a
-    per-session timestamp; pass force=True after mutations (e.g., settings save).
+    Settings come from the server-side cache in app.services.user_settings (shared by all
+    of the user's tabs and devices, invalidated on save), so this is a memory lookup on
+    every page; pass force=True to refetch from the API.
     """
-    try:
-        last = float(session.get("_settingsSyncTs") or 0.0)
-    except Exception:
-        last = 0.0
-    if not force and last and (time.time() - last) < _SETTINGS_SYNC_TTL_SECONDS:
+    first = get_user_settings(user_id, force=force)
+    if first:
+        for key in _SESSION_SETTINGS_FIELDS:
+            val = first.get(key)
+            if val and session.get(key) != val:
+                session[key] = val
         return
-    try:
-        resp = requests.get(f"{API_URL}/settings", params={"userId": user_id}, auth=aws_auth, timeout=10)
-        settings = resp.json().get("settings", []) if resp.status_code == 200 else []
-        settings = filter_records_by_user(settings, user_id)
-    except Exception as e:
-        print(f"Error fetching settings (home init): {e}")
-        settings = []
 
-    if settings and isinstance(settings, list):
-        try:
-            first = settings[0] or {}
-            if first.get("theme"):
-                session["theme"] = first.get("theme")
-            if first.get("currency"):
-                session["currency"] = first.get("currency")
-            if first.get("dashboardColors"):
-                session["dashboardColors"] = first.get("dashboardColors")
-            if first.get("incomeCategories"):
-                session["incomeCategories"] = first.get("incomeCategories")
-            if first.get("expenseCategories"):
-                session["expenseCategories"] = first.get("expenseCategories")
-        except Exception:
-            pass
-        session["_settingsSyncTs"] = time.time()
-        return
-
-    default_data = {"userId": user_id, **_SETTINGS_DEFAULTS}
+    default_data = settings_defaults()
 
     try:
-        upsert = requests.patch(f"{API_URL}/settings", json=default_data, auth=aws_auth, timeout=10)
+        upsert = update_user_settings(user_id, default_data)
         if upsert.status_code in (200, 201):
-            session["currency"] = default_data["currency"]
-            session["theme"] = default_data["theme"]
-            session["dashboardColors"] = default_data["dashboardColors"]
-            session["incomeCategories"] = default_data["incomeCategories"]
-            session["expenseCategories"] = default_data["expenseCategories"]
-            session["_settingsSyncTs"] = time.time()
+            for key in _SESSION_SETTINGS_FIELDS:
+                session[key] = default_data[key]
         else:
             try:
                 print(f"Settings default upsert failed: {upsert.status_code} {upsert.text}")
@@ -171,6 +190,7 @@ def invalidate_dashboard_cache():
     if not user:
         return jsonify({"error": "Not authenticated"}), 401
     user_id = user.get("username")
+    invalidate_user_records(user_id)
     _dashboard_cache_invalidate_user(user_id)
     return jsonify({"ok": True})
 
@@ -192,174 +212,120 @@ def dashboard():
         return render_template("dashboard.html")
 
 
-@home_bp.route("/api/dashboard-data", methods=["GET"])
-def dashboard_data():
-    user = session.get("user")
-    if not user:
-        return jsonify({"error": "Not authenticated"}), 401
+def _wallet_fx_helpers(wallet_dir: WalletDirectory, base_currency: str):
+    """Return (wallet_ccy, fx_amount_to_wallet) helpers for converting cash into each wallet's currency.
 
-    userId = user.get("username")
-    base_currency = _get_user_base_currency(userId)
-
-    cached_ctx = _dashboard_cache_get(userId, base_currency)
-    if isinstance(cached_ctx, dict):
-        return jsonify(cached_ctx)
-
-    # Fetch all API resources in parallel to reduce total wall time.
-    cryptos: list = []
-    wallets: list = []
-    transactions: list = []
-    loans: list = []
-    stocks: list = []
-
-    with ThreadPoolExecutor(max_workers=5) as ex:
-        futs = {
-            ex.submit(_api_list, "cryptos", user_id=userId, list_key="cryptos", timeout=12): "cryptos",
-            ex.submit(_api_list, "wallets", user_id=userId, list_key="wallets", timeout=12): "wallets",
-            ex.submit(_api_list, "transactions", user_id=userId, list_key="transactions", timeout=12): "transactions",
-            ex.submit(_api_list, "loans", user_id=userId, list_key="loans", timeout=12): "loans",
-            ex.submit(_api_list, "stocks", user_id=userId, list_key="stocks", timeout=12): "stocks",
-        }
-        for fut in as_completed(futs):
-            name = futs[fut]
-            try:
-                data = fut.result() or []
-            except Exception:
-                data = []
-            if name == "cryptos":
-                cryptos = data
-            elif name == "wallets":
-                wallets = data
-            elif name == "transactions":
-                transactions = data
-            elif name == "loans":
-                loans = data
-            elif name == "stocks":
-                stocks = data
-
-    if _truthy_env(os.getenv("OVERVIEW_DEBUG")):
-        def _distinct_user_ids(rows: list) -> list[str]:
-            out = set()
-            for r in rows or []:
-                try:
-                    if isinstance(r, dict) and r.get("userId") is not None:
-                        out.add(str(r.get("userId")).strip())
-                except Exception:
-                    continue
-            return sorted([x for x in out if x])
-
-        try:
-            in_codespaces = str(os.getenv("CODESPACES") or "").strip().lower() in {"1", "true", "yes", "y", "on"}
-            print(
-                "[dashboard debug] userId=", userId,
-                "baseCurrency=", base_currency,
-                "codespaces=", in_codespaces,
-                "cacheTTL=", _dashboard_cache_ttl_seconds(),
-                "wallets=", len(wallets or []),
-                "cryptos=", len(cryptos or []),
-                "transactions=", len(transactions or []),
-                "loans=", len(loans or []),
-                "stocks=", len(stocks or []),
-            )
-            print("[dashboard debug] wallets.userId distinct:", _distinct_user_ids(wallets))
-            print("[dashboard debug] transactions.userId distinct:", _distinct_user_ids(transactions))
-            print("[dashboard debug] loans.userId distinct:", _distinct_user_ids(loans))
-            print("[dashboard debug] stocks.userId distinct:", _distinct_user_ids(stocks))
-            print("[dashboard debug] cryptos.userId distinct:", _distinct_user_ids(cryptos))
-        except Exception:
-            pass
-
-    wallet_currency_by_id = {}
-    for w in wallets or []:
-        try:
-            wid = (w or {}).get("walletId")
-            if not wid:
-                continue
-            raw_ccy = (
-                (w or {}).get("currency")
-                or (w or {}).get("Currency")
-                or (w or {}).get("walletCurrency")
-                or (w or {}).get("wallet_currency")
-            )
-            wallet_currency_by_id[str(wid)] = _normalize_currency(raw_ccy, base_currency)
-        except Exception:
-            continue
+    Amounts are fixed-point ints (app.services.money); FX rates are looked up once per currency pair.
+    """
+    rates: dict[tuple[str, str], int] = {}
 
     def _wallet_ccy(wallet_id: str) -> str:
         try:
-            return wallet_currency_by_id.get(str(wallet_id), _normalize_currency(base_currency, "EUR"))
+            if wallet_id in wallet_dir:
+                return wallet_dir.currency(wallet_id, _normalize_currency(base_currency))
+            return _normalize_currency(base_currency, "EUR")
         except Exception:
             return _normalize_currency(base_currency, "EUR")
 
-    def _fx_amount_to_wallet(amount: Decimal, from_currency: str, wallet_id: str) -> Decimal:
+    def _fx_amount_to_wallet(amount: int, from_currency: str, wallet_id: str) -> int:
         try:
             from_ccy = _normalize_currency(from_currency, _normalize_currency(base_currency, "EUR"))
             to_ccy = _wallet_ccy(wallet_id)
             if from_ccy == to_ccy:
                 return amount
-            return amount * _get_fx_rate(from_ccy, to_ccy)
+            rate = rates.get((from_ccy, to_ccy))
+            if rate is None:
+                rate = rates[(from_ccy, to_ccy)] = from_decimal(_get_fx_rate(from_ccy, to_ccy))
+            return fmul(amount, rate)
         except Exception:
             # On FX failure, fall back to no conversion.
             return amount
 
-    # Wallet cash balances are kept in each wallet's own currency.
-    # This ledger is used later to compute wallet totals (cash + crypto live value + stock live value).
-    wallet_fiat_balances = defaultdict(lambda: Decimal("0"))
+    return _wallet_ccy, _fx_amount_to_wallet
+
+
+def _base_fx_lookup(base_currency: str, *, minor_units: bool = False):
+    """Return a memoized fx(currency, default) -> (normalized currency, fixed-point rate to base).
+
+    With minor_units, minor-unit quotes (e.g. GBX) are folded into the rate and
+    reported as their major currency, like _scale_minor_currency().
+    """
+    cache: dict[tuple, tuple[str, int]] = {}
+
+    def _fx(currency, default: str = "") -> tuple[str, int]:
+        key = (currency, default)
+        hit = cache.get(key)
+        if hit is None:
+            ccy = _normalize_currency(currency, default)
+            factor = Decimal(1)
+            if minor_units:
+                factor, ccy = _scale_minor_currency(factor, ccy)
+            hit = cache[key] = (ccy, from_decimal(factor * _get_fx_rate(ccy, base_currency)))
+        return hit
+
+    return _fx
+
+
+def _qty_map_out(qty_by_wallet) -> dict[str, dict[str, float]]:
+    """Per-wallet instrument qty maps as floats, dropping zero rows (frontend multiplies by live price)."""
+    out: dict[str, dict[str, float]] = {}
+    for w_id, per_asset in qty_by_wallet.items():
+        inner = {}
+        for name, q in per_asset.items():
+            if q:
+                inner[name] = to_float(q)
+        if inner:
+            out[str(w_id)] = inner
+    return out
+
+
+def _holding_row(key: str, name, pos: AvgCostPosition) -> dict:
+    return {
+        key: name,
+        "qty": to_float(pos.qty),
+        "paid": to_float(pos.cost),
+        "buyTotal": to_float(pos.buy_total),
+        "revenue": to_float(pos.sell_total),
+    }
 
-    # Legacy/unused: Real-time wallet balance calculation (base-currency) kept for reference.
-    wallet_balances = defaultdict(lambda: Decimal("0"))
+
+def _dashboard_crypto_section(cryptos: list[CryptoTx], wallet_dir: WalletDirectory, base_currency: str) -> dict:
+    """Crypto totals (weighted average cost), per-wallet crypto qty and the cash effect of buys/sells."""
+    _, fx_amount_to_wallet = _wallet_fx_helpers(wallet_dir, base_currency)
+    fx_to_base = _base_fx_lookup(base_currency)
+    # Wallet cash deltas, kept in each wallet's own currency.
+    wallet_fiat_balances = defaultdict(int)
     # Track per-wallet crypto quantities for live valuation
-    wallet_crypto_qty = defaultdict(lambda: defaultdict(lambda: Decimal(0)))
+    wallet_crypto_qty = defaultdict(lambda: defaultdict(int))
 
     # Calculate crypto totals using exact same method as crypto.py
-    crypto_totals_map = {}
+    crypto_positions = {}
     try:
-        # Safe Decimal conversion matching crypto.py behavior
-        def to_decimal(val):
-            try:
-                if val is None:
-                    return Decimal(0)
-                s = str(val).strip().replace(",", ".")
-                if s == "":
-                    return Decimal(0)
-                return Decimal(s)
-            except Exception:
-                return Decimal(0)
-
         # Group transactions by crypto and sort by date to process chronologically
         crypto_transactions = {}
         for c in cryptos:
-            name = c.get("cryptoName") or "Unknown"
-            if name not in crypto_transactions:
-                crypto_transactions[name] = []
-            crypto_transactions[name].append(c)
+            if c.name not in crypto_transactions:
+                crypto_transactions[c.name] = []
+            crypto_transactions[c.name].append(c)
 
         # Sort each crypto's transactions by date
         for name in crypto_transactions:
-            crypto_transactions[name].sort(key=lambda x: x.get("tdate", ""))
+            crypto_transactions[name].sort(key=lambda x: x.tdate)
 
         # Process each crypto's transactions chronologically (exact same logic as crypto.py)
         for name, crypto_txs in crypto_transactions.items():
-            entry = {
-                "cryptoName": name,
-                "total_qty": Decimal(0),  # Current holding quantity
-                "total_cost": Decimal(0),  # Current total cost basis
-                "total_fee": Decimal(0),  # Total fees paid
-                "total_value_buy": Decimal(0),  # Total spent on purchases
-                "total_value_sell": Decimal(0),  # Total received from sales
-                "currency": base_currency,
-            }
+            pos = AvgCostPosition()
 
             for tx in crypto_txs:
                 try:
-                    qty = to_decimal(tx.get("quantity", 0))
-                    price = to_decimal(tx.get("price", 0))
-                    fee = to_decimal(tx.get("fee", 0))
-                    operation = str(tx.get("operation") or tx.get("side") or "buy").lower()
-                    fee_currency = _normalize_currency(tx.get("feeCurrency"), "")
+                    qty = tx.qty
+                    price = tx.price
+                    fee = tx.fee
+                    operation = tx.operation
+                    fee_currency = tx.fee_currency
 
-                    to_wallet = tx.get("toWallet")
-                    from_wallet = tx.get("fromWallet")
+                    to_wallet = tx.to_wallet
+                    from_wallet = tx.from_wallet
 
                     # TRANSFER: fee is crypto quantity.
                     # Net received quantity = max(0, qty - fee).
@@ -367,14 +333,12 @@ def dashboard_data():
                     # - To wallet receives (qty - fee) (net)
                     # Portfolio delta = (+net if toWallet else 0) - (qty if fromWallet else 0)
                     if operation == "transfer":
-                        fee_qty = fee if fee_currency == "CRYPTO" else Decimal(0)
+                        fee_qty = fee if fee_currency == "CRYPTO" else 0
                         qty_total = qty
-                        qty_net = qty_total - fee_qty
-                        if qty_net < 0:
-                            qty_net = Decimal(0)
+                        qty_net = max(0, qty_total - fee_qty)
 
-                        qty_in = qty_net if to_wallet else Decimal(0)
-                        qty_out = qty_total if from_wallet else Decimal(0)
+                        qty_in = qty_net if to_wallet else 0
+                        qty_out = qty_total if from_wallet else 0
 
                         if from_wallet:
                             wallet_crypto_qty[from_wallet][name] -= qty_out
@@ -383,100 +347,44 @@ def dashboard_data():
 
                         delta_qty = qty_in - qty_out
                         if delta_qty > 0:
-                            entry["total_qty"] += delta_qty
+                            pos.add(delta_qty)
                         elif delta_qty < 0:
-                            qty_to_remove = -delta_qty
-                            if entry["total_qty"] and entry["total_qty"] > 0:
-                                avg_cost_per_unit = entry["total_cost"] / entry["total_qty"]
-                                can_remove = min(qty_to_remove, entry["total_qty"])
-                                entry["total_qty"] -= can_remove
-                                entry["total_cost"] -= can_remove * avg_cost_per_unit
-                                remaining = qty_to_remove - can_remove
-                                if remaining > 0:
-                                    entry["total_qty"] -= remaining
-                            else:
-                                entry["total_qty"] -= qty_to_remove
+                            pos.remove(-delta_qty)
                         continue
 
-                    tx_currency = _normalize_currency(tx.get("currency"), base_currency)
-                    fx_rate = _get_fx_rate(tx_currency, base_currency)
+                    tx_currency, fx_rate = fx_to_base(tx.currency, base_currency)
 
                     # Fee conversion: fiat feeCurrency or same-asset crypto fee.
                     if fee_currency == "CRYPTO":
-                        fee_base = (fee * price) * fx_rate
+                        fee_base = fmul3(fee, price, fx_rate)
                     else:
-                        fee_ccy = _normalize_currency(fee_currency, tx_currency)
-                        fee_fx = _get_fx_rate(fee_ccy, base_currency)
-                        fee_base = fee * fee_fx
+                        fee_base = fmul(fee, fx_to_base(fee_currency, tx_currency)[1])
 
-                    tx_value = (qty * price) + fee
-                    tx_value_base = ((qty * price) * fx_rate) + fee_base
-                    revenue_base = (qty * price) * fx_rate
+                    revenue_base = fmul3(qty, price, fx_rate)
+                    tx_value_base = revenue_base + fee_base
 
                     if operation == "buy":
                         # BUY: Add to holdings and cost basis
-                        entry["total_qty"] += qty
-                        entry["total_cost"] += tx_value_base
-                        entry["total_value_buy"] += tx_value_base
-                        entry["total_fee"] += fee_base
+                        pos.buy(qty, tx_value_base, fee_base)
 
                         # Wallet balance: money goes out of from_wallet, crypto goes into to_wallet
                         if from_wallet:
-                            wallet_balances[from_wallet] -= tx_value_base  # Cash out (base currency)
                             # Cash out in the from_wallet's own currency
-                            try:
-                                wallet_fiat_balances[from_wallet] -= _fx_amount_to_wallet(tx_value_base, base_currency, from_wallet)
-                            except Exception:
-                                pass
+                            wallet_fiat_balances[from_wallet] -= fx_amount_to_wallet(tx_value_base, base_currency, from_wallet)
                         if to_wallet:
-                            wallet_balances[to_wallet] += tx_value_base  # Crypto asset in (base currency)
                             # Track live crypto quantity by destination wallet
                             wallet_crypto_qty[to_wallet][name] += qty
 
                     elif operation == "sell":
-                        # SELL: Use weighted average to calculate cost of sold portion
-                        if entry["total_qty"] > 0:
-                            # Calculate current weighted average cost per unit
-                            avg_cost_per_unit = entry["total_cost"] / entry["total_qty"]
-
-                            # Determine how much we can actually sell from current holdings
-                            qty_to_sell = min(qty, entry["total_qty"])
-
-                            # Cost basis of the sold quantity
-                            sold_cost = qty_to_sell * avg_cost_per_unit
-
-                            # Update holdings
-                            entry["total_qty"] -= qty_to_sell
-                            entry["total_cost"] -= sold_cost
-                            entry["total_value_sell"] += (revenue_base - fee_base)  # Net revenue from sale (after fee)
-                            entry["total_fee"] += fee_base
-
-                            # If selling more than we have, handle the excess as short position
-                            excess_qty = qty - qty_to_sell
-                            if excess_qty > 0:
-                                # Track the excess as negative position
-                                entry["total_qty"] -= excess_qty
-                                # No additional cost basis change for short position
-
-                        else:
-                            # Selling without holdings (short sell) - track as negative
-                            entry["total_qty"] -= qty
-                            entry["total_value_sell"] += (revenue_base - fee_base)
-                            entry["total_fee"] += fee_base
+                        # SELL: weighted average cost of the sold portion leaves the cost basis;
+                        # selling more than held is tracked as a negative (short) position.
+                        net_proceeds_base = revenue_base - fee_base
+                        pos.sell(qty, net_proceeds_base, fee_base)
 
                         # Wallet balance: crypto goes out of from_wallet, money goes into to_wallet
-                        if from_wallet:
-                            wallet_balances[
-                                from_wallet
-                            ] -= tx_value_base  # Crypto asset out (base currency)
                         if to_wallet:
-                            wallet_balances[to_wallet] += revenue_base  # Cash in (base currency)
                             # Cash in (net of fee) in the to_wallet's own currency
-                            try:
-                                net_proceeds_base = revenue_base - fee_base
-                                wallet_fiat_balances[to_wallet] += _fx_amount_to_wallet(net_proceeds_base, base_currency, to_wallet)
-                            except Exception:
-                                pass
+                            wallet_fiat_balances[to_wallet] += fx_amount_to_wallet(net_proceeds_base, base_currency, to_wallet)
                         # Track live crypto quantity leaving the source wallet
                         if from_wallet:
                             wallet_crypto_qty[from_wallet][name] -= qty
@@ -485,38 +393,35 @@ def dashboard_data():
                     print(f"Error processing transaction for {name}: {e} | Raw tx: {tx}")
                     continue
 
-            # Set total_value as current cost basis for compatibility (same as crypto.py)
-            entry["total_value"] = entry["total_cost"]
-            crypto_totals_map[name] = entry
+            crypto_positions[name] = pos
 
     except Exception as e:
         print(f"Error computing crypto totals: {e}")
 
-    # Fiat transactions affect wallet cash balances (in each wallet's currency)
-    # Process regular transactions
-    for transaction in transactions:
-        try:
+    # --- Build raw crypto holdings (no live prices — frontend uses priceCache) ---
+    return {
+        "cash": dict(wallet_fiat_balances),
+        "holdings": [_holding_row("name", name, pos) for name, pos in crypto_positions.items()],
+        "walletQty": _qty_map_out(wallet_crypto_qty),
+    }
 
-            def to_decimal_fiat(val):
-                try:
-                    if val is None:
-                        return Decimal(0)
-                    s = str(val).strip().replace(",", ".")
-                    if s == "":
-                        return Decimal(0)
-                    return Decimal(s)
-                except Exception:
-                    return Decimal(0)
 
+def _dashboard_fiat_section(transactions: list[FiatTx], wallet_dir: WalletDirectory, base_currency: str) -> dict:
+    """Cash effect of fiat transactions (in each wallet's currency)."""
+    wallet_ccy, fx_amount_to_wallet = _wallet_fx_helpers(wallet_dir, base_currency)
+    wallet_fiat_balances = defaultdict(int)
+
+    for transaction in transactions:
+        try:
             # Fiat transactions: amount is the only value field; price is deprecated.
-            amt = to_decimal_fiat(transaction.get("amount", 0))
-            fee = to_decimal_fiat(transaction.get("fee", 0))
+            amt = transaction.amount
+            fee = transaction.fee
 
-            tx_currency = _normalize_currency(transaction.get("currency"), base_currency)
+            tx_currency = transaction.currency or base_currency
 
-            to_wallet = transaction.get("toWallet")
-            from_wallet = transaction.get("fromWallet")
-            ttype = str(transaction.get("transType") or "").strip().lower()
+            to_wallet = transaction.to_wallet
+            from_wallet = transaction.from_wallet
+            ttype = transaction.trans_type
 
             # Fiat wallet logic:
             # - Income: add amount to toWallet
@@ -525,47 +430,47 @@ def dashboard_data():
             # - FX Transfer: deduct (amount + fee) in fromWallet's currency, credit receivedAmount in toWallet's currency
             if ttype == "income":
                 if to_wallet:
-                    wallet_fiat_balances[to_wallet] += _fx_amount_to_wallet(amt, tx_currency, to_wallet)
+                    wallet_fiat_balances[to_wallet] += fx_amount_to_wallet(amt, tx_currency, to_wallet)
             elif ttype == "expense":
                 if from_wallet:
                     total_expense = amt + fee
-                    wallet_fiat_balances[from_wallet] -= _fx_amount_to_wallet(
+                    wallet_fiat_balances[from_wallet] -= fx_amount_to_wallet(
                         total_expense, tx_currency, from_wallet
                     )
             elif ttype == "transfer":
                 total_move = amt + fee
                 if from_wallet:
-                    wallet_fiat_balances[from_wallet] -= _fx_amount_to_wallet(
+                    wallet_fiat_balances[from_wallet] -= fx_amount_to_wallet(
                         total_move, tx_currency, from_wallet
                     )
                 if to_wallet:
-                    wallet_fiat_balances[to_wallet] += _fx_amount_to_wallet(amt, tx_currency, to_wallet)
+                    wallet_fiat_balances[to_wallet] += fx_amount_to_wallet(amt, tx_currency, to_wallet)
             elif ttype == "fx transfer":
-                received_amount = to_decimal_fiat(transaction.get("receivedAmount", 0))
+                received_amount = transaction.received_amount
                 if from_wallet:
                     # Amount + fee are in the fromWallet's currency
-                    from_ccy = _wallet_ccy(from_wallet)
-                    wallet_fiat_balances[from_wallet] -= _fx_amount_to_wallet(
+                    from_ccy = wallet_ccy(from_wallet)
+                    wallet_fiat_balances[from_wallet] -= fx_amount_to_wallet(
                         amt + fee, from_ccy, from_wallet
                     )
                 if to_wallet and received_amount:
                     # Received amount is in the toWallet's currency
-                    to_ccy = _wallet_ccy(to_wallet)
-                    wallet_fiat_balances[to_wallet] += _fx_amount_to_wallet(
+                    to_ccy = wallet_ccy(to_wallet)
+                    wallet_fiat_balances[to_wallet] += fx_amount_to_wallet(
                         received_amount, to_ccy, to_wallet
                     )
             else:
                 # Backward-compatible fallback based on which wallets are provided
                 if from_wallet and to_wallet:
                     total_move = amt + fee
-                    wallet_fiat_balances[from_wallet] -= _fx_amount_to_wallet(
+                    wallet_fiat_balances[from_wallet] -= fx_amount_to_wallet(
                         total_move, tx_currency, from_wallet
                     )
-                    wallet_fiat_balances[to_wallet] += _fx_amount_to_wallet(amt, tx_currency, to_wallet)
+                    wallet_fiat_balances[to_wallet] += fx_amount_to_wallet(amt, tx_currency, to_wallet)
                 elif to_wallet:
-                    wallet_fiat_balances[to_wallet] += _fx_amount_to_wallet(amt, tx_currency, to_wallet)
+                    wallet_fiat_balances[to_wallet] += fx_amount_to_wallet(amt, tx_currency, to_wallet)
                 elif from_wallet:
-                    wallet_fiat_balances[from_wallet] -= _fx_amount_to_wallet(
+                    wallet_fiat_balances[from_wallet] -= fx_amount_to_wallet(
                         amt, tx_currency, from_wallet
                     )
 
@@ -573,45 +478,31 @@ def dashboard_data():
             print(f"Error processing transaction {transaction}: {e}")
             continue
 
-    # Loans also affect wallet cash balances (in each wallet's currency)
-    def _wallet_id(val):
-        try:
-            s = (str(val) if val is not None else "").strip()
-            if not s or s.lower() == "none":
-                return None
-            return s
-        except Exception:
-            return None
-
-    for loan in loans or []:
-        try:
+    return {"cash": dict(wallet_fiat_balances)}
 
-            def to_decimal_loan(val):
-                try:
-                    if val is None:
-                        return Decimal(0)
-                    s = str(val).strip().replace(",", ".")
-                    if s == "":
-                        return Decimal(0)
-                    return Decimal(s)
-                except Exception:
-                    return Decimal(0)
 
-            loan_type = str(loan.get("type") or "").strip().lower()
-            if loan_type not in ("borrow", "lend", "loan"):
-                loan_type = "borrow"
+def _dashboard_loans_section(
+    loans: list[LoanTx], wallet_dir: WalletDirectory, base_currency: str, book: LoanBook | None = None
+) -> dict:
+    """Cash effect of loans plus the open-positions progress list for the Home card.
 
-            action = str(loan.get("action") or "").strip().lower() or "new"
-            if action not in ("new", "repay"):
-                action = "new"
+    ``book`` is the user's cached LoanBook; it is built from ``loans`` when not given.
+    """
+    _, fx_amount_to_wallet = _wallet_fx_helpers(wallet_dir, base_currency)
+    wallet_fiat_balances = defaultdict(int)
 
-            amt = to_decimal_loan(loan.get("amount"))
-            fee = to_decimal_loan(loan.get("fee"))
+    # Loans also affect wallet cash balances (in each wallet's currency)
+    for loan in loans or []:
+        try:
+            loan_type = loan.type
+            action = loan.action
+            amt = loan.amount
+            fee = loan.fee
 
-            tx_currency = _normalize_currency(loan.get("currency"), base_currency)
+            tx_currency = loan.currency or base_currency
 
-            from_wallet = _wallet_id(loan.get("fromWallet"))
-            to_wallet = _wallet_id(loan.get("toWallet"))
+            from_wallet = loan.from_wallet or None
+            to_wallet = loan.to_wallet or None
 
             inflow_wallet = None
             outflow_wallet = None
@@ -628,22 +519,22 @@ def dashboard_data():
                     inflow_wallet = to_wallet
 
             if outflow_wallet:
-                wallet_fiat_balances[outflow_wallet] -= _fx_amount_to_wallet(
+                wallet_fiat_balances[outflow_wallet] -= fx_amount_to_wallet(
                     amt, tx_currency, outflow_wallet
                 )
             if inflow_wallet:
-                wallet_fiat_balances[inflow_wallet] += _fx_amount_to_wallet(
+                wallet_fiat_balances[inflow_wallet] += fx_amount_to_wallet(
                     amt, tx_currency, inflow_wallet
                 )
 
             # Fee: if we have an outflow wallet, charge it there; otherwise deduct from inflow.
             if fee:
                 if outflow_wallet:
-                    wallet_fiat_balances[outflow_wallet] -= _fx_amount_to_wallet(
+                    wallet_fiat_balances[outflow_wallet] -= fx_amount_to_wallet(
                         fee, tx_currency, outflow_wallet
                     )
                 elif inflow_wallet:
-                    wallet_fiat_balances[inflow_wallet] -= _fx_amount_to_wallet(
+                    wallet_fiat_balances[inflow_wallet] -= fx_amount_to_wallet(
                         fee, tx_currency, inflow_wallet
                     )
 
@@ -651,52 +542,99 @@ def dashboard_data():
             print(f"Error processing loan {loan}: {e}")
             continue
 
+    # --- Loans (Home card): open positions progress (no FX) ---
+    # Positions come from the shared loan engine (same FIFO allocation of legacy repays as
+    # the Loans page). A position is considered open if outstanding > 0.
+    loanHomePositions = []
+
+    if loans:
+        if book is None:
+            book = build_loan_book(loans, base_currency or "EUR")
+        for entry in book.open_positions():
+            principal = entry.principal
+            repaid = entry.repaid
+            outstanding = principal - repaid
 
+            # Clamp overpayment to principal for progress display.
+            repaid_for_pct = repaid
+            if principal > 0 and repaid_for_pct > principal:
+                repaid_for_pct = principal
+
+            pct = 0
+            if principal > 0:
+                pct = muldiv(repaid_for_pct, 100 * ONE, principal)
+                pct = min(max(pct, 0), 100 * ONE)
+
+            t = entry.type
+            if t == "lend":
+                type_label = "Lend"
+            elif t == "loan":
+                type_label = "Loan"
+            else:
+                type_label = "Borrow"
+
+            loanHomePositions.append(
+                {
+                    "counterparty": entry.counterparty,
+                    "currency": entry.currency,
+                    "type": t,
+                    "typeLabel": type_label,
+                    "principal": to_float(principal),
+                    "repaid": to_float(repaid_for_pct),
+                    "outstanding": to_float(outstanding),
+                    "progressPct": to_float(pct),
+                }
+            )
+
+        loanHomePositions.sort(
+            key=lambda x: (
+                -abs(x.get("outstanding") or 0),
+                str(x.get("counterparty") or "").lower(),
+                str(x.get("currency") or ""),
+            )
+        )
+
+    return {"cash": dict(wallet_fiat_balances), "positions": loanHomePositions}
+
+
+def _dashboard_stock_section(stocks: list[StockTx], wallet_dir: WalletDirectory, base_currency: str) -> dict:
+    """Stock totals (cost basis + realized revenue), per-wallet stock qty and the cash effect of buys/sells."""
+    _, fx_amount_to_wallet = _wallet_fx_helpers(wallet_dir, base_currency)
+    # Minor-unit quotes (GBX) are scaled to major units inside the FX rate.
+    fx_to_base = _base_fx_lookup(base_currency, minor_units=True)
+    wallet_fiat_balances = defaultdict(int)
     # Track per-wallet stock quantities (for live valuation in Wallet Balances)
-    wallet_stock_qty = defaultdict(lambda: defaultdict(lambda: Decimal(0)))
+    wallet_stock_qty = defaultdict(lambda: defaultdict(int))
 
     # Stock portfolio totals (cost basis + realized revenue) for Home overview
-    stock_totals_map = {}
+    stock_positions = {}
     try:
         stock_transactions = {}
         for s in stocks:
-            sym = (s.get("stockName") or "").strip().upper() or "UNKNOWN"
-            stock_transactions.setdefault(sym, []).append(s)
+            stock_transactions.setdefault(s.symbol, []).append(s)
 
         for sym in stock_transactions:
-            stock_transactions[sym].sort(key=lambda x: x.get("tdate", ""))
+            stock_transactions[sym].sort(key=lambda x: x.tdate)
 
         for sym, stock_txs in stock_transactions.items():
-            entry = {
-                "stockName": sym,
-                "total_qty": Decimal(0),
-                "total_cost": Decimal(0),
-                "total_fee": Decimal(0),
-                "total_value_buy": Decimal(0),
-                "total_value_sell": Decimal(0),
-                "currency": base_currency,
-            }
+            pos = AvgCostPosition()
 
             for tx in stock_txs:
                 try:
-                    qty = _to_decimal_stock(tx.get("quantity", 0))
-                    price_raw = _to_decimal_stock(tx.get("price", 0))
-                    fee_raw = _to_decimal_stock(tx.get("fee", 0))
-                    operation = str(tx.get("operation") or tx.get("side") or "buy").lower()
-
-                    from_wallet = tx.get("fromWallet")
-                    to_wallet = tx.get("toWallet")
+                    qty = tx.qty
+                    price_raw = tx.price
+                    fee_raw = tx.fee
+                    operation = tx.operation
 
-                    tx_currency_raw = _normalize_currency(tx.get("currency"), base_currency)
-                    fee_currency_raw = _normalize_currency(tx.get("feeCurrency"), tx_currency_raw)
-                    price_major, tx_ccy = _scale_minor_currency(price_raw, tx_currency_raw)
-                    fee_major, fee_ccy = _scale_minor_currency(fee_raw, fee_currency_raw)
+                    from_wallet = tx.from_wallet
+                    to_wallet = tx.to_wallet
 
-                    fx_rate = _get_fx_rate(tx_ccy, base_currency)
-                    fx_fee = _get_fx_rate(fee_ccy, base_currency)
-                    tx_value_base = ((qty * price_major) * fx_rate) + (fee_major * fx_fee)
-                    fee_base = fee_major * fx_fee
-                    revenue_base = (qty * price_major) * fx_rate
+                    tx_currency_raw = tx.currency or base_currency
+                    fx_rate = fx_to_base(tx_currency_raw)[1]
+                    fx_fee = fx_to_base(tx.fee_currency or tx_currency_raw)[1]
+                    fee_base = fmul(fee_raw, fx_fee)
+                    revenue_base = fmul3(qty, price_raw, fx_rate)
+                    tx_value_base = revenue_base + fee_base
 
                     # Wallet holdings / cash-flow effects:
                     # - buy: cash decreases in fromWallet, stock qty increases in toWallet
@@ -706,14 +644,14 @@ def dashboard_data():
                         if to_wallet:
                             wallet_stock_qty[to_wallet][sym] += qty
                         if from_wallet:
-                            wallet_fiat_balances[from_wallet] -= _fx_amount_to_wallet(
+                            wallet_fiat_balances[from_wallet] -= fx_amount_to_wallet(
                                 tx_value_base, base_currency, from_wallet
                             )
                     elif operation == "sell":
                         if from_wallet:
                             wallet_stock_qty[from_wallet][sym] -= qty
                         if to_wallet:
-                            wallet_fiat_balances[to_wallet] += _fx_amount_to_wallet(
+                            wallet_fiat_balances[to_wallet] += fx_amount_to_wallet(
                                 (revenue_base - fee_base), base_currency, to_wallet
                             )
                     elif operation == "transfer":
@@ -723,27 +661,9 @@ def dashboard_data():
                             wallet_stock_qty[to_wallet][sym] += qty
 
                     if operation == "buy":
-                        entry["total_qty"] += qty
-                        entry["total_cost"] += tx_value_base
-                        entry["total_value_buy"] += tx_value_base
-                        entry["total_fee"] += fee_base
+                        pos.buy(qty, tx_value_base, fee_base)
                     elif operation == "sell":
-                        if entry["total_qty"] > 0:
-                            avg_cost_per_unit = entry["total_cost"] / entry["total_qty"]
-                            qty_to_sell = min(qty, entry["total_qty"])
-                            sold_cost = qty_to_sell * avg_cost_per_unit
-                            entry["total_qty"] -= qty_to_sell
-                            entry["total_cost"] -= sold_cost
-                            entry["total_value_sell"] += (revenue_base - fee_base)
-                            entry["total_fee"] += fee_base
-
-                            excess_qty = qty - qty_to_sell
-                            if excess_qty > 0:
-                                entry["total_qty"] -= excess_qty
-                        else:
-                            entry["total_qty"] -= qty
-                            entry["total_value_sell"] += (revenue_base - fee_base)
-                            entry["total_fee"] += fee_base
+                        pos.sell(qty, revenue_base - fee_base, fee_base)
                     else:
                         continue
 
@@ -751,80 +671,35 @@ def dashboard_data():
                     print(f"Error processing stock tx for {sym}: {e} | Raw tx: {tx}")
                     continue
 
-            entry["total_value"] = entry["total_cost"]
-            stock_totals_map[sym] = entry
+            stock_positions[sym] = pos
 
     except Exception as e:
         print(f"Error computing stock totals: {e}")
-        stock_totals_map = {}
-
-    # --- Build raw crypto holdings (no live prices — frontend uses priceCache) ---
-    crypto_holdings = []
-    for name, entry in crypto_totals_map.items():
-        crypto_holdings.append({
-            "name": name,
-            "qty": float(entry.get("total_qty") or Decimal(0)),
-            "paid": float(entry.get("total_cost") or Decimal(0)),
-            "buyTotal": float(entry.get("total_value_buy") or Decimal(0)),
-            "revenue": float(entry.get("total_value_sell") or Decimal(0)),
-        })
+        stock_positions = {}
 
     # --- Build raw stock holdings (no live prices — frontend uses priceCache) ---
-    stock_holdings = []
-    for sym, entry in stock_totals_map.items():
-        stock_holdings.append({
-            "symbol": sym,
-            "qty": float(entry.get("total_qty") or Decimal(0)),
-            "paid": float(entry.get("total_cost") or Decimal(0)),
-            "buyTotal": float(entry.get("total_value_buy") or Decimal(0)),
-            "revenue": float(entry.get("total_value_sell") or Decimal(0)),
-        })
-
-    # --- Build per-wallet instrument qty maps (frontend multiplies by live price) ---
-    wallet_crypto_qty_out: dict[str, dict[str, float]] = {}
-    for w_id, per_crypto in wallet_crypto_qty.items():
-        inner = {}
-        for cname, q in per_crypto.items():
-            try:
-                q_float = float(q or Decimal(0))
-            except Exception:
-                q_float = 0.0
-            if q_float != 0:
-                inner[cname] = q_float
-        if inner:
-            wallet_crypto_qty_out[str(w_id)] = inner
+    return {
+        "cash": dict(wallet_fiat_balances),
+        "holdings": [_holding_row("symbol", sym, pos) for sym, pos in stock_positions.items()],
+        "walletQty": _qty_map_out(wallet_stock_qty),
+    }
 
-    wallet_stock_qty_out: dict[str, dict[str, float]] = {}
-    for w_id, per_sym in wallet_stock_qty.items():
-        inner = {}
-        for sym, q in per_sym.items():
-            try:
-                q_float = float(q or Decimal(0))
-            except Exception:
-                q_float = 0.0
-            if q_float != 0:
-                inner[sym] = q_float
-        if inner:
-            wallet_stock_qty_out[str(w_id)] = inner
 
-    # --- Build wallet list with cash + FX info only (live values computed on client) ---
+def _dashboard_wallet_list(wallets: list[Wallet], sections: dict, base_currency: str) -> list:
+    """Wallet list with cash + FX info only (live values computed on client)."""
+    # Wallet cash balances are kept in each wallet's own currency; sum every section's deltas.
+    wallet_fiat_balances = defaultdict(int)
+    for name in _DASHBOARD_SECTIONS:
+        for wid, amount in ((sections.get(name) or {}).get("cash") or {}).items():
+            wallet_fiat_balances[wid] += amount
+
     wallet_list = []
     for wallet in wallets:
-        wallet_id = wallet.get("walletId")
-        wallet_name = wallet.get("walletName")
-        wallet_type = (
-            wallet.get("walletType")
-            or wallet.get("WalletType")
-            or wallet.get("type")
-            or wallet.get("wallet_type")
-        )
-        wallet_currency = (
-            wallet.get("currency")
-            or wallet.get("Currency")
-            or wallet.get("walletCurrency")
-            or wallet.get("wallet_currency")
-        )
-        cash_in_wallet_ccy = wallet_fiat_balances.get(wallet_id, Decimal(0)) or Decimal(0)
+        wallet_id = wallet.id or None
+        wallet_name = wallet.name or None
+        wallet_type = wallet.type or None
+        wallet_currency = wallet.currency or None
+        cash_in_wallet_ccy = to_decimal(wallet_fiat_balances.get(wallet.id, 0))
 
         w_ccy = _normalize_currency(wallet_currency, base_currency)
         b_ccy = _normalize_currency(base_currency, "EUR")
@@ -847,141 +722,133 @@ def dashboard_data():
                 "walletName": wallet_name,
                 "walletType": wallet_type,
                 "currency": wallet_currency,
-                "color": wallet.get("color") or "#00b09a",
+                "color": wallet.color or "#00b09a",
                 "cashWallet": float(round(cash_in_wallet_ccy, 2)),
                 "cashBase": float(round(cash_base, 2)),
                 "fxBaseToWallet": float(fx_base_to_wallet),
             }
         )
+    return wallet_list
 
-    # --- Loans (Home card): open positions progress (no FX) ---
-    # A position is considered open if outstanding > 0.
-    loanHomePositions = []
 
-    def _to_decimal_home(val) -> Decimal:
-        try:
-            if val is None:
-                return Decimal(0)
-            s = str(val).strip().replace(",", ".")
-            if s == "":
-                return Decimal(0)
-            return Decimal(s)
-        except Exception:
-            return Decimal(0)
-
-    def _day_from_iso_home(date_str: str) -> str:
-        s = (date_str or "").strip()
-        return s[:10] if len(s) >= 10 else s
+@home_bp.route("/api/dashboard-data", methods=["GET"])
+def dashboard_data():
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Not authenticated"}), 401
 
-    def _derive_position_home(counterparty: str, currency: str, tdate: str) -> str:
-        party = (counterparty or "").strip() or "—"
-        ccy = (currency or "").strip().upper() or (base_currency or "EUR")
-        day = _day_from_iso_home(tdate) or "unknown-date"
-        return f"{party} | {ccy} | {day}"
+    userId = user.get("username")
+    base_currency = _get_user_base_currency(userId)
 
-    if loans:
-        pos_map = {}
-        for row in loans or []:
+    # Repeat visits are answered from the stored payload (304 when the browser already has it).
+    cache_key = _dashboard_cache_key(userId, base_currency)
+    cached = _dashboard_cache_get(userId, cache_key)
+    if cached is not None:
+        return payload_response(cached)
+
+    # Results computed from a version older than the one at store time are not cached.
+    data_version = user_data_version(userId)
+
+    # Reuse cached sections; only sections invalidated by a change are recomputed.
+    sections: dict[str, dict] = {}
+    missing: list[str] = []
+    for name in _DASHBOARD_SECTIONS:
+        data = _dashboard_section_get(userId, base_currency, name)
+        if isinstance(data, dict):
+            sections[name] = data
+        else:
+            missing.append(name)
+
+    # Fetch the wallet directory and the API resources the missing sections need, in parallel
+    # to reduce total wall time.
+    needed = {res for name in missing for res in _DASHBOARD_SECTIONS[name] if res != "wallets"}
+    records: dict[str, list] = {}
+    with ThreadPoolExecutor(max_workers=len(needed) + 1) as ex:
+        fut_dir = ex.submit(get_wallet_directory, userId, timeout=12)
+        futs = {ex.submit(get_user_records, userId, res, timeout=12): res for res in sorted(needed)}
+        for fut in as_completed(futs):
             try:
-                t = str(row.get("type") or "").strip().lower()
-                if t not in ("borrow", "lend", "loan"):
-                    t = "borrow"
-                action = str(row.get("action") or "").strip().lower() or "new"
-                if action not in ("new", "repay"):
-                    action = "new"
-
-                party = str(row.get("counterparty") or "").strip() or "—"
-                currency = str(row.get("currency") or "").strip().upper() or (base_currency or "EUR")
-                amt = _to_decimal_home(row.get("amount"))
-                tdate = str(row.get("tdate") or "").strip()
-                position_raw = str(row.get("position") or "").strip()
-
-                if action == "new":
-                    position = position_raw or _derive_position_home(party, currency, tdate)
-                else:
-                    position = position_raw
-                    if not position:
-                        # Fallback: treat legacy repay as its own bucket.
-                        position = f"{party} | {currency} | legacy"
-
-                key = (t, position)
-                if key not in pos_map:
-                    pos_map[key] = {
-                        "type": t,
-                        "position": position,
-                        "counterparty": party,
-                        "currency": currency,
-                        "principal": Decimal(0),
-                        "repaid": Decimal(0),
-                    }
-
-                if action == "new":
-                    pos_map[key]["principal"] += amt
-                else:
-                    pos_map[key]["repaid"] += amt
+                records[futs[fut]] = fut.result() or []
             except Exception:
-                continue
-
-        for entry in pos_map.values():
-            principal = entry.get("principal") or Decimal(0)
-            repaid = entry.get("repaid") or Decimal(0)
-            outstanding = principal - repaid
-            if outstanding <= 0:
-                continue
-
-            # Clamp overpayment to principal for progress display.
-            repaid_for_pct = repaid
-            if principal > 0 and repaid_for_pct > principal:
-                repaid_for_pct = principal
+                records[futs[fut]] = []
+        wallet_dir = fut_dir.result()
+
+    # Sections computed against an older wallet list (ids, names, currencies) are stale too.
+    for name in list(sections):
+        if _dashboard_section_get(userId, base_currency, name, wallet_dir.version) is None:
+            del sections[name]
+            missing.append(name)
+            for res in _DASHBOARD_SECTIONS[name]:
+                if res != "wallets" and res not in records:
+                    records[res] = get_user_records(userId, res, timeout=12) or []
+    records["wallets"] = wallet_dir.wallets
 
-            pct = Decimal(0)
-            if principal > 0:
-                pct = (repaid_for_pct / principal) * Decimal(100)
-                if pct < 0:
-                    pct = Decimal(0)
-                if pct > 100:
-                    pct = Decimal(100)
-
-            t = entry.get("type")
-            if t == "lend":
-                type_label = "Lend"
-            elif t == "loan":
-                type_label = "Loan"
-            else:
-                type_label = "Borrow"
+    if _truthy_env(os.getenv("OVERVIEW_DEBUG")):
+        def _distinct_user_ids(rows: list) -> list[str]:
+            out = set()
+            for r in rows or []:
+                try:
+                    if isinstance(r, dict) and r.get("userId") is not None:
+                        out.add(str(r.get("userId")).strip())
+                except Exception:
+                    continue
+            return sorted([x for x in out if x])
 
-            loanHomePositions.append(
-                {
-                    "counterparty": entry.get("counterparty") or "—",
-                    "currency": entry.get("currency") or (base_currency or "EUR"),
-                    "type": t,
-                    "typeLabel": type_label,
-                    "principal": float(principal),
-                    "repaid": float(repaid_for_pct),
-                    "outstanding": float(outstanding),
-                    "progressPct": float(pct),
-                }
+        try:
+            in_codespaces = str(os.getenv("CODESPACES") or "").strip().lower() in {"1", "true", "yes", "y", "on"}
+            print(
+                "[dashboard debug] userId=", userId,
+                "baseCurrency=", base_currency,
+                "codespaces=", in_codespaces,
+                "cacheTTL=", _dashboard_cache_ttl_seconds(),
+                "recomputed=", missing,
+                *[f"{res}={len(rows or [])}" for res, rows in sorted(records.items())],
             )
+            for res, rows in sorted(records.items()):
+                print(f"[dashboard debug] {res}.userId distinct:", _distinct_user_ids(rows))
+        except Exception:
+            pass
 
-        loanHomePositions.sort(
-            key=lambda x: (
-                -abs(Decimal(str(x.get("outstanding") or 0))),
-                str(x.get("counterparty") or "").lower(),
-                str(x.get("currency") or ""),
-            )
-        )
+    def _parsed(res: str) -> list:
+        # Served from the parsed-records cache unless the rows or wallets were refetched.
+        try:
+            return get_user_transactions(userId, res, wallet_dir=wallet_dir).records
+        except Exception as e:
+            print(f"Error parsing {res}: {e}")
+            return []
+
+    for name in missing:
+        if name == "crypto":
+            data = _dashboard_crypto_section(_parsed("cryptos"), wallet_dir, base_currency)
+        elif name == "fiat":
+            data = _dashboard_fiat_section(_parsed("transactions"), wallet_dir, base_currency)
+        elif name == "loans":
+            try:
+                book = get_loan_book(userId, base_currency or "EUR", wallet_dir=wallet_dir)
+            except Exception as e:
+                print(f"Error building loan positions: {e}")
+                book = None
+            data = _dashboard_loans_section(_parsed("loans"), wallet_dir, base_currency, book)
+        else:
+            data = _dashboard_stock_section(_parsed("stocks"), wallet_dir, base_currency)
+        sections[name] = data
+        if user_data_version(userId) == data_version:
+            _dashboard_section_set(userId, base_currency, name, data, wallet_dir.version)
 
     ctx = {
         "baseCurrency": base_currency,
-        "cryptoHoldings": crypto_holdings,
-        "stockHoldings": stock_holdings,
-        "walletCryptoQty": wallet_crypto_qty_out,
-        "walletStockQty": wallet_stock_qty_out,
-        "wallets": wallet_list,
-        "loanHomePositions": loanHomePositions,
+        "cryptoHoldings": sections["crypto"].get("holdings") or [],
+        "stockHoldings": sections["stock"].get("holdings") or [],
+        "walletCryptoQty": sections["crypto"].get("walletQty") or {},
+        "walletStockQty": sections["stock"].get("walletQty") or {},
+        "wallets": _dashboard_wallet_list(get_user_wallets(userId, wallet_dir=wallet_dir).records, sections, base_currency),
+        "loanHomePositions": sections["loans"].get("positions") or [],
         "userId": userId,
     }
-    _dashboard_cache_set(userId, base_currency, ctx)
+    if user_data_version(userId) == data_version:
+        payload = _dashboard_cache_set(userId, cache_key, ctx)
+        if payload is not None:
+            return payload_response(payload)
     return jsonify(ctx)
 
 
@@ -6,25 +6,18 @@ from decimal import ROUND_HALF_UP, Decimal
 import requests
 from flask import Blueprint, jsonify, redirect, render_template, request, session, url_for
 
-from app.services.user_scope import filter_records_by_user
+from app.services.events import publish_change
+from app.services.loan_positions import get_loan_book
+from app.services.loan_schedule import FREQUENCIES, MAX_PERIODS, MAX_RATE_PERCENT, SchedulePlan, schedules_for_book
+from app.services.money import to_decimal, to_fixed, to_float
+from app.services.records import get_user_transactions
+from app.services.wallet_directory import get_wallet_directory
 from config import API_URL, aws_auth
 from .home import _ensure_user_settings_row
 
 loans_bp = Blueprint("loans", __name__)
 
 
-def _to_decimal(val) -> Decimal:
-    try:
-        if val is None:
-            return Decimal(0)
-        s = str(val).strip().replace(",", ".")
-        if s == "":
-            return Decimal(0)
-        return Decimal(s)
-    except Exception:
-        return Decimal(0)
-
-
 def _format_amount(val: Decimal, max_decimals: int = 2) -> str:
     """Format Decimal as a human-friendly string.
 
@@ -63,24 +56,6 @@ def _safe_date_key(date_str: str) -> float:
         return 0.0
 
 
-def _day_from_iso(date_str: str) -> str:
-    """Extract YYYY-MM-DD from an ISO-ish datetime string."""
-    s = (date_str or "").strip()
-    if len(s) >= 10:
-        return s[:10]
-    return s
-
-
-def _derive_position(counterparty: str, currency: str, tdate: str) -> str:
-    """Derive a position string from counterparty+currency+date (day precision)."""
-    party = (counterparty or "").strip() or "—"
-    ccy = (currency or "").strip().upper() or "EUR"
-    day = _day_from_iso(tdate)
-    if not day:
-        day = "unknown-date"
-    return f"{party} | {ccy} | {day}"
-
-
 @loans_bp.route("/loans", methods=["GET"])
 def loans_page():
     user = session.get("user")
@@ -91,10 +66,9 @@ def loans_page():
     _ensure_user_settings_row(user_id)
 
     # --- Fetch loans ---
+    wallet_dir = get_wallet_directory(user_id)
     try:
-        resp = requests.get(f"{API_URL}/loans", params={"userId": user_id}, auth=aws_auth, timeout=12)
-        loans = resp.json().get("loans", []) if resp.status_code == 200 else []
-        loans = filter_records_by_user(loans, user_id)
+        loans = get_user_transactions(user_id, "loans", wallet_dir=wallet_dir).items
     except Exception as e:
         print(f"Error fetching loans: {e}")
         loans = []
@@ -120,166 +94,23 @@ def loans_page():
     except Exception:
         pass
 
-    # --- Fetch wallets (for dropdowns + id->name mapping) ---
-    try:
-        w_resp = requests.get(f"{API_URL}/wallets", params={"userId": user_id}, auth=aws_auth, timeout=12)
-        wallets = w_resp.json().get("wallets", []) if w_resp.status_code == 200 else []
-        wallets = filter_records_by_user(wallets, user_id)
-    except Exception as e:
-        print(f"Error fetching wallets: {e}")
-        wallets = []
+    # --- Wallets (for dropdowns + id->name mapping) ---
+    wallets = wallet_dir.wallets
 
     # Base currency for display fallbacks only; loan totals are computed per currency.
     base_currency = (session.get("currency") or "EUR").strip().upper() or "EUR"
 
     # --- Positions overview (explicit Position field) ---
-    # We group by (type, position). Position is a string identifying a "contract".
-    # For backwards compatibility, if position is missing on an existing transaction,
-    # we derive it from counterparty+currency+date for NEW rows. Repays without a
-    # position are allocated FIFO across derived positions within (type, counterparty, currency).
-    positions = {}
-    positions_catalog_map = {}  # (type, position) -> {type, position, counterparty, currency, opened_date}
-    new_entries_by_group = defaultdict(list)  # (type, party_lower, currency) -> [entry]
-    repay_rows_no_pos_by_group = defaultdict(list)  # (type, party_lower, currency) -> [repay_row]
+    # Positions (with legacy repays allocated FIFO) come from the shared loan engine,
+    # cached per user until the loan list changes.
     try:
-        for row in loans or []:
-            t = str(row.get("type") or "").strip().lower()
-            if t not in ("borrow", "lend", "loan"):
-                t = "borrow"
-
-            action = str(row.get("action") or "").strip().lower() or "new"
-            if action not in ("new", "repay"):
-                action = "new"
-
-            party = str(row.get("counterparty") or "").strip() or "—"
-            currency = str(row.get("currency") or "").strip().upper() or base_currency
-            amt = _to_decimal(row.get("amount"))
-            fee = _to_decimal(row.get("fee"))
-            tdate = str(row.get("tdate") or "").strip()
-            due = str(row.get("ddate") or "").strip()
-            position_raw = str(row.get("position") or "").strip()
-
-            ts = _safe_date_key(tdate)
-            due_ts = _safe_date_key(due)
-
-            if action == "new":
-                position = position_raw or _derive_position(party, currency, tdate)
-            else:
-                position = position_raw
-
-            if position:
-                key = (t, position)
-                entry = positions.get(key)
-                if not entry:
-                    entry = {
-                        "type": t,
-                        "position": position,
-                        "counterparty": party,
-                        "currency": currency,
-                        "principal": Decimal(0),
-                        "repaid": Decimal(0),
-                        "fee_total": Decimal(0),
-                        "tx_count": 0,
-                        "opened_date": "",
-                        "opened_ts": 0.0,
-                        "last_activity": "",
-                        "last_activity_ts": 0.0,
-                        "next_due": "",
-                        "next_due_ts": 0.0,
-                    }
-                    positions[key] = entry
-
-                entry["tx_count"] += 1
-                entry["fee_total"] += fee
-
-                if action == "new":
-                    entry["principal"] += amt
-                    open_ts = ts
-                    if open_ts and ((entry.get("opened_ts") or 0.0) == 0.0 or open_ts < entry["opened_ts"]):
-                        entry["opened_ts"] = open_ts
-                        entry["opened_date"] = tdate
-                else:
-                    entry["repaid"] += amt
-
-                if ts and ts >= (entry.get("last_activity_ts") or 0.0):
-                    entry["last_activity_ts"] = ts
-                    entry["last_activity"] = tdate
-
-                if due_ts and ((entry.get("next_due_ts") or 0.0) == 0.0 or due_ts < entry["next_due_ts"]):
-                    entry["next_due_ts"] = due_ts
-                    entry["next_due"] = due
-
-                # Build positions catalog (suggestions) from NEW transactions.
-                # Include derived positions too so users can target existing legacy positions.
-                if action == "new" and position:
-                    cat_key = (t, position)
-                    if cat_key not in positions_catalog_map:
-                        positions_catalog_map[cat_key] = {
-                            "type": t,
-                            "position": position,
-                            "counterparty": party,
-                            "currency": currency,
-                            "opened_date": _day_from_iso(tdate),
-                        }
-
-                # Track NEW entries per (type, counterparty, currency) for FIFO fallback.
-                if action == "new":
-                    new_entries_by_group[(t, party.lower(), currency)].append(entry)
-            else:
-                # Repay without position (legacy): allocate FIFO later.
-                repay_rows_no_pos_by_group[(t, party.lower(), currency)].append(
-                    {
-                        "amount": amt,
-                        "fee": fee,
-                        "tdate": tdate,
-                        "ts": ts or 0.0,
-                    }
-                )
-
-        # FIFO allocation for legacy REPAY rows without position.
-        for group_key, repay_rows in repay_rows_no_pos_by_group.items():
-            entries = new_entries_by_group.get(group_key, [])
-            if not entries:
-                continue
-
-            entries.sort(key=lambda e: (e.get("opened_ts") or 0.0, e.get("opened_date") or ""))
-            repay_rows_sorted = sorted(repay_rows, key=lambda r: (r.get("ts") or 0.0, r.get("tdate") or ""))
-
-            for repay in repay_rows_sorted:
-                remaining = repay.get("amount") or Decimal(0)
-                if remaining <= 0:
-                    continue
-
-                fee_added = False
-                repay_ts = repay.get("ts") or 0.0
-                repay_date = repay.get("tdate") or ""
-
-                for entry in entries:
-                    if remaining <= 0:
-                        break
-                    outstanding = (entry.get("principal") or Decimal(0)) - (entry.get("repaid") or Decimal(0))
-                    if outstanding <= 0:
-                        continue
-
-                    apply_amt = remaining if remaining <= outstanding else outstanding
-                    entry["repaid"] = (entry.get("repaid") or Decimal(0)) + apply_amt
-                    entry["tx_count"] = int(entry.get("tx_count") or 0) + 1
-                    remaining -= apply_amt
-
-                    if not fee_added:
-                        entry["fee_total"] = (entry.get("fee_total") or Decimal(0)) + (
-                            repay.get("fee") or Decimal(0)
-                        )
-                        fee_added = True
-
-                    if repay_ts and repay_ts >= (entry.get("last_activity_ts") or 0.0):
-                        entry["last_activity_ts"] = repay_ts
-                        entry["last_activity"] = repay_date
-
+        book = get_loan_book(user_id, base_currency, wallet_dir=wallet_dir)
+        positions = list(book)
+        positions_catalog = [dict(row) for row in book.catalog]
     except Exception as e:
         print(f"Error building loan positions: {e}")
-        positions = {}
-        positions_catalog_map = {}
+        positions = []
+        positions_catalog = []
 
     # --- Overview totals (currency-safe; per-position) ---
     # Important: totals must be derived from per-position outstanding, otherwise
@@ -290,17 +121,17 @@ def loans_page():
 
     loan_positions = []
     try:
-        for entry in positions.values():
-            principal = entry["principal"]
-            repaid = entry["repaid"]
+        for entry in positions:
+            principal = to_decimal(entry.principal)
+            repaid = to_decimal(entry.repaid)
             outstanding = principal - repaid
             if outstanding < 0:
                 # Avoid showing negative outstanding (e.g., data issues or overpayment).
                 outstanding = Decimal(0)
 
-            ccy = str(entry.get("currency") or "").strip().upper() or base_currency
+            ccy = entry.currency or base_currency
             if outstanding > 0:
-                if entry.get("type") == "lend":
+                if entry.type == "lend":
                     receive_totals[ccy] += outstanding
                 else:
                     # borrow + loan
@@ -315,10 +146,10 @@ def loans_page():
                     repaid_pct = Decimal(100)
 
             status = "Open" if outstanding > 0 else "Closed"
-            if entry["type"] == "lend":
+            if entry.type == "lend":
                 badge_class = "pct-positive"
                 type_label = "Lend"
-            elif entry["type"] == "loan":
+            elif entry.type == "loan":
                 badge_class = "pct-negative"
                 type_label = "Loan"
             else:
@@ -326,24 +157,24 @@ def loans_page():
                 type_label = "Borrow"
 
             # Display-friendly dates: show just YYYY-MM-DD when possible.
-            opened_disp = entry.get("opened_date") or ""
+            opened_disp = entry.opened_date
             if opened_disp and len(opened_disp) >= 10:
                 opened_disp = opened_disp[:10]
-            last_disp = entry.get("last_activity") or ""
+            last_disp = entry.last_activity
             if last_disp and len(last_disp) >= 10:
                 last_disp = last_disp[:10]
-            due_disp = entry.get("next_due") or ""
+            due_disp = entry.next_due
             if due_disp and len(due_disp) >= 10:
                 due_disp = due_disp[:10]
 
             loan_positions.append(
                 {
-                    "type": entry["type"],
+                    "type": entry.type,
                     "type_label": type_label,
                     "badge_class": badge_class,
-                    "position": entry.get("position") or "",
-                    "counterparty": entry["counterparty"],
-                    "currency": entry["currency"],
+                    "position": entry.position,
+                    "counterparty": entry.counterparty,
+                    "currency": entry.currency,
                     "principal": float(principal),
                     "repaid": float(repaid),
                     "outstanding": float(outstanding),
@@ -352,8 +183,8 @@ def loans_page():
                     "outstanding_display": _format_amount(outstanding),
                     "repaid_pct": float(repaid_pct),
                     "repaid_pct_display": _format_amount(repaid_pct, 0),
-                    "fee_total_display": _format_amount(entry.get("fee_total") or Decimal(0)),
-                    "tx_count": int(entry.get("tx_count") or 0),
+                    "fee_total_display": _format_amount(to_decimal(entry.fee_total)),
+                    "tx_count": entry.tx_count,
                     "status": status,
                     "opened_date": opened_disp,
                     "last_activity": last_disp,
@@ -378,7 +209,6 @@ def loans_page():
         )
     )
 
-    positions_catalog = list(positions_catalog_map.values())
     try:
         positions_catalog.sort(
             key=lambda x: (
@@ -406,6 +236,75 @@ def loans_page():
     )
 
 
+@loans_bp.route("/api/loans/schedule", methods=["GET"])
+def loan_schedule():
+    """Projected amortization schedules for the user's open loan positions.
+
+    Loans carry no interest terms, so the plan comes from the query:
+    - rate: annual interest rate in percent (default 0)
+    - frequency: weekly | biweekly | monthly (default) | quarterly
+    - periods: number of installments (default: until the position's due date, else 12)
+    - position: only this position
+    - start: YYYY-MM-DD the schedule starts from (default today)
+
+    Returns: {positions: [{..., payment, totalInterest, payoffDate, schedule: [...]}], rate, frequency, baseCurrency}
+    """
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    user_id = user.get("username")
+    base_currency = (session.get("currency") or "EUR").strip().upper() or "EUR"
+
+    rate_raw = (request.args.get("rate") or "0").strip()
+    rate = to_fixed(rate_raw)
+    if rate < 0 or rate > to_fixed(MAX_RATE_PERCENT) or (rate == 0 and rate_raw.strip("0.,") != ""):
+        return jsonify({"error": f"Invalid rate; expected an annual percentage from 0 to {MAX_RATE_PERCENT}"}), 400
+
+    frequency = (request.args.get("frequency") or "monthly").strip().lower()
+    if frequency not in FREQUENCIES:
+        return jsonify({"error": f"Invalid frequency; expected one of {', '.join(FREQUENCIES)}"}), 400
+
+    periods = None
+    if (request.args.get("periods") or "").strip():
+        try:
+            periods = int(request.args.get("periods"))
+        except Exception:
+            periods = 0
+        if periods < 1 or periods > MAX_PERIODS:
+            return jsonify({"error": f"Invalid periods; expected 1-{MAX_PERIODS}"}), 400
+
+    start = None
+    start_raw = (request.args.get("start") or "").strip()
+    if start_raw:
+        try:
+            start = datetime.strptime(start_raw[:10], "%Y-%m-%d").date()
+        except Exception:
+            return jsonify({"error": "Invalid start; expected YYYY-MM-DD"}), 400
+
+    try:
+        book = get_loan_book(user_id, base_currency)
+    except Exception as e:
+        print(f"Error building loan positions: {e}")
+        return jsonify({"error": "Could not load loans"}), 502
+
+    schedules = schedules_for_book(
+        user_id,
+        book,
+        SchedulePlan(rate=rate, frequency=frequency, periods=periods),
+        start=start,
+        position=(request.args.get("position") or "").strip(),
+    )
+    return jsonify(
+        {
+            "positions": schedules,
+            "rate": to_float(rate),
+            "frequency": frequency,
+            "baseCurrency": base_currency,
+        }
+    )
+
+
 @loans_bp.route("/loans", methods=["POST"])
 def create_loan_transaction():
     user = session.get("user")
@@ -455,6 +354,7 @@ def create_loan_transaction():
     try:
         resp = requests.post(f"{API_URL}/loan", json=data, auth=aws_auth, timeout=12)
         if resp.status_code in (200, 201):
+            publish_change("loans", user_id, loan_id, data["tdate"], "create")
             return redirect(url_for("loans.loans_page"))
 
         # Bubble up backend message for debugging
@@ -526,6 +426,8 @@ def update_loan_transaction():
         print(f"✅ [Loans] Update Response: {response.status_code}, JSON: {j}")
         if response.status_code not in (200, 201):
             print(f"❌ [Loans] Update failed. Text: {response.text}")
+        else:
+            publish_change("loans", user_id, data["loanId"], data["tdate"], "update")
         # Keep UX consistent with other pages: always redirect back.
         return redirect(url_for("loans.loans_page"))
     except Exception as e:
@@ -551,6 +453,8 @@ def delete_loan_transaction(loan_id):
             print(f"✅ [Loans] Delete Response: {response.status_code}, JSON: {response.json()}")
         except Exception:
             print(f"✅ [Loans] Delete Response: {response.status_code}, Text: {response.text}")
+        if response.status_code < 400:
+            publish_change("loans", user_id, loan_id, action="delete")
         return redirect(url_for("loans.loans_page"))
     except Exception as e:
         print(f"❌ [Loans] Failed to delete loan: {str(e)}")
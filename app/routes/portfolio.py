@@ -0,0 +1,251 @@
+import csv
+import hashlib
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from flask import Blueprint, Response, jsonify, request, session
+
+from app.services.lots import KINDS, METHODS, get_lot_book, latest_prices, pnl_summary, tax_report_rows
+from app.services.portfolio_history import RANGES, portfolio_history
+from app.services.wallet_directory import get_wallet_directory
+
+from .crypto import _crypto_quotes, _fx_rates_to, _get_user_base_currency
+from .home import _base_fx_lookup
+from .stock import _stock_quotes
+
+portfolio_bp = Blueprint("portfolio", __name__)
+
+
+@portfolio_bp.route("/api/portfolio/history", methods=["GET"])
+def portfolio_history_api():
+    """Daily portfolio value (crypto + stocks + wallet cash) in the user's base currency.
+
+    Query params:
+    - range: 1M | 3M | 6M | 1Y (default) | ALL
+
+    Returns: {range, baseCurrency, points: [{date, value, crypto, stock, cash}], missing: [symbols without prices]}
+    """
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    range_key = (request.args.get("range") or "1Y").strip().upper()
+    if range_key not in RANGES:
+        return jsonify({"error": f"Invalid range; expected one of {', '.join(RANGES)}"}), 400
+
+    user_id = user.get("username")
+    try:
+        data = portfolio_history(user_id, _get_user_base_currency(user_id), range_key)
+    except Exception as e:
+        print(f"Error building portfolio history: {e}")
+        return jsonify({"error": "Could not build portfolio history"}), 502
+    return jsonify(data)
+
+
+def _lot_book_from_args(user_id: str, base_currency: str):
+    """(kinds, method, wallet_dir, LotBook) for the kind/method query params; raises ValueError on bad input."""
+    kind = (request.args.get("kind") or "all").strip().lower()
+    method = (request.args.get("method") or "fifo").strip().lower()
+    if kind != "all" and kind not in KINDS:
+        raise ValueError(f"Invalid kind; expected all or one of {', '.join(KINDS)}")
+    if method not in METHODS:
+        raise ValueError(f"Invalid method; expected one of {', '.join(METHODS)}")
+    kinds = tuple(KINDS) if kind == "all" else (kind,)
+    fx_by_kind = {
+        "crypto": _base_fx_lookup(base_currency),
+        "stock": _base_fx_lookup(base_currency, minor_units=True),
+    }
+    wallet_dir = get_wallet_directory(user_id)
+    book = get_lot_book(user_id, kinds, method, base_currency, fx_by_kind, wallet_dir=wallet_dir)
+    return kinds, method, wallet_dir, book
+
+
+def _year_arg(default=None):
+    raw = (request.args.get("year") or "").strip()
+    if not raw:
+        return default
+    year = int(raw)
+    if not 1900 <= year <= 9999:
+        raise ValueError("Invalid year")
+    return year
+
+
+@portfolio_bp.route("/api/pnl", methods=["GET"])
+def pnl_api():
+    """Realized and unrealized P&L per asset from tax lots, in the user's base currency.
+
+    Query params:
+    - kind: all (default) | crypto | stock
+    - method: fifo (default) | lifo | hifo | average
+    - year: only list sales of this year (asset totals are all-time)
+    - prices: 1 (default) values open lots at the latest stored close; 0 skips pricing
+
+    Returns: {method, baseCurrency, year, assets: [...], sales: [...], totals: {realized, unrealized, costBasis, marketValue}}
+    """
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    user_id = user.get("username")
+    base_currency = _get_user_base_currency(user_id)
+    try:
+        year = _year_arg()
+        _, _, _, book = _lot_book_from_args(user_id, base_currency)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error building lot book: {e}")
+        return jsonify({"error": "Could not compute P&L"}), 502
+
+    prices = {}
+    if (request.args.get("prices") or "1").strip() != "0":
+        held = [key for key, lots in book.assets.items() if lots.open_qty > 0]
+        try:
+            prices = latest_prices(held, base_currency)
+        except Exception as e:
+            print(f"Error pricing open lots: {e}")
+    return jsonify(pnl_summary(book, prices, year=year))
+
+
+@portfolio_bp.route("/api/pnl/tax-report", methods=["GET"])
+def pnl_tax_report():
+    """CSV of the year's disposals, one row per closed lot (acquired/sold dates, proceeds, cost basis, gain, term).
+
+    Query params: kind, method (as /api/pnl), year (default: current year)
+    """
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    user_id = user.get("username")
+    base_currency = _get_user_base_currency(user_id)
+    try:
+        year = _year_arg(date.today().year)
+        _, method, wallet_dir, book = _lot_book_from_args(user_id, base_currency)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error building lot book: {e}")
+        return jsonify({"error": "Could not build tax report"}), 502
+
+    headers = [
+        "Type",
+        "Asset",
+        "Wallet",
+        "Acquired",
+        "Sold",
+        "Quantity",
+        f"Proceeds ({base_currency})",
+        f"Cost Basis ({base_currency})",
+        f"Gain ({base_currency})",
+        "Holding Days",
+        "Term",
+    ]
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(headers)
+    for row in tax_report_rows(book, year):
+        writer.writerow(
+            [
+                row["kind"],
+                row["asset"],
+                wallet_dir.name(row["wallet"]) if row["wallet"] else "",
+                row["acquired"],
+                row["sold"],
+                row["quantity"],
+                row["proceeds"],
+                row["costBasis"],
+                row["gain"],
+                row["holdingDays"],
+                row["term"],
+            ]
+        )
+
+    filename = f"tax_report_{year}_{method}.csv"
+    return Response(
+        buf.getvalue(),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+_QUOTE_TYPES = ("crypto", "stock")
+_MAX_QUOTE_SYMBOLS = 300
+
+
+def _quote_tag(row: list) -> str:
+    """Short digest of a quote row; the client echoes it back to skip quotes it already holds."""
+    return hashlib.sha1(json.dumps(row, separators=(",", ":")).encode("utf-8")).hexdigest()[:12]
+
+
+@portfolio_bp.route("/api/quotes", methods=["GET"])
+def quotes_api():
+    """Live prices for a mix of crypto and stock symbols in the user's base currency.
+
+    CMC and Yahoo are queried concurrently and share one FX lookup per quote currency.
+
+    Query params:
+    - symbols: comma-separated typed symbols, e.g. "crypto:BTC,crypto:ETH,stock:AAPL"
+    - have: optional comma-separated tags of the caller's copies, in the order of ``symbols``
+      (empty for none); a quote whose fresh row has the same tag is omitted
+
+    Returns: {ts, baseCurrency, quotes: {"crypto:BTC": [price, currency, name, currencyBase], ...},
+    tags: {"crypto:BTC": tag, ...}}
+    """
+    user = session.get("user")
+    if not user:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    wanted: dict[str, list[str]] = {kind: [] for kind in _QUOTE_TYPES}
+    keys: dict[tuple[str, str], str] = {}
+    raw_symbols = (request.args.get("symbols") or "").split(",")
+    held = dict(zip((raw.strip() for raw in raw_symbols), (request.args.get("have") or "").split(",")))
+    for raw in raw_symbols:
+        kind, _, sym = raw.strip().partition(":")
+        sym = sym.strip()
+        if kind not in wanted or not sym:
+            continue
+        if kind == "stock":
+            sym = sym.upper()
+        if (kind, sym) not in keys:
+            wanted[kind].append(sym)
+            keys[(kind, sym)] = raw.strip()
+    if len(keys) > _MAX_QUOTE_SYMBOLS:
+        return jsonify({"error": f"At most {_MAX_QUOTE_SYMBOLS} symbols per request"}), 400
+
+    base_currency = _get_user_base_currency(user.get("username"))
+
+    fx = _fx_rates_to(base_currency)
+    results = {kind: {} for kind in _QUOTE_TYPES}
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        futures = {}
+        if wanted["crypto"]:
+            futures["crypto"] = ex.submit(_crypto_quotes, wanted["crypto"], base_currency, fx)
+        if wanted["stock"]:
+            futures["stock"] = ex.submit(_stock_quotes, wanted["stock"], base_currency, fx)
+        for kind, fut in futures.items():
+            try:
+                results[kind] = fut.result()
+            except Exception as e:
+                print(f"Error fetching {kind} quotes: {e}")
+
+    now_ms = int(time.time() * 1000)
+    quotes = {}
+    tags = {}
+    for (kind, sym), key in keys.items():
+        q = results[kind].get(sym) or {}
+        if kind == "crypto":
+            row = [q.get("price"), q.get("currency") or base_currency, q.get("name") or "", None]
+        else:
+            row = [q.get("priceBase"), q.get("currencyBase") or base_currency, q.get("name") or "", base_currency]
+        tag = _quote_tag(row)
+        tags[key] = tag
+        # Omitted only when the caller's copy is identical to this fresh quote.
+        if row[0] is not None and held.get(key) == tag:
+            continue
+        quotes[key] = row
+
+    return jsonify({"ts": now_ms, "baseCurrency": base_currency, "quotes": quotes, "tags": tags})
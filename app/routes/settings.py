@@ -1,14 +1,7 @@
-import json
-import os
-import requests
 from flask import Blueprint, jsonify, redirect, render_template, request, session, url_for
 
-from app.services.user_scope import filter_records_by_user
-from config import API_URL, aws_auth
-
-_SETTINGS_DEFAULTS_PATH = os.path.join(os.path.dirname(__file__), "..", "static", "settings_defaults.json")
-with open(_SETTINGS_DEFAULTS_PATH, "r") as _f:
-    _SETTING_DEFAULTS = json.load(_f)
+from app.services.settings_defaults import settings_defaults
+from app.services.user_settings import get_user_settings, update_user_settings
 
 settings_bp = Blueprint("settings", __name__)
 
@@ -19,27 +12,20 @@ def settings_page():
     if user:
         userId = user.get("username")
 
-        # --- Fetch settings ---
-        try:
-            response = requests.get(f"{API_URL}/settings", params={"userId": userId}, auth=aws_auth)
-            settings = response.json().get("settings", []) if response.status_code == 200 else []
-            settings = filter_records_by_user(settings, userId)
-            print(settings)
-        except Exception as e:
-            print(f"Error fetching settings: {e}")
-            settings = []
-
-        first = (settings[0] if settings and isinstance(settings, list) else None) or {}
+        # --- Settings (server-side cache, refreshed on save) ---
+        first = get_user_settings(userId)
+        settings = [first] if first else []
 
         # Sync all settings fields to session
         for key in ("theme", "currency", "dashboardColors", "incomeCategories", "expenseCategories"):
             val = first.get(key)
-            if val:
+            if val and session.get(key) != val:
                 session[key] = val
 
-        income_categories = first.get("incomeCategories") or _SETTING_DEFAULTS["incomeCategories"]
-        expense_categories = first.get("expenseCategories") or _SETTING_DEFAULTS["expenseCategories"]
-        dashboard_colors = first.get("dashboardColors") or _SETTING_DEFAULTS["dashboardColors"]
+        defaults = settings_defaults()
+        income_categories = first.get("incomeCategories") or defaults["incomeCategories"]
+        expense_categories = first.get("expenseCategories") or defaults["expenseCategories"]
+        dashboard_colors = first.get("dashboardColors") or defaults["dashboardColors"]
 
         return render_template(
             "settings.html",
@@ -48,7 +34,7 @@ def settings_page():
             income_categories=income_categories,
             expense_categories=expense_categories,
             dashboard_colors=dashboard_colors,
-            default_dashboard_colors=_SETTING_DEFAULTS.get("dashboardColors", {}),
+            default_dashboard_colors=defaults.get("dashboardColors", {}),
         )
     else:
         return render_template("home.html")
@@ -65,7 +51,7 @@ def update_settings():
     session["currency"] = data.get("currency")
 
     try:
-        response = requests.patch(f"{API_URL}/settings", json=data, auth=aws_auth)
+        response = update_user_settings(user_id, data)
         print(f"✅ [DEBUG] Update Response: {response.status_code}, JSON: {response.json()}")
         return redirect(url_for("settings.settings_page"))
     except Exception as e:
@@ -94,7 +80,7 @@ def update_category_settings():
         session["expenseCategories"] = body["expenseCategories"]
 
     try:
-        response = requests.patch(f"{API_URL}/settings", json=payload, auth=aws_auth)
+        response = update_user_settings(user_id, payload)
         print(f"✅ [DEBUG] Category settings update: {response.status_code}")
         return jsonify({"ok": True})
     except Exception as e:
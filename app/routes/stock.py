@@ -7,11 +7,25 @@ from decimal import Decimal
 import requests
 from flask import Blueprint, jsonify, redirect, render_template, request, session, url_for
 
-from app.services.user_scope import filter_records_by_user
+from app.services.alphavantage import configured as av_configured
+from app.services.alphavantage import global_quote as av_global_quote
+from app.services.events import publish_change
+from app.services.money import to_decimal
+from app.services.negative_cache import blocked as lookup_blocked
+from app.services.negative_cache import record_failure as record_lookup_failure
+from app.services.negative_cache import record_success as record_lookup_success
+from app.services.price_history import record_quote, stored_quote, yahoo_currency, yahoo_symbol
+from app.services.providers import Provider, ProviderError, fetch_quotes
+from app.services.providers import register as register_provider
+from app.services.records import get_user_transactions
+from app.services.user_records import get_user_records
+from app.services.wallet_directory import get_wallet_directory
+from app.services.yahoo import spark_quotes as yh_spark_quotes
 from config import API_URL, aws_auth
 
 # Reuse Settings currency + FX conversion helpers (same as fiat/home)
 from .crypto import (
+    _fx_rates_to,
     _get_fx_rate,
     _get_user_base_currency,
     _normalize_currency,
@@ -159,43 +173,14 @@ def _yh_search(keywords: str, limit: int = 8):
     return out
 
 
-def _yh_quote(symbol: str):
-    requested = (symbol or "").strip().upper()
-    if not requested:
-        return {"symbol": "", "name": "", "currency": "", "price": None, "asof": ""}
-
-    # Normalize some common provider suffixes for Yahoo.
-    # Alpha Vantage often uses .LON whereas Yahoo uses .L
-    yahoo_sym = requested
-    try:
-        if yahoo_sym.endswith(".LON"):
-            yahoo_sym = yahoo_sym[:-4] + ".L"
-    except Exception:
-        yahoo_sym = requested
-
-    now = time.time()
-    cached = _YH_QUOTE_CACHE.get(requested)
-    if cached and (now - cached.get("ts", 0.0) < _YH_QUOTE_TTL_SECONDS):
-        return cached.get("data") or {}
-
-    # NOTE: In this environment Yahoo's v7/finance/quote responds 401.
-    # The chart endpoint works and provides currency + regularMarketPrice in meta.
-    url = f"{YAHOO_CHART_URL}/{yahoo_sym}"
-    data = _yh_get(url, {"interval": "1d", "range": "1d"})
-    chart = data.get("chart") or {}
-    results = chart.get("result") or []
-    meta = (results[0] or {}).get("meta") if results else {}
-
+def _quote_from_meta(requested: str, meta: dict) -> dict:
+    """{symbol, name, currency, price, asof} from Yahoo chart meta (chart and spark endpoints)."""
     price = meta.get("regularMarketPrice")
     if price is None:
         price = meta.get("chartPreviousClose")
 
-    currency_raw = str(meta.get("currency") or "").strip()
     # Yahoo sometimes returns GBp for LSE quotes (pence). Treat as GBX so we can scale.
-    if currency_raw and currency_raw.upper() == "GBP" and currency_raw != currency_raw.upper():
-        currency = "GBX"
-    else:
-        currency = _normalize_currency(currency_raw, "")
+    currency = yahoo_currency(meta)
 
     name = str(meta.get("shortName") or meta.get("longName") or "").strip()
     asof = ""
@@ -206,25 +191,100 @@ def _yh_quote(symbol: str):
     except Exception:
         asof = ""
 
-    out = {
+    return {
         "symbol": requested,
         "name": name,
         "currency": currency,
         "price": float(price) if isinstance(price, int | float) else None,
         "asof": asof,
     }
+
+
+def _yh_quote(symbol: str):
+    requested = (symbol or "").strip().upper()
+    if not requested:
+        return {"symbol": "", "name": "", "currency": "", "price": None, "asof": ""}
+
+    # Normalize some common provider suffixes for Yahoo.
+    # Alpha Vantage often uses .LON whereas Yahoo uses .L
+    yahoo_sym = yahoo_symbol("stock", requested)
+
+    now = time.time()
+    cached = _YH_QUOTE_CACHE.get(requested)
+    if cached and (now - cached.get("ts", 0.0) < _YH_QUOTE_TTL_SECONDS):
+        return cached.get("data") or {}
+
+    # The local price store is shared by all workers and survives restarts.
+    stored = stored_quote(yahoo_sym, _YH_QUOTE_TTL_SECONDS)
+    if stored:
+        out = {"symbol": requested, **stored}
+        _YH_QUOTE_CACHE[requested] = {"ts": now, "data": out}
+        return out
+
+    # NOTE: In this environment Yahoo's v7/finance/quote responds 401.
+    # The chart endpoint works and provides currency + regularMarketPrice in meta.
+    url = f"{YAHOO_CHART_URL}/{yahoo_sym}"
+    data = _yh_get(url, {"interval": "1d", "range": "1d"})
+    chart = data.get("chart") or {}
+    results = chart.get("result") or []
+    meta = ((results[0] or {}).get("meta") if results else None) or {}
+
+    out = _quote_from_meta(requested, meta)
+    record_quote(yahoo_sym, out["name"], out["currency"], out["price"], out["asof"])
     _YH_QUOTE_CACHE[requested] = {"ts": now, "data": out}
     return out
 
 
-def _yh_quote_batch(symbols: list) -> dict:
-    """Fetch multiple stock quotes in parallel using ThreadPoolExecutor.
+def _yh_spark_batch(symbols: list) -> dict:
+    """Quotes for uppercased symbols from the price store or Yahoo's multi-symbol spark endpoint.
+
+    Symbols neither can price are left out (the caller falls back to per-symbol chart calls).
+    """
+    now = time.time()
+    result = {}
+    to_fetch = {}  # yahoo symbol -> requested symbol
+    for requested in symbols:
+        yahoo_sym = yahoo_symbol("stock", requested)
+        stored = stored_quote(yahoo_sym, _YH_QUOTE_TTL_SECONDS)
+        if stored:
+            result[requested] = {"symbol": requested, **stored}
+            _YH_QUOTE_CACHE[requested] = {"ts": now, "data": result[requested]}
+        else:
+            to_fetch[yahoo_sym] = requested
+    if not to_fetch:
+        return result
+
+    metas, _errors = yh_spark_quotes(list(to_fetch))
+    for yahoo_sym, meta in metas.items():
+        requested = to_fetch.get(yahoo_sym)
+        if not requested:
+            continue
+        out = _quote_from_meta(requested, meta)
+        if out["price"] is None:
+            continue
+        if not out["name"]:
+            out["name"] = ((_YH_QUOTE_CACHE.get(requested) or {}).get("data") or {}).get("name") or ""
+        record_quote(yahoo_sym, out["name"], out["currency"], out["price"], out["asof"])
+        _YH_QUOTE_CACHE[requested] = {"ts": now, "data": out}
+        result[requested] = out
+    record_lookup_success("yahoo", list(result))
+    return result
+
+
+def _yh_quote_batch(symbols: list, errors: dict | None = None) -> dict:
+    """Fetch multiple stock quotes, many symbols per Yahoo request.
     
     Args:
         symbols: List of stock symbols (e.g., ['AAPL', 'SGLN.L', 'MSFT'])
+        errors: Optional dict that receives symbol -> reason for lookups that failed
     
     Returns:
         Dict mapping symbol -> {symbol, name, currency, price, asof}
+        Symbols Yahoo doesn't know (or that failed) are negatively cached and get
+        their last cached quote, or one with price None, until their back-off expires.
+
+    Uncached symbols are priced by the spark endpoint in one round-trip per chunk;
+    only the ones it doesn't answer are fetched with per-symbol chart calls.
     """
     if not symbols:
         return {}
@@ -245,24 +305,49 @@ def _yh_quote_batch(symbols: list) -> dict:
             result[sym_upper] = cached.get("data", {})
         else:
             uncached_syms.append(sym_upper)
+
+    def _empty_quote(sym):
+        stale = _YH_QUOTE_CACHE.get(sym)
+        if stale and stale.get("data"):
+            return stale["data"]
+        return {"symbol": sym, "name": "", "currency": "", "price": None, "asof": ""}
+
+    skipped = lookup_blocked("yahoo", uncached_syms)
+    for sym in skipped:
+        result[sym] = _empty_quote(sym)
+    uncached_syms = [s for s in uncached_syms if s not in skipped]
     
     # If all cached, return early
     if not uncached_syms:
         return result
+
+    try:
+        spark_hits = _yh_spark_batch(uncached_syms)
+    except Exception as e:
+        print(f"Error in Yahoo spark batch: {e}")
+        spark_hits = {}
+    result.update(spark_hits)
+    uncached_syms = [s for s in uncached_syms if s not in spark_hits]
+    if not uncached_syms:
+        return result
     
-    # Parallelize uncached symbol fetches (5 workers)
+    # Parallelize the remaining per-symbol fetches (5 workers)
     def _fetch_one(sym):
         try:
-            return _yh_quote(sym)
+            quote = _yh_quote(sym)
         except Exception as e:
             print(f"Error fetching {sym}: {e}")
-            return {
-                "symbol": sym,
-                "name": "",
-                "currency": "",
-                "price": None,
-                "asof": "",
-            }
+            # Yahoo answers 404 for symbols it doesn't know; anything else may be transient.
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            record_lookup_failure("yahoo", sym, str(e), transient=status != 404)
+            if errors is not None and status != 404:
+                errors[sym] = str(e)
+            return _empty_quote(sym)
+        if quote.get("price") is None:
+            record_lookup_failure("yahoo", sym, "no price in chart response")
+        else:
+            record_lookup_success("yahoo", [sym])
+        return quote
     
     try:
         with ThreadPoolExecutor(max_workers=5) as executor:
@@ -283,6 +368,80 @@ def _yh_quote_batch(symbols: list) -> dict:
     
     return result
 
+# ===== Quote provider chain (see app.services.providers) =====
+_AV_QUOTE_CACHE = {}
+
+
+def _fresh_cached(cache: dict, symbols: list) -> dict:
+    now = time.time()
+    out = {}
+    for sym in symbols:
+        cached = cache.get(sym)
+        data = (cached or {}).get("data") or {}
+        if cached and now - cached.get("ts", 0.0) < _YH_QUOTE_TTL_SECONDS and data.get("price") is not None:
+            out[sym] = data
+    return out
+
+
+def _yh_provider_quotes(symbols: list) -> dict:
+    errors = {}
+    batch = _yh_quote_batch(symbols, errors=errors)
+    priced = {sym: q for sym, q in batch.items() if q.get("price") is not None}
+    if errors and not priced:
+        raise ProviderError(next(iter(errors.values())))
+    return priced
+
+
+def _av_provider_quotes(symbols: list) -> dict:
+    skipped = lookup_blocked("alphavantage", symbols)
+    out = {}
+    errors = []
+    for sym in symbols:
+        if sym in skipped:
+            continue
+        try:
+            quote = av_global_quote(sym)
+        except Exception as e:
+            errors.append(str(e))
+            record_lookup_failure("alphavantage", sym, str(e), transient=True)
+            continue
+        if quote is None:
+            continue  # unsupported exchange or no call allowance left
+        if not quote:
+            record_lookup_failure("alphavantage", sym, "unknown symbol")
+            continue
+        # Alpha Vantage quotes carry no name; keep the one Yahoo gave earlier.
+        name = ((_YH_QUOTE_CACHE.get(sym) or {}).get("data") or {}).get("name") or ""
+        out[sym] = {"symbol": sym, "name": name, **quote}
+        _AV_QUOTE_CACHE[sym] = {"ts": time.time(), "data": out[sym]}
+    record_lookup_success("alphavantage", list(out))
+    if errors and not out:
+        raise ProviderError(errors[0])
+    return out
+
+
+register_provider(
+    Provider(
+        "yahoo",
+        "stock",
+        {"quote", "batch", "search", "history"},
+        _yh_provider_quotes,
+        cached=lambda symbols: _fresh_cached(_YH_QUOTE_CACHE, symbols),
+    )
+)
+register_provider(
+    Provider(
+        "alphavantage",
+        "stock",
+        {"quote"},
+        _av_provider_quotes,
+        cached=lambda symbols: _fresh_cached(_AV_QUOTE_CACHE, symbols),
+        max_symbols=5,
+        enabled=av_configured,
+    )
+)
+
+
 @stock_bp.route("/stock/search", methods=["GET"])
 def stock_search():
     user = _require_user()
@@ -422,78 +581,78 @@ def stock_quotes_bulk():
     if not symbols:
         return jsonify({})
 
-    def _finalize_quote_bulk(
-        symbol_out: str, name: str, currency_raw: str, price_num, asof: str
-    ):
-        quote_ccy_raw = _normalize_currency(currency_raw, "") or base_currency
-        
-        # Detect UK stocks (ending in .L or .LON) and treat as GBX if price suggests pence
-        effective_ccy = quote_ccy_raw
-        try:
-            if price_num is not None and quote_ccy_raw == "GBP":
-                is_uk = symbol_out.endswith(".L") or symbol_out.endswith(".LON")
-                # If UK stock with high price, likely in pence (GBX)
-                if is_uk and float(price_num) >= 100:
-                    effective_ccy = "GBX"
-        except Exception:
-            pass
+    return jsonify(_stock_quotes(symbols, base_currency, _fx_rates_to(base_currency)))
 
-        price_major, quote_ccy = _scale_minor_currency(
-            _to_decimal(price_num) if price_num is not None else Decimal(0),
-            effective_ccy,
-        )
 
-        price_display = None
-        if price_num is not None:
-            try:
-                price_display = float(price_major)
-            except Exception:
-                price_display = price_num
+def _finalize_quote_bulk(symbol_out: str, name: str, currency_raw: str, price_num, asof: str, base_currency: str, fx):
+    quote_ccy_raw = _normalize_currency(currency_raw, "") or base_currency
 
-        price_base = None
+    # Detect UK stocks (ending in .L or .LON) and treat as GBX if price suggests pence
+    effective_ccy = quote_ccy_raw
+    try:
+        if price_num is not None and quote_ccy_raw == "GBP":
+            is_uk = symbol_out.endswith(".L") or symbol_out.endswith(".LON")
+            # If UK stock with high price, likely in pence (GBX)
+            if is_uk and float(price_num) >= 100:
+                effective_ccy = "GBX"
+    except Exception:
+        pass
+
+    price_major, quote_ccy = _scale_minor_currency(
+        _to_decimal(price_num) if price_num is not None else Decimal(0),
+        effective_ccy,
+    )
+
+    price_display = None
+    if price_num is not None:
         try:
-            if price_display is not None:
-                fx = _get_fx_rate(quote_ccy, base_currency)
-                price_base = float(_to_decimal(price_display) * fx)
+            price_display = float(price_major)
         except Exception:
-            price_base = None
+            price_display = price_num
+
+    price_base = None
+    try:
+        if price_display is not None:
+            price_base = float(_to_decimal(price_display) * fx(quote_ccy))
+    except Exception:
+        price_base = None
+
+    return {
+        "symbol": symbol_out,
+        "name": name or "",
+        "currency": quote_ccy,
+        "price": price_display,
+        "currencyBase": base_currency,
+        "priceBase": price_base,
+        "asof": asof or "",
+        "provider": "yahoo",
+    }
 
-        return {
-            "symbol": symbol_out,
-            "name": name or "",
-            "currency": quote_ccy,
-            "price": price_display,
-            "currencyBase": base_currency,
-            "priceBase": price_base,
-            "asof": asof or "",
-            "provider": "yahoo",
-        }
 
-    # BATCH fetch all stocks in parallel (not sequential!)
-    quotes_batch = _yh_quote_batch(symbols)
+def _stock_quotes(symbols: list, base_currency: str, fx) -> dict:
+    """{SYMBOL: {price, currency, priceBase, currencyBase, ...}}; ``fx(currency)`` gives the rate into base_currency."""
+    # Provider chain: batched Yahoo first, hedged/backed up by the next provider.
+    quotes_batch = fetch_quotes("stock", [(s or "").strip().upper() for s in symbols])
 
     # Build response
     out = {}
-    try:
-        for sym in symbols:
-            try:
-                yh = quotes_batch.get(sym, {})
-                
-                q = _finalize_quote_bulk(
-                    sym,
-                    yh.get("name") or "",
-                    yh.get("currency") or base_currency,
-                    yh.get("price"),
-                    yh.get("asof") or "",
-                )
-                out[sym] = q
-            except Exception as e:
-                print(f"Error in stock_quotes_bulk for '{sym}': {e}")
-                out[sym] = {"error": "Failed to fetch quote", "symbol": sym, "price": None}
-    except Exception as e:
-        print(f"Error in stock_quotes_bulk: {e}")
-
-    return jsonify(out)
+    for sym in symbols:
+        try:
+            yh = quotes_batch.get((sym or "").strip().upper(), {})
+
+            out[sym] = _finalize_quote_bulk(
+                sym,
+                yh.get("name") or "",
+                yh.get("currency") or base_currency,
+                yh.get("price"),
+                yh.get("asof") or "",
+                base_currency,
+                fx,
+            )
+        except Exception as e:
+            print(f"Error in stock_quotes_bulk for '{sym}': {e}")
+            out[sym] = {"error": "Failed to fetch quote", "symbol": sym, "price": None}
+    return out
 
 
 @stock_bp.route("/stock", methods=["GET"])
@@ -519,49 +678,44 @@ def stock_data():
 
     stocks = []
     wallets = []
-
-    def _fetch_stocks():
-        resp = requests.get(f"{API_URL}/stocks", params={"userId": userId}, auth=aws_auth)
-        items = resp.json().get("stocks", []) if resp.status_code == 200 else []
-        return filter_records_by_user(items, userId)
-
-    def _fetch_wallets():
-        resp = requests.get(f"{API_URL}/wallets", params={"userId": userId}, auth=aws_auth)
-        items = resp.json().get("wallets", []) if resp.status_code == 200 else []
-        return filter_records_by_user(items, userId)
+    stock_rows = ()
 
     try:
         with ThreadPoolExecutor(max_workers=2) as ex:
-            fut_s = ex.submit(_fetch_stocks)
-            fut_w = ex.submit(_fetch_wallets)
-            stocks = fut_s.result()
-            wallets = fut_w.result()
+            fut_s = ex.submit(get_user_records, userId, "stocks")
+            fut_w = ex.submit(get_wallet_directory, userId)
+            fut_s.result()
+            wallet_dir = fut_w.result()
+        wallets = wallet_dir.wallets
+        stock_records = get_user_transactions(userId, "stocks", wallet_dir=wallet_dir)
+        stock_rows = zip(stock_records.items, stock_records.records)
     except Exception as e:
         print(f"Error fetching stocks/wallets: {e}")
 
     # Convert transaction price/fee/value into website/base currency for portfolio display.
-    for s in stocks:
+    # Rows are the shared cached API rows, so the base-currency fields go on copies.
+    for s, rec in stock_rows:
+        row = dict(s)
         try:
-            tx_ccy_raw = _normalize_currency(s.get("currency"), base_currency)
-            fee_ccy_raw = _normalize_currency(s.get("feeCurrency"), tx_ccy_raw)
-            qty = _to_decimal(s.get("quantity", 0))
-            price_raw = _to_decimal(s.get("price", 0))
-            fee_raw = _to_decimal(s.get("fee", 0))
+            tx_ccy_raw = rec.currency or base_currency
+            fee_ccy_raw = rec.fee_currency or tx_ccy_raw
+            qty = to_decimal(rec.qty)
 
-            price_major, tx_ccy = _scale_minor_currency(price_raw, tx_ccy_raw)
-            fee_major, fee_ccy = _scale_minor_currency(fee_raw, fee_ccy_raw)
+            price_major, tx_ccy = _scale_minor_currency(to_decimal(rec.price), tx_ccy_raw)
+            fee_major, fee_ccy = _scale_minor_currency(to_decimal(rec.fee), fee_ccy_raw)
 
             fx_price = _get_fx_rate(tx_ccy, base_currency)
             fx_fee = _get_fx_rate(fee_ccy, base_currency)
 
-            s["currencyBase"] = base_currency
-            s["priceBase"] = float(price_major * fx_price)
-            s["feeBase"] = float(fee_major * fx_fee)
-            s["valuePaidBase"] = float((qty * price_major * fx_price) + (fee_major * fx_fee))
-            s["baseCurrency"] = base_currency
-            s["feeCurrency"] = fee_ccy
+            row["currencyBase"] = base_currency
+            row["priceBase"] = float(price_major * fx_price)
+            row["feeBase"] = float(fee_major * fx_fee)
+            row["valuePaidBase"] = float((qty * price_major * fx_price) + (fee_major * fx_fee))
+            row["baseCurrency"] = base_currency
+            row["feeCurrency"] = fee_ccy
         except Exception:
             fx_warning = True
+        stocks.append(row)
 
     return jsonify({
         "stocks": stocks,
@@ -608,6 +762,9 @@ def create_stock():
         response = _send_stock_with_compat(f"{API_URL}/stock", data, method="post")
         print(f"✅ [DEBUG] Create Response: {response.status_code}, JSON: {_response_json_safe(response)}")
 
+        if response.status_code < 400:
+            publish_change("stocks", user_id, stock_id, data["tdate"], "create")
+
         return redirect(url_for("stock.stock_page"))
     except Exception as e:
         print(f"❌ [ERROR] Failed to create stock: {str(e)}")
@@ -643,6 +800,9 @@ def update_stock():
         response = _send_stock_with_compat(f"{API_URL}/stock", data, method="patch")
         print(f"✅ [DEBUG] Update Response: {response.status_code}, JSON: {_response_json_safe(response)}")
 
+        if response.status_code < 400:
+            publish_change("stocks", user_id, data["stockId"], data["tdate"], "update")
+
         return redirect(url_for("stock.stock_page"))
     except Exception as e:
         print(f"❌ [ERROR] Failed to update stock: {str(e)}")
@@ -668,6 +828,8 @@ def delete_stock(stock_id, user_id):
         response = requests.delete(f"{API_URL}/stock", json=data, auth=aws_auth)
         print(f"✅ [DEBUG] Delete Response: {response.status_code}, JSON: {response.json()}")
 
+        if response.status_code < 400:
+            publish_change("stocks", session_user_id, stock_id, action="delete")
         return redirect(url_for("stock.stock_page"))
     except Exception as e:
         print(f"❌ [ERROR] Failed to delete stock: {str(e)}")
@@ -3,7 +3,8 @@ import uuid
 import requests
 from flask import Blueprint, jsonify, redirect, render_template, request, session, url_for
 
-from app.services.user_scope import filter_records_by_user
+from app.services.events import publish_change
+from app.services.wallet_directory import get_wallet_directory
 from config import API_URL, aws_auth
 from .home import _ensure_user_settings_row
 
@@ -16,13 +17,7 @@ def wallet_page():
     if user:
         userId = user.get("username")
         _ensure_user_settings_row(userId)
-        try:
-            response = requests.get(f"{API_URL}/wallets", params={"userId": userId}, auth=aws_auth)
-            wallets = response.json().get("wallets", []) if response.status_code == 200 else []
-            wallets = filter_records_by_user(wallets, userId)
-        except Exception as e:
-            print(f"Error fetching wallets: {e}")
-            wallets = []
+        wallets = get_wallet_directory(userId).wallets
         return render_template("wallet.html", wallets=wallets, userId=userId)
     else:
         return render_template("home.html")
@@ -51,6 +46,8 @@ def create_wallet():
         response = requests.post(f"{API_URL}/wallet", json=data, auth=aws_auth)
         print(f"✅ [DEBUG] Create Response: {response.status_code}, JSON: {response.json()}")
 
+        if response.status_code < 400:
+            publish_change("wallets", user_id, wallet_id, action="create")
         return redirect(url_for("wallet.wallet_page"))
     except Exception as e:
         print(f"❌ [ERROR] Failed to create wallet: {str(e)}")
@@ -82,6 +79,8 @@ def update_wallet():
         response = requests.patch(f"{API_URL}/wallet", json=data, auth=aws_auth)
         print(f"✅ [DEBUG] Update Response: {response.status_code}, JSON: {response.json()}")
 
+        if response.status_code < 400:
+            publish_change("wallets", user_id, data["walletId"], action="update")
         return redirect(url_for("wallet.wallet_page"))
     except Exception as e:
         print(f"❌ [ERROR] Failed to update wallet: {str(e)}")
@@ -107,6 +106,8 @@ def delete_wallet(wallet_id, user_id):
         response = requests.delete(f"{API_URL}/wallet", json=data, auth=aws_auth)
         print(f"✅ [DEBUG] Delete Response: {response.status_code}, JSON: {response.json()}")
 
+        if response.status_code < 400:
+            publish_change("wallets", session_user_id, wallet_id, action="delete")
         return redirect(url_for("wallet.wallet_page"))
     except Exception as e:
         print(f"❌ [ERROR] Failed to delete wallet: {str(e)}")
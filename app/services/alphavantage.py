@@ -0,0 +1,84 @@
+"""Alpha Vantage GLOBAL_QUOTE client (secondary stock quote provider).
+
+One symbol per call and a small per-minute allowance (ALPHA_VANTAGE_RATE_LIMIT_PER_MINUTE,
+default 5 as on the free plan), so it is only asked for the few symbols the primary
+provider could not price or was too slow for. Calls beyond the allowance are skipped
+rather than queued.
+"""
+
+from __future__ import annotations
+
+import os
+
+import requests
+
+from app.services.rate_limit import TokenBucket
+from config import ALPHA_VANTAGE_API_KEY
+
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+
+# Yahoo exchange suffix -> (Alpha Vantage suffix, quote currency). AV quotes carry no
+# currency, so symbols on other exchanges are not priced here.
+_EXCHANGES = {
+    "": ("", "USD"),
+    "L": ("LON", "GBX"),
+    "TO": ("TRT", "CAD"),
+    "DE": ("DEX", "EUR"),
+}
+
+
+def _rate_per_minute() -> int:
+    try:
+        return max(1, int((os.getenv("ALPHA_VANTAGE_RATE_LIMIT_PER_MINUTE") or "5").strip()))
+    except Exception:
+        return 5
+
+
+_BUCKET = TokenBucket(_rate_per_minute() / 60.0, capacity=_rate_per_minute())
+
+
+def configured() -> bool:
+    return bool(ALPHA_VANTAGE_API_KEY)
+
+
+def av_symbol(yahoo_sym: str) -> tuple[str, str] | None:
+    """(Alpha Vantage symbol, currency) for a Yahoo-style symbol, or None if unsupported."""
+    sym = (yahoo_sym or "").strip().upper()
+    if sym.endswith(".LON"):
+        sym = sym[:-4] + ".L"
+    base, _, suffix = sym.rpartition(".") if "." in sym else (sym, "", "")
+    mapped = _EXCHANGES.get(suffix)
+    if not base or mapped is None:
+        return None
+    av_suffix, currency = mapped
+    return (f"{base}.{av_suffix}" if av_suffix else base), currency
+
+
+def global_quote(yahoo_sym: str) -> dict | None:
+    """{price, currency, asof} for one symbol; {} if Alpha Vantage doesn't know it.
+
+    None when the symbol's exchange is unsupported or the call allowance is used up;
+    raises on network/HTTP errors.
+    """
+    mapped = av_symbol(yahoo_sym)
+    if mapped is None or not configured() or not _BUCKET.try_acquire():
+        return None
+    symbol, currency = mapped
+    r = requests.get(
+        ALPHA_VANTAGE_URL,
+        params={"function": "GLOBAL_QUOTE", "symbol": symbol, "apikey": ALPHA_VANTAGE_API_KEY},
+        timeout=12,
+    )
+    r.raise_for_status()
+    body = r.json() or {}
+    if "Note" in body or "Information" in body:
+        # Throttled by the API itself (the message replaces the data).
+        raise RuntimeError(str(body.get("Note") or body.get("Information"))[:200])
+    quote = body.get("Global Quote") or {}
+    try:
+        price = float(quote.get("05. price"))
+    except (TypeError, ValueError):
+        return {}
+    if price <= 0:
+        return {}
+    return {"price": price, "currency": currency, "asof": str(quote.get("07. latest trading day") or "")}
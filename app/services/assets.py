@@ -0,0 +1,120 @@
+"""Fingerprinted static assets.
+
+Templates reference static files through ``asset_url('css/site_styles.css')``,
+which returns a content-hashed URL such as
+``/assets/css/site_styles.3f2a9c1b7e4d.css``. Since a hashed URL never changes
+content, it is served with ``Cache-Control: public, max-age=31536000,
+immutable``. Browsers then keep shared CSS/JS across page navigations and
+deploys without even revalidating, and an edited file gets a new URL.
+
+Files are hashed and precompressed (gzip, plus brotli when available) once
+and served from memory. In debug mode a changed file is re-read on the next
+asset_url() call. Unknown paths fall back to the plain /static/ URL.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import Response, abort, request, url_for
+
+from app.services.compression import AVAILABLE_ENCODINGS, COMPRESSIBLE_TYPES, compress, negotiate_encoding
+
+ASSET_URL_PREFIX = "/assets"
+_IMMUTABLE = "public, max-age=31536000, immutable"
+_EXTRA_TYPES = {".webmanifest": "application/manifest+json", ".js": "text/javascript"}
+
+_LOCK = threading.Lock()
+# logical path ("css/site_styles.css") -> _Asset
+_BY_PATH: dict[str, _Asset] = {}
+# hashed path ("css/site_styles.3f2a9c1b7e4d.css") -> _Asset
+_BY_HASHED: dict[str, _Asset] = {}
+
+
+class _Asset:
+    __slots__ = ("path", "hashed", "digest", "mimetype", "mtime", "encoded")
+
+    def __init__(self, path: str, data: bytes, mtime: float):
+        self.path = path
+        self.digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(path)
+        self.hashed = f"{stem}.{self.digest}{ext}"
+        self.mimetype = _EXTRA_TYPES.get(ext) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.mtime = mtime
+        # content coding ("" = identity) -> bytes
+        self.encoded = {"": data}
+        if self.mimetype in COMPRESSIBLE_TYPES or self.mimetype == "application/manifest+json":
+            for encoding in AVAILABLE_ENCODINGS:
+                packed = compress(data, encoding, best=True)
+                if len(packed) < len(data):
+                    self.encoded[encoding] = packed
+
+
+def _load(static_folder: str, path: str) -> _Asset | None:
+    full = os.path.join(static_folder, path)
+    try:
+        mtime = os.stat(full).st_mtime
+        with open(full, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    asset = _Asset(path, data, mtime)
+    with _LOCK:
+        old = _BY_PATH.get(path)
+        if old is not None:
+            _BY_HASHED.pop(old.hashed, None)
+        _BY_PATH[path] = asset
+        _BY_HASHED[asset.hashed] = asset
+    return asset
+
+
+def _build_manifest(static_folder: str) -> None:
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            path = os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, "/")
+            _load(static_folder, path)
+
+
+def init_assets(app) -> None:
+    """Hash the static folder, register the /assets route and the asset_url() template helper."""
+    static_folder = app.static_folder
+    _build_manifest(static_folder)
+
+    def asset_url(path: str) -> str:
+        path = (path or "").lstrip("/")
+        asset = _BY_PATH.get(path)
+        if asset is not None and app.debug:
+            try:
+                if os.stat(os.path.join(static_folder, path)).st_mtime != asset.mtime:
+                    asset = _load(static_folder, path)
+            except OSError:
+                asset = None
+        if asset is None:
+            return url_for("static", filename=path)
+        return f"{ASSET_URL_PREFIX}/{asset.hashed}"
+
+    def serve_asset(filename: str):
+        asset = _BY_HASHED.get(filename)
+        if asset is None:
+            # Unknown or outdated fingerprint: never cache a different body under it.
+            abort(404)
+        if request.if_none_match.contains_weak(asset.digest):
+            resp = Response(status=304)
+        else:
+            encoding = negotiate_encoding(request.accept_encodings) or ""
+            if encoding not in asset.encoded:
+                encoding = ""
+            resp = Response(asset.encoded[encoding], mimetype=asset.mimetype)
+            if encoding:
+                resp.headers["Content-Encoding"] = encoding
+        # Weak: the same validator covers every content coding of the file.
+        resp.set_etag(asset.digest, weak=True)
+        resp.headers["Cache-Control"] = _IMMUTABLE
+        resp.vary.add("Accept-Encoding")
+        return resp
+
+    app.add_url_rule(f"{ASSET_URL_PREFIX}/<path:filename>", "assets", serve_asset)
+    app.add_template_global(asset_url, "asset_url")
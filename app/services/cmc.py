@@ -0,0 +1,212 @@
+"""CoinMarketCap API client: chunked batch quotes, rate limiting and credit accounting.
+
+- quotes_latest() splits any number of symbols into CMC_BATCH_SIZE chunks (default
+  100, the credit unit of /quotes/latest) fetched concurrently.
+- Every call takes a token from a bucket sized to the plan's per-minute limit
+  (CMC_RATE_LIMIT_PER_MINUTE, default 30); a 429 pauses all calls for a minute.
+- Credits are counted from each response's status.credit_count and re-synced
+  from /v1/key/info (free) every few minutes, so the counters also include usage
+  by other workers and processes sharing the key.
+- ttl_multiplier() grows as the daily/monthly quota runs out; callers multiply
+  their cache TTLs by it (inf once exhausted: keep serving cached prices).
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+from app.services.rate_limit import TokenBucket
+from config import CMC_API_KEY
+
+CMC_BASE_URL = "https://pro-api.coinmarketcap.com"
+_KEY_INFO_INTERVAL_SECONDS = 300
+_RATE_LIMIT_BACKOFF_SECONDS = 60
+_ACQUIRE_TIMEOUT_SECONDS = 20
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return max(1, int((os.getenv(name) or str(default)).strip()))
+    except Exception:
+        return default
+
+
+_BUCKET = TokenBucket(_int_env("CMC_RATE_LIMIT_PER_MINUTE", 30) / 60.0, capacity=5)
+_LOCK = threading.Lock()
+_STATE = {
+    "backoff_until": 0.0,
+    "key_info_ts": 0.0,
+    "day": "",
+    "month": "",
+    "calls": 0,
+    "errors": 0,
+    "credits_day": 0,
+    "credits_month": 0,
+    # Plan limits, from /v1/key/info (or CMC_DAILY_CREDITS / CMC_MONTHLY_CREDITS).
+    "limit_day": _int_env("CMC_DAILY_CREDITS", 333),
+    "limit_month": _int_env("CMC_MONTHLY_CREDITS", 10000),
+}
+
+
+class CmcError(Exception):
+    pass
+
+
+def _roll_periods() -> None:
+    now = datetime.now(timezone.utc)
+    day, month = now.strftime("%Y-%m-%d"), now.strftime("%Y-%m")
+    if _STATE["day"] != day:
+        _STATE["day"], _STATE["credits_day"] = day, 0
+    if _STATE["month"] != month:
+        _STATE["month"], _STATE["credits_month"] = month, 0
+
+
+def _count(credits: int, *, error: bool = False) -> None:
+    with _LOCK:
+        _roll_periods()
+        _STATE["calls"] += 1
+        _STATE["errors"] += 1 if error else 0
+        _STATE["credits_day"] += credits
+        _STATE["credits_month"] += credits
+
+
+def _headers() -> dict:
+    return {"X-CMC_PRO_API_KEY": CMC_API_KEY, "Accept": "application/json", "User-Agent": "Wallet-Front/1.0"}
+
+
+def _sync_key_info() -> None:
+    """Refresh credit usage and plan limits from /v1/key/info (costs no credits)."""
+    with _LOCK:
+        if time.time() - _STATE["key_info_ts"] < _KEY_INFO_INTERVAL_SECONDS:
+            return
+        _STATE["key_info_ts"] = time.time()
+    try:
+        r = requests.get(f"{CMC_BASE_URL}/v1/key/info", headers=_headers(), timeout=10)
+        if r.status_code != 200:
+            return
+        data = (r.json() or {}).get("data") or {}
+        plan, usage = data.get("plan") or {}, data.get("usage") or {}
+        with _LOCK:
+            _roll_periods()
+            _STATE["limit_day"] = int(plan.get("credit_limit_daily") or _STATE["limit_day"])
+            _STATE["limit_month"] = int(plan.get("credit_limit_monthly") or _STATE["limit_month"])
+            _STATE["credits_day"] = int((usage.get("current_day") or {}).get("credits_used") or _STATE["credits_day"])
+            _STATE["credits_month"] = int((usage.get("current_month") or {}).get("credits_used") or _STATE["credits_month"])
+    except Exception as e:
+        print(f"[cmc] key info sync failed: {e}")
+
+
+def usage() -> dict:
+    """Credit counters and plan limits (for logs/admin views)."""
+    with _LOCK:
+        _roll_periods()
+        return {k: v for k, v in _STATE.items() if k not in ("key_info_ts",)}
+
+
+def ttl_multiplier() -> float:
+    """1 while the quota is comfortable; 2, 6 or inf as the day's or month's credits run out."""
+    u = usage()
+    remaining = min(
+        1.0 - u["credits_day"] / max(1, u["limit_day"]),
+        1.0 - u["credits_month"] / max(1, u["limit_month"]),
+    )
+    if remaining <= 0.02:
+        return math.inf
+    if remaining <= 0.10:
+        return 6.0
+    if remaining <= 0.25:
+        return 2.0
+    return 1.0
+
+
+def cmc_get(path: str, params: dict, *, timeout: int = 15) -> dict:
+    """GET a CMC endpoint within the rate limit; returns the JSON body or raises CmcError."""
+    if not CMC_API_KEY:
+        raise CmcError("CMC_API_KEY not configured")
+    if time.time() - _STATE["key_info_ts"] >= _KEY_INFO_INTERVAL_SECONDS:
+        threading.Thread(target=_sync_key_info, name="cmc-key-info", daemon=True).start()
+    wait = _STATE["backoff_until"] - time.time()
+    if wait > 0:
+        raise CmcError(f"rate limited, retry in {wait:.0f}s")
+    if not _BUCKET.acquire(timeout=_ACQUIRE_TIMEOUT_SECONDS):
+        raise CmcError("local rate limit: no call slot available")
+    try:
+        r = requests.get(f"{CMC_BASE_URL}{path}", params=params, headers=_headers(), timeout=timeout)
+    except Exception as e:
+        _count(0, error=True)
+        raise CmcError(str(e)) from e
+    try:
+        body = r.json() or {}
+    except Exception:
+        body = {}
+    status = body.get("status") or {}
+    _count(int(status.get("credit_count") or 0), error=r.status_code != 200)
+    if r.status_code == 429:
+        _STATE["backoff_until"] = time.time() + _RATE_LIMIT_BACKOFF_SECONDS
+    if r.status_code != 200:
+        raise CmcError(f"HTTP {r.status_code}: {status.get('error_message') or ''}".strip())
+    return body
+
+
+def _parse_quote(sym: str, entry) -> dict:
+    # With symbol=... CMC v1 returns one object per symbol (v2 would return a list).
+    if isinstance(entry, list):
+        entry = entry[0] if entry else None
+    if not entry:
+        return {}
+    return {
+        "id": entry.get("id"),
+        "name": entry.get("name", sym),
+        "symbol": entry.get("symbol", sym),
+        "price_usd": float((entry.get("quote", {}).get("USD", {}).get("price")) or 0),
+    }
+
+
+def _quotes_chunk(symbols: list[str]) -> dict:
+    # skip_invalid: one unknown symbol would otherwise fail the whole chunk with a 400.
+    params = {"symbol": ",".join(symbols), "convert": "USD", "skip_invalid": "true"}
+    body = cmc_get("/v1/cryptocurrency/quotes/latest", params)
+    data = body.get("data") if isinstance(body.get("data"), dict) else {}
+    return {sym: _parse_quote(sym, data.get(sym)) for sym in symbols}
+
+
+def quotes_latest(symbols: list[str]) -> tuple[dict, dict]:
+    """USD quotes for any number of symbols.
+
+    Returns (quotes, errors): quotes maps each answered symbol to {id, name, symbol, price_usd}
+    ({} when CMC doesn't know it); errors maps symbols whose chunk failed to the reason.
+    """
+    syms = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+    if not syms:
+        return {}, {}
+    size = _int_env("CMC_BATCH_SIZE", 100)
+    chunks = [syms[i : i + size] for i in range(0, len(syms), size)]
+    quotes: dict = {}
+    errors: dict = {}
+
+    def run(chunk):
+        try:
+            return chunk, _quotes_chunk(chunk), None
+        except Exception as e:
+            return chunk, None, str(e)
+
+    workers = min(len(chunks), _int_env("CMC_MAX_CONCURRENCY", 4))
+    if workers == 1:
+        results = [run(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(run, chunks))
+    for chunk, found, error in results:
+        if error is not None:
+            print(f"[cmc] quotes chunk of {len(chunk)} symbols failed: {error}")
+            errors.update(dict.fromkeys(chunk, error))
+        else:
+            quotes.update(found)
+    return quotes, errors
@@ -0,0 +1,126 @@
+"""Response compression (brotli when available, else gzip) for text-like responses.
+
+Registered as an after_request hook by init_compression(). Responses are left
+alone when they are small (< COMPRESS_MIN_SIZE bytes, default 1024), not a
+text-like type, already encoded (e.g. the pre-compressed payloads of
+app.services.payload_cache), partial (206), bodiless, or marked no-transform.
+
+Buffered bodies are compressed in one go. Streamed bodies (send_file, generators)
+are compressed chunk by chunk as they are sent, so large files are never held
+in memory twice.
+
+brotli is optional: without the package only gzip is offered.
+"""
+
+from __future__ import annotations
+
+import gzip
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+}
+
+# Content codings this process can produce, best first.
+AVAILABLE_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+_GZIP_LEVEL = 6
+_BROTLI_QUALITY = 5  # good ratio at a fraction of the default (11) CPU cost for dynamic bodies
+
+
+def _min_size() -> int:
+    try:
+        return max(0, int((os.getenv("COMPRESS_MIN_SIZE") or "1024").strip()))
+    except Exception:
+        return 1024
+
+
+def negotiate_encoding(accept_encodings) -> str | None:
+    """Best supported content coding for a werkzeug Accept header: "br", "gzip" or None."""
+    if brotli is not None and accept_encodings["br"] > 0:
+        return "br"
+    if accept_encodings["gzip"] > 0:
+        return "gzip"
+    return None
+
+
+def compress(data: bytes, encoding: str, *, best: bool = False) -> bytes:
+    """Compress ``data``; ``best`` trades CPU for size (for bodies compressed once and reused)."""
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if best else _BROTLI_QUALITY)
+    return gzip.compress(data, 9 if best else _GZIP_LEVEL, mtime=0)
+
+
+def _compress_stream(chunks, encoding: str):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=_BROTLI_QUALITY)
+        for chunk in chunks:
+            out = compressor.process(chunk)
+            if out:
+                yield out
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31 -> gzip container
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def _compress_response(response):
+    if response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+    response.vary.add("Accept-Encoding")
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or request.method == "HEAD"
+        or "Content-Encoding" in response.headers
+        or "no-transform" in (response.headers.get("Cache-Control") or "")
+    ):
+        return response
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    min_size = _min_size()
+    if response.is_streamed:
+        length = response.content_length
+        if length is not None and length < min_size:
+            return response
+        response.response = _compress_stream(response.iter_encoded(), encoding)
+        response.direct_passthrough = False
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        response.set_data(compress(data, encoding))
+
+    response.headers["Content-Encoding"] = encoding
+    response.headers.pop("Accept-Ranges", None)
+    # The compressed bytes differ from the identity form, so a strong validator would lie.
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app) -> None:
+    app.after_request(_compress_response)
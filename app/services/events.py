@@ -0,0 +1,139 @@
+"""Change-event bus for server-side cache invalidation.
+
+Mutating routes publish a ChangeEvent after the API accepted the write; caches
+subscribe per resource and drop (or patch) only what the change affects.
+
+Delivery is synchronous and in-process. So that other gunicorn workers see the
+change too, publish() also touches a per-(user, resource) stamp file, and
+sync_remote_changes() re-dispatches events for stamps written by other processes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from collections.abc import Callable
+from dataclasses import dataclass
+
+# API list resources that can change (see app.services.user_records), plus settings.
+RESOURCES = ("wallets", "cryptos", "stocks", "transactions", "loans", "settings")
+
+
+@dataclass(frozen=True, slots=True)
+class ChangeEvent:
+    resource: str
+    user_id: str
+    record_id: str = ""
+    tdate: str = ""
+    action: str = ""  # create | update | delete | import
+    remote: bool = False  # True when replayed from another worker's stamp
+
+
+_SUBSCRIBERS: dict[str, list[Callable[[ChangeEvent], None]]] = {}
+
+# userId -> monotonically increasing data version (bumped on every event).
+_USER_DATA_VERSION: dict[str, int] = {}
+
+# (userId, resource) -> stamp mtime_ns last seen by this process.
+_STAMPS_SEEN: dict[tuple[str, str], int] = {}
+
+
+def subscribe(resource: str, handler: Callable[[ChangeEvent], None]) -> None:
+    """Register a handler for a resource; use "*" to receive every event."""
+    handlers = _SUBSCRIBERS.setdefault(resource, [])
+    if handler not in handlers:
+        handlers.append(handler)
+
+
+def user_data_version(user_id: str) -> int:
+    return _USER_DATA_VERSION.get(str(user_id or "").strip(), 0)
+
+
+def user_data_stamp(user_id: str, resources=RESOURCES) -> str:
+    """Cross-process data version: digest of the user's change-stamp mtimes for ``resources``.
+
+    Unlike user_data_version() it is the same in every worker and survives restarts.
+    """
+    uid = str(user_id or "").strip()
+    parts = []
+    for resource in resources:
+        try:
+            parts.append(f"{resource}:{os.stat(_stamp_path(uid, resource)).st_mtime_ns}")
+        except OSError:
+            parts.append(f"{resource}:0")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _stamp_dir() -> str:
+    return (os.getenv("CHANGE_EVENTS_DIR") or "").strip() or os.path.join(
+        tempfile.gettempdir(), "wallet-front-events"
+    )
+
+
+def _stamp_path(user_id: str, resource: str) -> str:
+    digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:20]
+    return os.path.join(_stamp_dir(), f"{digest}.{resource}")
+
+
+def _touch_stamp(user_id: str, resource: str) -> None:
+    try:
+        path = _stamp_path(user_id, resource)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a"):
+            pass
+        os.utime(path, None)
+        _STAMPS_SEEN[(user_id, resource)] = os.stat(path).st_mtime_ns
+    except Exception as e:
+        print(f"[events] Could not write change stamp: {e}")
+
+
+def _dispatch(event: ChangeEvent) -> None:
+    _USER_DATA_VERSION[event.user_id] = _USER_DATA_VERSION.get(event.user_id, 0) + 1
+    for handler in list(_SUBSCRIBERS.get(event.resource, [])) + list(_SUBSCRIBERS.get("*", [])):
+        try:
+            handler(event)
+        except Exception as e:
+            print(f"[events] Handler {getattr(handler, '__name__', handler)} failed for {event}: {e}")
+
+
+def publish(event: ChangeEvent) -> None:
+    uid = str(event.user_id or "").strip()
+    if not uid:
+        return
+    if uid != event.user_id:
+        event = ChangeEvent(event.resource, uid, event.record_id, event.tdate, event.action, event.remote)
+    _touch_stamp(uid, event.resource)
+    _dispatch(event)
+
+
+def publish_change(resource: str, user_id: str, record_id: str = "", tdate: str = "", action: str = "") -> None:
+    """Convenience wrapper used by the CRUD routes."""
+    publish(
+        ChangeEvent(
+            resource=resource,
+            user_id=str(user_id or "").strip(),
+            record_id=str(record_id or "").strip(),
+            tdate=str(tdate or "").strip(),
+            action=action,
+        )
+    )
+
+
+def sync_remote_changes(user_id: str) -> None:
+    """Dispatch events for changes another worker published since we last looked."""
+    uid = str(user_id or "").strip()
+    if not uid:
+        return
+    for resource in RESOURCES:
+        key = (uid, resource)
+        try:
+            mtime = os.stat(_stamp_path(uid, resource)).st_mtime_ns
+        except OSError:
+            # No change published yet: the first stamp to appear is a change to announce.
+            _STAMPS_SEEN.setdefault(key, 0)
+            continue
+        # Unseen stamps count as 0, so a change first seen after our caches filled is dispatched.
+        if mtime > _STAMPS_SEEN.get(key, 0):
+            _STAMPS_SEEN[key] = mtime
+            _dispatch(ChangeEvent(resource=resource, user_id=uid, remote=True))
@@ -0,0 +1,208 @@
+"""Record/replay of all outbound HTTP traffic, for offline and repeatable profiling.
+
+Every upstream call (API Gateway, CMC, Yahoo, Frankfurter, Alpha Vantage,
+Cognito/OIDC, Turnstile) goes through ``requests``, so the hook sits in
+requests.Session.send. HTTP_REPLAY_MODE selects what it does:
+
+- off (default): nothing is patched
+- record: calls go out as usual; each exchange is appended to the cassette
+  together with its latency
+- replay: nothing goes out; responses are served from the cassette, and a
+  request that was never recorded fails like a network error
+
+The cassette (HTTP_CASSETTE, default <instance>/http-cassette.jsonl) is one
+JSON line per exchange with the body zlib-compressed. Requests are matched
+on method, URL (query sorted, HTTP_REPLAY_IGNORE_PARAMS dropped, default
+period1,period2,_ since they change every day) and a hash of the request
+body; repeats of the same request replay their recordings in order, the last
+one from then on. Request headers are never stored and credential-like query
+parameters are redacted. Response bodies are stored as received (users'
+records included), except those of OIDC token/userinfo endpoints, which are
+replayed empty; the file is written with mode 0o600.
+
+HTTP_REPLAY_LATENCY_SCALE sleeps for the recorded latency times the factor
+(default 0: answer at once; 1: original timing).
+
+The app's own persistent caches (PRICE_HISTORY_DB, LOOKUP_FAILURES_DB, the OIDC
+cache) also shape which calls are made; point them at fresh paths for runs that
+must match a recording exactly. boto3 (admin tools) does not use requests and is
+not covered.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from app.services.private_files import instance_path, open_private
+
+_REDACTED_PARAMS = {"apikey", "api_key", "key", "token", "access_token", "secret", "client_secret", "password"}
+# Responses carrying tokens or user profiles (OIDC token and userinfo endpoints) are stored without a body.
+_SECRET_BODY_PATHS = ("/token", "/userinfo")
+# Response headers worth keeping; the body is stored decoded, so Content-Encoding is not.
+_KEPT_HEADERS = ("content-type", "cache-control", "etag", "last-modified", "retry-after", "location")
+
+_LOCK = threading.Lock()
+_STATE: dict = {"mode": "off", "original_send": None, "cassette": None, "positions": {}}
+
+
+def replay_mode() -> str:
+    mode = (os.getenv("HTTP_REPLAY_MODE") or "off").strip().lower()
+    return mode if mode in {"record", "replay"} else "off"
+
+
+def cassette_path() -> str:
+    return (os.getenv("HTTP_CASSETTE") or "").strip() or instance_path("http-cassette.jsonl")
+
+
+def _ignored_params() -> set[str]:
+    raw = os.getenv("HTTP_REPLAY_IGNORE_PARAMS")
+    raw = "period1,period2,_" if raw is None else raw
+    return {p.strip().lower() for p in raw.split(",") if p.strip()}
+
+
+def _latency_scale() -> float:
+    try:
+        return max(0.0, float((os.getenv("HTTP_REPLAY_LATENCY_SCALE") or "0").strip()))
+    except Exception:
+        return 0.0
+
+
+def _clean_url(url: str, drop: set[str]) -> str:
+    parts = urlsplit(url)
+    query = []
+    for name, value in parse_qsl(parts.query, keep_blank_values=True):
+        lname = name.lower()
+        if lname in drop:
+            continue
+        query.append((name, "REDACTED" if lname in _REDACTED_PARAMS else value))
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(sorted(query)), ""))
+
+
+def _request_key(request) -> str:
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()[:16] if body else ""
+    return f"{request.method} {_clean_url(request.url, _ignored_params())} {digest}".rstrip()
+
+
+def _load_cassette(path: str) -> dict[str, list[dict]]:
+    entries: dict[str, list[dict]] = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn write at the end of a recording
+                entries.setdefault(entry["key"], []).append(entry)
+    except FileNotFoundError:
+        print(f"[http replay] No cassette at {path}; every request will fail")
+    return entries
+
+
+def _record(request, response, seconds: float) -> None:
+    try:
+        content = response.content or b""
+    except Exception:
+        return  # body could not be read (connection dropped); not worth recording
+    if urlsplit(request.url).path.lower().rstrip("/").endswith(_SECRET_BODY_PATHS):
+        content = b""
+    entry = {
+        "key": _request_key(request),
+        "url": _clean_url(request.url, set()),
+        "status": response.status_code,
+        "reason": response.reason,
+        "headers": {k: v for k, v in response.headers.items() if k.lower() in _KEPT_HEADERS},
+        "encoding": response.encoding,
+        "body": base64.b64encode(zlib.compress(content, 6)).decode("ascii"),
+        "elapsed": round(seconds, 4),
+        "ts": round(time.time(), 3),
+    }
+    line = json.dumps(entry, separators=(",", ":")) + "\n"
+    path = cassette_path()
+    with _LOCK:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # One append per exchange: workers recording into the same file don't interleave lines.
+        with open_private(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def _replay(request) -> requests.Response:
+    key = _request_key(request)
+    with _LOCK:
+        if _STATE["cassette"] is None:
+            _STATE["cassette"] = _load_cassette(cassette_path())
+        recordings = _STATE["cassette"].get(key)
+        if not recordings:
+            raise requests.ConnectionError(f"[http replay] no recording for {key}", request=request)
+        position = _STATE["positions"].get(key, 0)
+        _STATE["positions"][key] = position + 1
+    entry = recordings[min(position, len(recordings) - 1)]
+
+    delay = float(entry.get("elapsed") or 0.0) * _latency_scale()
+    if delay > 0:
+        time.sleep(delay)
+    response = requests.Response()
+    response.status_code = int(entry["status"])
+    response.reason = entry.get("reason") or ""
+    response.headers = CaseInsensitiveDict(entry.get("headers") or {})
+    response.encoding = entry.get("encoding")
+    response._content = zlib.decompress(base64.b64decode(entry["body"]))
+    response.url = request.url
+    response.request = request
+    response.elapsed = timedelta(seconds=float(entry.get("elapsed") or 0.0))
+    return response
+
+
+def _send(self, request, **kwargs):
+    mode = _STATE["mode"]
+    if mode == "replay":
+        return _replay(request)
+    started = time.perf_counter()
+    response = _STATE["original_send"](self, request, **kwargs)
+    if mode == "record":
+        try:
+            _record(request, response, time.perf_counter() - started)
+        except Exception as e:
+            print(f"[http replay] Could not record {request.method} {request.url}: {e}")
+    return response
+
+
+def install(mode: str | None = None) -> str:
+    """Patch requests according to ``mode`` (default: HTTP_REPLAY_MODE); returns the active mode."""
+    mode = replay_mode() if mode is None else mode
+    with _LOCK:
+        if mode not in {"record", "replay"}:
+            if _STATE["original_send"] is not None:
+                requests.Session.send = _STATE["original_send"]
+                _STATE["original_send"] = None
+            _STATE["mode"] = "off"
+            return "off"
+        if _STATE["original_send"] is None:
+            _STATE["original_send"] = requests.Session.send
+            requests.Session.send = _send
+        _STATE["mode"] = mode
+        _STATE["cassette"] = None
+        _STATE["positions"] = {}
+    return mode
+
+
+def init_http_replay(app) -> None:
+    """Install the hook selected by HTTP_REPLAY_MODE before anything talks to an upstream."""
+    mode = install()
+    if mode != "off":
+        print(f"[http replay] {mode} mode, cassette {cassette_path()}")
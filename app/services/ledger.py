@@ -0,0 +1,60 @@
+"""Weighted-average-cost ledger shared by the Crypto page and the Overview.
+
+Values are fixed-point ints (see app.services.money).
+"""
+
+from __future__ import annotations
+
+from app.services.money import fdiv, muldiv
+
+
+class AvgCostPosition:
+    """Holding of one instrument under the weighted average cost method.
+
+    - buy: quantity and cost basis grow by the purchase value (fees included)
+    - remove/sell: cost basis shrinks by the average cost of the quantity
+      actually held; selling more than held leaves a negative (short)
+      quantity with no further cost basis change
+    - add: quantity arrives without cost basis (incoming transfer)
+    """
+
+    __slots__ = ("qty", "cost", "fee", "buy_total", "sell_total")
+
+    def __init__(self):
+        self.qty = 0
+        self.cost = 0
+        self.fee = 0
+        self.buy_total = 0  # total spent on purchases
+        self.sell_total = 0  # net proceeds from sales (after fees)
+
+    def buy(self, qty: int, value: int, fee: int = 0) -> None:
+        self.qty += qty
+        self.cost += value
+        self.buy_total += value
+        self.fee += fee
+
+    def add(self, qty: int) -> None:
+        self.qty += qty
+
+    def remove(self, qty: int) -> int:
+        """Take ``qty`` out at average cost; returns the cost basis removed."""
+        held = self.qty
+        if held > 0:
+            if qty >= held:
+                removed = self.cost
+            else:
+                removed = muldiv(qty, self.cost, held)
+            self.cost -= removed
+            self.qty = held - qty
+            return removed
+        self.qty = held - qty
+        return 0
+
+    def sell(self, qty: int, net_proceeds: int, fee: int = 0) -> int:
+        removed = self.remove(qty)
+        self.sell_total += net_proceeds
+        self.fee += fee
+        return removed
+
+    def avg_cost(self) -> int:
+        return fdiv(self.cost, self.qty) if self.qty else 0
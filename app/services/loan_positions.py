@@ -0,0 +1,213 @@
+"""Loan position engine shared by the Loans page and the Overview card.
+
+Loan rows are grouped into positions by (type, position). A position is a
+string identifying one "contract"; rows written before the field existed get
+one derived from counterparty + currency + day for NEW rows. Repays without a
+position (legacy) are allocated FIFO across the NEW positions of the same
+(type, counterparty, currency) group: one pass per group with a cursor over
+positions ordered by opening date, since a position that has been fully
+repaid never reopens.
+
+Amounts are fixed-point ints (app.services.money).
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+
+from app.services.records import LoanTx, get_user_transactions
+from app.services.wallet_directory import WalletDirectory
+
+# userId -> ((loan records version, base currency), LoanBook)
+_BOOK_CACHE: dict[str, tuple[tuple, LoanBook]] = {}
+
+
+def day_from_iso(date_str: str) -> str:
+    """Extract YYYY-MM-DD from an ISO-ish datetime string."""
+    s = (date_str or "").strip()
+    if len(s) >= 10:
+        return s[:10]
+    return s
+
+
+def derive_position(counterparty: str, currency: str, tdate: str) -> str:
+    """Derive a position string from counterparty+currency+date (day precision)."""
+    party = (counterparty or "").strip() or "—"
+    ccy = (currency or "").strip().upper() or "EUR"
+    day = day_from_iso(tdate)
+    if not day:
+        day = "unknown-date"
+    return f"{party} | {ccy} | {day}"
+
+
+class LoanPosition:
+    __slots__ = (
+        "type",
+        "position",
+        "counterparty",
+        "currency",
+        "principal",
+        "repaid",
+        "fee_total",
+        "tx_count",
+        "opened_date",
+        "opened_ts",
+        "last_activity",
+        "last_activity_ts",
+        "next_due",
+        "next_due_ts",
+    )
+
+    def __init__(self, loan_type: str, position: str, counterparty: str, currency: str):
+        self.type = loan_type
+        self.position = position
+        self.counterparty = counterparty
+        self.currency = currency
+        self.principal = 0
+        self.repaid = 0
+        self.fee_total = 0
+        self.tx_count = 0
+        self.opened_date = ""
+        self.opened_ts = 0.0
+        self.last_activity = ""
+        self.last_activity_ts = 0.0
+        self.next_due = ""
+        self.next_due_ts = 0.0
+
+    @property
+    def outstanding(self) -> int:
+        return self.principal - self.repaid
+
+    def touch(self, ts: float, tdate: str) -> None:
+        if ts and ts >= self.last_activity_ts:
+            self.last_activity_ts = ts
+            self.last_activity = tdate
+
+
+class LoanBook:
+    """All positions of one user (insertion order) plus the NEW-position catalog for suggestions."""
+
+    __slots__ = ("positions", "catalog")
+
+    def __init__(self, positions: dict, catalog: list):
+        self.positions: dict[tuple[str, str], LoanPosition] = positions
+        self.catalog: list[dict] = catalog
+
+    def __iter__(self):
+        return iter(self.positions.values())
+
+    def open_positions(self) -> list[LoanPosition]:
+        return [p for p in self.positions.values() if p.outstanding > 0]
+
+
+def _allocate_fifo(entries: list[LoanPosition], repays: list[LoanTx]) -> None:
+    entries.sort(key=lambda e: (e.opened_ts, e.opened_date))
+    repays.sort(key=lambda r: (r.ts, r.tdate))
+
+    cursor = 0
+    for repay in repays:
+        remaining = repay.amount
+        if remaining <= 0:
+            continue
+        fee_added = False
+        while remaining > 0 and cursor < len(entries):
+            entry = entries[cursor]
+            outstanding = entry.principal - entry.repaid
+            if outstanding <= 0:
+                cursor += 1
+                continue
+
+            apply_amt = remaining if remaining <= outstanding else outstanding
+            entry.repaid += apply_amt
+            entry.tx_count += 1
+            remaining -= apply_amt
+
+            if not fee_added:
+                entry.fee_total += repay.fee
+                fee_added = True
+            entry.touch(repay.ts, repay.tdate)
+        if cursor >= len(entries):
+            # Every position of the group is repaid; later repays have nothing to apply to.
+            break
+
+
+def build_loan_book(loans: list[LoanTx], base_currency: str) -> LoanBook:
+    positions: dict[tuple[str, str], LoanPosition] = {}
+    catalog: dict[tuple[str, str], dict] = {}
+    # (type, party_lower, currency) -> NEW positions / legacy repays without a position
+    new_entries_by_group: dict[tuple, dict[tuple[str, str], LoanPosition]] = defaultdict(dict)
+    repays_by_group: dict[tuple, list[LoanTx]] = defaultdict(list)
+
+    for row in loans:
+        t = row.type
+        party = row.counterparty or "—"
+        currency = row.currency or base_currency
+        is_new = row.action == "new"
+
+        position = row.position
+        if is_new and not position:
+            position = derive_position(party, currency, row.tdate)
+        group = (t, party.lower(), currency)
+
+        if not position:
+            repays_by_group[group].append(row)
+            continue
+
+        key = (t, position)
+        entry = positions.get(key)
+        if entry is None:
+            entry = positions[key] = LoanPosition(t, position, party, currency)
+
+        entry.tx_count += 1
+        entry.fee_total += row.fee
+
+        if is_new:
+            entry.principal += row.amount
+            if row.ts and (entry.opened_ts == 0.0 or row.ts < entry.opened_ts):
+                entry.opened_ts = row.ts
+                entry.opened_date = row.tdate
+        else:
+            entry.repaid += row.amount
+
+        entry.touch(row.ts, row.tdate)
+
+        if row.due_ts and (entry.next_due_ts == 0.0 or row.due_ts < entry.next_due_ts):
+            entry.next_due_ts = row.due_ts
+            entry.next_due = row.ddate
+
+        if is_new:
+            # Catalog (suggestions) includes derived positions so users can target legacy ones.
+            if key not in catalog:
+                catalog[key] = {
+                    "type": t,
+                    "position": position,
+                    "counterparty": party,
+                    "currency": currency,
+                    "opened_date": day_from_iso(row.tdate),
+                }
+            new_entries_by_group[group][key] = entry
+
+    for group, repays in repays_by_group.items():
+        entries = new_entries_by_group.get(group)
+        if entries:
+            _allocate_fifo(list(entries.values()), repays)
+
+    return LoanBook(positions, list(catalog.values()))
+
+
+def get_loan_book(
+    user_id: str, base_currency: str, *, wallet_dir: WalletDirectory | None = None, timeout: int = 12
+) -> LoanBook:
+    """Return the user's loan positions, rebuilt only when the loan list is refetched.
+
+    ``base_currency`` fills in rows without a currency, so it is part of the cache key.
+    """
+    uid = (str(user_id) if user_id is not None else "").strip()
+    record_set = get_user_transactions(uid, "loans", wallet_dir=wallet_dir, timeout=timeout)
+    version = (record_set.version[0], base_currency)
+    cached = _BOOK_CACHE.get(uid)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    book = build_loan_book(record_set.records, base_currency)
+    _BOOK_CACHE[uid] = (version, book)
+    return book
@@ -0,0 +1,156 @@
+"""Projected amortization schedules for open loan positions.
+
+Loan rows carry no interest terms, so the plan (annual rate, payment
+frequency, number of installments) comes from the caller. Each open
+position's outstanding balance is amortized as an annuity (equal
+installments; interest accrues on the remaining balance each period)
+starting from ``start``. When no installment count is given, it is derived
+from the position's next due date, falling back to DEFAULT_PERIODS.
+
+Schedules are memoized per position and plan, and dropped when the user's
+LoanBook is rebuilt (i.e. the loan list changed).
+
+Amounts are fixed-point ints (app.services.money).
+"""
+
+from __future__ import annotations
+
+import calendar
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal, localcontext
+
+from app.services.loan_positions import LoanBook, LoanPosition
+from app.services.money import SCALE, fmul, from_decimal, to_float
+
+# Payment frequency -> (periods per year, months per period or None, days per period)
+FREQUENCIES = {
+    "weekly": (52, None, 7),
+    "biweekly": (26, None, 14),
+    "monthly": (12, 1, 0),
+    "quarterly": (4, 3, 0),
+}
+
+DEFAULT_PERIODS = 12
+MAX_PERIODS = 600
+MAX_RATE_PERCENT = 1000
+_MEMO_MAX = 4096
+
+# userId -> (LoanBook the schedules were computed from, {(position key, plan, start): schedule})
+_SCHEDULE_CACHE: dict[str, tuple[LoanBook, dict]] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class SchedulePlan:
+    rate: int  # annual interest rate in percent (fixed-point)
+    frequency: str = "monthly"
+    periods: int | None = None  # installments; None -> derived from the next due date
+
+
+def _add_months(d: date, months: int) -> date:
+    month_index = d.month - 1 + months
+    year = d.year + month_index // 12
+    month = month_index % 12 + 1
+    return date(year, month, min(d.day, calendar.monthrange(year, month)[1]))
+
+
+def _period_date(start: date, frequency: str, n: int) -> date:
+    _, months, days = FREQUENCIES[frequency]
+    if months:
+        return _add_months(start, months * n)
+    return start + timedelta(days=days * n)
+
+
+def _periods_until(start: date, due: str, frequency: str) -> int | None:
+    try:
+        due_day = datetime.strptime((due or "").strip()[:10], "%Y-%m-%d").date()
+    except Exception:
+        return None
+    if due_day <= start:
+        return None
+    per_year, _, _ = FREQUENCIES[frequency]
+    n = -(-(due_day - start).days * per_year // 365)  # ceil
+    return max(1, min(n, MAX_PERIODS))
+
+
+def _installment(balance: int, period_rate: int, periods: int) -> int:
+    """Equal installment amortizing ``balance`` over ``periods`` at ``period_rate`` (fixed-point)."""
+    if period_rate <= 0:
+        return -(-balance // periods)
+    with localcontext() as ctx:
+        ctx.prec = 40
+        r = Decimal(period_rate) / SCALE
+        factor = (1 + r) ** periods
+        payment = Decimal(balance) / SCALE * r * factor / (factor - 1)
+    return from_decimal(payment)
+
+
+def amortize(position: LoanPosition, plan: SchedulePlan, start: date) -> dict:
+    """Amortization table for one position's outstanding balance."""
+    balance = max(0, position.outstanding)
+    per_year, _, _ = FREQUENCIES[plan.frequency]
+    periods = plan.periods or _periods_until(start, position.next_due, plan.frequency) or DEFAULT_PERIODS
+    periods = max(1, min(int(periods), MAX_PERIODS))
+    period_rate = max(0, plan.rate) // 100 // per_year
+
+    payment = _installment(balance, period_rate, periods) if balance else 0
+    rows = []
+    total_interest = 0
+    for n in range(1, periods + 1):
+        if balance <= 0:
+            break
+        interest = fmul(balance, period_rate)
+        principal_part = payment - interest
+        if n == periods or principal_part >= balance:
+            principal_part = balance
+        balance -= principal_part
+        total_interest += interest
+        rows.append(
+            {
+                "period": n,
+                "date": _period_date(start, plan.frequency, n).isoformat(),
+                "payment": round(to_float(principal_part + interest), 2),
+                "interest": round(to_float(interest), 2),
+                "principal": round(to_float(principal_part), 2),
+                "balance": round(to_float(balance), 2),
+            }
+        )
+
+    return {
+        "type": position.type,
+        "position": position.position,
+        "counterparty": position.counterparty,
+        "currency": position.currency,
+        "outstanding": round(to_float(max(0, position.outstanding)), 2),
+        "payment": round(to_float(payment), 2),
+        "periods": len(rows),
+        "totalInterest": round(to_float(total_interest), 2),
+        "totalPaid": round(to_float(max(0, position.outstanding) + total_interest), 2),
+        "payoffDate": rows[-1]["date"] if rows else "",
+        "schedule": rows,
+    }
+
+
+def schedules_for_book(
+    user_id: str, book: LoanBook, plan: SchedulePlan, *, start: date | None = None, position: str = ""
+) -> list[dict]:
+    """Schedules for every open position of ``book`` (or just ``position``), served from the per-position memo."""
+    start = start or date.today()
+    cached = _SCHEDULE_CACHE.get(user_id)
+    if cached is None or cached[0] is not book:
+        cached = (book, {})
+        _SCHEDULE_CACHE[user_id] = cached
+    memo = cached[1]
+    if len(memo) > _MEMO_MAX:
+        memo.clear()
+
+    out = []
+    for key, entry in book.positions.items():
+        if entry.outstanding <= 0 or (position and entry.position != position):
+            continue
+        memo_key = (key, plan, start)
+        schedule = memo.get(memo_key)
+        if schedule is None:
+            schedule = memo[memo_key] = amortize(entry, plan, start)
+        out.append(schedule)
+    return out
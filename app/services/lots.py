@@ -0,0 +1,433 @@
+"""Tax-lot engine: realized/unrealized P&L per asset under FIFO, LIFO, HIFO or average cost.
+
+Every buy opens a lot (quantity, cost basis incl. fees, acquisition day) in the
+wallet it lands in. Sells close lots of the wallet they leave (then of the
+asset's other wallets, if that one runs short) in the order of the chosen
+method; the realized gain of a sale is its net proceeds minus the cost basis
+of the closed lots. Quantity sold beyond all open lots is "uncovered" and
+carries no cost basis.
+
+Transfers move lots between wallets and keep their acquisition day. With a
+same-asset fee (feeCurrency=CRYPTO) the received lots shrink to the net
+quantity and keep the matching share of the cost basis, like the wallet
+holdings on the Crypto page. Incoming transfers from outside (no fromWallet)
+open zero-cost lots; outgoing ones (no toWallet) just close lots.
+
+Per (wallet, asset) the open lots are kept as parallel arrays plus a heap of
+lot indexes ordered by the method, so every close is O(log n).
+
+Amounts are fixed-point ints (app.services.money), in the base currency.
+"""
+
+from __future__ import annotations
+
+import heapq
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Callable
+
+from app.services.money import ONE, fdiv, fmul, fmul3, muldiv, to_fixed, to_float
+from app.services.portfolio_history import _crypto_symbol
+from app.services.price_history import get_daily_closes, yahoo_symbol
+from app.services.records import get_user_transactions
+from app.services.wallet_directory import WalletDirectory
+
+METHODS = ("fifo", "lifo", "hifo", "average")
+KINDS = {"crypto": "cryptos", "stock": "stocks"}
+
+_BOOK_TTL_SECONDS = 600
+_IDX_BITS = 32
+_IDX_MASK = (1 << _IDX_BITS) - 1
+
+# (userId, kind, method, base currency) -> {"ts", "version", "book"}
+_BOOK_CACHE: dict[tuple[str, str, str, str], dict] = {}
+
+
+def _day(tdate: str) -> int:
+    try:
+        return date.fromisoformat((tdate or "")[:10]).toordinal()
+    except Exception:
+        return 0
+
+
+class LotPool:
+    """Open lots of one asset in one wallet.
+
+    ``qty``/``cost`` are fixed-point ints (beyond int64 range, so plain lists);
+    ``day`` is an array of acquisition day ordinals. ``heap`` holds the open lot
+    indexes keyed by the method; closed lots stay in the arrays with qty 0.
+    """
+
+    __slots__ = ("method", "qty", "cost", "day", "heap", "open_qty", "open_cost")
+
+    def __init__(self, method: str):
+        self.method = method
+        self.qty: list[int] = []
+        self.cost: list[int] = []
+        self.day = array("l")
+        self.heap: list = []
+        self.open_qty = 0
+        self.open_cost = 0
+
+    def _key(self, i: int):
+        if self.method == "hifo":
+            return (-fdiv(self.cost[i], self.qty[i]), i)
+        key = (self.day[i] << _IDX_BITS) | i
+        return -key if self.method == "lifo" else key
+
+    def _index(self, key) -> int:
+        if self.method == "hifo":
+            return key[1]
+        return (-key if self.method == "lifo" else key) & _IDX_MASK
+
+    def add(self, qty: int, cost: int, day: int) -> None:
+        if qty <= 0:
+            return
+        self.open_qty += qty
+        self.open_cost += cost
+        if self.method == "average":
+            # One running lot; it is as old as the oldest quantity still held.
+            if self.qty and self.qty[0] > 0:
+                self.qty[0] += qty
+                self.cost[0] += cost
+                self.day[0] = min(self.day[0], day)
+                return
+            self.qty[:] = [qty]
+            self.cost[:] = [cost]
+            self.day = array("l", [day])
+            self.heap = [0]
+            return
+        i = len(self.qty)
+        self.qty.append(qty)
+        self.cost.append(cost)
+        self.day.append(day)
+        heapq.heappush(self.heap, self._key(i))
+
+    def close(self, qty: int) -> tuple[int, list[tuple[int, int, int]]]:
+        """Close up to ``qty`` in method order; returns (qty left over, [(qty, cost, day), ...])."""
+        pieces = []
+        heap = self.heap
+        while qty > 0 and heap:
+            i = self._index(heap[0])
+            lot_qty = self.qty[i]
+            if qty >= lot_qty:
+                take, take_cost = lot_qty, self.cost[i]
+                heapq.heappop(heap)
+                self.qty[i] = 0
+                self.cost[i] = 0
+            else:
+                # Partial close: the unit cost (and so the HIFO key) is unchanged.
+                take, take_cost = qty, muldiv(qty, self.cost[i], lot_qty)
+                self.qty[i] = lot_qty - take
+                self.cost[i] -= take_cost
+            qty -= take
+            self.open_qty -= take
+            self.open_cost -= take_cost
+            pieces.append((take, take_cost, self.day[i]))
+        return qty, pieces
+
+
+class Sale:
+    __slots__ = ("kind", "asset", "wallet", "tdate", "qty", "proceeds", "cost", "fee", "uncovered", "pieces")
+
+    def __init__(self, kind: str, asset: str, wallet: str, tdate: str, qty: int, proceeds: int, fee: int):
+        self.kind = kind
+        self.asset = asset
+        self.wallet = wallet
+        self.tdate = tdate
+        self.qty = qty
+        self.proceeds = proceeds  # net of fees
+        self.fee = fee
+        self.cost = 0
+        self.uncovered = 0
+        self.pieces: list[tuple[int, int, int]] = []
+
+    @property
+    def gain(self) -> int:
+        return self.proceeds - self.cost
+
+
+class AssetLots:
+    """Per-wallet lot pools plus realized totals of one asset."""
+
+    __slots__ = ("kind", "asset", "pools", "realized", "proceeds", "fees", "sold_qty")
+
+    def __init__(self, kind: str, asset: str):
+        self.kind = kind
+        self.asset = asset
+        self.pools: dict[str, LotPool] = {}
+        self.realized = 0
+        self.proceeds = 0
+        self.fees = 0
+        self.sold_qty = 0
+
+    def pool(self, wallet: str, method: str) -> LotPool:
+        p = self.pools.get(wallet)
+        if p is None:
+            p = self.pools[wallet] = LotPool(method)
+        return p
+
+    @property
+    def open_qty(self) -> int:
+        return sum(p.open_qty for p in self.pools.values())
+
+    @property
+    def open_cost(self) -> int:
+        return sum(p.open_cost for p in self.pools.values())
+
+
+class LotBook:
+    __slots__ = ("method", "base_currency", "assets", "sales")
+
+    def __init__(self, method: str, base_currency: str):
+        self.method = method
+        self.base_currency = base_currency
+        self.assets: dict[tuple[str, str], AssetLots] = {}
+        self.sales: list[Sale] = []
+
+
+def build_lot_book(
+    records,
+    kind: str,
+    method: str,
+    base_currency: str,
+    fx: Callable[[str, str], tuple[str, int]],
+    book: LotBook | None = None,
+) -> LotBook:
+    """Replay crypto or stock records (app.services.records) into lots.
+
+    ``fx(currency, default)`` returns (normalized currency, fixed-point rate to the base currency).
+    """
+    book = book or LotBook(method, base_currency)
+    by_name: dict[str, AssetLots] = {}
+    days: dict[str, int] = {}
+    for tx in sorted(records, key=lambda r: r.tdate):
+        name = tx.name if kind == "crypto" else tx.symbol
+        lots = by_name.get(name)
+        if lots is None:
+            asset = _crypto_symbol(name) if kind == "crypto" else name
+            lots = book.assets.get((kind, asset))
+            if lots is None:
+                lots = book.assets[(kind, asset)] = AssetLots(kind, asset)
+            by_name[name] = lots
+        day = days.get(tx.tdate)
+        if day is None:
+            day = days[tx.tdate] = _day(tx.tdate)
+        try:
+            _apply(book, lots, tx, day, method, base_currency, fx)
+        except Exception as e:
+            print(f"Error applying {kind} lot transaction {lots.asset}: {e} | Raw tx: {tx}")
+    return book
+
+
+def _apply(book: LotBook, lots: AssetLots, tx, day: int, method: str, base_currency: str, fx) -> None:
+    if tx.operation == "transfer":
+        fee_qty = tx.fee if tx.fee_currency == "CRYPTO" else 0
+        qty_net = max(0, tx.qty - fee_qty)
+        pieces = []
+        moved = 0
+        if tx.from_wallet:
+            _, pieces = lots.pool(tx.from_wallet, method).close(tx.qty)
+        if tx.to_wallet and qty_net > 0:
+            dest = lots.pool(tx.to_wallet, method)
+            for q, c, d in pieces:
+                q_net = muldiv(q, qty_net, tx.qty)
+                dest.add(q_net, muldiv(c, qty_net, tx.qty), d)
+                moved += q_net
+            # Whatever the source did not hold arrives without cost basis.
+            dest.add(qty_net - moved, 0, day)
+        return
+
+    tx_currency, rate = fx(tx.currency, base_currency)
+    if tx.fee_currency == "CRYPTO":
+        fee_base = fmul3(tx.fee, tx.price, rate)
+    else:
+        fee_base = fmul(tx.fee, fx(tx.fee_currency, tx_currency)[1])
+    value_base = fmul3(tx.qty, tx.price, rate)
+    lots.fees += fee_base
+
+    if tx.operation == "buy":
+        lots.pool(tx.to_wallet or tx.from_wallet, method).add(tx.qty, value_base + fee_base, day)
+    elif tx.operation == "sell":
+        wallet = tx.from_wallet or tx.to_wallet
+        sale = Sale(lots.kind, lots.asset, wallet, tx.tdate, tx.qty, value_base - fee_base, fee_base)
+        remaining, sale.pieces = lots.pool(wallet, method).close(tx.qty)
+        for other_wallet, other in lots.pools.items():
+            if remaining <= 0:
+                break
+            if other_wallet != wallet:
+                remaining, more = other.close(remaining)
+                sale.pieces.extend(more)
+        sale.cost = sum(c for _, c, _ in sale.pieces)
+        sale.uncovered = remaining
+        lots.realized += sale.gain
+        lots.proceeds += sale.proceeds
+        lots.sold_qty += tx.qty
+        book.sales.append(sale)
+
+
+def get_lot_book(
+    user_id: str,
+    kinds: tuple[str, ...],
+    method: str,
+    base_currency: str,
+    fx_by_kind: dict[str, Callable[[str, str], tuple[str, int]]],
+    *,
+    wallet_dir: WalletDirectory | None = None,
+    timeout: int = 12,
+) -> LotBook:
+    """The user's lots for ``kinds`` (crypto/stock), rebuilt when the records change or after _BOOK_TTL_SECONDS (FX).
+
+    ``fx_by_kind`` maps each kind to its fx lookup (stocks fold minor units such as GBX into the rate).
+    """
+    uid = (str(user_id) if user_id is not None else "").strip()
+    sets = [get_user_transactions(uid, KINDS[k], wallet_dir=wallet_dir, timeout=timeout) for k in kinds]
+    version = tuple(s.version for s in sets)
+    cache_key = (uid, ",".join(kinds), method, base_currency)
+    cached = _BOOK_CACHE.get(cache_key)
+    if cached and cached["version"] == version and time.time() - cached["ts"] < _BOOK_TTL_SECONDS:
+        return cached["book"]
+
+    book = LotBook(method, base_currency)
+    for kind, record_set in zip(kinds, sets):
+        build_lot_book(record_set.records, kind, method, base_currency, fx_by_kind[kind], book)
+    _BOOK_CACHE[cache_key] = {"ts": time.time(), "version": version, "book": book}
+    return book
+
+
+def latest_prices(assets: list[tuple[str, str]], base_currency: str) -> dict[tuple[str, str], int]:
+    """Latest daily close in the base currency per (kind, asset), from app.services.price_history."""
+    start = date.fromordinal(date.today().toordinal() - 7)
+    symbols = {key: yahoo_symbol(key[0], key[1]) for key in assets}
+    series = {}
+    if symbols:
+        unique = set(symbols.values())
+        with ThreadPoolExecutor(max_workers=min(8, len(unique))) as ex:
+            for sym, s in zip(unique, ex.map(lambda s: get_daily_closes(s, start), unique)):
+                series[sym] = s
+
+    fx_rates = {base_currency: ONE}
+    prices = {}
+    for key, sym in symbols.items():
+        s = series[sym]
+        close = s.latest()
+        if close is None:
+            continue
+        ccy = "USD" if key[0] == "crypto" else (s.currency or "USD")
+        price = to_fixed(close)
+        if ccy == "GBX":
+            price, ccy = price // 100, "GBP"
+        if ccy not in fx_rates:
+            rate = get_daily_closes(yahoo_symbol("fx", ccy + base_currency), start).latest()
+            fx_rates[ccy] = to_fixed(rate) if rate is not None else None
+        if fx_rates[ccy] is None:
+            continue
+        prices[key] = fmul(price, fx_rates[ccy])
+    return prices
+
+
+def _money(v: int) -> float:
+    return round(to_float(v), 2)
+
+
+def _day_iso(day: int) -> str:
+    return date.fromordinal(day).isoformat() if day > 0 else ""
+
+
+def pnl_summary(book: LotBook, prices: dict[tuple[str, str], int], *, year: int | None = None) -> dict:
+    """Per-asset realized/unrealized P&L plus the (optionally year-filtered) sales."""
+    assets = []
+    totals = {"realized": 0, "unrealized": 0, "costBasis": 0, "marketValue": 0}
+    for key, lots in book.assets.items():
+        qty = lots.open_qty
+        cost = lots.open_cost
+        if not qty and not lots.sold_qty:
+            continue
+        price = prices.get(key)
+        value = fmul(qty, price) if price is not None else None
+        unrealized = value - cost if value is not None else None
+        totals["realized"] += lots.realized
+        totals["costBasis"] += cost
+        if value is not None:
+            totals["marketValue"] += value
+            totals["unrealized"] += unrealized
+        assets.append(
+            {
+                "kind": lots.kind,
+                "asset": lots.asset,
+                "qty": to_float(qty),
+                "costBasis": _money(cost),
+                "avgCost": _money(fdiv(cost, qty)) if qty > 0 else None,
+                "price": _money(price) if price is not None else None,
+                "marketValue": _money(value) if value is not None else None,
+                "unrealized": _money(unrealized) if unrealized is not None else None,
+                "realized": _money(lots.realized),
+                "proceeds": _money(lots.proceeds),
+                "fees": _money(lots.fees),
+                "wallets": {w: to_float(p.open_qty) for w, p in lots.pools.items() if p.open_qty},
+                "lots": sum(1 for p in lots.pools.values() for q in p.qty if q > 0),
+            }
+        )
+    assets.sort(key=lambda a: (a["kind"], a["asset"]))
+
+    sales = []
+    for sale in book.sales:
+        if year is not None and sale.tdate[:4] != str(year):
+            continue
+        sales.append(
+            {
+                "kind": sale.kind,
+                "asset": sale.asset,
+                "wallet": sale.wallet,
+                "date": sale.tdate,
+                "qty": to_float(sale.qty),
+                "proceeds": _money(sale.proceeds),
+                "costBasis": _money(sale.cost),
+                "gain": _money(sale.gain),
+                "fee": _money(sale.fee),
+                "uncoveredQty": to_float(sale.uncovered),
+            }
+        )
+
+    return {
+        "method": book.method,
+        "baseCurrency": book.base_currency,
+        "year": year,
+        "assets": assets,
+        "sales": sales,
+        "totals": {k: _money(v) for k, v in totals.items()},
+    }
+
+
+def tax_report_rows(book: LotBook, year: int) -> list[dict]:
+    """One row per closed lot piece of the sales in ``year`` (for the CSV export)."""
+    rows = []
+    for sale in book.sales:
+        if sale.tdate[:4] != str(year):
+            continue
+        sold_day = _day(sale.tdate)
+        pieces = list(sale.pieces)
+        if sale.uncovered:
+            pieces.append((sale.uncovered, 0, 0))
+        for qty, cost, acquired in pieces:
+            # Proceeds are split across the closed lots by quantity.
+            proceeds = muldiv(sale.proceeds, qty, sale.qty) if sale.qty else 0
+            held_days = sold_day - acquired if acquired and sold_day else None
+            rows.append(
+                {
+                    "kind": sale.kind,
+                    "asset": sale.asset,
+                    "wallet": sale.wallet,
+                    "acquired": _day_iso(acquired),
+                    "sold": sale.tdate[:10],
+                    "quantity": f"{to_float(qty):.8f}",
+                    "proceeds": f"{to_float(proceeds):.2f}",
+                    "costBasis": f"{to_float(cost):.2f}",
+                    "gain": f"{to_float(proceeds - cost):.2f}",
+                    "holdingDays": "" if held_days is None else held_days,
+                    "term": "" if held_days is None else ("long" if held_days > 365 else "short"),
+                }
+            )
+    return rows
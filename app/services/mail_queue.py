@@ -0,0 +1,331 @@
+"""Outbound mail spool with a background SMTP sender (contact form).
+
+enqueue() writes the message to MAIL_SPOOL_DIR (default: <instance>/mail-spool)
+and returns immediately. The spool holds message contents and anything in it is
+sent through the SMTP account, so it must be private: the directory is created
+0o700 and refused unless this user owns it (see app.services.private_files), and
+entries are written 0o600. A daemon thread in each worker process delivers
+spooled messages:
+
+- one authenticated SMTP connection is kept open and reused between messages
+  (checked with NOOP, closed after MAIL_SMTP_IDLE_SECONDS without use)
+- a failed delivery is retried with exponential backoff (30s, 1m, 2m, ... up
+  to 1h); after MAIL_MAX_ATTEMPTS it is moved to <spool>/failed
+- a message is claimed by renaming its file, so several workers can share the
+  spool without sending twice; messages left over from a stopped process are
+  picked up again on the next start
+
+SMTP settings come from the environment, falling back to the project's .env
+file, which is re-parsed only when its mtime changes. For local testing point
+SMTP_HOST/SMTP_PORT at a stand-in server (e.g. ``python -m aiosmtpd -n -l
+localhost:1025`` with SMTP_USE_TLS=0 and no SMTP_USERNAME) and call
+deliver_due() to flush the spool synchronously.
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from dotenv import dotenv_values
+
+from app.services.private_files import instance_path, open_private, private_dir
+
+_ENV_FILE = Path(__file__).resolve().parents[2] / ".env"
+
+_RETRY_BASE_SECONDS = 30
+_RETRY_MAX_SECONDS = 3600
+_POLL_SECONDS = 30  # also picks up messages spooled by other processes
+_CLAIM_STALE_SECONDS = 600
+_SMTP_TIMEOUT_SECONDS = 20
+
+_LOCK = threading.Lock()
+_ENV_CACHE: dict = {"mtime": None, "values": {}}
+_WAKE = threading.Event()
+_WORKER: dict = {"thread": None}
+
+
+def _is_truthy(value: str | None) -> bool:
+    return str(value or "").strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+def _env_file_values() -> dict:
+    try:
+        mtime = os.stat(_ENV_FILE).st_mtime_ns
+    except OSError:
+        return {}
+    if _ENV_CACHE["mtime"] != mtime:
+        try:
+            values = dotenv_values(str(_ENV_FILE))
+        except Exception as e:
+            print(f"[mail] Could not read {_ENV_FILE}: {e}")
+            return _ENV_CACHE["values"]
+        with _LOCK:
+            _ENV_CACHE["values"] = values
+            _ENV_CACHE["mtime"] = mtime
+    return _ENV_CACHE["values"]
+
+
+def env_setting(name: str, default: str = "") -> str:
+    """Environment variable, else the value in .env (so edits apply without a restart)."""
+    val = os.getenv(name)
+    if val is None or str(val).strip() == "":
+        val = _env_file_values().get(name)
+    return str(val if val is not None else default).strip()
+
+
+def smtp_settings() -> dict:
+    host = env_setting("SMTP_HOST")
+    try:
+        port = int(env_setting("SMTP_PORT", "587") or "587")
+    except Exception:
+        port = 587
+    username = env_setting("SMTP_USERNAME")
+    password = env_setting("SMTP_PASSWORD")
+    # Gmail app passwords are often copied as 4-char groups with spaces.
+    # Normalize only for Gmail SMTP to avoid accidental auth failures.
+    if "gmail.com" in host.lower() and password:
+        password = password.replace(" ", "")
+    return {
+        "smtp_host": host,
+        "smtp_port": port,
+        "smtp_username": username,
+        "smtp_password": password,
+        "mail_from_email": env_setting("MAIL_FROM_EMAIL") or username,
+        "smtp_use_tls": _is_truthy(env_setting("SMTP_USE_TLS", "1")),
+        "smtp_use_ssl": _is_truthy(env_setting("SMTP_USE_SSL", "0")),
+    }
+
+
+def missing_smtp_settings(settings: dict) -> list[str]:
+    """Names of required settings that are empty (login is skipped when SMTP_USERNAME is unset)."""
+    missing = []
+    if not settings["smtp_host"]:
+        missing.append("SMTP_HOST")
+    if settings["smtp_username"] and not settings["smtp_password"]:
+        missing.append("SMTP_PASSWORD")
+    if not settings["mail_from_email"]:
+        missing.append("MAIL_FROM_EMAIL")
+    return missing
+
+
+def _int_setting(name: str, default: int) -> int:
+    try:
+        return max(1, int(env_setting(name, str(default)) or default))
+    except Exception:
+        return default
+
+
+def spool_dir() -> str:
+    """The spool directory, created if needed; raises PermissionError if it isn't private."""
+    return private_dir((os.getenv("MAIL_SPOOL_DIR") or "").strip() or instance_path("mail-spool"))
+
+
+def _write_entry(path: str, entry: dict) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open_private(tmp) as f:
+        json.dump(entry, f)
+    os.replace(tmp, path)
+
+
+def enqueue(msg) -> str:
+    """Spool an EmailMessage for delivery and wake the sender; returns the message id."""
+    root = spool_dir()
+    msg_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    entry = {"raw": msg.as_string(), "created": time.time(), "attempts": 0, "next_at": 0.0, "last_error": ""}
+    _write_entry(os.path.join(root, msg_id + ".json"), entry)
+    start_worker()
+    _WAKE.set()
+    return msg_id
+
+
+def pending_count() -> int:
+    root = spool_dir()
+    return len(glob.glob(os.path.join(root, "*.json"))) + len(glob.glob(os.path.join(root, "*.sending")))
+
+
+class _SmtpConnection:
+    """One SMTP session reused across messages while the settings stay the same."""
+
+    def __init__(self):
+        self.server = None
+        self.key = None
+        self.last_used = 0.0
+
+    def get(self, settings: dict):
+        key = tuple(sorted(settings.items()))
+        if self.server is not None and self.key == key:
+            try:
+                if self.server.noop()[0] == 250:
+                    return self.server
+            except Exception:
+                pass
+        self.close()
+        self.server = self._connect(settings)
+        self.key = key
+        return self.server
+
+    @staticmethod
+    def _connect(settings: dict):
+        import smtplib
+
+        host, port = settings["smtp_host"], settings["smtp_port"]
+        if settings["smtp_use_ssl"]:
+            server = smtplib.SMTP_SSL(host, port, timeout=_SMTP_TIMEOUT_SECONDS)
+        else:
+            server = smtplib.SMTP(host, port, timeout=_SMTP_TIMEOUT_SECONDS)
+        try:
+            if not settings["smtp_use_ssl"] and settings["smtp_use_tls"]:
+                server.starttls()
+            if settings["smtp_username"]:
+                server.login(settings["smtp_username"], settings["smtp_password"])
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def close_if_idle(self, idle_seconds: int) -> None:
+        if self.server is not None and time.time() - self.last_used >= idle_seconds:
+            self.close()
+
+    def close(self) -> None:
+        server, self.server, self.key = self.server, None, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+
+def _release_stale_claims(root: str) -> None:
+    for claim in glob.glob(os.path.join(root, "*.sending")):
+        try:
+            if time.time() - os.stat(claim).st_mtime >= _CLAIM_STALE_SECONDS:
+                os.replace(claim, claim.rsplit(".", 2)[0] + ".json")
+        except OSError:
+            pass
+
+
+def _remove_claim(claim: str) -> None:
+    try:
+        os.remove(claim)
+    except FileNotFoundError:
+        pass
+
+
+def _send_one(path: str, entry: dict, conn: _SmtpConnection, settings: dict) -> None:
+    from email import message_from_string
+    from email.policy import default as default_policy
+
+    claim = f"{path[:-5]}.{os.getpid()}.sending"
+    try:
+        os.rename(path, claim)
+    except OSError:
+        return  # claimed by another worker
+    try:
+        # rename keeps the old mtime; a retry that waited longer than _CLAIM_STALE_SECONDS
+        # must not look stale (and be released to another worker) while it is being sent.
+        os.utime(claim, None)
+    except OSError:
+        pass
+    try:
+        missing = missing_smtp_settings(settings)
+        if missing:
+            raise RuntimeError("SMTP is not configured. Missing: " + ", ".join(missing))
+        msg = message_from_string(entry["raw"], policy=default_policy)
+        try:
+            conn.get(settings).send_message(msg)
+        except Exception:
+            conn.close()
+            raise
+    except Exception as e:
+        entry["attempts"] = int(entry.get("attempts") or 0) + 1
+        entry["last_error"] = f"{type(e).__name__}: {e}"
+        if entry["attempts"] >= _int_setting("MAIL_MAX_ATTEMPTS", 10):
+            failed_dir = private_dir(os.path.join(os.path.dirname(path), "failed"))
+            _write_entry(os.path.join(failed_dir, os.path.basename(path)), entry)
+            print(f"[mail] Giving up on {os.path.basename(path)} after {entry['attempts']} attempts: {e}")
+        else:
+            delay = min(_RETRY_MAX_SECONDS, _RETRY_BASE_SECONDS * 2 ** (entry["attempts"] - 1))
+            entry["next_at"] = time.time() + delay
+            _write_entry(path, entry)
+            print(f"[mail] Delivery of {os.path.basename(path)} failed (attempt {entry['attempts']}), retrying in {delay}s: {e}")
+    else:
+        conn.last_used = time.time()
+    _remove_claim(claim)
+
+
+def deliver_due(conn: _SmtpConnection | None = None) -> float | None:
+    """Send every spooled message that is due; returns seconds until the next retry (None if none)."""
+    own_conn = conn is None
+    conn = conn or _SmtpConnection()
+    root = spool_dir()
+    next_wait = None
+    try:
+        _release_stale_claims(root)
+        settings = smtp_settings()
+        for path in sorted(glob.glob(os.path.join(root, "*.json"))):
+            try:
+                with open(path, "r") as f:
+                    entry = json.load(f)
+            except OSError:
+                continue  # claimed meanwhile
+            except Exception as e:
+                print(f"[mail] Skipping unreadable spool file {path}: {e}")
+                continue
+            wait = float(entry.get("next_at") or 0.0) - time.time()
+            if wait > 0:
+                next_wait = wait if next_wait is None else min(next_wait, wait)
+                continue
+            _send_one(path, entry, conn, settings)
+    finally:
+        if own_conn:
+            conn.close()
+    return next_wait
+
+
+def _run() -> None:
+    conn = _SmtpConnection()
+    while True:
+        _WAKE.clear()
+        try:
+            next_wait = deliver_due(conn)
+        except Exception as e:
+            print(f"[mail] Spool pass failed: {e}")
+            next_wait = None
+        idle = _int_setting("MAIL_SMTP_IDLE_SECONDS", 60)
+        conn.close_if_idle(idle)
+        timeout = _POLL_SECONDS if next_wait is None else min(_POLL_SECONDS, next_wait)
+        if conn.server is not None:
+            timeout = min(timeout, idle)
+        _WAKE.wait(timeout=max(0.5, timeout))
+
+
+def start_worker() -> None:
+    with _LOCK:
+        thread = _WORKER["thread"]
+        if thread is not None and thread.is_alive():
+            return
+        thread = threading.Thread(target=_run, name="mail-sender", daemon=True)
+        _WORKER["thread"] = thread
+    thread.start()
+
+
+def init_mail_queue(app) -> None:
+    """Resume delivery of messages spooled before this process started."""
+    try:
+        pending = pending_count()
+    except OSError as e:
+        print(f"[mail] Spool unavailable, contact mail will not be sent: {e}")
+        return
+    if pending:
+        start_worker()
@@ -0,0 +1,91 @@
+"""Fixed-point money/quantity values for the ledger loops.
+
+Amounts are plain ints scaled by SCALE (18 decimal places): additions and
+comparisons are int operations, and products/quotients round once, half up.
+Parsing goes through small LRU caches because the same strings (prices,
+fees, FX rates) repeat across thousands of rows.
+
+Convert back with to_decimal()/to_float() at the edges (JSON, templates).
+"""
+
+from __future__ import annotations
+
+from decimal import Decimal
+from functools import lru_cache
+
+SCALE_DIGITS = 18
+SCALE = 10**SCALE_DIGITS
+_HALF = SCALE // 2
+_SCALE_SQ = SCALE * SCALE
+_HALF_SQ = _SCALE_SQ // 2
+
+ZERO = 0
+ONE = SCALE
+
+
+@lru_cache(maxsize=65536)
+def _parse_str(s: str) -> int:
+    s = s.strip().replace(",", ".")
+    if not s:
+        return 0
+    try:
+        return int(Decimal(s).scaleb(SCALE_DIGITS).to_integral_value())
+    except Exception:
+        return 0
+
+
+@lru_cache(maxsize=4096)
+def from_decimal(val: Decimal) -> int:
+    """Fixed-point value of a Decimal (e.g. an FX rate)."""
+    try:
+        return int(val.scaleb(SCALE_DIGITS).to_integral_value())
+    except Exception:
+        return 0
+
+
+def to_fixed(val) -> int:
+    """Parse an API value (str/number/None) like the routes' _to_decimal helpers; blanks and junk are 0."""
+    if type(val) is str:
+        return _parse_str(val)
+    if val is None:
+        return 0
+    if isinstance(val, Decimal):
+        return from_decimal(val)
+    if isinstance(val, int) and not isinstance(val, bool):
+        return val * SCALE
+    return _parse_str(str(val))
+
+
+def fmul(a: int, b: int) -> int:
+    return (a * b + _HALF) // SCALE
+
+
+def fmul3(a: int, b: int, c: int) -> int:
+    """a * b * c with a single rounding step."""
+    return (a * b * c + _HALF_SQ) // _SCALE_SQ
+
+
+def fdiv(a: int, b: int) -> int:
+    if not b:
+        return 0
+    if b < 0:
+        a, b = -a, -b
+    return (a * SCALE + b // 2) // b
+
+
+def muldiv(a: int, b: int, c: int) -> int:
+    """a * b / c with a single rounding step (0 when c is 0)."""
+    if not c:
+        return 0
+    if c < 0:
+        a, c = -a, -c
+    return (a * b + c // 2) // c
+
+
+def to_decimal(val: int) -> Decimal:
+    return Decimal(val).scaleb(-SCALE_DIGITS)
+
+
+def to_float(val: int) -> float:
+    # int / int true division is correctly rounded.
+    return val / SCALE
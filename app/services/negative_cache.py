@@ -0,0 +1,176 @@
+"""Negative cache for market-data lookups that found nothing or failed.
+
+A symbol a provider doesn't know (typos such as "BITCOIN" stored as a crypto
+name) or whose lookup failed is remembered per (provider, symbol) and skipped
+until its retry time. The delay starts at NEGATIVE_CACHE_TTL_SECONDS (default
+15 min) for unknown symbols and NEGATIVE_CACHE_ERROR_TTL_SECONDS (default 60s)
+for errors, doubles with every consecutive failure and is capped at
+NEGATIVE_CACHE_MAX_SECONDS (default 1 day). A successful lookup clears the
+entry.
+
+Entries are kept in a small SQLite store (LOOKUP_FAILURES_DB, default:
+<tempdir>/wallet-front-lookup-failures.sqlite3) shared by all workers, so the
+admin view can list persistently failing symbols. Each worker reads it through
+an in-memory copy refreshed every few seconds; lookups on the hot path never
+touch the disk.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+_REFRESH_SECONDS = 15
+
+_LOCK = threading.Lock()
+# (provider, symbol) -> row dict; mirror of the SQLite table
+_ENTRIES: dict[tuple[str, str], dict] = {}
+_STATE = {"loaded_ts": 0.0}
+_SCHEMA_READY: set[str] = set()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lookup_failures (
+    provider TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    failures INTEGER NOT NULL,
+    first_ts REAL NOT NULL,
+    last_ts REAL NOT NULL,
+    retry_at REAL NOT NULL,
+    reason TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (provider, symbol)
+) WITHOUT ROWID;
+"""
+_COLUMNS = ("provider", "symbol", "kind", "failures", "first_ts", "last_ts", "retry_at", "reason")
+
+
+def _seconds_env(name: str, default: int) -> int:
+    try:
+        return max(1, int((os.getenv(name) or str(default)).strip()))
+    except Exception:
+        return default
+
+
+def _db_path() -> str:
+    return (os.getenv("LOOKUP_FAILURES_DB") or "").strip() or os.path.join(
+        tempfile.gettempdir(), "wallet-front-lookup-failures.sqlite3"
+    )
+
+
+@contextmanager
+def _db():
+    path = _db_path()
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        if path not in _SCHEMA_READY:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            _SCHEMA_READY.add(path)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _refresh(force: bool = False) -> None:
+    if not force and time.time() - _STATE["loaded_ts"] < _REFRESH_SECONDS:
+        return
+    try:
+        with _db() as conn:
+            rows = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM lookup_failures").fetchall()
+    except Exception as e:
+        print(f"[negative cache] Could not read failures: {e}")
+        rows = None
+    with _LOCK:
+        _STATE["loaded_ts"] = time.time()
+        if rows is not None:
+            _ENTRIES.clear()
+            for row in rows:
+                entry = dict(zip(_COLUMNS, row))
+                _ENTRIES[(entry["provider"], entry["symbol"])] = entry
+
+
+def blocked(provider: str, symbols) -> set[str]:
+    """The symbols (uppercased) whose lookup at ``provider`` is in back-off right now."""
+    _refresh()
+    now = time.time()
+    out = set()
+    with _LOCK:
+        for sym in symbols:
+            key = (provider, str(sym or "").strip().upper())
+            entry = _ENTRIES.get(key)
+            if entry and entry["retry_at"] > now:
+                out.add(key[1])
+    return out
+
+
+def record_failure(provider: str, symbol: str, reason: str = "", *, transient: bool = False) -> float:
+    """Remember a lookup that found nothing (or failed, if ``transient``); returns the back-off in seconds."""
+    sym = str(symbol or "").strip().upper()
+    if not sym:
+        return 0.0
+    kind = "error" if transient else "unknown"
+    base = _seconds_env("NEGATIVE_CACHE_ERROR_TTL_SECONDS", 60) if transient else _seconds_env("NEGATIVE_CACHE_TTL_SECONDS", 900)
+    now = time.time()
+    with _LOCK:
+        previous = _ENTRIES.get((provider, sym))
+    failures = int(previous["failures"]) + 1 if previous else 1
+    delay = min(_seconds_env("NEGATIVE_CACHE_MAX_SECONDS", 86400), base * 2 ** min(failures - 1, 20))
+    entry = {
+        "provider": provider,
+        "symbol": sym,
+        "kind": kind,
+        "failures": failures,
+        "first_ts": previous["first_ts"] if previous else now,
+        "last_ts": now,
+        "retry_at": now + delay,
+        "reason": str(reason or "")[:300],
+    }
+    with _LOCK:
+        _ENTRIES[(provider, sym)] = entry
+    try:
+        with _db() as conn:
+            # Another worker may have counted failures meanwhile; keep the higher count.
+            conn.execute(
+                f"""
+                INSERT INTO lookup_failures ({', '.join(_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(provider, symbol) DO UPDATE SET
+                    kind = excluded.kind,
+                    failures = MAX(lookup_failures.failures + 1, excluded.failures),
+                    last_ts = excluded.last_ts,
+                    retry_at = excluded.retry_at,
+                    reason = excluded.reason
+                """,
+                tuple(entry[c] for c in _COLUMNS),
+            )
+    except Exception as e:
+        print(f"[negative cache] Could not record failure for {provider}:{sym}: {e}")
+    return float(delay)
+
+
+def record_success(provider: str, symbols) -> None:
+    """Clear the entries of symbols that were just looked up successfully."""
+    with _LOCK:
+        keys = [(provider, s) for s in (str(x or "").strip().upper() for x in symbols) if (provider, s) in _ENTRIES]
+        for key in keys:
+            _ENTRIES.pop(key, None)
+    if not keys:
+        return
+    try:
+        with _db() as conn:
+            conn.executemany("DELETE FROM lookup_failures WHERE provider = ? AND symbol = ?", keys)
+    except Exception as e:
+        print(f"[negative cache] Could not clear failures: {e}")
+
+
+def failing_symbols(min_failures: int = 1) -> list[dict]:
+    """All entries with at least ``min_failures`` consecutive failures, most failures first."""
+    _refresh(force=True)
+    with _LOCK:
+        rows = [dict(e) for e in _ENTRIES.values() if int(e["failures"]) >= min_failures]
+    rows.sort(key=lambda e: (-int(e["failures"]), e["provider"], e["symbol"]))
+    return rows
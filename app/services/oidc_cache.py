@@ -0,0 +1,161 @@
+"""On-disk cache of the OIDC discovery document and JWKS (Cognito).
+
+A fresh worker used to download both on its first login. They rarely change,
+so they are kept in OIDC_CACHE_DIR (default: <instance>/oidc-cache, a private
+directory; see app.services.private_files) and shared by all workers:
+
+- entries younger than OIDC_CACHE_REFRESH_SECONDS (default 12h) are used as is
+- older entries are still used, and a background thread refreshes them
+- when no entry exists (or the network fails without one) the fetch is synchronous
+
+Signing-key rotation: when an ID token names a key id that the cached JWKS
+doesn't have, jwks(force=True) refetches it right away (at most once per
+_FORCE_MIN_INTERVAL_SECONDS so forged kids can't be used to hammer Cognito).
+
+Metadata whose issuer or jwks_uri is on another host than the metadata URL is
+never used: a tampered entry is refetched, and a bad live document is an error.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from app.services.private_files import instance_path, open_private, private_dir
+
+_FETCH_TIMEOUT_SECONDS = 10
+_FORCE_MIN_INTERVAL_SECONDS = 60
+
+_LOCK = threading.Lock()
+# url -> {"ts": fetched at, "data": dict}
+_MEMORY: dict[str, dict] = {}
+_REFRESHING: set[str] = set()
+_LAST_FORCED: dict[str, float] = {}
+
+
+def _refresh_seconds() -> int:
+    try:
+        return max(60, int((os.getenv("OIDC_CACHE_REFRESH_SECONDS") or "43200").strip()))
+    except Exception:
+        return 43200
+
+
+def _cache_path(url: str) -> str:
+    root = private_dir((os.getenv("OIDC_CACHE_DIR") or "").strip() or instance_path("oidc-cache"))
+    return os.path.join(root, hashlib.sha1(url.encode("utf-8")).hexdigest()[:20] + ".json")
+
+
+def _read_disk(url: str) -> dict | None:
+    try:
+        with open(_cache_path(url), "r") as f:
+            entry = json.load(f)
+        if isinstance(entry, dict) and isinstance(entry.get("data"), dict):
+            return entry
+    except PermissionError as e:
+        print(f"[oidc cache] Not using the cache for {url}: {e}")
+    except OSError:
+        pass
+    except Exception as e:
+        print(f"[oidc cache] Ignoring unreadable cache entry for {url}: {e}")
+    return None
+
+
+def _fetch(url: str) -> dict:
+    r = requests.get(url, headers={"Accept": "application/json"}, timeout=_FETCH_TIMEOUT_SECONDS)
+    r.raise_for_status()
+    data = r.json()
+    if not isinstance(data, dict):
+        raise ValueError("unexpected response")
+    entry = {"ts": time.time(), "data": data}
+    try:
+        path = _cache_path(url)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open_private(tmp) as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f"[oidc cache] Could not write cache entry for {url}: {e}")
+    with _LOCK:
+        _MEMORY[url] = entry
+    return entry
+
+
+def _refresh_in_background(url: str) -> None:
+    with _LOCK:
+        if url in _REFRESHING:
+            return
+        _REFRESHING.add(url)
+
+    def run():
+        try:
+            _fetch(url)
+        except Exception as e:
+            print(f"[oidc cache] Background refresh of {url} failed: {e}")
+        finally:
+            with _LOCK:
+                _REFRESHING.discard(url)
+
+    threading.Thread(target=run, name="oidc-cache-refresh", daemon=True).start()
+
+
+def cached_json(url: str, *, force: bool = False) -> dict:
+    """JSON document at ``url`` from memory/disk, refreshed in the background once stale."""
+    if force:
+        with _LOCK:
+            last = _LAST_FORCED.get(url, 0.0)
+            allowed = time.time() - last >= _FORCE_MIN_INTERVAL_SECONDS
+            if allowed:
+                _LAST_FORCED[url] = time.time()
+        if allowed:
+            try:
+                return _fetch(url)["data"]
+            except Exception as e:
+                print(f"[oidc cache] Forced refresh of {url} failed: {e}")
+
+    entry = _MEMORY.get(url)
+    if entry is None:
+        entry = _read_disk(url)
+        if entry is not None:
+            with _LOCK:
+                # Another worker may have refreshed the file; keep the newer copy.
+                current = _MEMORY.get(url)
+                if current is None or current["ts"] < entry["ts"]:
+                    _MEMORY[url] = entry
+                entry = _MEMORY[url]
+    if entry is None:
+        return _fetch(url)["data"]
+    if time.time() - float(entry.get("ts") or 0.0) >= _refresh_seconds():
+        _refresh_in_background(url)
+    return entry["data"]
+
+
+def _same_host(metadata_url: str, data: dict) -> bool:
+    host = urlsplit(metadata_url).hostname
+    return all(urlsplit(str(data.get(k) or "")).hostname == host for k in ("issuer", "jwks_uri"))
+
+
+def server_metadata(metadata_url: str) -> dict:
+    """The provider's discovery document (/.well-known/openid-configuration)."""
+    data = cached_json(metadata_url)
+    if not _same_host(metadata_url, data):
+        print(f"[oidc cache] Cached metadata for {metadata_url} points at another host; refetching")
+        with _LOCK:
+            _MEMORY.pop(metadata_url, None)
+        data = _fetch(metadata_url)["data"]
+        if not _same_host(metadata_url, data):
+            raise ValueError("OIDC metadata issuer/jwks_uri is not on the metadata URL's host")
+    return data
+
+
+def jwks(metadata_url: str, *, force: bool = False) -> dict:
+    """The provider's signing keys; ``force`` refetches them (key rotation)."""
+    uri = server_metadata(metadata_url).get("jwks_uri")
+    if not uri:
+        raise ValueError("OIDC metadata has no jwks_uri")
+    return cached_json(uri, force=force)
@@ -0,0 +1,160 @@
+"""Pre-serialised, gzip-compressed JSON payloads, kept in memory and on disk.
+
+Expensive API payloads (the Overview's /api/dashboard-data) are stored once as
+compressed JSON bytes under a caller-chosen key, e.g. (userId, base currency,
+data version). Every worker can serve them without recomputing or
+re-serialising, and they survive restarts. Each payload carries a strong ETag
+(digest of the JSON bytes, suffixed per content coding since the gzip, br and
+identity bodies are different representations), so a client that already has
+any of them gets a 304.
+
+Files live in PAYLOAD_CACHE_DIR (default: <instance>/payloads), named by a
+per-user digest so a user's payloads can be dropped together. They hold users'
+finances and are served as found, so the directory must be private (0o700,
+owned by this user; see app.services.private_files) and files are 0o600.
+"""
+
+from __future__ import annotations
+
+import glob
+import gzip
+import hashlib
+import os
+import time
+
+from flask import Response, request
+
+from app.services.compression import compress, negotiate_encoding
+from app.services.private_files import instance_path, open_private, private_dir
+
+_GZIP_LEVEL = 6
+
+# (namespace, userId) -> {key digest: Payload}
+_MEMORY: dict[tuple[str, str], dict[str, Payload]] = {}
+
+
+class Payload:
+    __slots__ = ("etag", "gz", "ts", "_encoded")
+
+    def __init__(self, etag: str, gz: bytes, ts: float):
+        self.etag = etag
+        self.gz = gz
+        self.ts = ts
+        self._encoded: dict[str, bytes] = {"gzip": gz}
+
+    def body(self) -> bytes:
+        return gzip.decompress(self.gz)
+
+    def encoded(self, encoding: str) -> bytes:
+        """Body in a content coding; other codings than gzip are compressed once and kept."""
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = compress(self.body(), encoding)
+        return data
+
+
+def _cache_dir() -> str:
+    return private_dir((os.getenv("PAYLOAD_CACHE_DIR") or "").strip() or instance_path("payloads"))
+
+
+def _digest(val: str, n: int = 20) -> str:
+    return hashlib.sha1(val.encode("utf-8")).hexdigest()[:n]
+
+
+def _path(namespace: str, user_id: str, key_digest: str) -> str:
+    return os.path.join(_cache_dir(), f"{namespace}.{_digest(user_id)}.{key_digest}.gz")
+
+
+def get_payload(namespace: str, user_id: str, key: tuple, max_age_seconds: float) -> Payload | None:
+    """Stored payload for ``key`` if younger than ``max_age_seconds`` (memory first, then disk)."""
+    uid = str(user_id or "").strip()
+    key_digest = _digest(repr(key))
+    now = time.time()
+    payload = _MEMORY.get((namespace, uid), {}).get(key_digest)
+    if payload is not None:
+        return payload if now - payload.ts < max_age_seconds else None
+
+    try:
+        path = _path(namespace, uid, key_digest)
+    except OSError as e:
+        print(f"[payload cache] Cache directory unavailable: {e}")
+        return None
+    try:
+        ts = os.stat(path).st_mtime
+        if now - ts >= max_age_seconds:
+            return None
+        with open(path, "rb") as f:
+            etag = f.readline().strip().decode("ascii")
+            gz = f.read()
+    except OSError:
+        return None
+    except Exception as e:
+        print(f"[payload cache] Could not read {path}: {e}")
+        return None
+    payload = Payload(etag, gz, ts)
+    _MEMORY.setdefault((namespace, uid), {})[key_digest] = payload
+    return payload
+
+
+def put_payload(namespace: str, user_id: str, key: tuple, body: bytes) -> Payload:
+    """Compress and store serialised JSON ``body``; older payloads of the user are replaced."""
+    uid = str(user_id or "").strip()
+    key_digest = _digest(repr(key))
+    payload = Payload(hashlib.sha256(body).hexdigest()[:32], gzip.compress(body, _GZIP_LEVEL, mtime=0), time.time())
+    drop_payloads(namespace, uid)
+    _MEMORY[(namespace, uid)] = {key_digest: payload}
+
+    try:
+        path = _path(namespace, uid, key_digest)
+    except OSError as e:
+        print(f"[payload cache] Cache directory unavailable: {e}")
+        return payload
+    try:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open_private(tmp, "wb") as f:
+            f.write(payload.etag.encode("ascii") + b"\n")
+            f.write(payload.gz)
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f"[payload cache] Could not write {path}: {e}")
+    return payload
+
+
+def drop_payloads(namespace: str, user_id: str, *, disk: bool = True) -> None:
+    """Forget every stored payload of the user in ``namespace`` (memory, and with ``disk`` the files too)."""
+    uid = str(user_id or "").strip()
+    _MEMORY.pop((namespace, uid), None)
+    if not disk:
+        return
+    try:
+        paths = glob.glob(os.path.join(_cache_dir(), f"{namespace}.{_digest(uid)}.*.gz"))
+    except OSError as e:
+        print(f"[payload cache] Could not drop stored payloads: {e}")
+        return
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _coded_etag(etag: str, encoding: str | None) -> str:
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def payload_response(payload: Payload) -> Response:
+    """200 with the stored bytes (in the best accepted coding) or 304 when If-None-Match has the ETag."""
+    encoding = negotiate_encoding(request.accept_encodings)
+    # Every coding decodes to the same JSON, so any of their ETags revalidates.
+    if any(request.if_none_match.contains(_coded_etag(payload.etag, c)) for c in (None, "gzip", "br")):
+        resp = Response(status=304)
+    elif encoding is not None:
+        resp = Response(payload.encoded(encoding), mimetype="application/json")
+        resp.headers["Content-Encoding"] = encoding
+    else:
+        resp = Response(payload.body(), mimetype="application/json")
+    resp.set_etag(_coded_etag(payload.etag, encoding))
+    resp.headers["Cache-Control"] = "private, no-cache"
+    resp.vary.add("Accept-Encoding")
+    resp.vary.add("Cookie")
+    return resp
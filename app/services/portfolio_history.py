@@ -0,0 +1,336 @@
+"""Daily portfolio quantity series and their valuation over time.
+
+The ledgers are replayed into per-asset daily quantity arrays:
+
+- ("crypto", SYMBOL): portfolio quantity (same deltas as the Crypto page ledger)
+- ("stock", SYMBOL): portfolio quantity (buys/sells; transfers move between own wallets)
+- ("cash", walletId, CCY): cash per wallet, in the currency the money moved in
+
+Each array holds one cumulative value per calendar day from the first
+transaction day on. Series are kept per user and extended incrementally:
+new days are appended, and when the records change only the days from the
+first changed day on are recomputed.
+
+Values are computed for the (downsampled) requested days only, by joining the
+quantities with app.services.price_history daily closes and FX series.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from array import array
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from app.services.money import fmul, to_fixed, to_float
+from app.services.price_history import get_daily_closes, yahoo_symbol
+from app.services.records import RecordSet, get_user_transactions
+from app.services.wallet_directory import WalletDirectory, get_wallet_directory
+
+LEDGER_RESOURCES = ("cryptos", "stocks", "transactions", "loans")
+RANGES = {"1M": 30, "3M": 91, "6M": 182, "1Y": 365, "ALL": None}
+MAX_POINTS = 120
+_RESULT_TTL_SECONDS = 600
+_GBX_FACTOR = to_fixed("0.01")
+
+_LOCK = threading.Lock()
+# userId -> UserHistory
+_HISTORY_CACHE: dict[str, UserHistory] = {}
+# (userId, range, base currency) -> {"ts", "key", "data"}
+_RESULT_CACHE: dict[tuple[str, str, str], dict] = {}
+
+
+class UserHistory:
+    __slots__ = ("version", "deltas", "first", "last", "qty")
+
+    def __init__(self):
+        self.version: tuple = ()
+        # asset key -> {day ordinal: quantity delta}
+        self.deltas: dict[tuple, dict[int, float]] = {}
+        self.first = 0
+        self.last = -1
+        # asset key -> cumulative quantity per day, index 0 == self.first
+        self.qty: dict[tuple, array] = {}
+
+    def quantity_on(self, key: tuple, day: int) -> float:
+        arr = self.qty.get(key)
+        if not arr or day < self.first:
+            return 0.0
+        return arr[min(day - self.first, len(arr) - 1)]
+
+
+def _day(tdate: str) -> int | None:
+    try:
+        return date.fromisoformat((tdate or "")[:10]).toordinal()
+    except Exception:
+        return None
+
+
+def _crypto_symbol(name) -> str:
+    """Ticker from stored cryptoName values like 'BTC - Bitcoin' (same key as the Crypto page holdings)."""
+    s = (str(name) if name is not None else "").strip()
+    if " - " in s:
+        s = s.split(" - ", 1)[0].strip()
+    s = " ".join(s.replace("(", " ").replace(")", " ").split())
+    return s.upper() or "UNKNOWN"
+
+
+def _major(amount: int, ccy: str) -> tuple[int, str]:
+    if ccy == "GBX":
+        return fmul(amount, _GBX_FACTOR), "GBP"
+    return amount, ccy
+
+
+def _ledger_deltas(sets: dict[str, RecordSet], wallet_dir: WalletDirectory, base_currency: str) -> dict:
+    """Replay the ledgers into {asset key: {day: quantity delta}}."""
+    deltas: dict[tuple, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def cash(wallet: str, ccy: str, day: int, amount: int) -> None:
+        if wallet and amount:
+            amount, ccy = _major(amount, ccy)
+            deltas[("cash", wallet, ccy)][day] += amount
+
+    for tx in sets["cryptos"]:
+        day = _day(tx.tdate)
+        if day is None:
+            continue
+        key = ("crypto", _crypto_symbol(tx.name))
+        if tx.operation == "transfer":
+            fee_qty = tx.fee if tx.fee_currency == "CRYPTO" else 0
+            qty_in = max(0, tx.qty - fee_qty) if tx.to_wallet else 0
+            qty_out = tx.qty if tx.from_wallet else 0
+            deltas[key][day] += qty_in - qty_out
+            continue
+        ccy = tx.currency or base_currency
+        gross = fmul(tx.qty, tx.price)
+        fee_ccy = ccy if tx.fee_currency == "CRYPTO" else (tx.fee_currency or ccy)
+        fee = fmul(tx.fee, tx.price) if tx.fee_currency == "CRYPTO" else tx.fee
+        if tx.operation == "buy":
+            deltas[key][day] += tx.qty
+            cash(tx.from_wallet, ccy, day, -gross)
+            cash(tx.from_wallet, fee_ccy, day, -fee)
+        elif tx.operation == "sell":
+            deltas[key][day] -= tx.qty
+            cash(tx.to_wallet, ccy, day, gross)
+            cash(tx.to_wallet, fee_ccy, day, -fee)
+
+    for tx in sets["stocks"]:
+        day = _day(tx.tdate)
+        if day is None:
+            continue
+        key = ("stock", tx.symbol)
+        ccy = tx.currency or base_currency
+        fee_ccy = tx.fee_currency or ccy
+        gross = fmul(tx.qty, tx.price)
+        if tx.operation == "buy":
+            deltas[key][day] += tx.qty
+            cash(tx.from_wallet, ccy, day, -gross)
+            cash(tx.from_wallet, fee_ccy, day, -tx.fee)
+        elif tx.operation == "sell":
+            deltas[key][day] -= tx.qty
+            cash(tx.to_wallet, ccy, day, gross)
+            cash(tx.to_wallet, fee_ccy, day, -tx.fee)
+
+    for tx in sets["transactions"]:
+        day = _day(tx.tdate)
+        if day is None:
+            continue
+        ccy = tx.currency or base_currency
+        ttype = tx.trans_type
+        if ttype == "fx transfer":
+            cash(tx.from_wallet, wallet_dir.currency(tx.from_wallet, ccy), day, -(tx.amount + tx.fee))
+            cash(tx.to_wallet, wallet_dir.currency(tx.to_wallet, ccy), day, tx.received_amount)
+        elif ttype == "income":
+            cash(tx.to_wallet, ccy, day, tx.amount)
+        elif ttype == "expense":
+            cash(tx.from_wallet, ccy, day, -(tx.amount + tx.fee))
+        elif ttype == "transfer" or (tx.from_wallet and tx.to_wallet):
+            cash(tx.from_wallet, ccy, day, -(tx.amount + tx.fee))
+            cash(tx.to_wallet, ccy, day, tx.amount)
+        else:
+            cash(tx.to_wallet, ccy, day, tx.amount)
+            cash(tx.from_wallet, ccy, day, -tx.amount)
+
+    for tx in sets["loans"]:
+        day = _day(tx.tdate)
+        if day is None:
+            continue
+        ccy = tx.currency or base_currency
+        borrowing = tx.type in ("borrow", "loan")
+        if (tx.action == "new") == borrowing:
+            inflow, outflow = tx.to_wallet, ""
+        else:
+            inflow, outflow = "", tx.from_wallet
+        cash(inflow, ccy, day, tx.amount)
+        cash(outflow, ccy, day, -tx.amount)
+        cash(outflow or inflow, ccy, day, -tx.fee)
+
+    out = {}
+    for key, per_day in deltas.items():
+        per_day = {d: to_float(v) for d, v in per_day.items() if v}
+        if per_day:
+            out[key] = per_day
+    return out
+
+
+def _first_changed_day(old: dict, new: dict) -> int | None:
+    changed = None
+    for key in old.keys() | new.keys():
+        a = old.get(key) or {}
+        b = new.get(key) or {}
+        if a == b:
+            continue
+        for day in a.keys() | b.keys():
+            if a.get(day) != b.get(day) and (changed is None or day < changed):
+                changed = day
+    return changed
+
+
+def _extend(hist: UserHistory, end_day: int) -> None:
+    for key, per_day in hist.deltas.items():
+        arr = hist.qty.get(key)
+        if arr is None:
+            arr = hist.qty[key] = array("d")
+        cum = arr[-1] if arr else 0.0
+        for day in range(hist.first + len(arr), end_day + 1):
+            cum += per_day.get(day, 0.0)
+            arr.append(cum)
+    hist.last = end_day
+
+
+def get_user_history(user_id: str, base_currency: str, *, today: date | None = None) -> UserHistory:
+    """Return the user's daily quantity series, updated incrementally up to ``today``."""
+    uid = (str(user_id) if user_id is not None else "").strip()
+    end_day = (today or date.today()).toordinal()
+    wallet_dir = get_wallet_directory(uid)
+    sets = {res: get_user_transactions(uid, res, wallet_dir=wallet_dir) for res in LEDGER_RESOURCES}
+    version = tuple(sets[res].version for res in LEDGER_RESOURCES) + (base_currency,)
+
+    with _LOCK:
+        hist = _HISTORY_CACHE.get(uid)
+    if hist is None or hist.version != version:
+        deltas = _ledger_deltas(sets, wallet_dir, base_currency)
+        first = min((min(per_day) for per_day in deltas.values()), default=end_day)
+        if hist is None or first < hist.first:
+            hist = UserHistory()
+            hist.first = first
+        else:
+            # Keep the days before the first changed one; recompute from there on.
+            changed = _first_changed_day(hist.deltas, deltas)
+            if changed is not None:
+                keep = max(0, changed - hist.first)
+                for key in list(hist.qty):
+                    if key in deltas:
+                        del hist.qty[key][keep:]
+                    else:
+                        del hist.qty[key]
+        hist.deltas = deltas
+        hist.version = version
+        _extend(hist, end_day)
+    elif hist.last < end_day:
+        _extend(hist, end_day)
+
+    with _LOCK:
+        _HISTORY_CACHE[uid] = hist
+    return hist
+
+
+def _sample_days(first: int, last: int, range_key: str) -> list[int]:
+    span_days = RANGES.get(range_key)
+    start = first if span_days is None else max(first, last - span_days + 1)
+    step = max(1, -(-(last - start + 1) // MAX_POINTS))
+    days = list(range(last, start - 1, -step))
+    days.reverse()
+    return days
+
+
+def portfolio_history(user_id: str, base_currency: str, range_key: str = "1Y") -> dict:
+    """Portfolio value in ``base_currency`` for the requested range (see RANGES), downsampled to MAX_POINTS."""
+    base = (base_currency or "EUR").strip().upper() or "EUR"
+    hist = get_user_history(user_id, base)
+    cache_key = (str(user_id or "").strip(), range_key, base)
+    stamp = (hist.version, hist.last)
+    cached = _RESULT_CACHE.get(cache_key)
+    if cached and cached["key"] == stamp and time.time() - cached["ts"] < _RESULT_TTL_SECONDS:
+        return cached["data"]
+
+    if not hist.deltas:
+        data = {"range": range_key, "baseCurrency": base, "points": [], "missing": []}
+        _RESULT_CACHE[cache_key] = {"ts": time.time(), "key": stamp, "data": data}
+        return data
+
+    days = _sample_days(hist.first, hist.last, range_key)
+    start = date.fromordinal(days[0])
+
+    # Price (and FX) series needed for the sampled range, fetched in parallel.
+    price_symbols: dict[tuple, str] = {}
+    for key in hist.qty:
+        if any(hist.quantity_on(key, d) for d in days):
+            if key[0] == "crypto":
+                price_symbols[key] = yahoo_symbol("crypto", key[1])
+            elif key[0] == "stock":
+                price_symbols[key] = yahoo_symbol("stock", key[1])
+    symbols = set(price_symbols.values())
+    series = {}
+    if symbols:
+        with ThreadPoolExecutor(max_workers=min(8, len(symbols))) as ex:
+            for sym, s in zip(symbols, ex.map(lambda s: get_daily_closes(s, start), symbols)):
+                series[sym] = s
+
+    def quote_ccy(key: tuple) -> str:
+        if key[0] == "cash":
+            return key[2]
+        if key[0] == "crypto":
+            return "USD"
+        ccy = series[price_symbols[key]].currency or "USD"
+        return "GBP" if ccy == "GBX" else ccy
+
+    fx_needed = {quote_ccy(k) for k in hist.qty if k[0] == "cash" or k in price_symbols} - {base}
+    fx_series = {}
+    if fx_needed:
+        with ThreadPoolExecutor(max_workers=min(8, len(fx_needed))) as ex:
+            for ccy, s in zip(fx_needed, ex.map(lambda c: get_daily_closes(yahoo_symbol("fx", c + base), start), fx_needed)):
+                fx_series[ccy] = s
+
+    missing = set()
+    points = []
+    for d in days:
+        totals = {"crypto": 0.0, "stock": 0.0, "cash": 0.0}
+        for key in hist.qty:
+            if key[0] != "cash" and key not in price_symbols:
+                continue
+            qty = hist.quantity_on(key, d)
+            if not qty:
+                continue
+            price = 1.0
+            if key[0] != "cash":
+                s = series[price_symbols[key]]
+                price = s.close_on(d)
+                if price is None:
+                    missing.add(price_symbols[key])
+                    continue
+                if s.currency == "GBX":
+                    price *= 0.01
+            ccy = quote_ccy(key)
+            fx = 1.0
+            if ccy != base:
+                fx = fx_series[ccy].close_on(d)
+                if fx is None:
+                    missing.add(f"{ccy}{base}")
+                    continue
+            totals[key[0]] += qty * price * fx
+        points.append(
+            {
+                "date": date.fromordinal(d).isoformat(),
+                "value": round(sum(totals.values()), 2),
+                "crypto": round(totals["crypto"], 2),
+                "stock": round(totals["stock"], 2),
+                "cash": round(totals["cash"], 2),
+            }
+        )
+
+    data = {"range": range_key, "baseCurrency": base, "points": points, "missing": sorted(missing)}
+    _RESULT_CACHE[cache_key] = {"ts": time.time(), "key": stamp, "data": data}
+    return data
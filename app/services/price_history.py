@@ -0,0 +1,339 @@
+"""Daily close history for crypto, stocks and FX pairs (Yahoo chart endpoint).
+
+Candles are persisted in a local SQLite store (one row per (symbol, day),
+shared by all workers and kept across restarts). A symbol's history is
+downloaded in one chart call; afterwards only the days missing before the
+stored range or after its last stored day are fetched. Ranges that are
+already covered never touch Yahoo, and with PRICE_HISTORY_OFFLINE=1 nothing
+does.
+
+In memory, series are dense per calendar day (weekends/holidays carry the
+previous close forward) as compact float arrays keyed by the Yahoo symbol.
+The store also keeps each symbol's latest quote (name, currency, price) so
+the latest-price endpoints can be answered from it while it is fresh.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+
+import requests
+
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart"
+
+# Re-check the newest day at most this often (today's candle keeps changing).
+_TOPUP_INTERVAL_SECONDS = 3600
+
+_LOCK = threading.Lock()
+# yahoo symbol -> DailyCloses (hot copy of the SQLite rows)
+_SERIES: dict[str, DailyCloses] = {}
+_SCHEMA_READY: set[str] = set()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candles (
+    symbol TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    close REAL NOT NULL,
+    PRIMARY KEY (symbol, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS symbols (
+    symbol TEXT PRIMARY KEY,
+    currency TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL DEFAULT '',
+    first_day INTEGER NOT NULL,
+    last_day INTEGER NOT NULL,
+    checked_ts REAL NOT NULL DEFAULT 0,
+    quote_price REAL,
+    quote_asof TEXT NOT NULL DEFAULT '',
+    quote_ts REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+def _db_path() -> str:
+    return (os.getenv("PRICE_HISTORY_DB") or "").strip() or os.path.join(
+        tempfile.gettempdir(), "wallet-front-prices.sqlite3"
+    )
+
+
+def _offline() -> bool:
+    return (os.getenv("PRICE_HISTORY_OFFLINE") or "").strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+def _connect() -> sqlite3.Connection:
+    path = _db_path()
+    conn = sqlite3.connect(path, timeout=10)
+    if path not in _SCHEMA_READY:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _SCHEMA_READY.add(path)
+    return conn
+
+
+@contextmanager
+def _db():
+    """Connection that commits on success and is always closed."""
+    conn = _connect()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+class DailyCloses:
+    """Dense daily closes from day ordinal ``first`` on; NaN before the first known close."""
+
+    __slots__ = ("symbol", "currency", "first", "values", "checked_ts")
+
+    def __init__(self, symbol: str, currency: str = "", first: int = 0, values: array | None = None):
+        self.symbol = symbol
+        self.currency = currency
+        self.first = first
+        self.values = values if values is not None else array("d")
+        self.checked_ts = 0.0
+
+    @property
+    def last(self) -> int:
+        """Ordinal of the last stored day (first - 1 when empty)."""
+        return self.first + len(self.values) - 1
+
+    def close_on(self, day: int) -> float | None:
+        """Close for day ordinal ``day``; the last close is carried forward past the end."""
+        if not self.values or day < self.first:
+            return None
+        i = min(day - self.first, len(self.values) - 1)
+        v = self.values[i]
+        return None if v != v else v
+
+    def latest(self) -> float | None:
+        return self.close_on(self.last) if self.values else None
+
+
+def yahoo_symbol(kind: str, name: str, quote_currency: str = "USD") -> str:
+    """Yahoo symbol for a crypto ticker, stock symbol or FX pair ("EURUSD")."""
+    s = (name or "").strip().upper()
+    if kind == "crypto":
+        return f"{s}-{quote_currency}"
+    if kind == "fx":
+        return f"{s}=X"
+    if s.endswith(".LON"):
+        return s[:-4] + ".L"
+    return s
+
+
+def _day_ts(day: int) -> int:
+    d = date.fromordinal(day)
+    return int(datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp())
+
+
+def yahoo_currency(meta: dict) -> str:
+    """Quote currency from chart meta; Yahoo's GBp (pence) is reported as GBX."""
+    currency_raw = str((meta or {}).get("currency") or "").strip()
+    if currency_raw.upper() == "GBP" and currency_raw != "GBP":
+        return "GBX"
+    return currency_raw.upper()
+
+
+def _fetch_candles(symbol: str, start_day: int, end_day: int) -> tuple[dict, dict[int, float]]:
+    """Chart meta plus daily closes (day ordinal -> close) in [start_day, end_day]."""
+    headers = {"Accept": "application/json", "User-Agent": "Wallet-Front/1.0"}
+    r = requests.get(
+        f"{YAHOO_CHART_URL}/{symbol}",
+        params={"interval": "1d", "period1": _day_ts(start_day), "period2": _day_ts(end_day + 1)},
+        headers=headers,
+        timeout=15,
+    )
+    r.raise_for_status()
+    chart = (r.json() or {}).get("chart") or {}
+    results = chart.get("result") or []
+    if not results:
+        # Failed or unknown lookup (chart.error): nothing may be marked as covered, so the next call retries.
+        error = chart.get("error") or {}
+        raise RuntimeError(f"no chart result: {error.get('description') or error.get('code') or 'empty response'}")
+    res = results[0] or {}
+
+    closes = {}
+    stamps = res.get("timestamp") or []
+    quote = ((res.get("indicators") or {}).get("quote") or [{}])[0] or {}
+    for ts, close in zip(stamps, quote.get("close") or []):
+        if close is None:
+            continue
+        try:
+            day = datetime.fromtimestamp(int(ts), tz=timezone.utc).date().toordinal()
+            closes[day] = float(close)
+        except Exception:
+            continue
+    return res.get("meta") or {}, closes
+
+
+def _store(symbol: str, meta: dict, closes: dict[int, float], start_day: int, end_day: int) -> None:
+    """Persist fetched candles and widen the symbol's covered range to [start_day, end_day]."""
+    now = time.time()
+    with _db() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO candles (symbol, day, close) VALUES (?, ?, ?)",
+            [(symbol, day, close) for day, close in closes.items()],
+        )
+        conn.execute(
+            """
+            INSERT INTO symbols (symbol, currency, name, first_day, last_day, checked_ts)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(symbol) DO UPDATE SET
+                currency = CASE WHEN excluded.currency != '' THEN excluded.currency ELSE symbols.currency END,
+                name = CASE WHEN excluded.name != '' THEN excluded.name ELSE symbols.name END,
+                first_day = MIN(symbols.first_day, excluded.first_day),
+                last_day = MAX(symbols.last_day, excluded.last_day),
+                checked_ts = excluded.checked_ts
+            """,
+            (
+                symbol,
+                yahoo_currency(meta),
+                str(meta.get("shortName") or meta.get("longName") or "").strip(),
+                start_day,
+                end_day,
+                now,
+            ),
+        )
+
+
+def _load(symbol: str) -> DailyCloses | None:
+    """Dense series from the SQLite rows, or None when the symbol was never downloaded."""
+    with _db() as conn:
+        row = conn.execute(
+            "SELECT currency, first_day, last_day, checked_ts FROM symbols WHERE symbol = ?", (symbol,)
+        ).fetchone()
+        if row is None:
+            return None
+        closes = dict(
+            conn.execute("SELECT day, close FROM candles WHERE symbol = ? ORDER BY day", (symbol,)).fetchall()
+        )
+    currency, first_day, last_day, checked_ts = row
+    series = DailyCloses(symbol, currency or "", first_day)
+    _append_days(series, closes, last_day)
+    series.checked_ts = float(checked_ts or 0.0)
+    return series
+
+
+def _append_days(series: DailyCloses, closes: dict[int, float], end_day: int) -> None:
+    nan = float("nan")
+    prev = series.values[-1] if series.values else nan
+    for day in range(series.last + 1, end_day + 1):
+        prev = closes.get(day, prev)
+        series.values.append(prev)
+
+
+def get_daily_closes(symbol: str, start: date, end: date | None = None) -> DailyCloses:
+    """Return the symbol's dense daily series covering ``start``..``end`` (default today).
+
+    Only days outside the stored range are downloaded (plus the newest stored day, which
+    may have been an intraday candle, at most every _TOPUP_INTERVAL_SECONDS). On network
+    errors, or when offline, the stored (possibly partial) series is returned.
+    """
+    start_day = start.toordinal()
+    end_day = (end or date.today()).toordinal()
+    with _LOCK:
+        series = _SERIES.get(symbol)
+    if series is None:
+        try:
+            series = _load(symbol)
+        except Exception as e:
+            print(f"[price history] Could not read store for {symbol}: {e}")
+
+    fetches = []
+    if series is None:
+        fetches.append((start_day, end_day))
+    else:
+        if start_day < series.first:
+            fetches.append((start_day, series.first - 1))
+        stale = time.time() - series.checked_ts > _TOPUP_INTERVAL_SECONDS
+        if series.last < end_day or (stale and series.last == end_day):
+            fetches.append((min(series.last, end_day), end_day))
+
+    if fetches and not _offline():
+        try:
+            for lo, hi in fetches:
+                meta, closes = _fetch_candles(symbol, lo, hi)
+                _store(symbol, meta, closes, lo, hi)
+            series = _load(symbol)
+        except Exception as e:
+            print(f"[price history] {symbol}: {e}")
+
+    if series is None:
+        return DailyCloses(symbol)
+    # Cache exactly what is stored: series.last must stay the stored last_day, or the
+    # next top-up would skip days that were never downloaded.
+    with _LOCK:
+        _SERIES[symbol] = series
+    if series.last < end_day and series.values:
+        # Carry the last close forward to the requested end (offline / failed top-up) on a copy.
+        padded = DailyCloses(symbol, series.currency, series.first, array("d", series.values))
+        padded.checked_ts = series.checked_ts
+        _append_days(padded, {}, end_day)
+        return padded
+    return series
+
+
+def stored_quote(symbol: str, max_age_seconds: float) -> dict | None:
+    """Latest quote {name, currency, price, asof} recorded for ``symbol`` if newer than ``max_age_seconds``."""
+    try:
+        with _db() as conn:
+            row = conn.execute(
+                "SELECT name, currency, quote_price, quote_asof, quote_ts FROM symbols WHERE symbol = ?",
+                (symbol,),
+            ).fetchone()
+    except Exception as e:
+        print(f"[price history] Could not read quote for {symbol}: {e}")
+        return None
+    if row is None or row[2] is None:
+        return None
+    name, currency, price, asof, quote_ts = row
+    if not _offline() and time.time() - float(quote_ts or 0.0) >= max_age_seconds:
+        return None
+    return {"name": name or "", "currency": currency or "", "price": float(price), "asof": asof or ""}
+
+
+def record_quote(symbol: str, name: str, currency: str, price: float | None, asof: str) -> None:
+    """Store a freshly fetched latest quote; also upserts it as the close of its ``asof`` day."""
+    if price is None:
+        return
+    now = time.time()
+    try:
+        day = date.fromisoformat(asof[:10]).toordinal() if asof else date.today().toordinal()
+    except Exception:
+        day = date.today().toordinal()
+    try:
+        with _db() as conn:
+            existing = conn.execute("SELECT last_day FROM symbols WHERE symbol = ?", (symbol,)).fetchone()
+            # Only extend a series whose covered range reaches this day; a lone quote must not
+            # make an undownloaded history look complete.
+            if existing is not None and existing[0] >= day - 1:
+                conn.execute(
+                    "INSERT OR REPLACE INTO candles (symbol, day, close) VALUES (?, ?, ?)", (symbol, day, float(price))
+                )
+                conn.execute("UPDATE symbols SET last_day = MAX(last_day, ?) WHERE symbol = ?", (day, symbol))
+            conn.execute(
+                """
+                INSERT INTO symbols (symbol, currency, name, first_day, last_day, quote_price, quote_asof, quote_ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(symbol) DO UPDATE SET
+                    currency = CASE WHEN excluded.currency != '' THEN excluded.currency ELSE symbols.currency END,
+                    name = CASE WHEN excluded.name != '' THEN excluded.name ELSE symbols.name END,
+                    quote_price = excluded.quote_price,
+                    quote_asof = excluded.quote_asof,
+                    quote_ts = excluded.quote_ts
+                """,
+                (symbol, currency or "", name or "", day + 1, day, float(price), asof or "", now),
+            )
+    except Exception as e:
+        print(f"[price history] Could not store quote for {symbol}: {e}")
+        return
+    with _LOCK:
+        _SERIES.pop(symbol, None)
@@ -0,0 +1,46 @@
+"""Private on-disk locations for caches and spools holding credentials or user data.
+
+These default to directories under the app's instance folder (<repo>/instance,
+Flask's instance_path for this package) instead of the shared temp dir, where
+any local user could read them or plant entries first. Directories are created
+with mode 0o700 and refused unless this process's user owns them and nobody
+else can write to them; files are written with mode 0o600.
+"""
+
+from __future__ import annotations
+
+import os
+import stat
+
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "instance")
+
+
+def instance_path(*parts: str) -> str:
+    return os.path.join(INSTANCE_DIR, *parts)
+
+
+def private_dir(path: str) -> str:
+    """Create ``path`` (0o700) if needed; raise PermissionError unless it is ours and private."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(f"{path} is not a directory owned by this user")
+    if st.st_mode & 0o022:
+        raise PermissionError(f"{path} is writable by other users")
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+def open_private(path: str, mode: str = "w", **kwargs):
+    """open() for writing a file only this user can read (0o600); refuses files owned by others."""
+    flags = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if "a" in mode else os.O_TRUNC)
+    fd = os.open(path, flags | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    try:
+        if os.fstat(fd).st_uid != os.getuid():
+            raise PermissionError(f"{path} is owned by another user")
+        os.fchmod(fd, 0o600)
+        return os.fdopen(fd, mode, **kwargs)
+    except BaseException:
+        os.close(fd)
+        raise
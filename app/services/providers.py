@@ -0,0 +1,246 @@
+"""Price-provider registry: capability-tagged providers, rolling health, hedged quote requests.
+
+Route modules register one Provider per upstream (Yahoo, Alpha Vantage, CMC,
+...) for a kind ("stock" or "crypto"), declaring what it can do (quote, batch,
+search, history). fetch_quotes() walks the kind's chain:
+
+- symbols any provider has cached are answered without a call
+- the primary gets the rest; if it hasn't answered by its own p95 latency, the
+  same request is also sent to the next provider (hedged request) and the
+  first answer wins; the slower call still finishes in the background and
+  warms its provider's cache
+- symbols left unpriced (unknown to a provider, or its call failed) go to the
+  next provider in the chain
+
+Each call's latency and outcome feed a per-provider health window (the last
+10 minutes). A provider failing most recent calls is moved behind healthy
+ones until its failures age out. The order otherwise follows
+STOCK_DATA_PROVIDER / CRYPTO_DATA_PROVIDER ("auto" orders by health score).
+PROVIDER_HEDGING=0 disables hedging (plain fallback).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable
+
+from config import CRYPTO_DATA_PROVIDER, STOCK_DATA_PROVIDER
+
+CAPABILITIES = frozenset({"quote", "batch", "search", "history"})
+
+_HEALTH_WINDOW_SECONDS = 600
+_HEALTH_MAX_SAMPLES = 200
+_MIN_SAMPLES = 5
+_DEFAULT_HEDGE_SECONDS = 1.5
+_MIN_HEDGE_SECONDS = 0.25
+_MAX_HEDGE_SECONDS = 5.0
+_CHAIN_TIMEOUT_SECONDS = 25.0
+
+_LOCK = threading.Lock()
+_PROVIDERS: dict[str, list[Provider]] = {}
+# Shared pool: a hedged call that loses must not hold up the request that started it.
+_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="price-provider")
+
+
+class ProviderError(Exception):
+    """A provider call that produced nothing usable (counts as a failure in its health)."""
+
+
+class ProviderHealth:
+    """Latency and outcome of a provider's recent calls."""
+
+    def __init__(self):
+        self._samples: deque = deque(maxlen=_HEALTH_MAX_SAMPLES)  # (ts, seconds, ok)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.append((time.time(), seconds, ok))
+
+    def _recent(self) -> list:
+        cutoff = time.time() - _HEALTH_WINDOW_SECONDS
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return list(self._samples)
+
+    def snapshot(self) -> dict:
+        samples = self._recent()
+        latencies = sorted(s for _, s, ok in samples if ok)
+        errors = sum(1 for *_, ok in samples if not ok)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None
+        return {
+            "calls": len(samples),
+            "errors": errors,
+            "error_rate": errors / len(samples) if samples else 0.0,
+            "p50": latencies[len(latencies) // 2] if latencies else None,
+            "p95": p95,
+        }
+
+    def hedge_after(self) -> float:
+        """Seconds to wait for this provider before hedging: its p95, within sane bounds."""
+        snap = self.snapshot()
+        if snap["p95"] is None or snap["calls"] < _MIN_SAMPLES:
+            return _DEFAULT_HEDGE_SECONDS
+        return min(_MAX_HEDGE_SECONDS, max(_MIN_HEDGE_SECONDS, snap["p95"]))
+
+    def degraded(self) -> bool:
+        snap = self.snapshot()
+        return snap["calls"] >= _MIN_SAMPLES and snap["error_rate"] >= 0.5
+
+    def score(self) -> float:
+        """Lower is better: p95 latency inflated by the error rate."""
+        snap = self.snapshot()
+        p95 = snap["p95"] if snap["p95"] is not None else _DEFAULT_HEDGE_SECONDS
+        return p95 * (1.0 + 4.0 * snap["error_rate"])
+
+
+class Provider:
+    """One upstream for a kind of asset.
+
+    ``quotes(symbols)`` returns {symbol: quote} for the symbols it could price (quote shape is
+    per kind) and raises on failure; ``cached(symbols)`` returns fresh cached quotes without any
+    call. Providers without the "batch" capability are given at most ``max_symbols`` symbols.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        capabilities,
+        quotes: Callable[[list], dict],
+        *,
+        cached: Callable[[list], dict] | None = None,
+        max_symbols: int | None = None,
+        enabled: Callable[[], bool] | None = None,
+    ):
+        unknown = set(capabilities) - CAPABILITIES
+        if unknown:
+            raise ValueError(f"Unknown provider capabilities: {sorted(unknown)}")
+        self.name = name
+        self.kind = kind
+        self.capabilities = frozenset(capabilities)
+        self.quotes = quotes
+        self.cached = cached
+        self.max_symbols = max_symbols if max_symbols is not None else (None if "batch" in capabilities else 1)
+        self.enabled = enabled or (lambda: True)
+        self.health = ProviderHealth()
+
+    def call(self, symbols: list) -> dict:
+        """quotes() timed into this provider's health; {} on failure."""
+        started = time.perf_counter()
+        try:
+            out = self.quotes(symbols) or {}
+        except Exception as e:
+            self.health.record(time.perf_counter() - started, False)
+            print(f"[providers] {self.kind}/{self.name} failed for {len(symbols)} symbols: {e}")
+            return {}
+        self.health.record(time.perf_counter() - started, True)
+        return out
+
+
+def register(provider: Provider) -> Provider:
+    """Add (or replace, by name) a provider for its kind."""
+    with _LOCK:
+        chain = [p for p in _PROVIDERS.get(provider.kind, []) if p.name != provider.name]
+        chain.append(provider)
+        _PROVIDERS[provider.kind] = chain
+    return provider
+
+
+def _preference(kind: str) -> str:
+    return STOCK_DATA_PROVIDER if kind == "stock" else CRYPTO_DATA_PROVIDER if kind == "crypto" else "auto"
+
+
+def providers_for(kind: str, capability: str = "quote") -> list[Provider]:
+    """Enabled providers of ``kind`` with ``capability``, best first."""
+    with _LOCK:
+        candidates = [p for p in _PROVIDERS.get(kind, []) if capability in p.capabilities]
+    candidates = [p for p in candidates if p.enabled()]
+    preferred = _preference(kind)
+    if preferred == "auto":
+        return sorted(candidates, key=lambda p: (p.health.degraded(), p.health.score()))
+    # Configured provider first, then registration order; degraded ones go last.
+    return sorted(candidates, key=lambda p: (p.health.degraded(), p.name != preferred))
+
+
+def _hedging_enabled() -> bool:
+    return (os.getenv("PROVIDER_HEDGING") or "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def fetch_quotes(kind: str, symbols: list) -> dict:
+    """{symbol: quote} for the symbols any provider of ``kind`` could price; others are absent."""
+    wanted = list(dict.fromkeys(s for s in symbols if s))
+    chain = providers_for(kind, "quote")
+    result: dict = {}
+    for provider in chain:
+        if provider.cached is None:
+            continue
+        missing = [s for s in wanted if s not in result]
+        if not missing:
+            break
+        try:
+            result.update(provider.cached(missing) or {})
+        except Exception as e:
+            print(f"[providers] {kind}/{provider.name} cache lookup failed: {e}")
+
+    remaining = [s for s in wanted if s not in result]
+    queue = list(chain)
+    pending: dict = {}  # future -> provider
+    deadline = time.monotonic() + _CHAIN_TIMEOUT_SECONDS
+    hedge_at = None
+
+    def start_next() -> None:
+        nonlocal hedge_at
+        provider = queue.pop(0)
+        batch = remaining if provider.max_symbols is None else remaining[: provider.max_symbols]
+        pending[_EXECUTOR.submit(provider.call, list(batch))] = provider
+        hedge_at = time.monotonic() + provider.health.hedge_after() if _hedging_enabled() else None
+
+    if remaining and queue:
+        start_next()
+    while remaining and pending:
+        now = time.monotonic()
+        if now >= deadline:
+            print(f"[providers] {kind} quotes timed out with {len(remaining)} symbols unpriced")
+            break
+        timeout = deadline - now
+        if queue and hedge_at is not None:
+            timeout = min(timeout, max(0.0, hedge_at - now))
+        done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            if queue and hedge_at is not None and time.monotonic() >= hedge_at:
+                start_next()  # hedge: the running provider is slower than its p95
+            continue
+        for future in done:
+            pending.pop(future, None)
+            found = future.result()
+            result.update({s: q for s, q in found.items() if s in remaining})
+        remaining = [s for s in wanted if s not in result]
+        if remaining and not pending and queue:
+            start_next()  # fall back for what the finished providers couldn't price
+    return result
+
+
+def health_snapshot() -> list[dict]:
+    """Each registered provider's capabilities and recent health (for the admin view)."""
+    with _LOCK:
+        providers = [p for chain in _PROVIDERS.values() for p in chain]
+    rows = []
+    for p in providers:
+        rows.append(
+            {
+                "kind": p.kind,
+                "name": p.name,
+                "capabilities": sorted(p.capabilities),
+                "enabled": p.enabled(),
+                "degraded": p.health.degraded(),
+                "hedge_after": p.health.hedge_after(),
+                **p.health.snapshot(),
+            }
+        )
+    return sorted(rows, key=lambda r: (r["kind"], r["name"]))
@@ -0,0 +1,42 @@
+"""Thread-safe token bucket for pacing calls to rate-limited APIs (DynamoDB, market data)."""
+
+from __future__ import annotations
+
+import threading
+import time
+
+
+class TokenBucket:
+    """``rate`` tokens per second, with bursts of up to ``capacity`` tokens (default: one second's worth)."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = max(0.001, float(rate))
+        self.capacity = max(1.0, float(capacity if capacity is not None else rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Take ``tokens`` if available; otherwise return the seconds to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        return self._reserve(tokens) == 0.0
+
+    def acquire(self, tokens: float = 1.0, timeout: float | None = None) -> bool:
+        """Block until ``tokens`` are available; False if that would take longer than ``timeout``."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._reserve(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
@@ -0,0 +1,287 @@
+"""Typed, slotted transaction/wallet records parsed once per fetched record list.
+
+API rows are loose dicts (numbers as strings, currencies in any case, wallet
+refs as ids or legacy names). The ledger loops used to re-parse the same
+fields on every request; here each row is parsed once into a frozen record:
+
+- numeric fields are fixed-point ints (app.services.money)
+- currencies are stripped/upper-cased ("" when unset, so callers keep their own defaults)
+- fromWallet/toWallet are resolved to walletIds through the WalletDirectory
+- tdate is kept as the (sortable ISO) string, plus ``ts`` as a timestamp (0.0 when invalid)
+
+Parsed lists are cached per user and rebuilt only when the underlying record
+list (or, for transactions, the wallet list) is refetched.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from app.services.money import to_fixed
+from app.services.user_records import get_user_records_versioned
+from app.services.wallet_directory import WalletDirectory, get_wallet_directory, wallet_currency_field
+
+# (userId, resource) -> ((records version, wallet version), RecordSet)
+_RECORDS_CACHE: dict[tuple[str, str], tuple[tuple[int, int], RecordSet]] = {}
+
+
+def _text(val) -> str:
+    return (str(val) if val is not None else "").strip()
+
+
+def _ccy(val) -> str:
+    return _text(val).upper()
+
+
+def date_ts(date_str: str) -> float:
+    """Timestamp for ISO-ish date strings ("Z" suffix allowed); invalid or empty -> 0.0."""
+    try:
+        s = (date_str or "").strip()
+        if not s:
+            return 0.0
+        if s.endswith("Z"):
+            s = s[:-1]
+        return datetime.fromisoformat(s).timestamp()
+    except Exception:
+        return 0.0
+
+
+def _operation(row: dict) -> str:
+    return str(row.get("operation") or row.get("side") or "buy").lower()
+
+
+@dataclass(frozen=True, slots=True)
+class CryptoTx:
+    id: str
+    name: str  # cryptoName as stored; "Unknown" when missing
+    operation: str  # buy | sell | transfer (lower-cased, as stored otherwise)
+    qty: int
+    price: int
+    fee: int
+    currency: str
+    fee_currency: str  # fiat code, or "CRYPTO" for same-asset fees
+    from_wallet: str
+    to_wallet: str
+    tdate: str
+    ts: float
+
+
+@dataclass(frozen=True, slots=True)
+class StockTx:
+    id: str
+    symbol: str  # upper-cased stockName; "UNKNOWN" when missing
+    operation: str
+    qty: int
+    price: int
+    fee: int
+    currency: str  # may be a minor unit (GBX); see routes.stock._scale_minor_currency
+    fee_currency: str
+    from_wallet: str
+    to_wallet: str
+    tdate: str
+    ts: float
+
+
+@dataclass(frozen=True, slots=True)
+class FiatTx:
+    id: str
+    trans_type: str  # income | expense | transfer | fx transfer (lower-cased)
+    amount: int
+    fee: int
+    received_amount: int  # FX transfers only, in the toWallet's currency
+    currency: str
+    from_wallet: str
+    to_wallet: str
+    tdate: str
+    ts: float
+
+
+@dataclass(frozen=True, slots=True)
+class LoanTx:
+    id: str
+    type: str  # borrow | lend | loan (unknown -> borrow)
+    action: str  # new | repay (unknown -> new)
+    amount: int
+    fee: int
+    currency: str
+    counterparty: str
+    position: str
+    from_wallet: str
+    to_wallet: str
+    tdate: str
+    ts: float
+    ddate: str
+    due_ts: float
+
+
+@dataclass(frozen=True, slots=True)
+class Wallet:
+    id: str
+    name: str
+    type: str
+    currency: str  # upper-cased; "" when unset
+    color: str
+
+
+def parse_crypto(row: dict, wallet_dir: WalletDirectory) -> CryptoTx:
+    tdate = _text(row.get("tdate"))
+    return CryptoTx(
+        id=_text(row.get("cryptoId")),
+        name=row.get("cryptoName") or "Unknown",
+        operation=_operation(row),
+        qty=to_fixed(row.get("quantity")),
+        price=to_fixed(row.get("price")),
+        fee=to_fixed(row.get("fee")),
+        currency=_ccy(row.get("currency")),
+        fee_currency=_ccy(row.get("feeCurrency")),
+        from_wallet=wallet_dir.resolve(row.get("fromWallet")),
+        to_wallet=wallet_dir.resolve(row.get("toWallet")),
+        tdate=tdate,
+        ts=date_ts(tdate),
+    )
+
+
+def parse_stock(row: dict, wallet_dir: WalletDirectory) -> StockTx:
+    tdate = _text(row.get("tdate"))
+    return StockTx(
+        id=_text(row.get("stockId")),
+        symbol=_text(row.get("stockName")).upper() or "UNKNOWN",
+        operation=_operation(row),
+        qty=to_fixed(row.get("quantity")),
+        price=to_fixed(row.get("price")),
+        fee=to_fixed(row.get("fee")),
+        currency=_ccy(row.get("currency")),
+        fee_currency=_ccy(row.get("feeCurrency")),
+        from_wallet=wallet_dir.resolve(row.get("fromWallet")),
+        to_wallet=wallet_dir.resolve(row.get("toWallet")),
+        tdate=tdate,
+        ts=date_ts(tdate),
+    )
+
+
+def parse_fiat(row: dict, wallet_dir: WalletDirectory) -> FiatTx:
+    tdate = _text(row.get("tdate"))
+    return FiatTx(
+        id=_text(row.get("transId")),
+        trans_type=_text(row.get("transType")).lower(),
+        amount=to_fixed(row.get("amount")),
+        fee=to_fixed(row.get("fee")),
+        received_amount=to_fixed(row.get("receivedAmount")),
+        currency=_ccy(row.get("currency")),
+        from_wallet=wallet_dir.resolve(row.get("fromWallet")),
+        to_wallet=wallet_dir.resolve(row.get("toWallet")),
+        tdate=tdate,
+        ts=date_ts(tdate),
+    )
+
+
+def parse_loan(row: dict, wallet_dir: WalletDirectory) -> LoanTx:
+    loan_type = _text(row.get("type")).lower()
+    if loan_type not in ("borrow", "lend", "loan"):
+        loan_type = "borrow"
+    action = _text(row.get("action")).lower()
+    if action not in ("new", "repay"):
+        action = "new"
+    tdate = _text(row.get("tdate"))
+    ddate = _text(row.get("ddate"))
+    return LoanTx(
+        id=_text(row.get("loanId")),
+        type=loan_type,
+        action=action,
+        amount=to_fixed(row.get("amount")),
+        fee=to_fixed(row.get("fee")),
+        currency=_ccy(row.get("currency")),
+        counterparty=_text(row.get("counterparty")),
+        position=_text(row.get("position")),
+        from_wallet=wallet_dir.resolve(row.get("fromWallet")),
+        to_wallet=wallet_dir.resolve(row.get("toWallet")),
+        tdate=tdate,
+        ts=date_ts(tdate),
+        ddate=ddate,
+        due_ts=date_ts(ddate),
+    )
+
+
+def parse_wallet(row: dict) -> Wallet:
+    return Wallet(
+        id=_text(row.get("walletId")),
+        name=_text(row.get("walletName")),
+        type=_text(row.get("walletType") or row.get("WalletType") or row.get("type") or row.get("wallet_type")),
+        currency=wallet_currency_field(row).upper(),
+        color=_text(row.get("color")),
+    )
+
+
+_PARSERS = {
+    "cryptos": parse_crypto,
+    "stocks": parse_stock,
+    "transactions": parse_fiat,
+    "loans": parse_loan,
+}
+
+
+class RecordSet:
+    """Raw API rows plus their parsed records (``records[i]`` is parsed from ``items[i]``).
+
+    ``items`` is the shared cached list from app.services.user_records; treat both as read-only.
+    """
+
+    __slots__ = ("items", "records", "version")
+
+    def __init__(self, items: list, records: list, version: tuple[int, int]):
+        self.items = items
+        self.records = records
+        self.version = version
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+def get_user_transactions(
+    user_id: str, resource: str, *, wallet_dir: WalletDirectory | None = None, timeout: int = 12
+) -> RecordSet:
+    """Return the user's parsed records for a transaction resource (cryptos/stocks/transactions/loans)."""
+    parse = _PARSERS[resource]
+    uid = _text(user_id)
+    items, records_version = get_user_records_versioned(uid, resource, timeout=timeout)
+    if wallet_dir is None:
+        wallet_dir = get_wallet_directory(uid, timeout=timeout)
+    version = (records_version, wallet_dir.version)
+
+    cached = _RECORDS_CACHE.get((uid, resource))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    records = []
+    kept = []
+    for row in items:
+        if not isinstance(row, dict):
+            continue
+        try:
+            records.append(parse(row, wallet_dir))
+            kept.append(row)
+        except Exception as e:
+            print(f"Error parsing {resource} row: {e} | Raw: {row}")
+    record_set = RecordSet(kept if len(kept) != len(items) else items, records, version)
+    _RECORDS_CACHE[(uid, resource)] = (version, record_set)
+    return record_set
+
+
+def get_user_wallets(user_id: str, *, wallet_dir: WalletDirectory | None = None, timeout: int = 12) -> RecordSet:
+    """Return the user's wallets as Wallet records (API order)."""
+    uid = _text(user_id)
+    if wallet_dir is None:
+        wallet_dir = get_wallet_directory(uid, timeout=timeout)
+    version = (wallet_dir.version, 0)
+
+    cached = _RECORDS_CACHE.get((uid, "wallets"))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    record_set = RecordSet(wallet_dir.wallets, [parse_wallet(w) for w in wallet_dir.wallets], version)
+    _RECORDS_CACHE[(uid, "wallets")] = (version, record_set)
+    return record_set
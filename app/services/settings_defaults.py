@@ -0,0 +1,37 @@
+"""Default user settings (static/settings_defaults.json), loaded once per process.
+
+Used to seed a new user's Settings row, as fallbacks on the Settings page and
+by the admin seed tool. The file is re-read only when its mtime changes, so
+edits are picked up without a restart; if it cannot be read, the last good
+copy is kept. Treat the returned dict as read-only; copy it before adding fields.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+
+SETTINGS_DEFAULTS_PATH = os.path.join(os.path.dirname(__file__), "..", "static", "settings_defaults.json")
+
+_LOCK = threading.Lock()
+_CACHE: dict = {"mtime": None, "data": {}}
+
+
+def settings_defaults() -> dict:
+    try:
+        mtime = os.stat(SETTINGS_DEFAULTS_PATH).st_mtime_ns
+    except OSError as e:
+        print(f"[settings defaults] Could not stat {SETTINGS_DEFAULTS_PATH}: {e}")
+        return _CACHE["data"]
+    if _CACHE["mtime"] == mtime:
+        return _CACHE["data"]
+    with _LOCK:
+        if _CACHE["mtime"] != mtime:
+            try:
+                with open(SETTINGS_DEFAULTS_PATH, "r") as f:
+                    _CACHE["data"] = json.load(f)
+                _CACHE["mtime"] = mtime
+            except Exception as e:
+                print(f"[settings defaults] Could not read {SETTINGS_DEFAULTS_PATH}: {e}")
+    return _CACHE["data"]
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import base64
+import json
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+
+from app.services.user_records import get_user_records_versioned
+from app.services.wallet_directory import WalletDirectory, get_wallet_directory
+
+# Per-asset field mapping for the transaction history API.
+# - resource: API list resource backing the asset
+# - category: field used by the ``category`` filter
+# - symbol: field used by the ``symbol`` filter
+# - amount: numeric field used by ``sort=amount``
+ASSET_SPECS = {
+    "fiat": {
+        "resource": "transactions",
+        "id_field": "transId",
+        "category": "mainCat",
+        "symbol": "currency",
+        "amount": "amount",
+    },
+    "crypto": {
+        "resource": "cryptos",
+        "id_field": "cryptoId",
+        "category": "operation",
+        "symbol": "cryptoName",
+        "amount": "quantity",
+    },
+    "stock": {
+        "resource": "stocks",
+        "id_field": "stockId",
+        "category": "operation",
+        "symbol": "stockName",
+        "amount": "quantity",
+    },
+    "loans": {
+        "resource": "loans",
+        "id_field": "loanId",
+        "category": "type",
+        "symbol": "counterparty",
+        "amount": "amount",
+    },
+}
+
+SORT_FIELDS = ("date", "amount")
+
+# (userId, asset) -> ((records version, wallet version), TransactionIndex)
+_INDEX_CACHE: dict[tuple[str, str], tuple[tuple[int, int], TransactionIndex]] = {}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _text(val) -> str:
+    return (str(val) if val is not None else "").strip()
+
+
+def _amount(val) -> float:
+    try:
+        s = _text(val).replace(",", ".")
+        return float(Decimal(s)) if s else 0.0
+    except Exception:
+        return 0.0
+
+
+def _symbol_key(asset: str, val) -> str:
+    s = _text(val)
+    # Crypto names are stored as "BTC - Bitcoin"; filter on the leading symbol.
+    if asset == "crypto" and " - " in s:
+        s = s.split(" - ", 1)[0].strip()
+    return s.upper()
+
+
+def encode_cursor(key: tuple) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        s = (cursor or "").strip()
+        raw = base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+        val = json.loads(raw.decode("utf-8"))
+        if not isinstance(val, list) or len(val) != 2:
+            raise ValueError("bad cursor shape")
+        return (val[0], str(val[1]))
+    except Exception as e:
+        raise InvalidCursor(str(e)) from e
+
+
+class TransactionIndex:
+    """Read-only index over one user's records for one asset type.
+
+    Rows are kept in two sorted orders (date, amount) so range queries and
+    keyset pagination are bisect lookups. Filter values are bucketed into
+    inverted maps (wallet/category/symbol -> row positions).
+    """
+
+    __slots__ = (
+        "asset",
+        "records",
+        "_order",
+        "_keys",
+        "_by_wallet",
+        "_by_category",
+        "_by_symbol",
+    )
+
+    def __init__(self, asset: str, records: list, wallet_dir: WalletDirectory | None = None):
+        spec = ASSET_SPECS[asset]
+        self.asset = asset
+        self.records = [r for r in (records or []) if isinstance(r, dict)]
+        self._by_wallet: dict[str, set[int]] = {}
+        self._by_category: dict[str, set[int]] = {}
+        self._by_symbol: dict[str, set[int]] = {}
+
+        date_keys = []
+        amount_keys = []
+        for i, r in enumerate(self.records):
+            rid = _text(r.get(spec["id_field"])) or f"#{i}"
+            date_keys.append((_text(r.get("tdate")), rid))
+            amount_keys.append((_amount(r.get(spec["amount"])), rid))
+
+            for field in ("fromWallet", "toWallet"):
+                # Rows may reference a wallet by name; bucket under the walletId.
+                w = wallet_dir.resolve(r.get(field)) if wallet_dir is not None else _text(r.get(field))
+                if w and w.lower() != "none":
+                    self._by_wallet.setdefault(w, set()).add(i)
+            cat = _text(r.get(spec["category"])).lower()
+            if cat:
+                self._by_category.setdefault(cat, set()).add(i)
+            sym = _symbol_key(asset, r.get(spec["symbol"]))
+            if sym:
+                self._by_symbol.setdefault(sym, set()).add(i)
+
+        self._order = {}
+        self._keys = {}
+        for name, keys in (("date", date_keys), ("amount", amount_keys)):
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            self._order[name] = order
+            self._keys[name] = [keys[i] for i in order]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _allowed_rows(self, wallet: str, category: str, symbol: str) -> set[int] | None:
+        allowed = None
+        for bucket, value in (
+            (self._by_wallet, wallet),
+            (self._by_category, category.lower()),
+            (self._by_symbol, _symbol_key(self.asset, symbol)),
+        ):
+            if not value:
+                continue
+            rows = bucket.get(value, set())
+            allowed = rows if allowed is None else (allowed & rows)
+        return allowed
+
+    def query(
+        self,
+        *,
+        date_from: str = "",
+        date_to: str = "",
+        wallet: str = "",
+        category: str = "",
+        symbol: str = "",
+        sort: str = "date",
+        descending: bool = True,
+        cursor: str = "",
+        limit: int = 50,
+    ) -> dict:
+        """Return one page of matching records.
+
+        Dates are YYYY-MM-DD (inclusive). ``cursor`` is the opaque ``nextCursor``
+        of the previous page; ``total`` is only computed for the first page.
+        """
+        sort = sort if sort in SORT_FIELDS else "date"
+        order = self._order[sort]
+        keys = self._keys[sort]
+        limit = max(1, int(limit))
+
+        lo, hi = 0, len(keys)
+        allowed = self._allowed_rows(wallet, category, symbol)
+        date_filtered = bool(date_from or date_to)
+        if sort == "date":
+            # Range scan on the date order: tdate strings are ISO so they sort lexicographically.
+            if date_from:
+                lo = bisect_left(keys, (date_from, ""))
+            if date_to:
+                hi = bisect_right(keys, (date_to + "\uffff",))
+            date_filtered = False
+
+        def _matches(pos: int) -> bool:
+            row = order[pos]
+            if allowed is not None and row not in allowed:
+                return False
+            if date_filtered:
+                day = _text(self.records[row].get("tdate"))[:10]
+                if (date_from and day < date_from) or (date_to and day > date_to):
+                    return False
+            return True
+
+        total = None
+        if not cursor:
+            total = sum(1 for pos in range(lo, hi) if _matches(pos))
+
+        if cursor:
+            ckey = decode_cursor(cursor)
+            try:
+                if descending:
+                    hi = min(hi, bisect_left(keys, ckey))
+                else:
+                    lo = max(lo, bisect_right(keys, ckey))
+            except TypeError as e:
+                # Cursor issued for a different sort field.
+                raise InvalidCursor(str(e)) from e
+
+        positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+        items = []
+        last_key = None
+        has_more = False
+        for pos in positions:
+            if not _matches(pos):
+                continue
+            if len(items) >= limit:
+                has_more = True
+                break
+            items.append(self.records[order[pos]])
+            last_key = keys[pos]
+
+        return {
+            "items": items,
+            "nextCursor": encode_cursor(last_key) if (has_more and last_key is not None) else None,
+            "total": total,
+        }
+
+
+def get_transaction_index(user_id: str, asset: str) -> TransactionIndex:
+    """Return the (cached) index for a user's asset history, rebuilt when the record or wallet list changes."""
+    spec = ASSET_SPECS[asset]
+    records, records_version = get_user_records_versioned(user_id, spec["resource"])
+    wallet_dir = get_wallet_directory(user_id)
+    version = (records_version, wallet_dir.version)
+    key = (str(user_id or "").strip(), asset)
+    cached = _INDEX_CACHE.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+    idx = TransactionIndex(asset, records, wallet_dir)
+    _INDEX_CACHE[key] = (version, idx)
+    return idx
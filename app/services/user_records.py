@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import os
+import time
+
+import requests
+
+from app.services.events import ChangeEvent, subscribe, sync_remote_changes
+from app.services.user_scope import filter_records_by_user
+from config import API_URL, aws_auth
+
+# API list endpoints: resource path -> key holding the list in the JSON response.
+RESOURCE_LIST_KEYS = {
+    "wallets": "wallets",
+    "cryptos": "cryptos",
+    "stocks": "stocks",
+    "transactions": "transactions",
+    "loans": "loans",
+}
+
+# In-process cache of per-user record lists.
+# NOTE: This is per-process (per gunicorn worker) and resets on restart. Entries are
+# dropped on ChangeEvents (see app.services.events), so the TTL only bounds staleness
+# from writes made outside this app.
+# Layout: userId -> resource -> {"ts": float, "items": list, "version": int}
+_USER_RECORDS_CACHE: dict[str, dict[str, dict]] = {}
+_VERSION_COUNTER = [0]
+# (userId, resource) -> invalidation count; a fetch racing an invalidation is not stored.
+_INVALIDATIONS: dict[tuple[str, str], int] = {}
+
+
+def records_cache_ttl_seconds() -> int:
+    try:
+        return max(0, int((os.getenv("USER_RECORDS_CACHE_TTL_SECONDS") or "300").strip()))
+    except Exception:
+        return 300
+
+
+def _next_version() -> int:
+    _VERSION_COUNTER[0] += 1
+    return _VERSION_COUNTER[0]
+
+
+def fetch_user_records(user_id: str, resource: str, *, timeout: int = 12) -> list:
+    """Fetch a user's records for an API list resource (no caching)."""
+    list_key = RESOURCE_LIST_KEYS.get(resource, resource)
+    try:
+        resp = requests.get(
+            f"{API_URL}/{resource.lstrip('/')}",
+            params={"userId": user_id},
+            auth=aws_auth,
+            timeout=timeout,
+        )
+        items = resp.json().get(list_key, []) if resp.status_code == 200 else []
+        return filter_records_by_user(items, user_id)
+    except Exception as e:
+        try:
+            print(f"Error fetching {resource}: {e}")
+        except Exception:
+            pass
+        return []
+
+
+def _cache_entry(user_id: str, resource: str, *, timeout: int = 12, force: bool = False) -> dict:
+    uid = str(user_id or "").strip()
+    sync_remote_changes(uid)
+    ttl = records_cache_ttl_seconds()
+    per_user = _USER_RECORDS_CACHE.setdefault(uid, {})
+    cached = per_user.get(resource)
+    now = time.time()
+    if not force and cached and ttl > 0 and (now - float(cached.get("ts") or 0.0) < ttl):
+        return cached
+
+    generation = _INVALIDATIONS.get((uid, resource), 0)
+    items = fetch_user_records(uid, resource, timeout=timeout)
+    entry = {"ts": now, "items": items, "version": _next_version()}
+    if ttl > 0 and _INVALIDATIONS.get((uid, resource), 0) == generation:
+        per_user[resource] = entry
+    return entry
+
+
+def get_user_records(user_id: str, resource: str, *, timeout: int = 12, force: bool = False) -> list:
+    """Return the user's records for a resource, served from the in-process cache when fresh.
+
+    The returned list is shared between callers; treat it as read-only.
+    """
+    return _cache_entry(user_id, resource, timeout=timeout, force=force)["items"]
+
+
+def get_user_records_versioned(
+    user_id: str, resource: str, *, timeout: int = 12, force: bool = False
+) -> tuple[list, int]:
+    """Like get_user_records(), also returning a version that changes whenever the list is refetched."""
+    entry = _cache_entry(user_id, resource, timeout=timeout, force=force)
+    return entry["items"], int(entry["version"])
+
+
+def invalidate_user_records(user_id: str, resource: str | None = None) -> None:
+    uid = str(user_id or "").strip()
+    if not uid:
+        return
+    for res in RESOURCE_LIST_KEYS if resource is None else (resource,):
+        _INVALIDATIONS[(uid, res)] = _INVALIDATIONS.get((uid, res), 0) + 1
+    if resource is None:
+        _USER_RECORDS_CACHE.pop(uid, None)
+        return
+    per_user = _USER_RECORDS_CACHE.get(uid)
+    if per_user:
+        per_user.pop(resource, None)
+
+
+def _on_records_change(event: ChangeEvent) -> None:
+    if event.resource in RESOURCE_LIST_KEYS:
+        invalidate_user_records(event.user_id, event.resource)
+
+
+subscribe("*", _on_records_change)
@@ -0,0 +1,110 @@
+"""Read-through cache of each user's Settings row (base currency, theme, categories, colors).
+
+Every page used to fetch ``GET /settings`` (or rely on a per-session 5 minute
+throttle, so each tab/device paid its own fetch). The row is now kept in memory
+per userId together with a version. Writes go through update_user_settings(),
+which PATCHes the API and publishes a "settings" ChangeEvent. That bumps the
+version and drops the entry in this worker; other workers drop theirs when they
+replay the event's change stamp (see app.services.events). A base-currency
+change is therefore visible to the next request in every tab and worker, and the
+caches keyed by base currency (Overview payload, quotes, lots) follow at once.
+
+NOTE: Per-process; the TTL only bounds staleness from writes made outside this app.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+import requests
+
+from app.services.events import ChangeEvent, publish_change, subscribe, sync_remote_changes
+from app.services.user_scope import filter_records_by_user
+from config import API_URL, aws_auth
+
+# userId -> {"ts": float, "row": dict, "version": int}
+_SETTINGS_CACHE: dict[str, dict] = {}
+# userId -> bumped on every invalidation; a fetch racing an invalidation is not stored.
+_SETTINGS_VERSION: dict[str, int] = {}
+
+
+def settings_cache_ttl_seconds() -> int:
+    try:
+        return max(0, int((os.getenv("USER_SETTINGS_CACHE_TTL_SECONDS") or "3600").strip()))
+    except Exception:
+        return 3600
+
+
+def settings_version(user_id: str) -> int:
+    return _SETTINGS_VERSION.get(str(user_id or "").strip(), 0)
+
+
+def _fetch_settings_row(user_id: str, *, timeout: int = 10) -> dict | None:
+    """The user's Settings row ({} when none exists), or None when the API call failed."""
+    try:
+        resp = requests.get(f"{API_URL}/settings", params={"userId": user_id}, auth=aws_auth, timeout=timeout)
+        if resp.status_code != 200:
+            print(f"Error fetching settings: HTTP {resp.status_code}")
+            return None
+        rows = filter_records_by_user(resp.json().get("settings", []), user_id)
+    except Exception as e:
+        print(f"Error fetching settings: {e}")
+        return None
+    return dict(rows[0] or {}) if rows and isinstance(rows, list) else {}
+
+
+def get_user_settings(user_id: str, *, force: bool = False) -> dict:
+    """The user's Settings row from memory, fetched on a miss; {} if none exists or the API failed.
+
+    The returned dict is shared between callers; treat it as read-only.
+    """
+    uid = str(user_id or "").strip()
+    if not uid:
+        return {}
+    sync_remote_changes(uid)
+    ttl = settings_cache_ttl_seconds()
+    cached = _SETTINGS_CACHE.get(uid)
+    if not force and cached and ttl > 0 and time.time() - cached["ts"] < ttl:
+        return cached["row"]
+
+    version = settings_version(uid)
+    row = _fetch_settings_row(uid)
+    if row is None:
+        # Keep serving the last known row through an API hiccup.
+        return cached["row"] if cached else {}
+    if ttl > 0 and settings_version(uid) == version:
+        _SETTINGS_CACHE[uid] = {"ts": time.time(), "row": row, "version": version}
+    return row
+
+
+def invalidate_user_settings(user_id: str) -> None:
+    uid = str(user_id or "").strip()
+    if not uid:
+        return
+    _SETTINGS_VERSION[uid] = _SETTINGS_VERSION.get(uid, 0) + 1
+    _SETTINGS_CACHE.pop(uid, None)
+
+
+def update_user_settings(user_id: str, fields: dict, *, timeout: int = 10) -> requests.Response:
+    """PATCH fields onto the user's Settings row and publish the change.
+
+    Raises on network errors like requests does; the caller inspects the status code.
+    """
+    uid = str(user_id or "").strip()
+    previous = (_SETTINGS_CACHE.get(uid) or {}).get("row")
+    resp = requests.patch(f"{API_URL}/settings", json={**fields, "userId": uid}, auth=aws_auth, timeout=timeout)
+    if resp.status_code in (200, 201):
+        publish_change("settings", uid, action="update")
+        if previous is not None and settings_cache_ttl_seconds() > 0:
+            # Write-through: this worker already knows the new row, no refetch needed.
+            row = {**previous, **fields, "userId": uid}
+            _SETTINGS_CACHE[uid] = {"ts": time.time(), "row": row, "version": settings_version(uid)}
+    return resp
+
+
+def _on_settings_change(event: ChangeEvent) -> None:
+    invalidate_user_settings(event.user_id)
+
+
+subscribe("settings", _on_settings_change)
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from app.services.user_records import get_user_records_versioned
+
+# userId -> WalletDirectory (rebuilt when the cached wallet list changes)
+_DIRECTORY_CACHE: dict[str, WalletDirectory] = {}
+
+
+def _text(val) -> str:
+    return (str(val) if val is not None else "").strip()
+
+
+def wallet_currency_field(wallet: dict) -> str:
+    """Raw currency of a wallet record (the API has used several field names over time)."""
+    w = wallet or {}
+    return _text(w.get("currency") or w.get("Currency") or w.get("walletCurrency") or w.get("wallet_currency"))
+
+
+class WalletDirectory:
+    """Lookup index over one user's wallets.
+
+    Transactions reference wallets by walletId, but older rows (and CSV imports)
+    may carry the wallet name instead; resolve() maps either to the walletId.
+    Name lookups are case-insensitive. ``version`` changes whenever the wallet
+    list is refetched, so downstream caches can key on it.
+    """
+
+    __slots__ = ("version", "wallets", "_ids", "_by_id", "_id_by_name", "_resolved")
+
+    def __init__(self, wallets: list, version: int = 0):
+        self.version = int(version)
+        self.wallets = [w for w in (wallets or []) if isinstance(w, dict)]
+        self._ids: list[str] = []
+        self._by_id: dict[str, dict] = {}
+        self._id_by_name: dict[str, str] = {}
+        # Memo for resolve(); the same few refs repeat across every transaction row.
+        self._resolved: dict = {}
+        for w in self.wallets:
+            wid = _text(w.get("walletId"))
+            if not wid:
+                continue
+            if wid not in self._by_id:
+                self._ids.append(wid)
+            self._by_id[wid] = w
+            name = _text(w.get("walletName")).lower()
+            if name:
+                self._id_by_name[name] = wid
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, wallet_id) -> bool:
+        return _text(wallet_id) in self._by_id
+
+    def ids(self) -> list[str]:
+        """Wallet ids in API order."""
+        return list(self._ids)
+
+    def get(self, wallet_id) -> dict | None:
+        return self._by_id.get(_text(wallet_id))
+
+    def lookup(self, ref) -> str | None:
+        """walletId for a wallet id or name, or None when it matches no wallet."""
+        s = _text(ref)
+        if not s:
+            return None
+        if s in self._by_id:
+            return s
+        return self._id_by_name.get(s.lower())
+
+    def resolve(self, ref) -> str:
+        """Normalize a fromWallet/toWallet value to a walletId.
+
+        Unknown references are returned as-is (stripped); empty and "none" give "".
+        """
+        try:
+            return self._resolved[ref]
+        except (KeyError, TypeError):
+            pass
+        s = _text(ref)
+        if not s or s.lower() == "none":
+            resolved = ""
+        else:
+            resolved = self.lookup(s) or s
+        try:
+            self._resolved[ref] = resolved
+        except TypeError:
+            pass
+        return resolved
+
+    def name(self, wallet_id, default: str | None = None) -> str:
+        wid = _text(wallet_id)
+        w = self._by_id.get(wid)
+        if w is None:
+            return wid if default is None else default
+        return w.get("walletName") or wid
+
+    def currency(self, wallet_id, default: str = "") -> str:
+        """Upper-cased wallet currency, or ``default`` when unknown/unset."""
+        w = self._by_id.get(_text(wallet_id))
+        ccy = wallet_currency_field(w).upper() if w is not None else ""
+        return ccy or default
+
+
+def get_wallet_directory(user_id: str, *, timeout: int = 12) -> WalletDirectory:
+    """Return the user's (cached) wallet directory, rebuilt only when the wallet list changes."""
+    uid = _text(user_id)
+    wallets, version = get_user_records_versioned(uid, "wallets", timeout=timeout)
+    cached = _DIRECTORY_CACHE.get(uid)
+    if cached is not None and cached.version == version:
+        return cached
+    directory = WalletDirectory(wallets, version)
+    _DIRECTORY_CACHE[uid] = directory
+    return directory
@@ -0,0 +1,79 @@
+"""Yahoo Finance multi-symbol quotes (spark endpoint).
+
+The chart endpoint answers one symbol per request. /v7/finance/spark takes a
+comma-separated symbol list and returns each symbol's chart meta (price,
+currency, market time, name), so a whole portfolio is priced in about one
+round-trip: symbols are split into YAHOO_SPARK_BATCH_SIZE chunks (default 20,
+the endpoint's limit) fetched concurrently over one keep-alive session.
+Symbols the endpoint leaves out are for the caller to fetch via the chart
+endpoint.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+YAHOO_SPARK_URL = "https://query1.finance.yahoo.com/v7/finance/spark"
+_MAX_CONCURRENCY = 6
+
+_HTTP = requests.Session()
+_HTTP.headers.update({"Accept": "application/json", "User-Agent": "Wallet-Front/1.0"})
+
+
+def _batch_size() -> int:
+    try:
+        return max(1, int((os.getenv("YAHOO_SPARK_BATCH_SIZE") or "20").strip()))
+    except Exception:
+        return 20
+
+
+def _spark_chunk(symbols: list[str]) -> dict:
+    r = _HTTP.get(YAHOO_SPARK_URL, params={"symbols": ",".join(symbols), "range": "1d", "interval": "1d"}, timeout=12)
+    r.raise_for_status()
+    results = ((r.json() or {}).get("spark") or {}).get("result") or []
+    metas = {}
+    for item in results:
+        sym = str((item or {}).get("symbol") or "").strip().upper()
+        responses = (item or {}).get("response") or []
+        meta = (responses[0] or {}).get("meta") if responses else None
+        if sym and meta and (meta.get("regularMarketPrice") is not None or meta.get("chartPreviousClose") is not None):
+            metas[sym] = meta
+    return metas
+
+
+def spark_quotes(symbols: list[str]) -> tuple[dict, dict]:
+    """Chart meta for many Yahoo symbols at once.
+
+    Returns (metas, errors): metas maps each priced symbol to its chart meta; errors maps
+    the symbols of chunks whose request failed to the reason. Symbols in neither were
+    not answered (unknown to the endpoint or returned without a price).
+    """
+    syms = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+    if not syms:
+        return {}, {}
+    size = _batch_size()
+    chunks = [syms[i : i + size] for i in range(0, len(syms), size)]
+
+    def run(chunk):
+        try:
+            return chunk, _spark_chunk(chunk), None
+        except Exception as e:
+            return chunk, None, str(e)
+
+    if len(chunks) == 1:
+        results = [run(chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(chunks), _MAX_CONCURRENCY)) as ex:
+            results = list(ex.map(run, chunks))
+    metas: dict = {}
+    errors: dict = {}
+    for chunk, found, error in results:
+        if error is not None:
+            print(f"[yahoo] spark request for {len(chunk)} symbols failed: {error}")
+            errors.update(dict.fromkeys(chunk, error))
+        else:
+            metas.update(found)
+    return metas, errors
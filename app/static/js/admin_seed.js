@@ -0,0 +1,41 @@
+// Admin tools: poll the progress of a bulk settings seed job.
+(function () {
+    const panel = document.getElementById('bulkSeedJob');
+    if (!panel) return;
+    const jobId = panel.dataset.jobId;
+    const stateEl = document.getElementById('bulkSeedState');
+    const countsEl = document.getElementById('bulkSeedCounts');
+    const bar = document.getElementById('bulkSeedBar');
+
+    function render(job) {
+        const done = job.written + job.skipped + job.failed;
+        const total = job.mode === 'apply' ? job.matched : 0;
+        stateEl.textContent = `${job.mode === 'apply' ? 'Apply' : 'Preview'} "${job.field}": ${job.state}` + (job.error ? ` (${job.error})` : '');
+        countsEl.textContent = job.mode === 'apply'
+            ? `${job.matched} rows missing the field · ${job.written} written · ${job.skipped} skipped · ${job.failed} failed`
+            : `${job.matched} rows missing the field`;
+        const pct = total > 0 ? Math.round((done / total) * 100) : (job.state === 'done' ? 100 : 0);
+        bar.style.width = `${pct}%`;
+        bar.textContent = `${pct}%`;
+        bar.classList.toggle('bg-danger', job.state === 'failed');
+        bar.classList.toggle('bg-success', job.state === 'done');
+    }
+
+    async function poll() {
+        try {
+            const resp = await fetch(`/admin/seed-settings/bulk/${encodeURIComponent(jobId)}`, { cache: 'no-store' });
+            if (!resp.ok) {
+                stateEl.textContent = 'Job not found.';
+                return;
+            }
+            const job = await resp.json();
+            render(job);
+            if (job.state === 'done' || job.state === 'failed') return;
+        } catch (e) {
+            // Transient network error: keep polling.
+        }
+        setTimeout(poll, 1000);
+    }
+
+    poll();
+})();
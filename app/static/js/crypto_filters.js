@@ -0,0 +1,201 @@
+// Utilities for client-side filtering
+function parseLocalDateTime(val) {
+    if (!val) return null;
+    try { return new Date(val); } catch(e) { return null; }
+}
+function parseTxDate(val) {
+    if (!val) return null;
+    // Keep date-only values in local time to avoid timezone day shifts.
+    let s = String(val).trim();
+    if (/^\d{4}-\d{2}-\d{2}$/.test(s)) {
+        const localDateOnly = new Date(`${s}T00:00:00`);
+        return isNaN(localDateOnly) ? null : localDateOnly;
+    }
+    // Attempt ISO, then fallback by replacing space with T
+    let d = new Date(s);
+    if (isNaN(d)) {
+        d = new Date(s.replace(' ', 'T'));
+    }
+    return isNaN(d) ? null : d;
+}
+
+function dayKeyFromDate(d) {
+    if (!d || isNaN(d)) return 'unknown';
+    const y = d.getFullYear();
+    const m = String(d.getMonth() + 1).padStart(2, '0');
+    const day = String(d.getDate()).padStart(2, '0');
+    return `${y}-${m}-${day}`;
+}
+
+function dayLabelFromDate(d) {
+    if (!d || isNaN(d)) return 'Unknown date';
+    try {
+        return d.toLocaleDateString('en-GB', { day: '2-digit', month: 'short', year: 'numeric' });
+    } catch (e) {
+        return `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`;
+    }
+}
+
+function buildCryptoDayGroups() {
+    const list = document.getElementById('cryptoList');
+    if (!list) return;
+
+    // Remove existing headers
+    list.querySelectorAll('li.crypto-group-header').forEach(h => h.remove());
+
+    // Only group real transaction items
+    const txItems = Array.from(list.querySelectorAll('li[data-tdate]'));
+    if (!txItems.length) return;
+
+    let currentKey = null;
+    txItems.forEach(li => {
+        const d = parseTxDate(li.getAttribute('data-tdate'));
+        const key = dayKeyFromDate(d);
+        li.setAttribute('data-group', key);
+
+        if (key !== currentKey) {
+            const header = document.createElement('li');
+            header.className = 'crypto-group-header';
+            header.setAttribute('data-group', key);
+            header.textContent = dayLabelFromDate(d);
+            list.insertBefore(header, li);
+            currentKey = key;
+        }
+    });
+}
+
+function syncCryptoGroupHeaders() {
+    const list = document.getElementById('cryptoList');
+    if (!list) return;
+
+    const headers = Array.from(list.querySelectorAll('li.crypto-group-header'));
+    if (!headers.length) return;
+
+    const txItems = Array.from(list.querySelectorAll('li[data-tdate]'));
+    headers.forEach(h => {
+        const key = h.getAttribute('data-group') || '';
+        const anyVisible = txItems.some(li => {
+            if ((li.getAttribute('data-group') || '') !== key) return false;
+            return li.style.display !== 'none';
+        });
+        h.style.display = anyVisible ? '' : 'none';
+    });
+}
+
+function ensureCryptoGroupsBuilt(force) {
+    const list = document.getElementById('cryptoList');
+    if (!list) return;
+    const hasHeaders = !!list.querySelector('li.crypto-group-header');
+    if (force || !hasHeaders) {
+        buildCryptoDayGroups();
+    }
+    syncCryptoGroupHeaders();
+}
+
+function applyCryptoFilters() {
+    const list = document.getElementById('cryptoList');
+    if (!list) return;
+    // Ensure day grouping headers exist, but only filter real tx items.
+    ensureCryptoGroupsBuilt(false);
+    const items = Array.from(list.querySelectorAll('li[data-tdate]'));
+    const startVal = document.getElementById('filterStart')?.value || '';
+    const endVal = document.getElementById('filterEnd')?.value || '';
+    const cryptoVal = (document.getElementById('filterCrypto')?.value || '').trim().toLowerCase();
+    const noteVal = (document.getElementById('filterNote')?.value || '').trim().toLowerCase();
+    const fromVal = document.getElementById('filterFromWallet')?.value || '';
+    const toVal = document.getElementById('filterToWallet')?.value || '';
+
+    const startDt = parseLocalDateTime(startVal);
+    const endDt = parseLocalDateTime(endVal);
+
+    // Pagination state
+    if (window.cryptoPageSize == null) window.cryptoPageSize = 20;
+    if (window.cryptoCurrentPage == null) window.cryptoCurrentPage = 1;
+
+    function itemMatches(li) {
+        let show = true;
+        const tdate = parseTxDate(li.getAttribute('data-tdate'));
+        if (startDt && tdate && tdate < startDt) show = false;
+        if (endDt && tdate && tdate > endDt) show = false;
+        // If date filters exist but tx date invalid, hide
+        if ((startDt || endDt) && !tdate) show = false;
+
+        if (show && cryptoVal) {
+            const name = (li.getAttribute('data-crypto') || '').toLowerCase();
+            const symbol = name.includes(' - ') ? name.split(' - ')[0] : name;
+            const typed = cryptoVal;
+            // match typed against symbol or full name
+            if (!(symbol.includes(typed) || name.includes(typed))) show = false;
+        }
+        if (show && fromVal) {
+            const fromAttr = (li.getAttribute('data-from') || '').trim();
+            if (String(fromAttr) !== String(fromVal)) show = false;
+        }
+        if (show && toVal) {
+            const toAttr = (li.getAttribute('data-to') || '').trim();
+            if (String(toAttr) !== String(toVal)) show = false;
+        }
+
+        if (show && noteVal) {
+            const noteAttr = (li.getAttribute('data-note') || '').toLowerCase();
+            if (!noteAttr.includes(noteVal)) show = false;
+        }
+
+        return show;
+    }
+
+    const matching = items.filter(itemMatches);
+    const total = matching.length;
+    const pageSize = Number(window.cryptoPageSize) || 20;
+    const totalPages = Math.max(1, Math.ceil(total / pageSize));
+    window.cryptoCurrentPage = Math.min(Math.max(1, Number(window.cryptoCurrentPage) || 1), totalPages);
+
+    // Hide everything first
+    items.forEach(li => { li.style.display = 'none'; });
+
+    // Show only the current page slice
+    const startIdx = (window.cryptoCurrentPage - 1) * pageSize;
+    const endIdx = startIdx + pageSize;
+    matching.slice(startIdx, endIdx).forEach(li => { li.style.display = ''; });
+
+    syncCryptoGroupHeaders();
+
+    const emptyMsg = document.getElementById('filterEmptyMsg');
+    if (emptyMsg) emptyMsg.style.display = total ? 'none' : '';
+
+    // Update pagination controls
+    const pager = document.getElementById('cryptoPagination');
+    const pageInfo = document.getElementById('cryptoPageInfo');
+    const prevBtn = document.getElementById('cryptoPrevPage');
+    const nextBtn = document.getElementById('cryptoNextPage');
+    if (pager) {
+        pager.style.display = total ? '' : 'none';
+    }
+    if (pageInfo) {
+        pageInfo.textContent = `Page ${window.cryptoCurrentPage} of ${totalPages}`;
+    }
+    if (prevBtn) prevBtn.disabled = window.cryptoCurrentPage <= 1;
+    if (nextBtn) nextBtn.disabled = window.cryptoCurrentPage >= totalPages;
+}
+
+function resetCryptoFilters() {
+    ['filterStart','filterEnd','filterCrypto','filterNote','filterFromWallet','filterToWallet'].forEach(id => {
+        const el = document.getElementById(id);
+        if (!el) return;
+
+        if (el.tagName === 'SELECT') el.selectedIndex = 0;
+        else el.value = '';
+    });
+    window.cryptoCurrentPage = 1;
+    applyCryptoFilters();
+}
+
+function cryptoGoToPrevPage() {
+    window.cryptoCurrentPage = Math.max(1, (Number(window.cryptoCurrentPage) || 1) - 1);
+    applyCryptoFilters();
+}
+
+function cryptoGoToNextPage() {
+    window.cryptoCurrentPage = (Number(window.cryptoCurrentPage) || 1) + 1;
+    applyCryptoFilters();
+}
@@ -0,0 +1,1306 @@
+function setCryptoNavVisibility(activeView) {
+    const btns = Array.from(document.querySelectorAll('[data-crypto-nav]'));
+    btns.forEach(btn => {
+        const v = String(btn.getAttribute('data-crypto-nav') || '').trim();
+        const isActive = (v && v === String(activeView || ''));
+        if (isActive) btn.setAttribute('aria-current', 'page');
+        else btn.removeAttribute('aria-current');
+        btn.classList.toggle('is-active', isActive);
+    });
+}
+
+function showCryptoPortfolio() {
+    const title = document.getElementById('cryptoPageTitle');
+    const panel = document.getElementById('panel');
+    const walletsPanel = document.getElementById('cryptoWalletsPanel');
+    const listDiv = document.getElementById('cryptoListDiv');
+    const newDiv = document.getElementById('newCrypto');
+    const updateDiv = document.getElementById('updateCryptoDiv');
+    const sectionTitle = document.querySelector('#cryptoListDiv .crypto-section-title');
+
+    document.body.classList.remove('crypto-mode-history');
+    if (title) title.innerText = 'Crypto Portfolio';
+    if (panel) panel.style.display = 'block';
+    if (walletsPanel) walletsPanel.style.display = 'none';
+    if (listDiv) listDiv.style.display = 'none';
+    if (newDiv) newDiv.style.display = 'none';
+    if (updateDiv) updateDiv.style.display = 'none';
+    if (sectionTitle) sectionTitle.style.display = '';
+
+    setCryptoNavVisibility('portfolio');
+}
+
+function showCryptoNew() {
+    const title = document.getElementById('cryptoPageTitle');
+    const panel = document.getElementById('panel');
+    const walletsPanel = document.getElementById('cryptoWalletsPanel');
+    const listDiv = document.getElementById('cryptoListDiv');
+    const newDiv = document.getElementById('newCrypto');
+    const updateDiv = document.getElementById('updateCryptoDiv');
+    const sectionTitle = document.querySelector('#cryptoListDiv .crypto-section-title');
+
+    document.body.classList.remove('crypto-mode-history');
+    if (title) title.innerText = 'New Crypto Transaction';
+    if (newDiv) newDiv.style.display = 'block';
+    if (updateDiv) updateDiv.style.display = 'none';
+    if (panel) panel.style.display = 'none';
+    if (walletsPanel) walletsPanel.style.display = 'none';
+    if (listDiv) listDiv.style.display = 'none';
+    if (sectionTitle) sectionTitle.style.display = '';
+
+    setCryptoNavVisibility('new');
+}
+
+function showCryptoHistory() {
+    const title = document.getElementById('cryptoPageTitle');
+    const panel = document.getElementById('panel');
+    const walletsPanel = document.getElementById('cryptoWalletsPanel');
+    const listDiv = document.getElementById('cryptoListDiv');
+    const newDiv = document.getElementById('newCrypto');
+    const updateDiv = document.getElementById('updateCryptoDiv');
+    const sectionTitle = document.querySelector('#cryptoListDiv .crypto-section-title');
+
+    document.body.classList.add('crypto-mode-history');
+    if (title) title.innerText = 'Cryptos Transactions History';
+    if (listDiv) listDiv.style.display = 'block';
+    if (newDiv) newDiv.style.display = 'none';
+    if (updateDiv) updateDiv.style.display = 'none';
+    if (panel) panel.style.display = 'none';
+    if (walletsPanel) walletsPanel.style.display = 'none';
+    if (sectionTitle) sectionTitle.style.display = 'none';
+
+    setCryptoNavVisibility('history');
+    if (typeof applyCryptoFilters === 'function') { applyCryptoFilters(); }
+}
+
+function showCryptoUpdate() {
+    const title = document.getElementById('cryptoPageTitle');
+    const panel = document.getElementById('panel');
+    const walletsPanel = document.getElementById('cryptoWalletsPanel');
+    const listDiv = document.getElementById('cryptoListDiv');
+    const newDiv = document.getElementById('newCrypto');
+    const updateDiv = document.getElementById('updateCryptoDiv');
+    const sectionTitle = document.querySelector('#cryptoListDiv .crypto-section-title');
+
+    document.body.classList.remove('crypto-mode-history');
+    if (title) title.innerText = 'Update Crypto Transaction';
+    if (updateDiv) updateDiv.style.display = 'block';
+    if (newDiv) newDiv.style.display = 'none';
+    if (listDiv) listDiv.style.display = 'none';
+    if (panel) panel.style.display = 'none';
+    if (walletsPanel) walletsPanel.style.display = 'none';
+    if (sectionTitle) sectionTitle.style.display = '';
+
+    // Update view doesn't have its own nav button, so keep all visible.
+    setCryptoNavVisibility('update');
+}
+
+function showCryptoWallets() {
+    const title = document.getElementById('cryptoPageTitle');
+    const panel = document.getElementById('panel');
+    const walletsPanel = document.getElementById('cryptoWalletsPanel');
+    const listDiv = document.getElementById('cryptoListDiv');
+    const newDiv = document.getElementById('newCrypto');
+    const updateDiv = document.getElementById('updateCryptoDiv');
+    const sectionTitle = document.querySelector('#cryptoListDiv .crypto-section-title');
+
+    document.body.classList.remove('crypto-mode-history');
+    if (title) title.innerText = 'Wallet Contents';
+    if (walletsPanel) walletsPanel.style.display = 'block';
+    if (panel) panel.style.display = 'none';
+    if (listDiv) listDiv.style.display = 'none';
+    if (newDiv) newDiv.style.display = 'none';
+    if (updateDiv) updateDiv.style.display = 'none';
+    if (sectionTitle) sectionTitle.style.display = '';
+
+    setCryptoNavVisibility('wallets');
+}
+window.showCryptoWallets = showCryptoWallets;
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Default view is Portfolio; hide its button.
+    setCryptoNavVisibility('portfolio');
+});
+
+function editCrypto(cryptoId, userId, cryptoName, tdate, fromWallet, toWallet, operation, quantity, price, currency, fee, feeCurrency, note) {
+    document.getElementById("updateCryptoId").value = cryptoId;
+    document.getElementById("updateUserId").value = userId;
+    // set update visible input and hidden value; prefer uppercase symbol when available
+    const updateHidden = document.getElementById('updateCryptoName');
+    const updateVisible = document.getElementById('updateCryptoSearch');
+    try {
+        const coinsDataElem = document.getElementById('coins-data');
+        let coins = [];
+        if (coinsDataElem && coinsDataElem.dataset.coins) {
+            coins = JSON.parse(coinsDataElem.dataset.coins);
+        }
+        let matched = null;
+        if (cryptoName) {
+            const cLower = (cryptoName||'').toLowerCase();
+            matched = coins.find(c => (c.id||'').toLowerCase() === cLower || (c.symbol||'').toLowerCase() === cLower || (c.name||'').toLowerCase() === cLower);
+        }
+        if (matched) {
+            if (updateVisible) updateVisible.value = `${(matched.symbol||'').toUpperCase()} - ${matched.name}`;
+            if (updateHidden) updateHidden.value = (matched.symbol||'').toUpperCase() || matched.id || matched.name;
+        } else {
+            if (updateVisible) updateVisible.value = cryptoName || '';
+            if (updateHidden) updateHidden.value = (cryptoName||'').toUpperCase();
+        }
+    } catch (e) {
+        if (updateVisible) updateVisible.value = cryptoName || '';
+        if (updateHidden) updateHidden.value = (cryptoName||'').toUpperCase();
+    }
+    {
+        const el = document.getElementById("updateTdate");
+        if (el) el.value = (tdate || '').slice(0, 10);
+    }
+    document.getElementById("updateFromWallet").value = fromWallet;
+    document.getElementById("updateToWallet").value = toWallet;
+    document.getElementById("updateOperation").value = operation;
+    document.getElementById("updateQuantity").value = quantity;
+    document.getElementById("updatePrice").value = price;
+    document.getElementById("updateCurrency").value = currency;
+    document.getElementById("updateFee").value = fee;
+    {
+        const el = document.getElementById("updateFeeCurrency");
+        if (el) {
+            el.value = feeCurrency || currency || 'EUR';
+            el.dataset.userSelected = '1';
+        }
+    }
+    document.getElementById("updateNote").value = note;
+    showCryptoUpdate();
+    document.getElementById("deleteForm").action = `/deleteCrypto/${cryptoId}/${userId}`;
+
+    // Match the New Crypto Transaction layout: use the header title for consistent spacing.
+    document.body.classList.remove('crypto-mode-history');
+    const title = document.getElementById('cryptoPageTitle');
+    if (title) {
+        title.innerText = 'Update Crypto Transaction';
+        title.style.display = '';
+    }
+
+    // Ensure Transfer-specific UI is applied for update form.
+    if (typeof syncCryptoOperationUI === 'function') {
+        syncCryptoOperationUI('update');
+    }
+}  
+
+function _escapeHtml(s) {
+    return String(s ?? '').replace(/[&<>"']/g, function(ch) {
+        switch(ch) { case '&': return '&amp;'; case '<': return '&lt;'; case '>': return '&gt;'; case '"': return '&quot;'; case "'": return '&#39;'; default: return ch; }
+    });
+}
+
+function _populateCryptoWalletSelects(wallets) {
+    var sorted = (wallets || []).slice().sort(function(a, b) {
+        return String(a.walletName || '').localeCompare(String(b.walletName || ''));
+    });
+    var selectIds = ['fromWallet','toWallet','updateFromWallet','updateToWallet','filterFromWallet','filterToWallet'];
+    selectIds.forEach(function(id) {
+        var sel = document.getElementById(id);
+        if (!sel) return;
+        while (sel.options.length > 1) sel.remove(1);
+        sorted.forEach(function(w) {
+            var opt = document.createElement('option');
+            opt.value = w.walletId || '';
+            var label = w.walletName || w.walletId || '';
+            if (w.walletType) label += ' - ' + w.walletType;
+            if (w.currency) label += ' - ' + w.currency;
+            opt.textContent = label;
+            sel.appendChild(opt);
+        });
+    });
+}
+
+function _formatNumber(value, maxDigits) {
+    var v = Number(value);
+    if (!isFinite(v)) return '0';
+
+    // For very small numbers, use more decimal places instead of rounding to 0
+    var digits = typeof maxDigits === 'number' ? maxDigits : 6;
+    if (v !== 0 && Math.abs(v) < 0.01) {
+        // Use up to 12 decimal places for small numbers
+        digits = Math.max(digits, 12);
+    }
+
+    var opts = { maximumFractionDigits: digits };
+    try { return new Intl.NumberFormat(undefined, opts).format(v); } catch (e) { return String(v); }
+}
+
+function _formatOverviewValue(value) {
+    var v = Number(value);
+    if (!isFinite(v)) return '0';
+    try {
+        return new Intl.NumberFormat(undefined, { maximumFractionDigits: 2 }).format(v);
+    } catch (e) {
+        return String(v);
+    }
+}
+
+function _truncateTo(value, digits) {
+    var factor = Math.pow(10, digits);
+    if (!isFinite(factor) || factor === 0) return value;
+    return value < 0 ? Math.ceil(value * factor) / factor : Math.floor(value * factor) / factor;
+}
+
+function _formatOverviewUnitPrice(value) {
+    var v = Number(value);
+    if (!isFinite(v)) return '0';
+
+    var abs = Math.abs(v);
+    var digits = 2;
+    if (abs > 0 && abs < 1) {
+        var leadingZeros = Math.max(0, Math.ceil(-Math.log10(abs)) - 1);
+        digits = Math.min(12, leadingZeros + 2);
+    }
+
+    var truncated = _truncateTo(v, digits);
+    try {
+        return new Intl.NumberFormat(undefined, {
+            maximumFractionDigits: digits
+        }).format(truncated);
+    } catch (e) {
+        return String(truncated);
+    }
+}
+
+function _formatOverviewQuantity(value) {
+    var v = Number(value);
+    if (!isFinite(v)) return '0';
+
+    var abs = Math.abs(v);
+    var digits = 4;
+    if (abs > 0 && abs < 1) {
+        var leadingZeros = Math.max(0, Math.ceil(-Math.log10(abs)) - 1);
+        digits = Math.min(12, leadingZeros + 4);
+    }
+
+    var truncated = _truncateTo(v, digits);
+    try {
+        return new Intl.NumberFormat(undefined, {
+            maximumFractionDigits: digits
+        }).format(truncated);
+    } catch (e) {
+        return String(truncated);
+    }
+}
+
+function _buildCryptoTotals(totals, baseCurrency) {
+    var grid = document.getElementById('cryptoTotalsGrid');
+    var emptyMsg = document.getElementById('cryptoTotalsEmpty');
+    if (!grid) return;
+
+    if (!totals || !totals.length) {
+        grid.innerHTML = '';
+        if (emptyMsg) emptyMsg.style.display = '';
+        return;
+    }
+    if (emptyMsg) emptyMsg.style.display = 'none';
+
+    var sorted = totals.slice().sort(function(a, b) {
+        return String(a.cryptoName || '').toLowerCase().localeCompare(String(b.cryptoName || '').toLowerCase());
+    });
+
+    grid.innerHTML = sorted.map(function(t) {
+        var cur = t.currency ? ' ' + _escapeHtml(t.currency) : '';
+
+        var displaySymbol = t.cryptoName.indexOf(' - ') >= 0 ? t.cryptoName.split(' - ')[0].trim() : t.cryptoName;
+        var inlineName = t.cryptoName.indexOf(' - ') >= 0 ? t.cryptoName.split(' - ').slice(1).join(' - ').trim() : '';
+        return '<div class="totals-card" data-crypto-symbol="' + _escapeHtml(t.cryptoName) + '" data-crypto-qty="' + t.total_qty + '" data-crypto-cost="' + (t.total_value || 0) + '" data-crypto-buy="' + (t.total_value_buy || 0) + '" data-crypto-sell="' + (t.total_value_sell || 0) + '">'
+            + '<div class="totals-header"><div>'
+            + '<div style="font-size:1rem;font-weight:700"><span class="crypto-symbol">' + _escapeHtml(displaySymbol) + '</span><span data-crypto-fullname class="small-muted" style="margin-left:8px;font-weight:600;">' + _escapeHtml(inlineName) + '</span></div>'
+            + '</div>'
+            + '</div>'
+            + '<div class="totals-meta">'
+            + '<div class="totals-row"><span class="totals-label small-muted">Total Quantity:</span><span class="totals-value">' + _escapeHtml(t.total_qty_display || '') + '</span></div>'
+            + '<div class="totals-row"><span class="totals-label small-muted">Total Value Now:</span><span class="totals-value" data-crypto-now>\u2014</span></div>'
+            + '<div class="totals-row"><span class="totals-label small-muted">Cost Basis:</span><span class="totals-value">' + _escapeHtml(_formatOverviewValue(t.total_value || 0)) + cur + '</span></div>'
+            + '<div class="totals-row"><span class="totals-label small-muted">Unit price now:</span><span class="totals-value" data-crypto-live>\u2014</span></div>'
+            + '<div class="totals-row"><span class="totals-label small-muted">Avg Buy Price:</span><span class="totals-value">' + (t.avg_buy_price == null ? '\u2014' : _escapeHtml(_formatOverviewUnitPrice(t.avg_buy_price))) + cur + '</span></div>'
+            + '<div class="totals-row"><span class="totals-label small-muted">Fees paid:</span><span class="totals-value">' + ((Number(t.total_fee || 0) > 0) ? _escapeHtml(_formatOverviewUnitPrice(t.total_fee)) : '\u2014') + cur + '</span></div>'
+            + '<div class="totals-row"><span class="totals-label small-muted">Realized P/L:</span><span class="totals-value" data-crypto-realized>\u2014 (N/A)</span></div>'
+            + '<div class="totals-row"><span class="totals-label small-muted">Unrealized P/L:</span><span class="totals-value" data-crypto-unrealized>\u2014 (N/A)</span></div>'
+            + '<div class="totals-row"><span class="totals-label small-muted">Total Gain / Loss:</span><span class="totals-value" style="font-weight:bold;" data-crypto-gl>\u2014 (N/A)</span></div>'
+            + '</div></div>';
+    }).join('');
+}
+
+function _buildCryptoWalletHoldings(walletHoldings, baseCurrency) {
+    var grid = document.getElementById('cryptoWalletsGrid');
+    var emptyMsg = document.getElementById('cryptoWalletsEmpty');
+    if (!grid) return;
+
+    var withHoldings = (walletHoldings || []).filter(function(w) { return w.holdings && w.holdings.length; });
+    if (!withHoldings.length) {
+        grid.innerHTML = '';
+        if (emptyMsg) emptyMsg.style.display = '';
+        return;
+    }
+    if (emptyMsg) emptyMsg.style.display = 'none';
+
+    var sorted = withHoldings.slice().sort(function(a, b) {
+        return String(a.walletName || '').toLowerCase().localeCompare(String(b.walletName || '').toLowerCase());
+    });
+
+    var bc = baseCurrency || 'EUR';
+    grid.innerHTML = sorted.map(function(w) {
+        var holdingsSorted = (w.holdings || []).slice().sort(function(a, b) {
+            return String(a.cryptoName || '').toLowerCase().localeCompare(String(b.cryptoName || '').toLowerCase());
+        });
+        return '<div class="totals-card" data-wallet-card>'
+            + '<div class="totals-header">'
+            + '<div class="crypto-wallets-header-title">' + _escapeHtml(w.walletName || w.walletId) + '</div>'
+            + '<div class="pct-badge pct-neutral crypto-wallets-total-badge" data-wallet-total>\u2014 ' + _escapeHtml(bc) + '</div>'
+            + '</div>'
+            + '<div class="totals-meta crypto-wallets-list">'
+            + holdingsSorted.map(function(h) {
+                return '<div class="crypto-wallets-row" data-holding-symbol="' + _escapeHtml(h.cryptoName) + '" data-holding-qty="' + (h.qty || 0) + '" data-holding-cost="' + (h.cost_basis || 0) + '">'
+                    + '<div class="crypto-wallets-left">'
+                    + '<span class="crypto-wallets-symbol" data-holding-name>' + _escapeHtml(h.cryptoName) + '</span>'
+                    + '<span class="crypto-wallets-qty">' + _escapeHtml(String(h.qty != null ? h.qty : (h.qty_display || 0))) + '</span>'
+                    + '</div>'
+                    + '<div class="crypto-wallets-right">'
+                    + '<div class="wallet-contents-value" data-holding-value>\u2014 ' + _escapeHtml(bc) + '</div>'
+                    + '<div class="wallet-contents-gl" data-holding-gl>\u2014</div>'
+                    + '</div>'
+                    + '</div>';
+            }).join('')
+            + '</div></div>';
+    }).join('');
+}
+
+function _buildCryptoHistoryList(cryptos, wallets) {
+    var list = document.getElementById('cryptoList');
+    var emptyMsg = document.getElementById('cryptoListEmpty');
+    if (!list) return;
+
+    var walletNameById = {};
+    (wallets || []).forEach(function(w) {
+        if (w.walletId) walletNameById[w.walletId] = w.walletName || w.walletId;
+    });
+
+    if (!cryptos || !cryptos.length) {
+        list.innerHTML = '';
+        if (emptyMsg) emptyMsg.style.display = '';
+        return;
+    }
+    if (emptyMsg) emptyMsg.style.display = 'none';
+
+    list.innerHTML = cryptos.map(function(c) {
+        var op = String(c.operation || c.side || '').trim();
+        var note = String(c.note || '').trim();
+        var fromW = String(c.fromWallet || '').trim();
+        var toW = String(c.toWallet || '').trim();
+        var fromName = fromW ? (walletNameById[fromW] || fromW) : '';
+        var toName = toW ? (walletNameById[toW] || toW) : '';
+        var walletLine = '';
+        if (fromName && toName) walletLine = fromName + ' -> ' + toName;
+        else if (fromName || toName) walletLine = fromName || toName;
+        var isTransfer = op.toLowerCase() === 'transfer';
+        var qtyNum = Number(String(c.quantity || 0).replace(',', '.'));
+        var priceNum = Number(String(c.price || 0).replace(',', '.'));
+        var feeNum = Number(String(c.fee || 0).replace(',', '.'));
+        var totalNum = (isFinite(qtyNum) ? qtyNum : 0) * (isFinite(priceNum) ? priceNum : 0) + (isFinite(feeNum) ? feeNum : 0);
+        var totalText = _formatNumber(totalNum, 2) + (c.currency ? ' ' + _escapeHtml(c.currency) : '');
+
+        return '<li data-id="' + _escapeHtml(c.cryptoId || '') + '" data-tdate="' + _escapeHtml(c.tdate || '') + '" data-crypto="' + _escapeHtml(c.cryptoName || '') + '" data-operation="' + _escapeHtml(op) + '" data-qty="' + _escapeHtml(c.quantity || '') + '" data-fee="' + _escapeHtml(c.fee || 0) + '" data-note="' + _escapeHtml(note) + '" data-from="' + _escapeHtml(c.fromWallet || '') + '" data-to="' + _escapeHtml(c.toWallet || '') + '">'
+            + '<div class="crypto-history-row">'
+            + '<div class="crypto-history-left">'
+            + '<div class="crypto-history-title">' + _escapeHtml(c.cryptoName || '') + '</div>'
+            + '<div class="crypto-history-sub">' + _escapeHtml(op) + '</div>'
+            + (walletLine ? '<div class="crypto-history-sub">' + _escapeHtml(walletLine) + '</div>' : '')
+            + '</div>'
+            + '<div class="crypto-history-right">'
+            + '<div class="crypto-history-amount">' + _escapeHtml(c.quantity || '') + '</div>'
+            + (!isTransfer ? '<div class="crypto-history-sub">' + totalText + '</div>' : '')
+            + (note ? '<div class="crypto-history-sub">' + _escapeHtml(note) + '</div>' : '')
+            + '</div>'
+            + '<div class="crypto-history-actions">'
+            + '<button class="btn-insert" onclick="editCrypto(\'' + _escapeHtml(c.cryptoId || '') + '\',\'' + _escapeHtml(c.userId || '') + '\',\'' + _escapeHtml(c.cryptoName || '') + '\',\'' + _escapeHtml(c.tdate || '') + '\',\'' + _escapeHtml(c.fromWallet || '') + '\',\'' + _escapeHtml(c.toWallet || '') + '\',\'' + _escapeHtml(op) + '\',\'' + _escapeHtml(c.quantity || '') + '\',\'' + _escapeHtml(c.price || '') + '\',\'' + _escapeHtml(c.currency || '') + '\',\'' + _escapeHtml(c.fee || '') + '\',\'' + _escapeHtml(c.feeCurrency || c.currency || '') + '\',\'' + _escapeHtml(note) + '\')">Edit</button>'
+            + '</div>'
+            + '</div>'
+            + '</li>';
+    }).join('');
+
+    // Sort by date descending
+    var items = Array.from(list.querySelectorAll('li[data-tdate]'));
+    items.sort(function(a, b) {
+        var dateA = new Date(a.getAttribute('data-tdate') || 0);
+        var dateB = new Date(b.getAttribute('data-tdate') || 0);
+        return dateB - dateA;
+    });
+    items.forEach(function(item) { list.appendChild(item); });
+    if (typeof ensureCryptoGroupsBuilt === 'function') ensureCryptoGroupsBuilt(true);
+}
+
+document.addEventListener("DOMContentLoaded", function() {
+    // initialize autocomplete with coins data passed from server (via data attribute)
+    let coinsDataElem = document.getElementById('coins-data');
+    let coinsList = [];
+    if (coinsDataElem && coinsDataElem.dataset && coinsDataElem.dataset.coins) {
+        try { coinsList = JSON.parse(coinsDataElem.dataset.coins); } catch(e) { coinsList = []; }
+    }
+
+    // DexScreener-backed remote suggestions (keeps selection-only UX, but allows new tokens)
+    function mergeCoinsInPlace(newCoins) {
+        try {
+            if (!Array.isArray(newCoins) || !newCoins.length) return;
+            const seen = new Set();
+            for (let c of coinsList) {
+                const sym = String((c && c.symbol) || '').trim().toUpperCase();
+                if (sym) seen.add(sym);
+            }
+            for (let c of newCoins) {
+                if (!c) continue;
+                const sym = String(c.symbol || '').trim().toUpperCase();
+                const name = String(c.name || '').trim() || sym;
+                if (!sym || seen.has(sym)) continue;
+                seen.add(sym);
+                coinsList.push({ id: sym.toLowerCase(), symbol: sym, name });
+            }
+        } catch (e) {}
+    }
+
+    // Upgrade existing items when remote results provide a better full name.
+    // Example: local has {symbol:'BTC', name:'BTC'} but DexScreener suggests name:'Bitcoin'.
+    function upgradeCoinNamesInPlace(newCoins) {
+        try {
+            if (!Array.isArray(newCoins) || !newCoins.length) return;
+            const bySym = new Map();
+            for (let i = 0; i < coinsList.length; i++) {
+                const sym = String((coinsList[i] && coinsList[i].symbol) || '').trim().toUpperCase();
+                if (sym) bySym.set(sym, i);
+            }
+            for (let c of newCoins) {
+                const sym = String((c && c.symbol) || '').trim().toUpperCase();
+                const name = String((c && c.name) || '').trim();
+                if (!sym || !name) continue;
+                const idx = bySym.get(sym);
+                if (idx === undefined) continue;
+                const curName = String((coinsList[idx] && coinsList[idx].name) || '').trim();
+                if (!curName || curName.toUpperCase() === sym) {
+                    if (name.toUpperCase() !== sym) coinsList[idx].name = name;
+                }
+            }
+        } catch (e) {}
+    }
+
+    async function fetchDexSuggestions(query) {
+        const q = String(query || '').trim();
+        if (q.length < 2) return;
+        try {
+            const url = `/crypto/search?q=${encodeURIComponent(q)}`;
+            const resp = await fetch(url, { headers: { 'Accept': 'application/json' } });
+            if (!resp || !resp.ok) return;
+            const data = await resp.json();
+            const incoming = (data && data.coins) ? data.coins : [];
+            upgradeCoinNamesInPlace(incoming);
+            mergeCoinsInPlace(incoming);
+        } catch (e) {}
+    }
+
+    function attachDexSuggestions(inputElem) {
+        if (!inputElem) return;
+        let timer = null;
+        let lastQ = '';
+        inputElem.addEventListener('input', function() {
+            const q = String(inputElem.value || '').trim();
+            if (q.length < 2 || q === lastQ) return;
+            lastQ = q;
+            if (timer) clearTimeout(timer);
+            timer = setTimeout(() => { fetchDexSuggestions(q); }, 200);
+        });
+    }
+
+    // Attach before initAutocomplete so early typing gets suggestions too.
+    attachDexSuggestions(document.getElementById('cryptoSearch'));
+    attachDexSuggestions(document.getElementById('updateCryptoSearch'));
+
+    initAutocomplete('cryptoSearch','cryptoSearchList','cryptoName', coinsList);
+    initAutocomplete('updateCryptoSearch','updateCryptoSearchList','updateCryptoName', coinsList);
+    // No autocomplete for the history filter crypto field (free text filter)
+
+    // apply percent-fill widths for visual bars (using data attributes to avoid inline css parsing issues)
+    const fills = document.querySelectorAll('.pct-fill');
+    fills.forEach(f => {
+        const v = f.getAttribute('data-fill');
+        if (v !== null && v !== undefined) {
+            const num = parseFloat(v) || 0;
+            f.style.width = (Math.max(0, Math.min(100, num))) + '%';
+        }
+    });
+
+    // enforce selection-only behaviour: on blur clear free text, on submit block if not selected
+    const createInput = document.getElementById('cryptoSearch');
+    const updateInput = document.getElementById('updateCryptoSearch');
+    const createHidden = document.getElementById('cryptoName');
+    const updateHidden = document.getElementById('updateCryptoName');
+
+    function matchCoinByText(text) {
+        if (!text) return null;
+        const t = text.trim().toLowerCase();
+        // try patterns: exact symbol, exact name, 'SYMBOL - name'
+        for (let c of coinsList) {
+            if ((c.symbol||'').toLowerCase() === t) return c;
+            if ((c.name||'').toLowerCase() === t) return c;
+            const combo = `${(c.symbol||'').toLowerCase()} - ${(c.name||'').toLowerCase()}`;
+            if (combo === t) return c;
+        }
+        return null;
+    }
+
+    function tryMatchAndSet(inputElem, hiddenElem) {
+        const val = (inputElem && inputElem.value) ? inputElem.value.trim() : '';
+        const found = matchCoinByText(val);
+        if (found) {
+            const symbol = (found.symbol||'').toUpperCase();
+            if (hiddenElem) hiddenElem.value = symbol || found.id || found.name;
+            if (inputElem) inputElem.value = `${symbol} - ${found.name}`;
+            clearError(inputElem);
+            return true;
+        }
+        return false;
+    }
+
+    function showError(inputElem, msg) {
+        clearError(inputElem);
+        const span = document.createElement('span');
+        span.className = 'field-error';
+        span.innerText = msg || 'Please select a coin from the list.';
+        if (!inputElem || !inputElem.parentNode) return;
+
+        // For the coin search fields, show error inline beside the label.
+        const isCoinSearch = inputElem.id === 'cryptoSearch' || inputElem.id === 'updateCryptoSearch';
+        if (isCoinSearch) {
+            span.classList.add('field-error-inline');
+            const label = inputElem.parentNode.querySelector('label');
+            if (label) {
+                label.appendChild(span);
+                return;
+            }
+        }
+
+        // Fallback: show below the input.
+        inputElem.parentNode.appendChild(span);
+    }
+
+    function clearError(inputElem) {
+        if (!inputElem || !inputElem.parentNode) return;
+        const existing = inputElem.parentNode.querySelector('.field-error');
+        if (existing) existing.parentNode.removeChild(existing);
+    }
+
+    // Expose error clearer so autocomplete selection handlers can remove stale messages
+    try { window.__clearCoinError = clearError; } catch (e) {}
+
+    if (createInput) {
+        createInput.addEventListener('blur', function(){
+            // small timeout to allow click selection to trigger first
+            setTimeout(() => {
+                if (!tryMatchAndSet(createInput, createHidden)) {
+                    // clear free text and hidden value
+                    if (createInput) createInput.value = '';
+                    if (createHidden) createHidden.value = '';
+                    showError(createInput, 'Please select a coin from the list.');
+                }
+            }, 150);
+        });
+    }
+
+    if (updateInput) {
+        updateInput.addEventListener('blur', function(){
+            setTimeout(() => {
+                if (!tryMatchAndSet(updateInput, updateHidden)) {
+                    if (updateInput) updateInput.value = '';
+                    if (updateHidden) updateHidden.value = '';
+                    showError(updateInput, 'Please select a coin from the list.');
+                }
+            }, 150);
+        });
+    }
+
+    // Mark caches as stale when delete form submits
+    var _cryptoDeleteForm = document.getElementById('deleteForm');
+    if (_cryptoDeleteForm && !_cryptoDeleteForm._txMarkAttached) {
+        _cryptoDeleteForm._txMarkAttached = true;
+        _cryptoDeleteForm.addEventListener('submit', function() {
+            if (typeof window.markTransactionChanged === 'function') window.markTransactionChanged();
+        });
+    }
+
+    // form submit guards
+    const createForm = document.getElementById('createCryptoForm');
+    if (createForm) {
+        createForm.addEventListener('submit', function(e){
+            if (!tryMatchAndSet(createInput, createHidden)) {
+                e.preventDefault();
+                showError(createInput, 'You must choose a coin from the list before submitting.');
+                createInput.focus();
+                return false;
+            }
+            if (typeof validateTransfer === 'function' && !validateTransfer('')) {
+                e.preventDefault();
+                return false;
+            }
+            if (typeof window.markTransactionChanged === 'function') window.markTransactionChanged();
+        });
+    }
+
+    const updateForm = document.getElementById('updateForm');
+    if (updateForm) {
+        const updateErrorBox = document.getElementById('updateFormError');
+
+        function clearUpdateError() {
+            if (!updateErrorBox) return;
+            updateErrorBox.style.display = 'none';
+            updateErrorBox.textContent = '';
+        }
+
+        function showUpdateError(msg) {
+            if (!updateErrorBox) {
+                alert(msg || 'Failed to update transaction.');
+                return;
+            }
+            updateErrorBox.textContent = msg || 'Failed to update transaction.';
+            updateErrorBox.style.display = '';
+        }
+
+        updateForm.addEventListener('submit', async function(e){
+            e.preventDefault();
+            if (!tryMatchAndSet(updateInput, updateHidden)) {
+                showError(updateInput, 'You must choose a coin from the list before submitting.');
+                updateInput.focus();
+                return false;
+            }
+            if (typeof validateTransfer === 'function' && !validateTransfer('update')) {
+                return false;
+            }
+
+            clearUpdateError();
+
+            const saveBtn = updateForm.querySelector('.btn-insert');
+            if (saveBtn) saveBtn.disabled = true;
+
+            try {
+                const response = await fetch(updateForm.action, {
+                    method: 'POST',
+                    body: new FormData(updateForm),
+                    headers: {
+                        'Accept': 'application/json',
+                        'X-Requested-With': 'XMLHttpRequest'
+                    }
+                });
+
+                if (response.ok) {
+                    if (typeof window.markTransactionChanged === 'function') window.markTransactionChanged();
+                    window.location.href = '/crypto';
+                    return;
+                }
+
+                let message = 'Failed to update transaction.';
+                try {
+                    const data = await response.json();
+                    message = (data && (data.error || data.Message || data.message)) || message;
+                } catch (err) {
+                    try {
+                        const txt = await response.text();
+                        if (txt) message = txt;
+                    } catch (err2) {}
+                }
+                showUpdateError(message);
+            } catch (err) {
+                showUpdateError('Network error while updating transaction.');
+            } finally {
+                if (saveBtn) saveBtn.disabled = false;
+            }
+        });
+    }
+
+    // Operation UI behavior (Transfer vs Buy/Sell)
+    function isTransfer(val) {
+        return String(val || '').trim().toLowerCase() === 'transfer';
+    }
+
+    function syncCryptoOperationUI(prefix) {
+        const p = prefix ? String(prefix) : '';
+        const op = document.getElementById(p ? (p + 'Operation') : 'operation');
+        const feeCurrency = document.getElementById(p ? (p + 'FeeCurrency') : 'feeCurrency');
+        const price = document.getElementById(p ? (p + 'Price') : 'price');
+        const currency = document.getElementById(p ? (p + 'Currency') : 'currency');
+        const feeLabel = document.querySelector(`label[for="${p ? (p + 'Fee') : 'fee'}"]`);
+        const priceLabel = document.querySelector(`label[for="${p ? (p + 'Price') : 'price'}"]`);
+        const currencyLabel = (currency && currency.parentNode) ? currency.parentNode.querySelector('label') : null;
+        const fee = document.getElementById(p ? (p + 'Fee') : 'fee');
+        const fromWallet = document.getElementById(p ? (p + 'FromWallet') : 'fromWallet');
+        const toWallet = document.getElementById(p ? (p + 'ToWallet') : 'toWallet');
+
+        const priceRow = price ? (price.closest ? price.closest('div') : price.parentNode) : null;
+        const currencyRow = currency ? (currency.closest ? currency.closest('div') : currency.parentNode) : null;
+
+        if (!op) return;
+
+        const transferMode = isTransfer(op.value);
+
+        if (feeCurrency) {
+            if (!feeCurrency.dataset.userSelected) {
+                feeCurrency.value = String((currency && currency.value) || 'EUR').toUpperCase();
+            }
+        }
+
+        if (feeLabel) {
+            feeLabel.textContent = 'Fee:';
+        }
+
+        // For transfer, price/currency are not meaningful. Keep them, but disable and force 0.
+        if (price) {
+            if (transferMode) {
+                price.value = '0';
+                price.readOnly = true;
+                price.required = false;
+            } else {
+                price.readOnly = false;
+                price.required = true;
+            }
+        }
+        if (currency) {
+            // Don't disable selects (disabled fields don't submit). Instead lock to EUR during transfer.
+            if (transferMode) {
+                currency.value = 'EUR';
+                currency.dataset.locked = '1';
+                currency.required = false;
+            } else {
+                delete currency.dataset.locked;
+                currency.required = true;
+            }
+        }
+
+        if (priceLabel) {
+            priceLabel.textContent = transferMode ? 'Price (not used for Transfer):' : 'Price:';
+        }
+        if (currencyLabel) {
+            currencyLabel.textContent = transferMode ? 'Currency (not used for Transfer):' : 'Currency:';
+        }
+
+        // Hide currency + price for Transfer (insert + update).
+        if (priceRow) priceRow.style.display = transferMode ? 'none' : '';
+        if (currencyRow) currencyRow.style.display = transferMode ? 'none' : '';
+
+        // For Transfer, require both wallets
+        if (fromWallet) fromWallet.required = !!transferMode;
+        if (toWallet) toWallet.required = !!transferMode;
+    }
+    window.syncCryptoOperationUI = syncCryptoOperationUI;
+
+    const opCreate = document.getElementById('operation');
+    if (opCreate) {
+        opCreate.addEventListener('change', function(){ syncCryptoOperationUI(''); });
+        syncCryptoOperationUI('');
+    }
+    const ccyCreate = document.getElementById('currency');
+    if (ccyCreate) {
+        ccyCreate.addEventListener('change', function(){
+            if (ccyCreate.dataset.locked === '1') ccyCreate.value = 'EUR';
+            const feeCcy = document.getElementById('feeCurrency');
+            if (feeCcy && feeCcy.dataset.locked !== '1' && String(feeCcy.value || '').trim().toUpperCase() !== 'CRYPTO') {
+                feeCcy.value = ccyCreate.value || 'EUR';
+            }
+        });
+    }
+    const feeCcyCreate = document.getElementById('feeCurrency');
+    if (feeCcyCreate) {
+        feeCcyCreate.addEventListener('change', function(){
+            feeCcyCreate.dataset.userSelected = '1';
+        });
+    }
+    const opUpdate = document.getElementById('updateOperation');
+    if (opUpdate) {
+        opUpdate.addEventListener('change', function(){ syncCryptoOperationUI('update'); });
+    }
+    const ccyUpdate = document.getElementById('updateCurrency');
+    if (ccyUpdate) {
+        ccyUpdate.addEventListener('change', function(){
+            if (ccyUpdate.dataset.locked === '1') ccyUpdate.value = 'EUR';
+            const feeCcy = document.getElementById('updateFeeCurrency');
+            if (feeCcy && feeCcy.dataset.locked !== '1' && String(feeCcy.value || '').trim().toUpperCase() !== 'CRYPTO') {
+                feeCcy.value = ccyUpdate.value || 'EUR';
+            }
+        });
+    }
+    const feeCcyUpdate = document.getElementById('updateFeeCurrency');
+    if (feeCcyUpdate) {
+        feeCcyUpdate.addEventListener('change', function(){
+            feeCcyUpdate.dataset.userSelected = '1';
+        });
+    }
+
+    function computeWalletHolding(cryptoName, walletId, ignoreCryptoId) {
+        const list = document.getElementById('cryptoList');
+        if (!list) return null;
+        if (!cryptoName || !walletId) return null;
+
+        let holding = 0;
+        const items = Array.from(list.querySelectorAll('li'));
+        items.forEach(li => {
+            if (ignoreCryptoId && String(li.getAttribute('data-id') || '') === String(ignoreCryptoId)) return;
+
+            const liCrypto = String(li.getAttribute('data-crypto') || '');
+            if (liCrypto !== String(cryptoName)) return;
+
+            const op = String(li.getAttribute('data-operation') || '').toLowerCase();
+            const from = String(li.getAttribute('data-from') || '');
+            const to = String(li.getAttribute('data-to') || '');
+            const qty = parseFloat(String(li.getAttribute('data-qty') || '0')) || 0;
+            const fee = parseFloat(String(li.getAttribute('data-fee') || '0')) || 0;
+
+            if (op === 'buy') {
+                if (to === walletId) holding += qty;
+            } else if (op === 'sell') {
+                if (from === walletId) holding -= qty;
+            } else if (op === 'transfer') {
+                if (from === walletId) holding -= qty;
+                if (to === walletId) holding += Math.max(0, qty - fee);
+            }
+        });
+
+        return holding;
+    }
+    window.computeWalletHolding = computeWalletHolding;
+
+    function validateTransfer(prefix) {
+        const p = prefix ? String(prefix) : '';
+        const op = document.getElementById(p ? (p + 'Operation') : 'operation');
+        if (!op) return true;
+        if (!isTransfer(op.value)) return true;
+
+        const fromWallet = document.getElementById(p ? (p + 'FromWallet') : 'fromWallet');
+        const toWallet = document.getElementById(p ? (p + 'ToWallet') : 'toWallet');
+        const qtyEl = document.getElementById(p ? (p + 'Quantity') : 'quantity');
+        const feeEl = document.getElementById(p ? (p + 'Fee') : 'fee');
+        const cryptoNameEl = document.getElementById(p ? (p + 'CryptoName') : 'cryptoName');
+        const cryptoIdEl = p ? document.getElementById(p + 'CryptoId') : null;
+
+        if (fromWallet) clearError(fromWallet);
+        if (toWallet) clearError(toWallet);
+        if (qtyEl) clearError(qtyEl);
+        if (feeEl) clearError(feeEl);
+
+        if (!fromWallet || !fromWallet.value) {
+            if (fromWallet) showError(fromWallet, 'From Wallet is required for Transfer.');
+            return false;
+        }
+        if (!toWallet || !toWallet.value) {
+            if (toWallet) showError(toWallet, 'To Wallet is required for Transfer.');
+            return false;
+        }
+        if (fromWallet.value === toWallet.value) {
+            showError(toWallet, 'From Wallet and To Wallet must be different.');
+            return false;
+        }
+
+        const qty = parseFloat((qtyEl && qtyEl.value) ? qtyEl.value : '0');
+        const fee = parseFloat((feeEl && feeEl.value) ? feeEl.value : '0');
+        const feeCurrencyEl = document.getElementById(p ? (p + 'FeeCurrency') : 'feeCurrency');
+        const feeCurrency = String((feeCurrencyEl && feeCurrencyEl.value) || '').trim().toUpperCase();
+        if (!(qty > 0)) {
+            if (qtyEl) showError(qtyEl, 'Quantity must be greater than 0 for Transfer.');
+            return false;
+        }
+        if (isNaN(fee) || fee < 0) {
+            if (feeEl) showError(feeEl, 'Fee must be a valid number (>= 0).');
+            return false;
+        }
+        if (feeCurrency === 'CRYPTO' && fee > qty) {
+            if (feeEl) showError(feeEl, 'Fee cannot be greater than Quantity for Transfer.');
+            return false;
+        }
+
+        // Prevent negative wallet balances by ensuring the source wallet has enough holdings.
+        // This is a UI guard only; backend should enforce the same rule.
+        const cryptoName = cryptoNameEl ? String(cryptoNameEl.value || '') : '';
+        const ignoreId = cryptoIdEl ? String(cryptoIdEl.value || '') : '';
+        const available = computeWalletHolding(cryptoName, fromWallet.value, ignoreId);
+        if (available !== null) {
+            // Use a small epsilon for floating point quantities.
+            const eps = 1e-12;
+            if (available + eps < qty) {
+                if (qtyEl) showError(qtyEl, `Not enough ${cryptoName || 'crypto'} in From Wallet. Available: ${available}`);
+                return false;
+            }
+        }
+        return true;
+    }
+    window.validateTransfer = validateTransfer;
+
+    // Hook filter inputs to live filtering
+    const fStart = document.getElementById('filterStart');
+    const fEnd = document.getElementById('filterEnd');
+    const fCrypto = document.getElementById('filterCrypto');
+    const fNote = document.getElementById('filterNote');
+    const fFrom = document.getElementById('filterFromWallet');
+    const fTo = document.getElementById('filterToWallet');
+    ['input','change'].forEach(evt => {
+        if (fStart) fStart.addEventListener(evt, applyCryptoFilters);
+        if (fEnd) fEnd.addEventListener(evt, applyCryptoFilters);
+        if (fCrypto) fCrypto.addEventListener(evt, applyCryptoFilters);
+        if (fNote) fNote.addEventListener(evt, applyCryptoFilters);
+        if (fFrom) fFrom.addEventListener(evt, applyCryptoFilters);
+        if (fTo) fTo.addEventListener(evt, applyCryptoFilters);
+    });
+
+    // --- Live price hydration via shared priceCache ---
+    var _cryptoPageData = null;
+
+    function _cryptoCollectSymbols() {
+        var out = {};
+        document.querySelectorAll('#cryptoTotalsGrid [data-crypto-symbol]').forEach(function(c) {
+            var s = c.getAttribute('data-crypto-symbol'); if (s) out[s] = true;
+        });
+        document.querySelectorAll('#cryptoWalletsGrid [data-holding-symbol]').forEach(function(r) {
+            var s = r.getAttribute('data-holding-symbol'); if (s) out[s] = true;
+        });
+        return Object.keys(out);
+    }
+
+    function _cryptoApplyPortfolio(priceMap, bc) {
+        var cards = document.querySelectorAll('#cryptoTotalsGrid [data-crypto-symbol]');
+        cards.forEach(function(card) {
+            var symbol = card.getAttribute('data-crypto-symbol');
+            var price = priceMap[symbol];
+            if (price == null) return;
+            var qty = parseFloat(card.getAttribute('data-crypto-qty')) || 0;
+            var cost = parseFloat(card.getAttribute('data-crypto-cost')) || 0;
+            var buy = parseFloat(card.getAttribute('data-crypto-buy')) || 0;
+            var sell = parseFloat(card.getAttribute('data-crypto-sell')) || 0;
+            var totalNow = price * qty;
+            var soldCost = Math.max(0, buy - cost);
+            var realized = sell - soldCost;
+            var unrealized = totalNow - cost;
+            var gl = realized + unrealized;
+            var realizedPct = soldCost !== 0 ? ((realized / soldCost) * 100) : null;
+            var unrealizedPct = cost !== 0 ? ((unrealized / cost) * 100) : null;
+            var totalPct = cost !== 0 ? ((gl / cost) * 100) : null;
+
+            var nowEl = card.querySelector('[data-crypto-now]');
+            var liveEl = card.querySelector('[data-crypto-live]');
+            var realizedEl = card.querySelector('[data-crypto-realized]');
+            var unrealizedEl = card.querySelector('[data-crypto-unrealized]');
+            var glEl = card.querySelector('[data-crypto-gl]');
+            var nameEl = card.querySelector('[data-crypto-fullname]');
+            if (nameEl && !nameEl.textContent.trim() && window.priceCache) {
+                var entry = priceCache.entry('crypto', symbol);
+                if (entry && entry.name) nameEl.textContent = entry.name;
+            }
+            if (nowEl) nowEl.textContent = _formatOverviewValue(totalNow) + ' ' + bc;
+            if (liveEl) liveEl.textContent = _formatOverviewUnitPrice(price) + ' ' + bc;
+            if (realizedEl) {
+                var rp = (realizedPct === null)
+                    ? 'N/A'
+                    : ((realizedPct >= 0 ? '+' : '') + _formatNumber(realizedPct, 2) + '%');
+                realizedEl.textContent = (realized >= 0 ? '+' : '') + _formatOverviewValue(realized) + ' ' + bc + ' (' + rp + ')';
+                realizedEl.classList.remove('pct-positive', 'pct-negative', 'pct-neutral');
+                realizedEl.classList.add(realized >= 0 ? 'pct-positive' : 'pct-negative');
+            }
+            if (unrealizedEl) {
+                var up = (unrealizedPct === null)
+                    ? 'N/A'
+                    : ((unrealizedPct >= 0 ? '+' : '') + _formatNumber(unrealizedPct, 2) + '%');
+                unrealizedEl.textContent = (unrealized >= 0 ? '+' : '') + _formatOverviewValue(unrealized) + ' ' + bc + ' (' + up + ')';
+                unrealizedEl.classList.remove('pct-positive', 'pct-negative', 'pct-neutral');
+                unrealizedEl.classList.add(unrealized >= 0 ? 'pct-positive' : 'pct-negative');
+            }
+            if (glEl) {
+                var tp = (totalPct === null)
+                    ? 'N/A'
+                    : ((totalPct >= 0 ? '+' : '') + _formatNumber(totalPct, 2) + '%');
+                glEl.textContent = (gl >= 0 ? '+' : '') + _formatOverviewValue(gl) + ' ' + bc + ' (' + tp + ')';
+                glEl.classList.remove('pct-positive', 'pct-negative', 'pct-neutral');
+                glEl.classList.add(gl >= 0 ? 'pct-positive' : 'pct-negative');
+            }
+        });
+    }
+
+    function _cryptoApplyWallets(priceMap, bc) {
+        var walletCards = document.querySelectorAll('#cryptoWalletsGrid [data-wallet-card]');
+        walletCards.forEach(function(card) {
+            var rows = card.querySelectorAll('[data-holding-symbol]');
+            var walletTotal = 0;
+            rows.forEach(function(row) {
+                var sym = row.getAttribute('data-holding-symbol');
+                var qty = parseFloat(row.getAttribute('data-holding-qty')) || 0;
+                var cost = parseFloat(row.getAttribute('data-holding-cost')) || 0;
+                var price = priceMap[sym];
+                var valEl = row.querySelector('[data-holding-value]');
+                var glEl = row.querySelector('[data-holding-gl]');
+                if (price != null) {
+                    var val = price * qty;
+                    walletTotal += val;
+                    if (valEl) valEl.textContent = _formatOverviewUnitPrice(val) + ' ' + bc;
+                    if (glEl) {
+                        var gl = val - cost;
+                        var pct = cost > 0 ? (gl / cost) * 100 : null;
+                        var pctText = pct === null ? 'N/A' : ((pct >= 0 ? '+' : '') + _formatNumber(pct, 2) + '%');
+                        glEl.textContent = (gl >= 0 ? '+' : '') + _formatOverviewValue(gl) + ' ' + bc + ' (' + pctText + ')';
+                        glEl.classList.remove('pct-positive', 'pct-negative', 'pct-neutral');
+                        glEl.classList.add(gl >= 0 ? 'pct-positive' : 'pct-negative');
+                    }
+                } else {
+                    if (valEl) valEl.textContent = '\u2014 ' + bc;
+                    if (glEl) {
+                        glEl.textContent = '\u2014 (N/A)';
+                        glEl.classList.remove('pct-positive', 'pct-negative');
+                        glEl.classList.add('pct-neutral');
+                    }
+                }
+            });
+            var totalBadge = card.querySelector('[data-wallet-total]');
+            if (totalBadge) totalBadge.textContent = _formatNumber(walletTotal, 2) + ' ' + bc;
+        });
+    }
+
+    function hydrateCryptoPrices(force) {
+        var bc = (_cryptoPageData && _cryptoPageData.baseCurrency) || 'EUR';
+        var syms = _cryptoCollectSymbols();
+        if (!syms.length) { _cryptoUpdateRefreshLabel(); return Promise.resolve(); }
+
+        // Always fetch fresh prices - no caching
+        _cryptoApplyPortfolio({}, bc);
+        _cryptoApplyWallets({}, bc);
+        _cryptoUpdateRefreshLabel();
+
+        return window.priceCache.getMany('crypto', syms, force ? { force: true } : undefined).then(function(priceMap) {
+            priceMap = priceMap || {};
+            _cryptoApplyPortfolio(priceMap, bc);
+            _cryptoApplyWallets(priceMap, bc);
+            _cryptoUpdateRefreshLabel();
+        });
+    }
+
+    function _cryptoUpdateRefreshLabel() {
+        var el = document.getElementById('cryptoLastRefresh');
+        if (!el || !window.priceCache) return;
+        var ts = priceCache.lastRefresh();
+        if (!ts) { el.textContent = ''; return; }
+        var d = new Date(ts);
+        var yyyy = d.getFullYear();
+        var MM = String(d.getMonth() + 1).padStart(2, '0');
+        var dd = String(d.getDate()).padStart(2, '0');
+        var hh = String(d.getHours()).padStart(2, '0');
+        var mm = String(d.getMinutes()).padStart(2, '0');
+        var ss = String(d.getSeconds()).padStart(2, '0');
+        el.textContent = 'Prices updated ' + yyyy + '-' + MM + '-' + dd + ' ' + hh + ':' + mm + ':' + ss;
+    }
+
+    function _cryptoRenderFromData(data) {
+        var loadingEl = document.getElementById('cryptoDataLoading');
+        if (loadingEl) loadingEl.style.display = 'none';
+
+        var coinsEl = document.getElementById('coins-data');
+        if (coinsEl && data.coins) {
+            coinsEl.setAttribute('data-coins', JSON.stringify(data.coins));
+            try {
+                var newCoins = data.coins || [];
+                for (var i = 0; i < newCoins.length; i++) {
+                    var nc = newCoins[i];
+                    var sym = String((nc && nc.symbol) || '').trim().toUpperCase();
+                    if (!sym) continue;
+                    var found = false;
+                    for (var j = 0; j < coinsList.length; j++) {
+                        if (String((coinsList[j] && coinsList[j].symbol) || '').trim().toUpperCase() === sym) { found = true; break; }
+                    }
+                    if (!found) coinsList.push(nc);
+                }
+            } catch(e) {}
+        }
+        _populateCryptoWalletSelects(data.wallets || []);
+        _buildCryptoTotals(data.totals || [], data.baseCurrency || 'EUR');
+        _buildCryptoWalletHoldings(data.walletHoldings || [], data.baseCurrency || 'EUR');
+        _buildCryptoHistoryList(data.cryptos || [], data.wallets || []);
+        setCryptoNavVisibility('portfolio');
+    }
+
+    function loadCryptoPage(forceReload, forcePriceRefresh) {
+        var cached = (!forceReload) ? window.pageDataCache.get('crypto-data') : Promise.resolve(null);
+        return Promise.resolve(cached).then(function(cachedData) {
+            if (cachedData) {
+                console.log('[PageCache] Using cached crypto-data');
+                _cryptoPageData = cachedData;
+                _cryptoRenderFromData(cachedData);
+                return hydrateCryptoPrices(false);
+            }
+            return fetch('/api/crypto-data')
+                .then(function(resp) {
+                    if (!resp.ok) throw new Error('HTTP ' + resp.status);
+                    return resp.json();
+                })
+                .then(function(data) {
+                    window.pageDataCache.set('crypto-data', data);
+                    _cryptoPageData = data;
+                    _cryptoRenderFromData(data);
+                    return hydrateCryptoPrices(!!forcePriceRefresh);
+                })
+                .catch(function(err) {
+                    console.error('Crypto data fetch failed:', err);
+                    var loadingEl = document.getElementById('cryptoDataLoading');
+                    if (loadingEl) loadingEl.innerHTML = '<div class="small-muted">Failed to load crypto data: ' + _escapeHtml(err.message || err) + '</div>';
+                });
+        });
+    }
+
+    function refreshCryptoPrices(force) {
+        var btn = document.getElementById('cryptoRefreshBtn');
+        var label = document.getElementById('cryptoRefreshLabel');
+        if (btn) btn.disabled = true;
+        var prev = label ? label.textContent : '';
+        if (label) label.textContent = 'Refreshing…';
+        return loadCryptoPage(true, !!force).finally(function() {
+            if (btn) btn.disabled = false;
+            if (label) label.textContent = prev || 'Refresh prices';
+        });
+    }
+
+    var _cryptoRefreshBtn = document.getElementById('cryptoRefreshBtn');
+    if (_cryptoRefreshBtn) {
+        _cryptoRefreshBtn.addEventListener('click', function() { refreshCryptoPrices(true); });
+    }
+
+    loadCryptoPage(false);
+});
+
+// Minimal vanilla JS autocomplete
+function initAutocomplete(inputId, listId, hiddenId, coins) {
+    const input = document.getElementById(inputId);
+    const listWrap = document.getElementById(listId);
+    const hidden = document.getElementById(hiddenId);
+    if (!input || !listWrap) return;
+
+    let currentFocus = -1;
+
+    input.addEventListener('input', function(e) {
+        // As user types, remove any previous "must select from list" error.
+        try {
+            if (typeof window.__clearCoinError === 'function') window.__clearCoinError(input);
+        } catch (err) {}
+        const val = this.value.trim().toLowerCase();
+        closeAllLists();
+        if (!val) { if (hidden) hidden.value = ''; return false; }
+
+            const matches = coins.filter(c => (c.name || '').toLowerCase().includes(val) || (c.symbol || '').toLowerCase().includes(val)).slice(0, 20);
+        if (!matches.length) return false;
+
+        const list = document.createElement('div');
+        list.setAttribute('class','autocomplete-items');
+            // Anchor the dropdown to the wrapper directly under the input
+            if (!listWrap.style.position) listWrap.style.position = 'relative';
+            list.style.position = 'absolute';
+            list.style.zIndex = 1000;
+            list.style.left = '0px';
+            list.style.right = '0px';
+            // listWrap is placed right after the input, so top=0 keeps it snug
+            list.style.top = '4px';
+            list.style.maxHeight = '260px';
+            list.style.overflowY = 'auto';
+            listWrap.appendChild(list);
+
+        matches.forEach(c => {
+            const item = document.createElement('div');
+            item.innerHTML = `<strong>${(c.symbol||'').toUpperCase()}</strong> - ${c.name}`;
+            item.style.padding = '6px 8px';
+            item.style.cursor = 'pointer';
+            item.addEventListener('click', function(e){
+                if (inputId === 'filterCrypto') {
+                    input.value = `${(c.symbol||'').toUpperCase()}`;
+                } else {
+                    input.value = `${(c.symbol||'').toUpperCase()} - ${c.name}`;
+                }
+                if (hidden) {
+                    if (c.symbol) hidden.value = (c.symbol||'').toUpperCase();
+                    else if (c.id) hidden.value = c.id;
+                    else hidden.value = c.name;
+                }
+                closeAllLists();
+                try {
+                    if (typeof window.__clearCoinError === 'function') window.__clearCoinError(input);
+                } catch (err) {}
+                if (inputId === 'filterCrypto' && typeof applyCryptoFilters === 'function') {
+                    applyCryptoFilters();
+                }
+            });
+            // touch support for mobile devices
+            item.addEventListener('touchstart', function(e){
+                // prevent duplicate click/touch events
+                e.preventDefault();
+                if (inputId === 'filterCrypto') {
+                    input.value = `${(c.symbol||'').toUpperCase()}`;
+                } else {
+                    input.value = `${(c.symbol||'').toUpperCase()} - ${c.name}`;
+                }
+                if (hidden) {
+                    if (c.symbol) hidden.value = (c.symbol||'').toUpperCase();
+                    else if (c.id) hidden.value = c.id;
+                    else hidden.value = c.name;
+                }
+                closeAllLists();
+                try {
+                    if (typeof window.__clearCoinError === 'function') window.__clearCoinError(input);
+                } catch (err) {}
+                if (inputId === 'filterCrypto' && typeof applyCryptoFilters === 'function') {
+                    applyCryptoFilters();
+                }
+            });
+
+            // Prefer committing selection before input blur fires (prevents stale error state)
+            item.addEventListener('mousedown', function(){
+                try {
+                    if (typeof window.__clearCoinError === 'function') window.__clearCoinError(input);
+                } catch (err) {}
+            });
+            list.appendChild(item);
+        });
+    });
+
+    input.addEventListener('keydown', function(e) {
+        const items = listWrap.querySelectorAll('.autocomplete-items div');
+        if (!items || items.length === 0) return;
+        if (e.keyCode == 40) { // down
+            currentFocus++; addActive(items);
+        } else if (e.keyCode == 38) { // up
+            currentFocus--; addActive(items);
+        } else if (e.keyCode == 13) { // enter
+            e.preventDefault();
+            if (currentFocus > -1 && items[currentFocus]) items[currentFocus].click();
+        }
+    });
+
+    function addActive(items) {
+        if (!items) return false;
+        removeActive(items);
+        if (currentFocus >= items.length) currentFocus = 0;
+        if (currentFocus < 0) currentFocus = items.length - 1;
+        items[currentFocus].classList.add('autocomplete-active');
+        items[currentFocus].style.background = '#e9e9e9';
+    }
+    function removeActive(items) {
+        items.forEach(i => { i.classList.remove('autocomplete-active'); i.style.background=''; });
+    }
+
+    function closeAllLists(elmnt) {
+        const lists = document.querySelectorAll('.autocomplete-items');
+        lists.forEach(l => { if (elmnt != l && elmnt != input) l.parentNode.removeChild(l); });
+        currentFocus = -1;
+    }
+
+    document.addEventListener('click', function (e) { closeAllLists(e.target); });
+}
+
+function newCryptoDiv() {
+    showCryptoNew();
+}
+
+function cryptoWalletsDiv() {
+    showCryptoWallets();
+}
+
+function cryptoHistoryDiv() {
+    showCryptoHistory();
+}
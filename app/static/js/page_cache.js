@@ -0,0 +1,281 @@
+// localStorage-backed price + page-data cache (1 hour TTL).
+// Caches are invalidated when transactions or currency settings change.
+(function () {
+    const PRICE_TTL_MS = 60 * 60 * 1000;   // 1 hour
+    const PAGE_TTL_MS  = 60 * 60 * 1000;   // 1 hour
+    const PAGE_LS_KEY  = 'walletPageCache';
+    const TX_TS_KEY    = 'walletLastTransactionAt';
+
+    function _lsGet(key) {
+        try { return JSON.parse(localStorage.getItem(key) || '{}'); } catch(e) { return {}; }
+    }
+    function _lsSet(key, val) {
+        try { localStorage.setItem(key, JSON.stringify(val)); } catch(e) {}
+    }
+    function _txTs() {
+        try { return Number(localStorage.getItem(TX_TS_KEY) || '0'); } catch(e) { return 0; }
+    }
+    function _isFresh(entry, ttlMs) {
+        if (!entry || !entry.ts) return false;
+        const now = Date.now();
+        if (now - entry.ts > ttlMs) return false;   // expired
+        if (_txTs() > entry.ts) return false;        // invalidated by a transaction change
+        return true;
+    }
+
+    // ── Prices ──────────────────────────────────────────────────────────
+    // One row per symbol, kept in memory and persisted to localStorage as compact
+    // tuples: "type:SYM" -> [ts, price, currency, name, currencyBase, tag]. The stored
+    // object is parsed once per page load instead of on every read.
+    //
+    // Tabs share one fetcher: the tab holding the 'wallet-price-leader' Web Lock
+    // answers the other tabs' requests over a BroadcastChannel and broadcasts the
+    // results, so N open tabs cost one /quotes call instead of N. Symbols already
+    // being fetched are never requested twice. Without Web Locks/BroadcastChannel
+    // (or when the leader doesn't answer in time) a tab simply fetches itself.
+    const PRICE_ROWS_KEY = 'walletPriceRows';
+    const LEGACY_PRICE_KEY = 'walletPriceCache';
+    const LEADER_LOCK = 'wallet-price-leader';
+    const LEADER_ACK_MS = 1500;
+    const LEADER_REPLY_MS = 15000;
+
+    const priceRows = new Map();
+    const inflight = new Map();   // "type:SYM" -> Promise resolved when that symbol's fetch ends
+    const pending = new Map();    // request id -> {resolve, timer}
+    const channel = ('BroadcastChannel' in window) ? new BroadcastChannel('wallet-prices') : null;
+    const tabId = Math.random().toString(36).slice(2);
+    let isLeader = false;
+    let txTs = _txTs();
+    let persistTimer = null;
+
+    (function hydrate() {
+        const stored = _lsGet(PRICE_ROWS_KEY);
+        for (const k in stored) {
+            if (Array.isArray(stored[k])) priceRows.set(k, stored[k]);
+        }
+        try { localStorage.removeItem(LEGACY_PRICE_KEY); } catch(e) {}
+    })();
+
+    window.addEventListener('storage', (ev) => {
+        if (ev.key === TX_TS_KEY) txTs = _txTs();
+    });
+
+    function _rowFresh(row) {
+        return !!row && (Date.now() - row[0] <= PRICE_TTL_MS) && txTs <= row[0];
+    }
+
+    function _persistSoon() {
+        if (persistTimer) return;
+        persistTimer = setTimeout(() => {
+            persistTimer = null;
+            _lsSet(PRICE_ROWS_KEY, Object.fromEntries(priceRows));
+        }, 250);
+    }
+
+    function _storeRows(rows, persist) {
+        for (const k in rows) priceRows.set(k, rows[k]);
+        if (persist) _persistSoon();
+    }
+
+    // One /api/quotes call for any mix of "crypto:SYM" / "stock:SYM" keys. Rows carry the
+    // server's tag of their values (row[5]); ?have= sends them back so the server can omit
+    // quotes whose fresh values are identical. Only those rows just get a new timestamp.
+    async function _fetchFromServer(keys) {
+        console.log(`[Price] Fetching ${keys.length} quotes:`, keys.join(','));
+        const params = new URLSearchParams({ symbols: keys.join(',') });
+        const prev = keys.map((k) => priceRows.get(k));
+        const held = prev.map((row) => (row && row[0] >= txTs && row[5]) || '');
+        if (held.some(Boolean)) params.set('have', held.join(','));
+        const resp = await fetch(`/api/quotes?${params}`, {
+            headers: { 'Accept': 'application/json' },
+            credentials: 'same-origin'
+        });
+        if (!resp.ok) throw new Error(`Status ${resp.status}`);
+        const data = await resp.json();
+        const now = Date.now();
+        const quotes = data.quotes || {};
+        const tags = data.tags || {};
+        const rows = {};
+        keys.forEach((k, i) => {
+            const q = quotes[k];
+            const tag = tags[k] || '';
+            if (q) rows[k] = [now, (typeof q[0] === 'number') ? q[0] : null, q[1], q[2], q[3], tag];
+            else if (held[i] && held[i] === tag) rows[k] = [now, prev[i][1], prev[i][2], prev[i][3], prev[i][4], tag];
+            else rows[k] = [now, null, null, null, null, ''];
+        });
+        return rows;
+    }
+
+    // Fetch keys in this tab, joining fetches already in flight for any of them.
+    async function _fetchShared(keys) {
+        const waits = [];
+        const need = [];
+        for (const k of keys) {
+            const running = inflight.get(k);
+            if (running) waits.push(running); else need.push(k);
+        }
+        if (need.length) {
+            const p = _fetchFromServer(need).then((rows) => {
+                _storeRows(rows, true);
+                if (channel) channel.postMessage({ kind: 'rows', rows });
+            }).catch((e) => {
+                console.error('[Price] Quote fetch failed:', e);
+            }).finally(() => {
+                for (const k of need) inflight.delete(k);
+            });
+            for (const k of need) inflight.set(k, p);
+            waits.push(p);
+        }
+        await Promise.all(waits);
+    }
+
+    // Ask the leader tab to fetch; resolves true once it broadcast the rows, false to fetch ourselves.
+    function _askLeader(keys) {
+        if (!channel || isLeader || !(navigator.locks && navigator.locks.request)) return Promise.resolve(false);
+        const id = tabId + ':' + Math.random().toString(36).slice(2);
+        return new Promise((resolve) => {
+            const req = { resolve, timer: null };
+            req.timer = setTimeout(() => { pending.delete(id); resolve(false); }, LEADER_ACK_MS);
+            pending.set(id, req);
+            channel.postMessage({ kind: 'need', id, keys });
+        });
+    }
+
+    if (channel) {
+        channel.onmessage = (ev) => {
+            const msg = ev.data || {};
+            if (msg.kind === 'rows') {
+                _storeRows(msg.rows, false);
+            } else if (msg.kind === 'need' && isLeader) {
+                channel.postMessage({ kind: 'ack', id: msg.id });
+                // Rows this tab already has fresh are sent as is; only the rest is fetched.
+                const known = {};
+                const stale = [];
+                for (const k of msg.keys || []) {
+                    if (_rowFresh(priceRows.get(k))) known[k] = priceRows.get(k); else stale.push(k);
+                }
+                if (Object.keys(known).length) channel.postMessage({ kind: 'rows', rows: known });
+                _fetchShared(stale).finally(() => channel.postMessage({ kind: 'done', id: msg.id }));
+            } else if (msg.kind === 'ack' && pending.has(msg.id)) {
+                const req = pending.get(msg.id);
+                clearTimeout(req.timer);
+                req.timer = setTimeout(() => { pending.delete(msg.id); req.resolve(false); }, LEADER_REPLY_MS);
+            } else if (msg.kind === 'done' && pending.has(msg.id)) {
+                const req = pending.get(msg.id);
+                clearTimeout(req.timer);
+                pending.delete(msg.id);
+                req.resolve(true);
+            }
+        };
+        if (navigator.locks && navigator.locks.request) {
+            // Held until the tab closes; the next waiting tab then takes over.
+            navigator.locks.request(LEADER_LOCK, () => {
+                isLeader = true;
+                console.log('[Price] This tab fetches prices for all tabs');
+                return new Promise(() => {});
+            });
+        }
+    }
+
+    window._priceMetadata = {};
+    window._priceCacheLastRefresh = 0;
+
+    function _collect(type, symbols) {
+        const out = {};
+        for (const sym of symbols) {
+            const row = priceRows.get(`${type}:${sym}`);
+            if (!row) continue;
+            out[sym] = row[1];
+            window._priceMetadata[`${type}:${sym}`] = { currency: row[2], name: row[3], currencyBase: row[4] };
+            if (row[0] > window._priceCacheLastRefresh) window._priceCacheLastRefresh = row[0];
+        }
+        return out;
+    }
+
+    window.simpleFetch = {
+        async getPrice(type, symbol) {
+            const map = await this.getMany(type, [symbol]);
+            return (map && map[symbol] !== undefined) ? map[symbol] : null;
+        },
+        async get(type, symbol, opts) {
+            return this.getPrice(type, symbol);
+        },
+        async getMany(type, symbols, opts) {
+            if (!symbols || !symbols.length) return {};
+            const out = await this.getMixed({ [type]: symbols }, opts);
+            return out[type] || {};
+        },
+        // Prices for several types in one round-trip: {crypto: [...], stock: [...]} -> {crypto: {SYM: price}, stock: {...}}
+        async getMixed(symbolsByType, opts) {
+            const force = !!(opts && opts.force);
+            const keys = [];
+            for (const type in symbolsByType) {
+                for (const sym of symbolsByType[type] || []) keys.push(`${type}:${sym}`);
+            }
+            const missing = force ? keys : keys.filter((k) => !_rowFresh(priceRows.get(k)));
+            if (!missing.length) {
+                console.log(`[Price] Cache hit (${keys.length} symbols)`);
+            } else {
+                const viaLeader = !force && await _askLeader(missing);
+                if (!viaLeader) await _fetchShared(missing);
+            }
+            const out = {};
+            for (const type in symbolsByType) out[type] = _collect(type, symbolsByType[type] || []);
+            return out;
+        },
+        entry(type, symbol) {
+            const metaKey = `${type}:${symbol}`;
+            return window._priceMetadata[metaKey] || null;
+        },
+        setBaseCurrency(bc) {},
+        lastRefresh() { return window._priceCacheLastRefresh || 0; },
+        ttlMs() { return PRICE_TTL_MS; }
+    };
+    window.priceCache = window.simpleFetch;
+
+    // Page-data cache (for /api/crypto-data, /api/stock-data, /api/dashboard-data)
+    window.pageDataCache = {
+        async get(name) {
+            const store = _lsGet(PAGE_LS_KEY);
+            const entry = store[name];
+            if (_isFresh(entry, PAGE_TTL_MS)) {
+                console.log(`[PageCache] Hit for ${name}`);
+                return entry.data;
+            }
+            return null;
+        },
+        set(name, payload) {
+            const store = _lsGet(PAGE_LS_KEY);
+            store[name] = { ts: Date.now(), data: payload };
+            _lsSet(PAGE_LS_KEY, store);
+            console.log(`[PageCache] Stored ${name}, expires in 1h`);
+        },
+        invalidate(name) {
+            const store = _lsGet(PAGE_LS_KEY);
+            if (store[name]) { delete store[name]; _lsSet(PAGE_LS_KEY, store); }
+        },
+        clearAll() {
+            _lsSet(PAGE_LS_KEY, {});
+            _lsSet(PRICE_ROWS_KEY, {});
+            priceRows.clear();
+        }
+    };
+
+    // Call this when settings that affect computed totals (like currency)
+    // change so cached page/price data is bypassed on next loads.
+    window.markSettingsChanged = function() {
+        txTs = Date.now();
+        try { localStorage.setItem(TX_TS_KEY, String(txTs)); } catch(e) {}
+        window._priceMetadata = {};
+        window._priceCacheLastRefresh = 0;
+        console.log('[Cache] Settings changed — caches invalidated');
+    };
+
+    // Call this after any transaction insert / update / delete.
+    window.markTransactionChanged = function() {
+        window.markSettingsChanged();
+        console.log('[Cache] Transaction changed — caches invalidated');
+    };
+
+    console.log('[Cache] localStorage price+page cache initialized');
+})();
@@ -0,0 +1,1594 @@
+    function setStockNavVisibility(activeView) {
+        const btns = Array.from(document.querySelectorAll('[data-stock-nav]'));
+        btns.forEach(btn => {
+            const v = String(btn.getAttribute('data-stock-nav') || '').trim();
+            const isActive = (v && v === String(activeView || ''));
+            if (isActive) btn.setAttribute('aria-current', 'page');
+            else btn.removeAttribute('aria-current');
+            btn.classList.toggle('is-active', isActive);
+        });
+    }
+
+    function getStocksData() {
+        try {
+            const el = document.getElementById('stocks-data');
+            if (!el || !el.dataset || !el.dataset.stocks) return [];
+            const arr = JSON.parse(el.dataset.stocks);
+            return Array.isArray(arr) ? arr : [];
+        } catch (e) {
+            return [];
+        }
+    }
+
+    function getStockWalletsData() {
+        try {
+            const el = document.getElementById('stock-wallets-data');
+            if (!el || !el.dataset || !el.dataset.wallets) return [];
+            const arr = JSON.parse(el.dataset.wallets);
+            return Array.isArray(arr) ? arr : [];
+        } catch (e) {
+            return [];
+        }
+    }
+
+    function formatNumber(value, maxDigits) {
+        const v = Number(value);
+        if (!isFinite(v)) return '0';
+        const opts = { maximumFractionDigits: (typeof maxDigits === 'number' ? maxDigits : 6) };
+        try {
+            return new Intl.NumberFormat(undefined, opts).format(v);
+        } catch (e) {
+            return String(v);
+        }
+    }
+
+    function formatOverviewValue(value) {
+        const v = Number(value);
+        if (!isFinite(v)) return '0';
+        try {
+            return new Intl.NumberFormat(undefined, { maximumFractionDigits: 2 }).format(v);
+        } catch (e) {
+            return String(v);
+        }
+    }
+
+    function truncateTo(value, digits) {
+        const factor = Math.pow(10, digits);
+        if (!isFinite(factor) || factor === 0) return value;
+        return value < 0 ? Math.ceil(value * factor) / factor : Math.floor(value * factor) / factor;
+    }
+
+    function formatOverviewUnitPrice(value) {
+        const v = Number(value);
+        if (!isFinite(v)) return '0';
+
+        const abs = Math.abs(v);
+        let digits = 2;
+        if (abs > 0 && abs < 1) {
+            const leadingZeros = Math.max(0, Math.ceil(-Math.log10(abs)) - 1);
+            digits = Math.min(12, leadingZeros + 2);
+        }
+
+        const truncated = truncateTo(v, digits);
+        try {
+            return new Intl.NumberFormat(undefined, {
+                maximumFractionDigits: digits,
+            }).format(truncated);
+        } catch (e) {
+            return String(truncated);
+        }
+    }
+
+    function formatOverviewQuantity(value) {
+        const v = Number(value);
+        if (!isFinite(v)) return '0';
+
+        const abs = Math.abs(v);
+        let digits = 4;
+        if (abs > 0 && abs < 1) {
+            const leadingZeros = Math.max(0, Math.ceil(-Math.log10(abs)) - 1);
+            digits = Math.min(12, leadingZeros + 4);
+        }
+
+        const truncated = truncateTo(v, digits);
+        try {
+            return new Intl.NumberFormat(undefined, {
+                maximumFractionDigits: digits,
+            }).format(truncated);
+        } catch (e) {
+            return String(truncated);
+        }
+    }
+
+    function escapeHtml(value) {
+        const s = String(value ?? '');
+        return s.replace(/[&<>"']/g, ch => {
+            switch (ch) {
+                case '&': return '&amp;';
+                case '<': return '&lt;';
+                case '>': return '&gt;';
+                case '"': return '&quot;';
+                case "'": return '&#39;';
+                default: return ch;
+            }
+        });
+    }
+
+    let _stockForceHydrateNextLoad = false;
+
+    function _stockCachedPriceMap(pc, symbols, force) {
+        const out = {};
+        const needFetch = [];
+        const now = Date.now();
+        const ttlMs = (pc && typeof pc.ttlMs === 'function') ? (pc.ttlMs() || 0) : 0;
+        (symbols || []).forEach(sym => {
+            const key = String(sym || '').trim();
+            if (!key) return;
+            const e = pc ? pc.entry('stock', key) : null;
+            if (e && typeof e.price === 'number') {
+                out[key] = e.price;
+                const stale = ttlMs > 0 ? ((now - (e.ts || 0)) >= ttlMs) : false;
+                if (!force && stale) needFetch.push(key);
+            } else {
+                needFetch.push(key);
+            }
+        });
+        return { out, needFetch };
+    }
+
+    function buildStockPortfolio() {
+        const container = document.getElementById('stockPortfolioCards');
+        const emptyMsg = document.getElementById('stockPortfolioEmpty');
+        if (!container) return;
+
+        const baseCurrency = (document.getElementById('stockBaseCurrency')?.value || 'EUR').trim().toUpperCase();
+
+        const stocks = getStocksData();
+        if (!stocks.length) {
+            container.innerHTML = '';
+            if (emptyMsg) emptyMsg.style.display = '';
+            return;
+        }
+
+        const groups = new Map();
+
+        function toNum(x) {
+            const n = parseFloat(String(x ?? '').replace(',', '.'));
+            return isFinite(n) ? n : 0;
+        }
+
+        const stocksSorted = stocks.slice().sort((a, b) => {
+            const da = String(a.tdate || a.date || '');
+            const db = String(b.tdate || b.date || '');
+            return da.localeCompare(db);
+        });
+
+        stocksSorted.forEach(s => {
+            const stockSymbol = String(s.stockName || '').trim() || 'UNKNOWN';
+            const currency = String((s.currencyBase || s.currency || '')).trim();
+            const qty = toNum(s.quantity);
+            const price = toNum((s.priceBase != null ? s.priceBase : s.price));
+            const fee = toNum((s.feeBase != null ? s.feeBase : s.fee));
+            const operation = String((s.operation || s.side || 'buy')).toLowerCase();
+
+            // Group by stock + currency (keeps numbers honest if user mixes currencies).
+            const key = `${stockSymbol}||${currency}`;
+            if (!groups.has(key)) {
+                groups.set(key, {
+                    stockSymbol,
+                    currency,
+                    totalQty: 0,
+                    totalCost: 0,
+                    totalValueBuy: 0,
+                    totalValueSell: 0,
+                    totalFee: 0,
+                    txCount: 0,
+                });
+            }
+            const g = groups.get(key);
+            g.txCount += 1;
+
+            // Handle BUY vs SELL transactions differently
+            if (operation === 'sell') {
+                // SELL: reduce holdings using weighted-average cost basis.
+                if (g.totalQty > 0) {
+                    const avgCost = g.totalCost / g.totalQty;
+                    const qtyToSell = Math.min(qty, g.totalQty);
+                    const soldCost = qtyToSell * avgCost;
+                    g.totalQty -= qtyToSell;
+                    g.totalCost -= soldCost;
+                    const excessQty = qty - qtyToSell;
+                    if (excessQty > 0) g.totalQty -= excessQty;
+                } else {
+                    g.totalQty -= qty;
+                }
+                g.totalValueSell += (qty * price) - fee;
+                g.totalFee += fee;
+            } else {
+                // BUY (default for unknown): increase holdings, track cost
+                g.totalQty += qty;
+                g.totalCost += (qty * price) + fee;
+                g.totalValueBuy += (qty * price) + fee;
+                g.totalFee += fee;
+            }
+        });
+
+        const list = Array.from(groups.values())
+            .filter(g => g.totalQty > 0)  // Only include positions with holdings
+            .sort((a, b) => (b.totalCost - a.totalCost));
+
+        if (list.length === 0) {
+            container.innerHTML = '';
+            if (emptyMsg) emptyMsg.style.display = '';
+            return;
+        }
+
+        container.innerHTML = list.map(g => {
+            const avgBuy = g.totalQty ? (g.totalCost / g.totalQty) : 0;
+            const soldCost = Math.max(0, g.totalValueBuy - g.totalCost);
+            const realized = g.totalValueSell - soldCost;
+            const cur = g.currency ? ` ${g.currency}` : (baseCurrency ? ` ${baseCurrency}` : '');
+            const symbol = String(g.stockSymbol || '').toUpperCase();
+            return `
+                <div class="totals-card" data-stock-symbol="${symbol}" data-stock-qty="${g.totalQty}" data-stock-cost="${g.totalCost}" data-stock-buy="${g.totalValueBuy}" data-stock-sell="${g.totalValueSell}">
+                    <div class="totals-header">
+                        <div>
+                            <div style="font-size:1rem;font-weight:700">
+                                <span class="stock-symbol">${symbol}</span>
+                                <span class="stock-name small-muted" style="margin-left:8px; font-weight:600;"></span>
+                            </div>
+                        </div>
+                    </div>
+
+                    <div class="totals-meta">
+                        <div class="totals-row">
+                            <span class="totals-label small-muted">Total Quantity:</span>
+                            <span class="totals-value">${formatNumber(g.totalQty, 6)}</span>
+                        </div>
+                        <div class="totals-row">
+                            <span class="totals-label small-muted">Total Value Now:</span>
+                            <span class="totals-value" data-stock-now>—</span>
+                        </div>
+                        <div class="totals-row">
+                            <span class="totals-label small-muted">Cost Basis:</span>
+                            <span class="totals-value">${formatOverviewValue(g.totalCost)}${cur}</span>
+                        </div>
+                        <div class="totals-row">
+                            <span class="totals-label small-muted">Unit price now:</span>
+                            <span class="totals-value" data-stock-live>—</span>
+                        </div>
+                        <div class="totals-row">
+                            <span class="totals-label small-muted">Avg Buy Price:</span>
+                            <span class="totals-value">${formatOverviewUnitPrice(avgBuy)}${cur}</span>
+                        </div>
+                        <div class="totals-row">
+                            <span class="totals-label small-muted">Fees paid:</span>
+                            <span class="totals-value">${formatOverviewUnitPrice(g.totalFee)}${cur}</span>
+                        </div>
+                        <div class="totals-row">
+                            <span class="totals-label small-muted">Realized P/L:</span>
+                            <span class="totals-value" data-stock-realized>— (N/A)</span>
+                        </div>
+                        <div class="totals-row">
+                            <span class="totals-label small-muted">Unrealized P/L:</span>
+                            <span class="totals-value" data-stock-unrealized>— (N/A)</span>
+                        </div>
+                        <div class="totals-row">
+                            <span class="totals-label small-muted">Total Gain / Loss:</span>
+                            <span class="totals-value" style="font-weight:bold;" data-stock-gl>— (N/A)</span>
+                        </div>
+                    </div>
+                </div>
+            `;
+        }).join('');
+
+        // Fill live quote fields asynchronously.
+        hydrateStockPortfolioLiveQuotes({ force: _stockForceHydrateNextLoad });
+        _stockForceHydrateNextLoad = false;
+    }
+
+    function showStockPortfolio() {
+        const title = document.getElementById('stockPageTitle');
+        const panel = document.getElementById('stockPanel');
+        const walletsPanel = document.getElementById('stockWalletsPanel');
+        const newDiv = document.getElementById('newStock');
+        const listDiv = document.getElementById('stockListDiv');
+        const updateDiv = document.getElementById('updateStockDiv');
+
+        if (title) title.innerText = 'Stock Portfolio';
+        if (panel) panel.style.display = 'block';
+        if (walletsPanel) walletsPanel.style.display = 'none';
+        if (newDiv) newDiv.style.display = 'none';
+        if (listDiv) listDiv.style.display = 'none';
+        if (updateDiv) updateDiv.style.display = 'none';
+
+        buildStockPortfolio();
+        setStockNavVisibility('portfolio');
+    }
+
+    function buildStockWalletContents() {
+        const container = document.getElementById('stockWalletsCards');
+        const emptyMsg = document.getElementById('stockWalletsEmpty');
+        if (!container) return;
+
+        const baseCurrency = (document.getElementById('stockBaseCurrency')?.value || 'EUR').trim().toUpperCase();
+        const stocks = getStocksData();
+        const wallets = getStockWalletsData();
+
+        const walletNameById = new Map();
+        wallets.forEach(w => {
+            const id = String(w.walletId || w.id || '').trim();
+            if (!id) return;
+            walletNameById.set(id, String(w.walletName || w.name || id));
+        });
+
+        function walletLabel(walletId) {
+            const id = String(walletId || '').trim();
+            if (!id) return 'Wallet';
+            return walletNameById.get(id) || id;
+        }
+
+        function toNum(x) {
+            const n = parseFloat(String(x ?? '').replace(',', '.'));
+            return isFinite(n) ? n : 0;
+        }
+
+        const holdingsByWallet = new Map();
+
+        function getHolding(walletId, symbol) {
+            const wId = String(walletId || '').trim();
+            const sym = String(symbol || '').trim().toUpperCase();
+            if (!wId || !sym) return null;
+            if (!holdingsByWallet.has(wId)) holdingsByWallet.set(wId, new Map());
+            const symMap = holdingsByWallet.get(wId);
+            if (!symMap.has(sym)) symMap.set(sym, { qty: 0, cost: 0 });
+            return symMap.get(sym);
+        }
+
+        function addQtyCost(walletId, symbol, qtyDelta, costDelta) {
+            const h = getHolding(walletId, symbol);
+            if (!h) return;
+            h.qty += qtyDelta;
+            h.cost += costDelta;
+        }
+
+        function removeAtAvgCost(walletId, symbol, qtyOut) {
+            const h = getHolding(walletId, symbol);
+            if (!h || !(qtyOut > 0)) return 0;
+
+            if (h.qty > 0) {
+                const removable = Math.min(qtyOut, h.qty);
+                const avgCost = h.cost / h.qty;
+                const removedCost = removable * avgCost;
+                h.qty -= removable;
+                h.cost -= removedCost;
+                const excess = qtyOut - removable;
+                if (excess > 0) h.qty -= excess;
+                return removedCost;
+            }
+
+            h.qty -= qtyOut;
+            return 0;
+        }
+
+        stocks.forEach(tx => {
+            const symbol = String(tx.stockName || '').trim().toUpperCase();
+            const op = String(tx.operation || tx.side || '').trim().toLowerCase() || 'buy';
+            const qty = toNum(tx.quantity);
+            if (!symbol || !(qty > 0)) return;
+
+            const txPriceBase = tx.priceBase != null ? toNum(tx.priceBase) : toNum(tx.price);
+            const txFeeBase = tx.feeBase != null ? toNum(tx.feeBase) : toNum(tx.fee);
+            const txCostBase = (qty * txPriceBase) + txFeeBase;
+
+            if (op === 'buy') {
+                const holdWallet = String(tx.toWallet || tx.fromWallet || '').trim();
+                if (!holdWallet) return;
+                addQtyCost(holdWallet, symbol, qty, txCostBase);
+            } else if (op === 'sell') {
+                const holdWallet = String(tx.fromWallet || tx.toWallet || '').trim();
+                if (!holdWallet) return;
+                removeAtAvgCost(holdWallet, symbol, qty);
+            } else if (op === 'transfer') {
+                const fromWallet = String(tx.fromWallet || '').trim();
+                const toWallet = String(tx.toWallet || '').trim();
+                const movedCost = fromWallet ? removeAtAvgCost(fromWallet, symbol, qty) : 0;
+                if (toWallet) addQtyCost(toWallet, symbol, qty, movedCost);
+            }
+        });
+
+        const walletCards = [];
+        for (const [walletId, symMap] of holdingsByWallet.entries()) {
+            const rows = [];
+            for (const [sym, h] of symMap.entries()) {
+                if (!(h.qty > 1e-12)) continue;
+                rows.push({ sym, qty: h.qty, cost: h.cost });
+            }
+            if (!rows.length) continue;
+            rows.sort((a, b) => a.sym.localeCompare(b.sym));
+            walletCards.push({ walletId, walletName: walletLabel(walletId), rows });
+        }
+
+        walletCards.sort((a, b) => String(a.walletName).localeCompare(String(b.walletName)));
+
+        if (!walletCards.length) {
+            container.innerHTML = '';
+            if (emptyMsg) emptyMsg.style.display = '';
+            return;
+        }
+        if (emptyMsg) emptyMsg.style.display = 'none';
+
+        container.innerHTML = walletCards.map(w => {
+            const walletIdAttr = escapeHtml(w.walletId);
+            return `
+                <div class="totals-card" data-stock-wallet-id="${walletIdAttr}">
+                    <div class="totals-header">
+                        <div style="font-size:1rem;font-weight:800;color:var(--title-accent);">${escapeHtml(w.walletName)}</div>
+                        <div class="wallet-contents-total-badge" data-stock-wallet-total>— ${escapeHtml(baseCurrency)}</div>
+                    </div>
+                    <div class="wallet-contents-list">
+                        ${w.rows.map(r => {
+                            const sym = escapeHtml(r.sym);
+                            return `
+                                <div class="wallet-contents-row" data-stock-wallet-symbol="${sym}" data-stock-wallet-qty="${r.qty}" data-stock-wallet-cost="${r.cost}" data-stock-wallet-wallet="${walletIdAttr}">
+                                    <div class="wallet-contents-left">
+                                        <span class="wallet-contents-symbol" data-stock-wallet-name>${sym}</span>
+                                        <span class="wallet-contents-qty">${escapeHtml(String(r.qty))}</span>
+                                    </div>
+                                    <div class="wallet-contents-right">
+                                        <div class="wallet-contents-value" data-stock-wallet-value>— ${escapeHtml(baseCurrency)}</div>
+                                        <div class="wallet-contents-gl" data-stock-wallet-gl>—</div>
+                                    </div>
+                                </div>
+                            `;
+                        }).join('')}
+                    </div>
+                </div>
+            `;
+        }).join('');
+
+        hydrateStockWalletContentsLiveQuotes(baseCurrency, { force: _stockForceHydrateNextLoad });
+        _stockForceHydrateNextLoad = false;
+    }
+
+    async function hydrateStockWalletContentsLiveQuotes(baseCurrency, opts) {
+        const rows = Array.from(document.querySelectorAll('#stockWalletsCards [data-stock-wallet-symbol]'));
+        if (!rows.length) { _stockUpdateRefreshLabel(); return; }
+
+        const rowsBySymbol = new Map();
+        rows.forEach(r => {
+            const sym = String(r.getAttribute('data-stock-wallet-symbol') || '').trim().toUpperCase();
+            if (!sym) return;
+            if (!rowsBySymbol.has(sym)) rowsBySymbol.set(sym, []);
+            rowsBySymbol.get(sym).push(r);
+        });
+
+        const uniqSyms = Array.from(rowsBySymbol.keys());
+        const pc = window.priceCache;
+        const force = !!(opts && opts.force);
+
+        let cachedMap = {};
+        let needFetch = uniqSyms.slice();
+        if (pc) {
+            const cached = _stockCachedPriceMap(pc, uniqSyms, force);
+            cachedMap = cached.out;
+            needFetch = force ? uniqSyms.slice() : cached.needFetch;
+        }
+
+        const totalsByWallet = new Map();
+        function applyPrices(priceMap) {
+            for (const [sym, symRows] of rowsBySymbol.entries()) {
+                const price = priceMap[sym];
+                const entry = pc ? pc.entry('stock', sym) : null;
+                for (const row of symRows) {
+                    const qty = parseFloat(row.getAttribute('data-stock-wallet-qty') || '0') || 0;
+                    const cost = parseFloat(row.getAttribute('data-stock-wallet-cost') || '0') || 0;
+                    const walletId = String(row.getAttribute('data-stock-wallet-wallet') || '').trim();
+                    const valEl = row.querySelector('[data-stock-wallet-value]');
+                    const glEl = row.querySelector('[data-stock-wallet-gl]');
+                    const cur = baseCurrency ? ` ${baseCurrency}` : '';
+
+                    if (price == null) {
+                        if (valEl) valEl.textContent = `—${cur}`;
+                        if (glEl) {
+                            glEl.textContent = '— (N/A)';
+                            glEl.classList.remove('pct-positive', 'pct-negative');
+                            glEl.classList.add('pct-neutral');
+                        }
+                        continue;
+                    }
+
+                    const valueNow = qty * price;
+                    const gl = valueNow - cost;
+                    const glPct = cost > 0 ? (gl / cost) * 100 : null;
+                    const glPctText = glPct == null ? 'N/A' : `${glPct >= 0 ? '+' : ''}${formatNumber(glPct, 2)}%`;
+                    if (valEl) valEl.textContent = `${formatOverviewUnitPrice(valueNow)}${cur}`;
+                    if (glEl) {
+                        glEl.textContent = `${gl >= 0 ? '+' : ''}${formatOverviewValue(gl)}${cur} (${glPctText})`;
+                        glEl.classList.remove('pct-positive', 'pct-negative', 'pct-neutral');
+                        glEl.classList.add(gl >= 0 ? 'pct-positive' : 'pct-negative');
+                    }
+
+                    totalsByWallet.set(walletId, (totalsByWallet.get(walletId) || 0) + valueNow);
+                }
+            }
+
+            const cards = Array.from(document.querySelectorAll('#stockWalletsCards [data-stock-wallet-id]'));
+            cards.forEach(card => {
+                const walletId = String(card.getAttribute('data-stock-wallet-id') || '').trim();
+                const totalEl = card.querySelector('[data-stock-wallet-total]');
+                const total = totalsByWallet.get(walletId);
+                const cur = baseCurrency ? ` ${baseCurrency}` : '';
+                if (totalEl) totalEl.textContent = (typeof total === 'number') ? `${formatNumber(total, 2)}${cur}` : `—${cur}`;
+            });
+            _stockUpdateRefreshLabel();
+        }
+
+        applyPrices(cachedMap);
+
+        if (!pc || !needFetch.length) return;
+
+        const fetchedMap = await pc.getMany('stock', needFetch, force ? { force: true } : undefined);
+        const merged = Object.assign({}, cachedMap, fetchedMap || {});
+        totalsByWallet.clear();
+        applyPrices(merged);
+    }
+
+    function showStockWallets() {
+        const title = document.getElementById('stockPageTitle');
+        const panel = document.getElementById('stockPanel');
+        const walletsPanel = document.getElementById('stockWalletsPanel');
+        const newDiv = document.getElementById('newStock');
+        const listDiv = document.getElementById('stockListDiv');
+        const updateDiv = document.getElementById('updateStockDiv');
+
+        if (title) title.innerText = 'Wallet Contents';
+        if (panel) panel.style.display = 'none';
+        if (walletsPanel) walletsPanel.style.display = 'block';
+        if (newDiv) newDiv.style.display = 'none';
+        if (listDiv) listDiv.style.display = 'none';
+        if (updateDiv) updateDiv.style.display = 'none';
+
+        buildStockWalletContents();
+        setStockNavVisibility('wallets');
+    }
+
+    async function hydrateStockPortfolioLiveQuotes(opts) {
+        const cards = Array.from(document.querySelectorAll('#stockPortfolioCards [data-stock-symbol]'));
+        if (!cards.length) { _stockUpdateRefreshLabel(); return; }
+
+        const symbols = [];
+        cards.forEach(c => {
+            const s = String(c.getAttribute('data-stock-symbol') || '').trim();
+            if (s) symbols.push(s);
+        });
+        const pc = window.priceCache;
+        const force = !!(opts && opts.force);
+
+        let cachedMap = {};
+        let needFetch = symbols.slice();
+        if (pc) {
+            const cached = _stockCachedPriceMap(pc, symbols, force);
+            cachedMap = cached.out;
+            needFetch = force ? symbols.slice() : cached.needFetch;
+        }
+
+        function applyPrices(priceMap) {
+            for (const card of cards) {
+                const symbol = String(card.getAttribute('data-stock-symbol') || '').trim();
+                if (!symbol) continue;
+                const price = priceMap[symbol];
+                const entry = pc ? pc.entry('stock', symbol) : null;
+                const curCode = (entry && entry.currency) ? entry.currency : '';
+                const cur = curCode ? ` ${curCode}` : '';
+
+                const qty = parseFloat(card.getAttribute('data-stock-qty') || '0') || 0;
+                const cost = parseFloat(card.getAttribute('data-stock-cost') || '0') || 0;
+                const buy = parseFloat(card.getAttribute('data-stock-buy') || '0') || 0;
+                const sell = parseFloat(card.getAttribute('data-stock-sell') || '0') || 0;
+
+                const liveEl = card.querySelector('[data-stock-live]');
+                const nowEl = card.querySelector('[data-stock-now]');
+                const realizedEl = card.querySelector('[data-stock-realized]');
+                const unrealizedEl = card.querySelector('[data-stock-unrealized]');
+                const glEl = card.querySelector('[data-stock-gl]');
+                const nameEl = card.querySelector('.stock-name');
+                if (nameEl && entry && entry.name && !nameEl.textContent.trim()) nameEl.textContent = entry.name;
+
+                const soldCost = Math.max(0, buy - cost);
+                const realized = sell - soldCost;
+                const realizedPct = soldCost ? (realized / soldCost) * 100 : null;
+                if (realizedEl) {
+                    const signR = realized >= 0 ? '+' : '';
+                    const rp = realizedPct == null
+                        ? 'N/A'
+                        : `${realizedPct >= 0 ? '+' : ''}${formatNumber(realizedPct, 2)}%`;
+                    realizedEl.textContent = `${signR}${formatOverviewValue(realized)}${cur} (${rp})`;
+                    realizedEl.classList.remove('pct-positive','pct-negative','pct-neutral');
+                    realizedEl.classList.add(realized >= 0 ? 'pct-positive' : 'pct-negative');
+                }
+
+                if (price == null) {
+                    if (liveEl) liveEl.textContent = '—';
+                    if (nowEl) nowEl.textContent = '—';
+                    if (unrealizedEl) unrealizedEl.textContent = '— (N/A)';
+                    if (glEl) glEl.textContent = '— (N/A)';
+                    continue;
+                }
+
+                const valueNow = qty * price;
+                const unrealized = valueNow - cost;
+                const gl = realized + unrealized;
+                const unrealizedPct = cost ? (unrealized / cost) * 100 : null;
+                const totalPct = cost ? (gl / cost) * 100 : null;
+
+                if (liveEl) liveEl.textContent = `${formatOverviewUnitPrice(price)}${cur}`;
+                if (nowEl) nowEl.textContent = `${formatOverviewValue(valueNow)}${cur}`;
+                if (unrealizedEl) {
+                    const signU = unrealized >= 0 ? '+' : '';
+                    const up = unrealizedPct == null
+                        ? 'N/A'
+                        : `${unrealizedPct >= 0 ? '+' : ''}${formatNumber(unrealizedPct, 2)}%`;
+                    unrealizedEl.textContent = `${signU}${formatOverviewValue(unrealized)}${cur} (${up})`;
+                    unrealizedEl.classList.remove('pct-positive','pct-negative','pct-neutral');
+                    unrealizedEl.classList.add(unrealized >= 0 ? 'pct-positive' : 'pct-negative');
+                }
+                if (glEl) {
+                    const sign = gl >= 0 ? '+' : '';
+                    const tp = totalPct == null
+                        ? 'N/A'
+                        : `${totalPct >= 0 ? '+' : ''}${formatNumber(totalPct, 2)}%`;
+                    glEl.textContent = `${sign}${formatOverviewValue(gl)}${cur} (${tp})`;
+                    glEl.classList.remove('pct-positive','pct-negative','pct-neutral');
+                    glEl.classList.add(gl >= 0 ? 'pct-positive' : 'pct-negative');
+                }
+            }
+            _stockUpdateRefreshLabel();
+        }
+
+        applyPrices(cachedMap);
+
+        if (!pc || !needFetch.length) return;
+
+        const fetchedMap = await pc.getMany('stock', needFetch, force ? { force: true } : undefined);
+        const merged = Object.assign({}, cachedMap, fetchedMap || {});
+        applyPrices(merged);
+    }
+
+    function _stockUpdateRefreshLabel() {
+        const el = document.getElementById('stockLastRefresh');
+        if (!el || !window.priceCache) return;
+        const ts = priceCache.lastRefresh();
+        if (!ts) { el.textContent = ''; return; }
+        const d = new Date(ts);
+        const yyyy = d.getFullYear();
+        const MM = String(d.getMonth() + 1).padStart(2, '0');
+        const dd = String(d.getDate()).padStart(2, '0');
+        const hh = String(d.getHours()).padStart(2, '0');
+        const mm = String(d.getMinutes()).padStart(2, '0');
+        const ss = String(d.getSeconds()).padStart(2, '0');
+        el.textContent = 'Prices updated ' + yyyy + '-' + MM + '-' + dd + ' ' + hh + ':' + mm + ':' + ss;
+    }
+
+    function refreshStockPrices(force) {
+        const btn = document.getElementById('stockRefreshBtn');
+        const label = document.getElementById('stockRefreshLabel');
+        if (btn) btn.disabled = true;
+        const prev = label ? label.textContent : '';
+        if (label) label.textContent = 'Refreshing…';
+        _stockForceHydrateNextLoad = !!force;
+        return loadStockPage(true).finally(function() {
+            _stockForceHydrateNextLoad = false;
+            if (btn) btn.disabled = false;
+            if (label) label.textContent = prev || 'Refresh prices';
+        });
+    }
+
+    function _normalizeStockSide(v) {
+        return String(v || '').trim().toLowerCase();
+    }
+
+    function _applyStockWalletRules(sideEl, fromEl, toEl) {
+        if (!sideEl || !fromEl || !toEl) return;
+        const side = _normalizeStockSide(sideEl.value);
+
+        fromEl.required = (side === 'sell');
+        toEl.required = (side === 'buy');
+
+        fromEl.setCustomValidity('');
+        toEl.setCustomValidity('');
+    }
+
+    function _validateStockWalletRules(sideEl, fromEl, toEl) {
+        if (!sideEl || !fromEl || !toEl) return true;
+
+        _applyStockWalletRules(sideEl, fromEl, toEl);
+        const side = _normalizeStockSide(sideEl.value);
+        const fromVal = String(fromEl.value || '').trim();
+        const toVal = String(toEl.value || '').trim();
+
+        if (side === 'buy' && !toVal) {
+            toEl.setCustomValidity('To Wallet is required for Buy transactions.');
+            toEl.reportValidity();
+            return false;
+        }
+        if (side === 'sell' && !fromVal) {
+            fromEl.setCustomValidity('From Wallet is required for Sell transactions.');
+            fromEl.reportValidity();
+            return false;
+        }
+
+        return true;
+    }
+
+    // Crypto-like autocomplete powered by backend stock search/quote endpoints.
+    // - User can type symbol or name
+    // - Dropdown suggests "SYMBOL - Company Name"
+    // - Hidden input stores the symbol
+    // - Optionally auto-fills price/currency from /stock/quote
+    function initStockAutocomplete(inputId, listWrapId, hiddenId, opts) {
+        const input = document.getElementById(inputId);
+        const listWrap = document.getElementById(listWrapId);
+        const hidden = document.getElementById(hiddenId);
+        const priceEl = (opts && opts.priceId) ? document.getElementById(opts.priceId) : null;
+        const currencyEl = (opts && opts.currencyId) ? document.getElementById(opts.currencyId) : null;
+        if (!input || !listWrap || !hidden) return;
+
+        let currentFocus = -1;
+        let lastController = null;
+        let lastQuotedSymbol = '';
+
+        function showError(inputElem, msg) {
+            clearError(inputElem);
+            const span = document.createElement('span');
+            span.className = 'field-error';
+            span.innerText = msg || 'Please select a stock from the suggestions.';
+            if (!inputElem || !inputElem.parentNode) return;
+
+            // Match crypto: show error inline beside the label for the stock search fields.
+            const isStockSearch = inputElem.id === 'stockSearch' || inputElem.id === 'updateStockSearch';
+            if (isStockSearch) {
+                span.classList.add('field-error-inline');
+                const label = inputElem.parentNode.querySelector('label');
+                if (label) {
+                    label.appendChild(span);
+                    return;
+                }
+            }
+
+            // Fallback: show below the input.
+            inputElem.parentNode.appendChild(span);
+        }
+
+        function clearError(inputElem) {
+            if (!inputElem || !inputElem.parentNode) return;
+            const existing = inputElem.parentNode.querySelector('.field-error');
+            if (existing) existing.parentNode.removeChild(existing);
+        }
+
+        function extractSymbol(raw) {
+            const txt = String(raw || '').trim();
+            if (!txt) return '';
+            // If user selected an option, input can be "SYM - Name".
+            if (txt.includes(' - ')) {
+                const first = txt.split(' - ')[0].trim();
+                return first.replace(/\(.+\)$/, '').trim().toUpperCase();
+            }
+            // If user typed a raw symbol, accept only strict symbol-like strings.
+            // (Avoid treating company names as symbols.)
+            if (/\s/.test(txt)) return '';
+            if (!/^[A-Za-z0-9.\-]+$/.test(txt)) return '';
+            const upper = txt.toUpperCase();
+            // Most tickers are short; keep a conservative max to reduce false positives.
+            if (upper.length > 12) return '';
+            return upper;
+        }
+
+        function setHiddenFromInput() {
+            hidden.value = extractSymbol(input.value);
+        }
+
+        async function tryMatchAndSetFromSearch() {
+            setHiddenFromInput();
+            const sym = String(hidden.value || '').trim().toUpperCase();
+            if (!sym) return false;
+            if (!/^[A-Z0-9.\-]+$/.test(sym)) return false;
+
+            // If it came from a list click, trust it (same spirit as crypto: must come from list).
+            if (String(hidden.dataset.fromList || '') === '1') {
+                // Keep whatever label the user selected (usually "SYM - Name").
+                hidden.value = sym;
+                return true;
+            }
+
+            // Otherwise, validate by checking that /stock/search can find this symbol.
+            try {
+                const res = await fetch(`/stock/search?q=${encodeURIComponent(sym)}`);
+                const data = await res.json();
+                if (!res.ok) return false;
+                const results = Array.isArray(data && data.results) ? data.results : [];
+                const match = results.find(r => String(r && r.symbol || '').trim().toUpperCase() === sym);
+                if (!match) return false;
+                const nm = String(match && match.name || '').trim();
+                input.value = nm ? `${sym} - ${nm}` : sym;
+                hidden.value = sym;
+                return true;
+            } catch (e) {
+                return false;
+            }
+        }
+
+        function closeAllLists(elmnt) {
+            const x = document.getElementsByClassName('autocomplete-items');
+            for (let i = x.length - 1; i >= 0; i--) {
+                if (elmnt !== x[i] && elmnt !== input) {
+                    x[i].parentNode && x[i].parentNode.removeChild(x[i]);
+                }
+            }
+        }
+
+        function addActive(x) {
+            if (!x) return false;
+            removeActive(x);
+            if (currentFocus >= x.length) currentFocus = 0;
+            if (currentFocus < 0) currentFocus = (x.length - 1);
+            x[currentFocus].classList.add('autocomplete-active');
+        }
+
+        function removeActive(x) {
+            for (let i = 0; i < x.length; i++) {
+                x[i].classList.remove('autocomplete-active');
+            }
+        }
+
+        function ensureSelectHasOption(selectEl, value) {
+            if (!selectEl || !value) return;
+            if (String(selectEl.tagName || '').toUpperCase() !== 'SELECT') return;
+            const v = String(value).trim().toUpperCase();
+            if (!v) return;
+            const exists = Array.from(selectEl.options || []).some(o => String(o.value || '').toUpperCase() === v);
+            if (exists) return;
+            const opt = document.createElement('option');
+            opt.value = v;
+            opt.textContent = v;
+            selectEl.appendChild(opt);
+        }
+
+        async function fillQuote(symbol) {
+            const sym = String(symbol || '').trim().toUpperCase();
+            if (!sym) return;
+            if (lastQuotedSymbol === sym) return;
+            lastQuotedSymbol = sym;
+
+            try {
+                const res = await fetch(`/stock/quote?symbol=${encodeURIComponent(sym)}`);
+                const data = await res.json();
+                if (!res.ok) {
+                    console.warn('[stock] quote failed', res.status, data && data.error ? data.error : data);
+                }
+                // Keep input as the symbol only; name stays in the dropdown suggestions.
+                if (priceEl && (String(priceEl.value || '').trim() === '') && data && typeof data.price === 'number') {
+                    // Prefer website/base currency quote if available.
+                    if (typeof data.priceBase === 'number') priceEl.value = String(data.priceBase);
+                    else priceEl.value = String(data.price);
+                }
+                if (currencyEl && (String(currencyEl.value || '').trim() === '') && data && data.currency) {
+                    const desired = data.currencyBase ? String(data.currencyBase) : String(data.currency);
+                    ensureSelectHasOption(currencyEl, desired);
+                    currencyEl.value = String(desired);
+                }
+            } catch (e) {
+                console.warn('[stock] quote exception', e);
+            }
+        }
+
+        function commitSelection(symbol, name) {
+            const sym = String(symbol || '').trim().toUpperCase();
+            if (!sym) return;
+            // Crypto-like: show a friendly label, but store only the symbol.
+            const nm = String(name || '').trim();
+            input.value = nm ? `${sym} - ${nm}` : sym;
+            hidden.value = sym;
+            hidden.dataset.fromList = '1';
+            clearError(input);
+            closeAllLists();
+            fillQuote(sym);
+        }
+
+        input.addEventListener('input', async function () {
+            const q = String(input.value || '').trim();
+            setHiddenFromInput();
+            hidden.dataset.fromList = '0';
+            clearError(input);
+            closeAllLists();
+            currentFocus = -1;
+            if (!q || q.length < 2) return;
+
+            const list = document.createElement('div');
+            list.setAttribute('class', 'autocomplete-items');
+            if (!listWrap.style.position) listWrap.style.position = 'relative';
+            list.style.position = 'absolute';
+            list.style.zIndex = 1000;
+            list.style.left = '0px';
+            list.style.right = '0px';
+            list.style.top = '4px';
+            list.style.maxHeight = '260px';
+            list.style.overflowY = 'auto';
+            listWrap.appendChild(list);
+
+            try {
+                if (lastController) lastController.abort();
+                lastController = new AbortController();
+                const res = await fetch(`/stock/search?q=${encodeURIComponent(q)}`, { signal: lastController.signal });
+                const data = await res.json();
+                if (!res.ok) {
+                    console.warn('[stock] search failed', res.status, data && data.error ? data.error : data);
+                }
+                const results = Array.isArray(data && data.results) ? data.results : [];
+
+                results.slice(0, 20).forEach(r => {
+                    const sym = String(r.symbol || '').trim().toUpperCase();
+                    const nm = String(r.name || '').trim();
+                    const region = String(r.region || '').trim();
+                    const cur = String(r.currency || '').trim();
+
+                    if (!sym) return;
+
+                    const item = document.createElement('div');
+                    const meta = [region, cur].filter(Boolean).join(' / ');
+                    item.innerHTML = `<strong>${sym}</strong>${nm ? ` - ${nm}` : ''}${meta ? ` <span class="small-muted">(${meta})</span>` : ''}`;
+                    item.addEventListener('click', function () {
+                        commitSelection(sym, nm);
+                    });
+                    item.addEventListener('touchstart', function (e) {
+                        e.preventDefault();
+                        commitSelection(sym, nm);
+                    });
+                    // Prefer committing selection before input blur fires.
+                    item.addEventListener('mousedown', function () {
+                        commitSelection(sym, nm);
+                    });
+                    list.appendChild(item);
+                });
+            } catch (e) {
+                if (!(e && e.name === 'AbortError')) {
+                    console.warn('[stock] search exception', e);
+                }
+            }
+        });
+
+        input.addEventListener('keydown', function (e) {
+            let x = document.getElementsByClassName('autocomplete-items');
+            if (x.length) x = x[0].getElementsByTagName('div');
+            if (e.keyCode === 40) {
+                currentFocus++;
+                addActive(x);
+            } else if (e.keyCode === 38) {
+                currentFocus--;
+                addActive(x);
+            } else if (e.keyCode === 13) {
+                if (currentFocus > -1) {
+                    e.preventDefault();
+                    if (x && x[currentFocus]) x[currentFocus].click();
+                }
+            }
+        });
+
+        input.addEventListener('blur', function () {
+            // Small timeout to allow click selection to commit first.
+            setTimeout(async () => {
+                const ok = await tryMatchAndSetFromSearch();
+                if (!ok) {
+                    // Clear free text and hidden value (crypto-like: must be a real item).
+                    input.value = '';
+                    hidden.value = '';
+                    hidden.dataset.fromList = '0';
+                    showError(input, 'Please select a stock from the suggestions.');
+                    return;
+                }
+                clearError(input);
+                const sym = String(hidden.value || '').trim().toUpperCase();
+                if (sym) fillQuote(sym);
+            }, 150);
+        });
+
+        const form = input.closest('form');
+        if (form) {
+            form.addEventListener('submit', function (e) {
+                // Async validation (same end result as crypto): block submit unless the
+                // input matches an actual symbol.
+                e.preventDefault();
+                (async () => {
+                    const ok = await tryMatchAndSetFromSearch();
+                    if (!ok) {
+                        showError(input, 'You must choose a stock from the suggestions before submitting.');
+                        try { input.focus(); } catch (_) {}
+                        return;
+                    }
+                    const isUpdate = form.id === 'updateForm';
+                    const sideEl = document.getElementById(isUpdate ? 'updateOperation' : 'operation');
+                    const fromEl = document.getElementById(isUpdate ? 'updateFromWallet' : 'fromWallet');
+                    const toEl = document.getElementById(isUpdate ? 'updateToWallet' : 'toWallet');
+                    if (!_validateStockWalletRules(sideEl, fromEl, toEl)) return;
+                    clearError(input);
+                    form.submit();
+                })();
+                return false;
+            });
+        }
+
+        document.addEventListener('click', function (e) {
+            closeAllLists(e.target);
+        });
+    }
+
+    function showStockNew() {
+        const title = document.getElementById('stockPageTitle');
+        const panel = document.getElementById('stockPanel');
+        const walletsPanel = document.getElementById('stockWalletsPanel');
+        const newDiv = document.getElementById('newStock');
+        const listDiv = document.getElementById('stockListDiv');
+        const updateDiv = document.getElementById('updateStockDiv');
+
+        if (title) title.innerText = 'New Stock Transaction';
+        if (panel) panel.style.display = 'none';
+        if (walletsPanel) walletsPanel.style.display = 'none';
+        if (newDiv) newDiv.style.display = 'block';
+        if (listDiv) listDiv.style.display = 'none';
+        if (updateDiv) updateDiv.style.display = 'none';
+        setStockNavVisibility('new');
+    }
+
+    function showStockHistory() {
+        const title = document.getElementById('stockPageTitle');
+        const panel = document.getElementById('stockPanel');
+        const walletsPanel = document.getElementById('stockWalletsPanel');
+        const newDiv = document.getElementById('newStock');
+        const listDiv = document.getElementById('stockListDiv');
+        const updateDiv = document.getElementById('updateStockDiv');
+
+        if (title) title.innerText = 'Stocks Transactions History';
+        if (panel) panel.style.display = 'none';
+        if (walletsPanel) walletsPanel.style.display = 'none';
+        if (listDiv) listDiv.style.display = 'block';
+        if (newDiv) newDiv.style.display = 'none';
+        if (updateDiv) updateDiv.style.display = 'none';
+        setStockNavVisibility('history');
+
+        if (typeof applyStockFilters === 'function') { applyStockFilters(); }
+    }
+
+    function showStockUpdate() {
+        const title = document.getElementById('stockPageTitle');
+        const panel = document.getElementById('stockPanel');
+        const walletsPanel = document.getElementById('stockWalletsPanel');
+        const newDiv = document.getElementById('newStock');
+        const listDiv = document.getElementById('stockListDiv');
+        const updateDiv = document.getElementById('updateStockDiv');
+
+        if (title) title.innerText = 'Update Stock Transaction';
+        if (panel) panel.style.display = 'none';
+        if (walletsPanel) walletsPanel.style.display = 'none';
+        if (updateDiv) updateDiv.style.display = 'block';
+        if (newDiv) newDiv.style.display = 'none';
+        if (listDiv) listDiv.style.display = 'none';
+
+        // Update view doesn't have its own nav button.
+        setStockNavVisibility('update');
+    }
+
+    function editStock(stockId, userId, stockName, tdate, fromWallet, toWallet, operation, quantity, price, currency, fee, feeCurrency, note) {
+        document.getElementById("updateStockId").value = stockId;
+        document.getElementById("updateUserId").value = userId;
+        const hidden = document.getElementById("updateStockName");
+        const visible = document.getElementById("updateStockSearch");
+        const sym = (stockName || '').toUpperCase();
+        if (hidden) {
+            hidden.value = sym;
+            // Treat the existing saved symbol as already-selected so blur/submit validators
+            // don't clear it just because we didn't pick it from today's autocomplete list.
+            hidden.dataset.fromList = sym ? '1' : '0';
+        }
+        if (visible) visible.value = sym;
+        {
+            const el = document.getElementById("updateTdate");
+            if (el) el.value = (tdate || '').slice(0, 10);
+        }
+        document.getElementById("updateFromWallet").value = fromWallet;
+        document.getElementById("updateToWallet").value = toWallet;
+        {
+            const opEl = document.getElementById("updateOperation");
+            if (opEl) opEl.value = operation || '';
+        }
+        _applyStockWalletRules(
+            document.getElementById('updateOperation'),
+            document.getElementById('updateFromWallet'),
+            document.getElementById('updateToWallet')
+        );
+        document.getElementById("updateQuantity").value = quantity;
+        document.getElementById("updatePrice").value = price;
+        document.getElementById("updateCurrency").value = currency;
+        document.getElementById("updateFee").value = fee;
+        {
+            const el = document.getElementById("updateFeeCurrency");
+            if (el) el.value = feeCurrency || currency || 'EUR';
+        }
+        document.getElementById("updateNote").value = note;
+        showStockUpdate();
+        // Route is lowercase in the blueprint: /deletestock/<stock_id>/<user_id>
+        document.getElementById("deleteForm").action = `/deletestock/${stockId}/${userId}`;
+
+        // Best-effort: resolve and show company name, but never overwrite if the user started editing.
+        if (visible && sym) {
+            const requestSym = sym;
+            fetch(`/stock/quote?symbol=${encodeURIComponent(requestSym)}`)
+                .then(r => r.json())
+                .then(d => {
+                    if (!visible) return;
+                    // Only fill the label if the field still shows just the symbol.
+                    const current = String(visible.value || '').trim().toUpperCase();
+                    const hiddenSym = hidden ? String(hidden.value || '').trim().toUpperCase() : '';
+                    if (hiddenSym !== requestSym) return;
+                    if (current !== requestSym) return;
+                    if (d && d.name) visible.value = `${requestSym} - ${d.name}`;
+                })
+                .catch(() => {});
+        }
+    }  
+
+    function editStockFromRow(buttonEl) {
+        const li = buttonEl?.closest('li[data-id]');
+        if (!li) return;
+        editStock(
+            li.dataset.id,
+            li.dataset.userid,
+            li.dataset.stock,
+            li.dataset.tdate,
+            li.dataset.from,
+            li.dataset.to,
+            li.dataset.operation,
+            li.dataset.qty,
+            li.dataset.price,
+            li.dataset.currency,
+            li.dataset.fee,
+            li.dataset.feecurrency,
+            li.dataset.note
+        );
+    }
+
+    function parseLocalDateTime(dateStr) {
+        // Accepts: YYYY-MM-DDTHH:mm; parse as local.
+        const s = String(dateStr || '').trim();
+        if (!s) return null;
+        const m = s.match(/^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2})/);
+        if (!m) return null;
+        return new Date(
+            parseInt(m[1], 10),
+            parseInt(m[2], 10) - 1,
+            parseInt(m[3], 10),
+            parseInt(m[4], 10),
+            parseInt(m[5], 10),
+            0,
+            0
+        );
+    }
+
+    function parseTxDate(dateStr) {
+        // Most tx dates are ISO-like without timezone; parse as local.
+        if (dateStr && /^\d{4}-\d{2}-\d{2}$/.test(String(dateStr).trim())) {
+            const localDateOnly = new Date(`${String(dateStr).trim()}T00:00:00`);
+            return isNaN(localDateOnly) ? null : localDateOnly;
+        }
+        const d = parseLocalDateTime(dateStr);
+        if (d) return d;
+        if (!dateStr) return null;
+        const fallback = new Date(dateStr);
+        return isNaN(fallback) ? null : fallback;
+    }
+
+    function dayKeyFromDate(d) {
+        if (!d || isNaN(d)) return 'unknown';
+        const y = d.getFullYear();
+        const m = String(d.getMonth() + 1).padStart(2, '0');
+        const day = String(d.getDate()).padStart(2, '0');
+        return `${y}-${m}-${day}`;
+    }
+
+    function dayLabelFromDate(d) {
+        if (!d || isNaN(d)) return 'Unknown date';
+        try {
+            return d.toLocaleDateString('en-GB', { day: '2-digit', month: 'short', year: 'numeric' });
+        } catch (e) {
+            return `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`;
+        }
+    }
+
+    function buildStockDayGroups() {
+        const list = document.getElementById('stockList');
+        if (!list) return;
+
+        // Remove existing headers
+        list.querySelectorAll('li.crypto-group-header').forEach(h => h.remove());
+
+        // Only group real transaction items
+        const txItems = Array.from(list.querySelectorAll('li[data-tdate]'));
+        if (!txItems.length) return;
+
+        let currentKey = null;
+        txItems.forEach(li => {
+            const d = parseTxDate(li.getAttribute('data-tdate'));
+            const key = dayKeyFromDate(d);
+            li.setAttribute('data-group', key);
+
+            if (key !== currentKey) {
+                const header = document.createElement('li');
+                header.className = 'crypto-group-header';
+                header.setAttribute('data-group', key);
+                header.textContent = dayLabelFromDate(d);
+                list.insertBefore(header, li);
+                currentKey = key;
+            }
+        });
+    }
+
+    function syncStockGroupHeaders() {
+        const list = document.getElementById('stockList');
+        if (!list) return;
+
+        const headers = Array.from(list.querySelectorAll('li.crypto-group-header'));
+        if (!headers.length) return;
+
+        const txItems = Array.from(list.querySelectorAll('li[data-tdate]'));
+        headers.forEach(h => {
+            const key = h.getAttribute('data-group') || '';
+            const anyVisible = txItems.some(li => {
+                if ((li.getAttribute('data-group') || '') !== key) return false;
+                return li.style.display !== 'none';
+            });
+            h.style.display = anyVisible ? '' : 'none';
+        });
+    }
+
+    function ensureStockGroupsBuilt(force) {
+        const list = document.getElementById('stockList');
+        if (!list) return;
+        const hasHeaders = !!list.querySelector('li.crypto-group-header');
+        if (force || !hasHeaders) {
+            buildStockDayGroups();
+        }
+        syncStockGroupHeaders();
+    }
+
+    function applyStockFilters() {
+        const list = document.getElementById('stockList');
+        if (!list) return;
+        // Ensure day grouping headers exist, but only filter real tx items.
+        ensureStockGroupsBuilt(false);
+        const items = Array.from(list.querySelectorAll('li[data-tdate]'));
+
+        const startVal = document.getElementById('stockFilterStart')?.value || '';
+        const endVal = document.getElementById('stockFilterEnd')?.value || '';
+        const stockVal = (document.getElementById('stockFilterSymbol')?.value || '').trim().toLowerCase();
+        const noteVal = (document.getElementById('stockFilterNote')?.value || '').trim().toLowerCase();
+        const fromVal = String(document.getElementById('stockFilterFromWallet')?.value || '').trim();
+        const toVal = String(document.getElementById('stockFilterToWallet')?.value || '').trim();
+
+        const startDt = parseLocalDateTime(startVal);
+        const endDt = parseLocalDateTime(endVal);
+
+        if (window.stockPageSize == null) window.stockPageSize = 20;
+        if (window.stockCurrentPage == null) window.stockCurrentPage = 1;
+
+        function itemMatches(li) {
+            let show = true;
+            const tdate = parseTxDate(li.getAttribute('data-tdate'));
+            if (startDt && tdate && tdate < startDt) show = false;
+            if (endDt && tdate && tdate > endDt) show = false;
+            if ((startDt || endDt) && !tdate) show = false;
+
+            if (show && stockVal) {
+                const sym = (li.getAttribute('data-stock') || '').toLowerCase();
+                if (!sym.includes(stockVal)) show = false;
+            }
+            if (show && noteVal) {
+                const noteAttr = (li.getAttribute('data-note') || '').toLowerCase();
+                if (!noteAttr.includes(noteVal)) show = false;
+            }
+            if (show && fromVal) {
+                const fromAttrRaw = String(li.getAttribute('data-from') || '').trim();
+                const fromAttr = fromAttrRaw.toLowerCase();
+                const needle = fromVal.toLowerCase();
+                // Prefer exact match (wallet id), fall back to substring match for older records.
+                if (fromAttrRaw !== fromVal && !fromAttr.includes(needle)) show = false;
+            }
+            if (show && toVal) {
+                const toAttrRaw = String(li.getAttribute('data-to') || '').trim();
+                const toAttr = toAttrRaw.toLowerCase();
+                const needle = toVal.toLowerCase();
+                if (toAttrRaw !== toVal && !toAttr.includes(needle)) show = false;
+            }
+            return show;
+        }
+
+        const matching = items.filter(itemMatches);
+        const total = matching.length;
+        const pageSize = Number(window.stockPageSize) || 20;
+        const totalPages = Math.max(1, Math.ceil(total / pageSize));
+        window.stockCurrentPage = Math.min(Math.max(1, Number(window.stockCurrentPage) || 1), totalPages);
+
+        items.forEach(li => { li.style.display = 'none'; });
+
+        const startIdx = (window.stockCurrentPage - 1) * pageSize;
+        const endIdx = startIdx + pageSize;
+        matching.slice(startIdx, endIdx).forEach(li => { li.style.display = ''; });
+
+        syncStockGroupHeaders();
+
+        const emptyMsg = document.getElementById('stockFilterEmptyMsg');
+        if (emptyMsg) emptyMsg.style.display = total ? 'none' : '';
+
+        const pager = document.getElementById('stockPagination');
+        const pageInfo = document.getElementById('stockPageInfo');
+        const prevBtn = document.getElementById('stockPrevPage');
+        const nextBtn = document.getElementById('stockNextPage');
+        if (pager) pager.style.display = total ? '' : 'none';
+        if (pageInfo) pageInfo.textContent = `Page ${window.stockCurrentPage} of ${totalPages}`;
+        if (prevBtn) prevBtn.disabled = window.stockCurrentPage <= 1;
+        if (nextBtn) nextBtn.disabled = window.stockCurrentPage >= totalPages;
+    }
+
+    function resetStockFilters() {
+        ['stockFilterStart','stockFilterEnd','stockFilterSymbol','stockFilterNote','stockFilterFromWallet','stockFilterToWallet'].forEach(id => {
+            const el = document.getElementById(id);
+            if (!el) return;
+            el.value = '';
+        });
+        window.stockCurrentPage = 1;
+        applyStockFilters();
+    }
+
+    function stockGoToPrevPage() {
+        window.stockCurrentPage = Math.max(1, (Number(window.stockCurrentPage) || 1) - 1);
+        applyStockFilters();
+    }
+
+    function stockGoToNextPage() {
+        window.stockCurrentPage = (Number(window.stockCurrentPage) || 1) + 1;
+        applyStockFilters();
+    }
+
+    function _populateWalletSelects(wallets) {
+        const sorted = (wallets || []).slice().sort(function(a, b) {
+            return String(a.walletName || '').localeCompare(String(b.walletName || ''));
+        });
+        const selectIds = ['fromWallet','toWallet','updateFromWallet','updateToWallet','stockFilterFromWallet','stockFilterToWallet'];
+        selectIds.forEach(function(id) {
+            const sel = document.getElementById(id);
+            if (!sel) return;
+            // Keep the first option (placeholder)
+            while (sel.options.length > 1) sel.remove(1);
+            sorted.forEach(function(w) {
+                var opt = document.createElement('option');
+                opt.value = w.walletId || '';
+                var label = w.walletName || w.walletId || '';
+                if (w.walletType) label += ' - ' + w.walletType;
+                if (w.currency) label += ' - ' + w.currency;
+                opt.textContent = label;
+                sel.appendChild(opt);
+            });
+        });
+    }
+
+    function _buildStockHistoryList(stocks, wallets) {
+        var list = document.getElementById('stockList');
+        var emptyMsg = document.getElementById('stockListEmpty');
+        if (!list) return;
+
+        function toNumber(v) {
+            if (v == null) return 0;
+            var s = String(v).trim().replace(/\s+/g, '').replace(',', '.');
+            var n = Number(s);
+            return isFinite(n) ? n : 0;
+        }
+
+        var walletNameById = {};
+        (wallets || []).forEach(function(w) {
+            if (w.walletId) walletNameById[w.walletId] = w.walletName || w.walletId;
+        });
+
+        if (!stocks || !stocks.length) {
+            list.innerHTML = '';
+            if (emptyMsg) emptyMsg.style.display = '';
+            return;
+        }
+        if (emptyMsg) emptyMsg.style.display = 'none';
+
+        list.innerHTML = stocks.map(function(s) {
+            var op = String(s.operation || s.side || '').trim();
+            if (op === 'None') op = '';
+            var note = String(s.note || '').trim();
+            if (note === 'None') note = '';
+            var fromW = String(s.fromWallet || '').trim();
+            if (fromW === 'None') fromW = '';
+            var toW = String(s.toWallet || '').trim();
+            if (toW === 'None') toW = '';
+            var fromName = fromW ? (walletNameById[fromW] || fromW) : '';
+            var toName = toW ? (walletNameById[toW] || toW) : '';
+            var walletLine = '';
+            if (fromName && toName) walletLine = fromName + ' - ' + toName;
+            else if (fromName || toName) walletLine = fromName || toName;
+            var qtyNum = toNumber(s.quantity);
+            var priceNum = toNumber(s.price);
+            var feeNum = toNumber(s.fee || 0);
+            var totalNum = (qtyNum * priceNum) + feeNum;
+            var totalText = formatNumber(totalNum, 2) + (s.currency ? ' ' + escapeHtml(s.currency) : '');
+
+            return '<li data-id="' + escapeHtml(s.stockId || '') + '" data-userid="' + escapeHtml(s.userId || '') + '" data-tdate="' + escapeHtml(s.tdate || '') + '" data-stock="' + escapeHtml(s.stockName || '') + '" data-operation="' + escapeHtml(op) + '" data-qty="' + escapeHtml(s.quantity || '') + '" data-price="' + escapeHtml(s.price || '') + '" data-currency="' + escapeHtml(s.currency || '') + '" data-fee="' + escapeHtml(s.fee || 0) + '" data-feecurrency="' + escapeHtml(s.feeCurrency || s.currency || '') + '" data-note="' + escapeHtml(note) + '" data-from="' + escapeHtml(s.fromWallet || '') + '" data-to="' + escapeHtml(s.toWallet || '') + '">'
+                + '<div class="crypto-history-row">'
+                + '<div class="crypto-history-left">'
+                + '<div class="crypto-history-title">' + escapeHtml(s.stockName || '') + '</div>'
+                + (op ? '<div class="crypto-history-sub">' + escapeHtml(op) + '</div>' : '')
+                + (walletLine ? '<div class="crypto-history-sub">' + escapeHtml(walletLine) + '</div>' : '')
+                + '</div>'
+                + '<div class="crypto-history-right">'
+                + '<div class="crypto-history-amount">' + escapeHtml(s.quantity || '') + '</div>'
+                + '<div class="crypto-history-sub">' + totalText + '</div>'
+                + (note ? '<div class="crypto-history-sub">' + escapeHtml(note) + '</div>' : '')
+                + '</div>'
+                + '<div class="crypto-history-actions">'
+                + '<button class="btn-insert" type="button" onclick="editStockFromRow(this)">Edit</button>'
+                + '</div>'
+                + '</div>'
+                + '</li>';
+        }).join('');
+
+        // Sort by date descending
+        var items = Array.from(list.querySelectorAll('li[data-tdate]'));
+        items.sort(function(a, b) {
+            var dateA = parseTxDate(a.getAttribute('data-tdate')) || new Date(0);
+            var dateB = parseTxDate(b.getAttribute('data-tdate')) || new Date(0);
+            return dateB - dateA;
+        });
+        items.forEach(function(item) { list.appendChild(item); });
+        ensureStockGroupsBuilt(true);
+    }
+
+document.addEventListener("DOMContentLoaded", function() {
+    initStockAutocomplete('stockSearch', 'stockSearchList', 'stockName', { priceId: 'stockPrice', currencyId: 'stockCurrency' });
+    initStockAutocomplete('updateStockSearch', 'updateStockSearchList', 'updateStockName', { priceId: 'updatePrice', currencyId: 'updateCurrency' });
+
+    // Mark caches as stale on any transaction mutation
+    var _stockCreateForm = document.querySelector('form[action="/stock"]');
+    if (_stockCreateForm) {
+        _stockCreateForm.addEventListener('submit', function() {
+            if (typeof window.markTransactionChanged === 'function') window.markTransactionChanged();
+        });
+    }
+    var _stockUpdateForm = document.getElementById('updateForm');
+    if (_stockUpdateForm) {
+        _stockUpdateForm.addEventListener('submit', function() {
+            if (typeof window.markTransactionChanged === 'function') window.markTransactionChanged();
+        });
+    }
+    var _stockDeleteForm = document.getElementById('deleteForm');
+    if (_stockDeleteForm && !_stockDeleteForm._txMarkAttached) {
+        _stockDeleteForm._txMarkAttached = true;
+        _stockDeleteForm.addEventListener('submit', function() {
+            if (typeof window.markTransactionChanged === 'function') window.markTransactionChanged();
+        });
+    }
+
+    const createCurrency = document.getElementById('stockCurrency');
+    const createFeeCurrency = document.getElementById('feeCurrency');
+    if (createCurrency && createFeeCurrency) {
+        createFeeCurrency.value = createCurrency.value || 'EUR';
+        createCurrency.addEventListener('change', function() {
+            createFeeCurrency.value = createCurrency.value || 'EUR';
+        });
+    }
+
+    const updateCurrency = document.getElementById('updateCurrency');
+    const updateFeeCurrency = document.getElementById('updateFeeCurrency');
+    if (updateCurrency && updateFeeCurrency) {
+        updateFeeCurrency.value = updateCurrency.value || 'EUR';
+        updateCurrency.addEventListener('change', function() {
+            updateFeeCurrency.value = updateCurrency.value || 'EUR';
+        });
+    }
+
+    const createOperation = document.getElementById('operation');
+    const createFromWallet = document.getElementById('fromWallet');
+    const createToWallet = document.getElementById('toWallet');
+    if (createOperation && createFromWallet && createToWallet) {
+        const syncCreateRules = function() {
+            _applyStockWalletRules(createOperation, createFromWallet, createToWallet);
+        };
+        createOperation.addEventListener('change', syncCreateRules);
+        syncCreateRules();
+    }
+
+    const updateOperation = document.getElementById('updateOperation');
+    const updateFromWallet = document.getElementById('updateFromWallet');
+    const updateToWallet = document.getElementById('updateToWallet');
+    if (updateOperation && updateFromWallet && updateToWallet) {
+        const syncUpdateRules = function() {
+            _applyStockWalletRules(updateOperation, updateFromWallet, updateToWallet);
+        };
+        updateOperation.addEventListener('change', syncUpdateRules);
+        syncUpdateRules();
+    }
+
+    // Wire filter events
+    ['stockFilterStart','stockFilterEnd','stockFilterSymbol','stockFilterNote','stockFilterFromWallet','stockFilterToWallet'].forEach(function(id) {
+        var el = document.getElementById(id);
+        if (!el) return;
+        ['input','change'].forEach(function(evt) {
+            el.addEventListener(evt, function () {
+                window.stockCurrentPage = 1;
+                applyStockFilters();
+            });
+        });
+    });
+
+    function _stockRenderFromData(data) {
+        var loadingEl = document.getElementById('stockDataLoading');
+        if (loadingEl) loadingEl.style.display = 'none';
+
+        var stocksEl = document.getElementById('stocks-data');
+        var walletsEl = document.getElementById('stock-wallets-data');
+        if (stocksEl) stocksEl.setAttribute('data-stocks', JSON.stringify(data.stocks || []));
+        if (walletsEl) walletsEl.setAttribute('data-wallets', JSON.stringify(data.wallets || []));
+
+        var bcEl = document.getElementById('stockBaseCurrency');
+        if (bcEl && data.base_currency) bcEl.value = data.base_currency;
+
+        if (data.fx_warning) {
+            var fxEl = document.getElementById('stockFxWarning');
+            if (fxEl) {
+                fxEl.textContent = 'Some transactions could not be converted to ' + (data.base_currency || 'EUR') + ' (FX unavailable). Portfolio values may be approximate.';
+                fxEl.style.display = '';
+            }
+        }
+
+        _populateWalletSelects(data.wallets || []);
+        _buildStockHistoryList(data.stocks || [], data.wallets || []);
+        showStockPortfolio();
+    }
+
+    window.loadStockPage = function(forceReload) {
+        var cached = (!forceReload) ? window.pageDataCache.get('stock-data') : Promise.resolve(null);
+        return Promise.resolve(cached).then(function(cachedData) {
+            if (cachedData) {
+                console.log('[PageCache] Using cached stock-data');
+                _stockRenderFromData(cachedData);
+                return;
+            }
+            return fetch('/api/stock-data')
+                .then(function(resp) {
+                    if (!resp.ok) throw new Error('HTTP ' + resp.status);
+                    return resp.json();
+                })
+                .then(function(data) {
+                    window.pageDataCache.set('stock-data', data);
+                    _stockRenderFromData(data);
+                })
+                .catch(function(err) {
+                    console.error('Stock data fetch failed:', err);
+                    var loadingEl = document.getElementById('stockDataLoading');
+                    if (loadingEl) loadingEl.innerHTML = '<div class="small-muted">Failed to load stock data</div>';
+                });
+        });
+    };
+
+    var _stockRefreshBtn = document.getElementById('stockRefreshBtn');
+    if (_stockRefreshBtn) {
+        _stockRefreshBtn.addEventListener('click', function() { refreshStockPrices(true); });
+    }
+
+    loadStockPage(false);
+});
+
+// Keep these names for menu/sidebar compatibility.
+function newStockDiv() { showStockNew(); }
+function stockHistoryDiv() { showStockHistory(); }
+function stockWalletsDiv() { showStockWallets(); }
@@ -20,13 +20,15 @@ ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY") or os.getenv("AV_API_
 # CoinMarketCap API (crypto)
 CMC_API_KEY = os.getenv("CMC_API_KEY")
 
-# Stock data provider:
-# - yahoo (default): Yahoo Finance only
-# - auto: try Alpha Vantage, fall back to Yahoo Finance
-# - alphavantage: Alpha Vantage only
-# - yahoo: Yahoo Finance only
+# Stock data provider (first in the quote chain, see app.services.providers):
+# - yahoo (default): Yahoo Finance first, Alpha Vantage (if a key is set) as hedge/fallback
+# - alphavantage: Alpha Vantage first, Yahoo Finance as hedge/fallback
+# - auto: whichever is currently fastest and healthiest
 STOCK_DATA_PROVIDER = (os.getenv("STOCK_DATA_PROVIDER") or "yahoo").strip().lower()
 
+# Crypto data provider: cmc (default), yahoo or auto (same meaning as above).
+CRYPTO_DATA_PROVIDER = (os.getenv("CRYPTO_DATA_PROVIDER") or "cmc").strip().lower()
+
 AUTHORITY = "https://cognito-idp.eu-north-1.amazonaws.com/eu-north-1_dBBGtdFWv"
 SERVER_METADATA_URL = (
     "https://cognito-idp.eu-north-1.amazonaws.com/eu-north-1_dBBGtdFWv/.well-known/openid-configuration"